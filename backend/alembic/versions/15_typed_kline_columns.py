@@ -0,0 +1,142 @@
+"""Typed numeric columns for kline tables
+
+Revision ID: 15
+Revises: 14
+Create Date: 2026-10-16
+
+将K线表的timestamp从String迁移为BIGINT(纳秒)，OHLCV从String迁移为DOUBLE，
+并添加(symbol, interval, timestamp)联合唯一索引。
+
+SQLite不支持修改列类型，因此采用"新建表 -> 回填数据 -> 删除旧表 -> 重命名"的方式，
+回填时顺带将非纳秒级时间戳统一为纳秒级，并按联合键去重（保留id最大的一条）。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+from collector.db.migrations import typed_kline_backfill_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '15'
+down_revision: Union[str, Sequence[str], None] = '14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+KLINE_TABLES = [
+    'crypto_spot_klines',
+    'crypto_future_klines',
+    'stock_klines',
+]
+
+def _table_exists(conn, table: str) -> bool:
+    return sa.inspect(conn).has_table(table)
+
+
+def _timestamp_is_numeric(conn, table: str) -> bool:
+    """检查timestamp列是否已经是整数类型"""
+    for column in sa.inspect(conn).get_columns(table):
+        if column['name'] == 'timestamp':
+            return isinstance(column['type'], sa.Integer)
+    return False
+
+
+def _create_kline_table(name: str, typed: bool) -> None:
+    ts_type = sa.BigInteger() if typed else sa.String()
+    price_type = sa.Double() if typed else sa.String()
+    op.create_table(
+        name,
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('interval', sa.String(), nullable=False),
+        sa.Column('timestamp', ts_type, nullable=False),
+        sa.Column('open', price_type, nullable=False),
+        sa.Column('high', price_type, nullable=False),
+        sa.Column('low', price_type, nullable=False),
+        sa.Column('close', price_type, nullable=False),
+        sa.Column('volume', price_type, nullable=False),
+        sa.Column('unique_kline', sa.String(), nullable=False),
+        sa.Column('data_source', sa.String(length=50), nullable=False, server_default='unknown'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def _create_kline_indexes(table: str, typed: bool) -> None:
+    op.create_index(op.f(f'ix_{table}_id'), table, ['id'], unique=False)
+    op.create_index(op.f(f'ix_{table}_symbol'), table, ['symbol'], unique=False)
+    op.create_index(op.f(f'ix_{table}_interval'), table, ['interval'], unique=False)
+    op.create_index(op.f(f'ix_{table}_timestamp'), table, ['timestamp'], unique=False)
+    op.create_index(op.f(f'ix_{table}_unique_kline'), table, ['unique_kline'], unique=True)
+    op.create_index(op.f(f'ix_{table}_data_source'), table, ['data_source'], unique=False)
+    if typed:
+        op.create_index(
+            f'ix_{table}_symbol_interval_timestamp', table,
+            ['symbol', 'interval', 'timestamp'], unique=True
+        )
+
+
+def upgrade() -> None:
+    """将K线表迁移为数值类型列并回填数据"""
+    conn = op.get_bind()
+
+    for table in KLINE_TABLES:
+        print(f"\n处理表: {table}")
+
+        if not _table_exists(conn, table):
+            print(f"  表 {table} 不存在，跳过")
+            continue
+        if _timestamp_is_numeric(conn, table):
+            print(f"  表 {table} 已是数值类型，跳过")
+            continue
+
+        new_table = f"{table}_typed"
+        op.execute(f"DROP TABLE IF EXISTS {new_table}")
+        _create_kline_table(new_table, typed=True)
+
+        # 回填：统一纳秒时间戳、转换价格类型、重建unique_kline并按联合键去重
+        conn.execute(text(typed_kline_backfill_sql(table, new_table)))
+
+        old_count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        new_count = conn.execute(text(f"SELECT COUNT(*) FROM {new_table}")).scalar()
+        print(f"  回填完成: 原记录 {old_count} 条，迁移后 {new_count} 条")
+
+        op.drop_table(table)
+        op.rename_table(new_table, table)
+        _create_kline_indexes(table, typed=True)
+
+    print("\n✓ K线表数值类型迁移完成！")
+
+
+def downgrade() -> None:
+    """降级：将K线表还原为String类型列"""
+    conn = op.get_bind()
+
+    for table in KLINE_TABLES:
+        if not _table_exists(conn, table) or not _timestamp_is_numeric(conn, table):
+            continue
+
+        new_table = f"{table}_legacy"
+        op.execute(f"DROP TABLE IF EXISTS {new_table}")
+        _create_kline_table(new_table, typed=False)
+
+        conn.execute(text(f"""
+            INSERT INTO {new_table} (
+                id, symbol, "interval", "timestamp", open, high, low, close, volume,
+                unique_kline, data_source, created_at, updated_at
+            )
+            SELECT
+                id, symbol, "interval", CAST("timestamp" AS VARCHAR),
+                CAST(open AS VARCHAR), CAST(high AS VARCHAR), CAST(low AS VARCHAR),
+                CAST(close AS VARCHAR), CAST(volume AS VARCHAR),
+                unique_kline, data_source, created_at, updated_at
+            FROM {table}
+        """))
+
+        op.drop_table(table)
+        op.rename_table(new_table, table)
+        _create_kline_indexes(table, typed=False)
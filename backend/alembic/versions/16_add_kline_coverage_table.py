@@ -0,0 +1,34 @@
+"""add_kline_coverage_table
+
+Revision ID: 16
+Revises: 15
+Create Date: 2026-10-16
+
+添加K线覆盖索引表，每行记录一个 (K线表, symbol, interval) 的连续已覆盖区间。
+已有K线不在迁移中回填，首次完整性检查时按需补录。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '16'
+down_revision: Union[str, Sequence[str], None] = '15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('kline_coverage',
+        sa.Column('kline_table', sa.String(), nullable=False),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('interval', sa.String(), nullable=False),
+        sa.Column('start_ts', sa.BigInteger(), nullable=False),
+        sa.Column('end_ts', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('kline_table', 'symbol', 'interval', 'start_ts')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('kline_coverage')
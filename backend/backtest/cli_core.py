@@ -19,7 +19,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -34,12 +34,17 @@ if str(strategies_dir) not in sys.path:
     sys.path.insert(0, str(strategies_dir))
 
 from backtest.progress import ConsoleProgressBar, ProgressTracker
+from collector.db.kline_cache import invalidate_kline_cache, read_cached_klines
+from collector.db.kline_coverage import missing_from_timestamps
 from backtest.result_analysis import output_results
 from strategy.core import StrategyBase
 from strategy.adapters import VectorBacktestAdapter, PortfolioBacktestAdapter
 from utils.time_parser import parse_time_range, datetime_to_timestamp
 from utils.validation import parse_symbols, parse_timeframes
 
+if TYPE_CHECKING:
+    from collector.db.kline_lake import KlineLake
+
 
 class DownloadFailureType(Enum):
     """下载失败类型"""
@@ -131,12 +136,16 @@ class CLICore:
             DataPreparationError: 数据准备失败
         """
         from backtest.data_integrity import DataIntegrityChecker
+        from collector.db.kline_lake import get_default_kline_lake
         
         # 解析时间范围
         start_date, end_date = parse_time_range(time_range)
         
         # 初始化检查器和下载器
         checker = DataIntegrityChecker()
+
+        # K线数据源配置为数据湖时优先从数据湖读取
+        kline_lake = get_default_kline_lake()
         
         # 使用独立下载器（如果已初始化）
         if not hasattr(self, 'downloader') or self.downloader is None:
@@ -166,9 +175,15 @@ class CLICore:
                         logger.info(f"[{current_task}/{total_tasks}] 准备数据: {key}")
 
                     try:
-                        # 检查数据完整性
+                        df = None
+                        if kline_lake is not None:
+                            df = self._load_klines_from_lake(
+                                kline_lake, symbol, timeframe, start_date, end_date, trading_mode
+                            )
+
+                        # 检查数据完整性（数据湖完整覆盖时间范围时跳过数据库检查）
                         integrity_result = None
-                        if start_date and end_date:
+                        if start_date and end_date and df is None:
                             integrity_result = checker.check_data_completeness(
                                 symbol=symbol,
                                 interval=timeframe,
@@ -216,16 +231,17 @@ class CLICore:
                                     progress_bar.set_message(f"✅ {key} 数据完整")
 
                         # 从数据库加载数据
-                        if show_progress and progress_bar:
-                            progress_bar.set_message(f"📊 加载 {key} 数据...")
+                        if df is None:
+                            if show_progress and progress_bar:
+                                progress_bar.set_message(f"📊 加载 {key} 数据...")
 
-                        df = self._load_klines_from_db(
-                            symbol=symbol,
-                            timeframe=timeframe,
-                            start_date=start_date,
-                            end_date=end_date,
-                            trading_mode=trading_mode
-                        )
+                            df = self._load_klines_from_db(
+                                symbol=symbol,
+                                timeframe=timeframe,
+                                start_date=start_date,
+                                end_date=end_date,
+                                trading_mode=trading_mode
+                            )
 
                         if df is not None and not df.empty:
                             data_dict[key] = df
@@ -312,6 +328,54 @@ class CLICore:
         except Exception as e:
             raise DataPreparationError(f"数据准备失败: {e}")
     
+    def _load_klines_from_lake(
+        self,
+        kline_lake: 'KlineLake',
+        symbol: str,
+        timeframe: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        trading_mode: str
+    ) -> Optional[pd.DataFrame]:
+        """
+        从K线数据湖加载K线数据
+
+        参数：
+            kline_lake: 数据湖实例
+            symbol: 货币对
+            timeframe: 时间周期
+            start_date: 开始日期
+            end_date: 结束日期
+            trading_mode: 交易模式
+
+        返回：
+            Optional[pd.DataFrame]: K线数据DataFrame，数据湖中无数据或未完整覆盖时间范围时返回None
+        """
+        try:
+            start_ns = datetime_to_timestamp(start_date) * 1_000_000 if start_date else None  # 毫秒转纳秒
+            end_ns = datetime_to_timestamp(end_date) * 1_000_000 if end_date else None  # 毫秒转纳秒
+
+            # 经进程级K线缓存读取，重复回测同一时间段时不再读取数据湖
+            arrays = read_cached_klines(
+                symbol, timeframe, start_ns, end_ns, market=trading_mode, kline_lake=kline_lake
+            )
+            logger.info(f"[_load_klines_from_lake] {symbol} {timeframe}: 返回 {len(arrays)} 条数据")
+
+            if len(arrays) == 0:
+                return None
+
+            gaps = missing_from_timestamps(arrays.ts, timeframe, start_ns, end_ns)
+            if gaps:
+                # 不完整时回退到数据库检查和下载，丢弃缓存中这段数据湖K线
+                logger.info(f"[_load_klines_from_lake] {symbol} {timeframe}: 数据湖数据不完整（{len(gaps)} 处缺口），回退到数据库")
+                invalidate_kline_cache(trading_mode, symbol, timeframe, start_ns, end_ns)
+                return None
+            return arrays.to_dataframe().copy()
+
+        except Exception as e:
+            logger.error(f"从数据湖加载K线数据失败: {symbol} {timeframe}, 错误: {e}")
+            return None
+
     def _load_klines_from_db(
         self,
         symbol: str,
@@ -333,66 +397,41 @@ class CLICore:
         返回：
             Optional[pd.DataFrame]: K线数据DataFrame
         """
-        from collector.db.connection import get_db_connection
-        from collector.db.models import CryptoSpotKline, CryptoFutureKline
-        
         try:
-            conn = get_db_connection()
-
             # 标准化symbol格式（去除/）
             normalized_symbol = symbol.replace('/', '')
 
             # 选择数据表
             if trading_mode == 'spot':
-                KlineModel = CryptoSpotKline
+                crypto_type = 'spot'
             elif trading_mode in ['futures', 'perpetual']:
-                KlineModel = CryptoFutureKline
+                crypto_type = 'future'
             else:
                 raise ValueError(f"不支持的交易模式: {trading_mode}")
 
-            # 构建查询条件
-            # 注意：数据库存储的是16位时间戳（微秒级），需要将13位毫秒时间戳转换为16位
-            conditions = f"symbol = '{normalized_symbol}' AND interval = '{timeframe}'"
-            if start_date:
-                start_timestamp = datetime_to_timestamp(start_date) * 1000  # 13位转16位
-                conditions += f" AND CAST(timestamp AS INTEGER) >= {start_timestamp}"
-            if end_date:
-                end_timestamp = datetime_to_timestamp(end_date) * 1000  # 13位转16位
-                conditions += f" AND CAST(timestamp AS INTEGER) <= {end_timestamp}"
-
-            # 生成SQL
-            query = f"""
-                SELECT timestamp, open, high, low, close, volume
-                FROM {KlineModel.__tablename__}
-                WHERE {conditions}
-                ORDER BY timestamp ASC
-            """
+            # 注意：数据库存储的是BIGINT纳秒级时间戳，直接按整数范围过滤
+            start_ns = datetime_to_timestamp(start_date) * 1_000_000 if start_date else None  # 毫秒转纳秒
+            end_ns = datetime_to_timestamp(end_date) * 1_000_000 if end_date else None  # 毫秒转纳秒
 
             # 添加诊断日志
             logger.info(f"[_load_klines_from_db] 查询参数: symbol={symbol}, normalized={normalized_symbol}, interval={timeframe}")
             logger.info(f"[_load_klines_from_db] 时间范围: start={start_date}, end={end_date}")
-            logger.info(f"[_load_klines_from_db] SQL: {query}")
-
-            # 执行查询
-            cursor = conn.cursor()
-            cursor.execute(query)
-            klines = cursor.fetchall()
-
-            logger.info(f"[_load_klines_from_db] 查询结果: 返回 {len(klines)} 条数据")
-
-            # 转换为DataFrame
-            if klines:
-                df = pd.DataFrame(
-                    klines,
-                    columns=['timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
-                )
-                # 时间戳转换 - 数据库是16位微秒时间戳，直接转为datetime保持精度
-                df['timestamp'] = pd.to_datetime(df['timestamp'].astype(float), unit='us')
-                df.set_index('timestamp', inplace=True)
-                return df
-            else:
+
+            # 经进程级K线缓存列式读取，缺口才查询数据库，再由数组构建DataFrame
+            arrays = read_cached_klines(
+                normalized_symbol,
+                timeframe,
+                start_ns=start_ns,
+                end_ns=end_ns,
+                market=crypto_type,
+            )
+
+            logger.info(f"[_load_klines_from_db] 查询结果: 返回 {len(arrays)} 条数据")
+
+            if len(arrays) == 0:
                 return None
-                
+            return arrays.to_dataframe().copy()
+
         except Exception as e:
             logger.error(f"加载K线数据失败: {symbol} {timeframe}, 错误: {e}")
             return None
@@ -5,10 +5,10 @@
 提供回测数据完整性检查功能，包括：
 - 时间范围完整性检查
 - 数据质量验证（缺失值、异常值）
-- 缺失时间段计算
+- 缺失时间段计算（基于K线覆盖索引的区间运算）
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import pandas as pd
 import numpy as np
@@ -17,7 +17,10 @@ from utils.logger import get_logger, LogType
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
 from collector.db.database import SessionLocal
+from collector.db.kline_coverage import count_bars, find_missing_ranges
+from collector.db.kline_reader import read_kline_arrays
 from collector.db.models import CryptoSpotKline, CryptoFutureKline
+from utils.timestamp_utils import datetime_to_nanoseconds
 
 
 class DataIntegrityResult:
@@ -90,11 +93,15 @@ class DataIntegrityChecker:
         start_time: datetime,
         end_time: datetime,
         market_type: str = 'crypto',
-        crypto_type: str = 'spot'
+        crypto_type: str = 'spot',
+        check_quality: bool = False
     ) -> DataIntegrityResult:
         """
         检查数据完整性
         
+        缺失时间段由K线覆盖索引做区间运算得到，开销与缺口数量成正比；
+        数据质量检查需要读取范围内的全部K线，默认关闭。
+        
         Args:
             symbol: 交易对符号
             interval: 时间周期
@@ -102,6 +109,7 @@ class DataIntegrityChecker:
             end_time: 结束时间
             market_type: 市场类型
             crypto_type: 加密货币类型
+            check_quality: 是否同时检查数据质量
             
         Returns:
             DataIntegrityResult: 检查结果
@@ -122,45 +130,31 @@ class DataIntegrityChecker:
                 logger.info(f"转换end_time从字符串到datetime: {end_time}")
                 end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
             
-            # 1. 获取现有数据
-            existing_data = self._get_existing_data(
-                symbol, interval, start_time, end_time, market_type, crypto_type
-            )
-            
-            # 2. 计算期望的数据点数量
+            # 1. 由覆盖索引计算缺失时间段，只在候选缺口内扫描数据库
             result.total_expected = self._calculate_expected_count(
                 start_time, end_time, interval
             )
-            result.total_actual = len(existing_data)
-            
-            # 3. 计算缺失时间段
-            if existing_data.empty:
-                result.missing_ranges = [(start_time, end_time)]
-                result.missing_count = result.total_expected
-            else:
-                result.missing_ranges = self._calculate_missing_ranges(
-                    existing_data, start_time, end_time, interval
-                )
-                # 使用缺失时间段计算真实的缺失数据点数量
-                result.missing_count = sum(
-                    self._calculate_expected_count(start, end, interval)
-                    for start, end in result.missing_ranges
-                )
+            result.missing_ranges, result.missing_count = self._find_missing_ranges(
+                symbol, interval, start_time, end_time, market_type, crypto_type
+            )
+            result.total_actual = max(result.total_expected - result.missing_count, 0)
             
-            # 4. 计算覆盖率（限制在0-100%之间）
+            # 2. 计算覆盖率（限制在0-100%之间）
             if result.total_expected > 0:
-                # 实际数据可能超出期望范围，限制覆盖率不超过100%
-                actual_in_range = min(result.total_actual, result.total_expected)
                 result.coverage_percent = min(
-                    (actual_in_range / result.total_expected) * 100,
+                    (result.total_actual / result.total_expected) * 100,
                     100.0
                 )
             
-            # 5. 检查数据质量
-            if not existing_data.empty:
-                result.quality_issues = self._check_data_quality(existing_data)
+            # 3. 检查数据质量（需要读取全部K线，按需开启）
+            if check_quality:
+                existing_data = self._get_existing_data(
+                    symbol, interval, start_time, end_time, market_type, crypto_type
+                )
+                if not existing_data.empty:
+                    result.quality_issues = self._check_data_quality(existing_data)
             
-            # 6. 判断是否完整
+            # 4. 判断是否完整
             # 当覆盖率达到100%且没有缺失数据时，认为数据完整（即使有轻微质量问题）
             result.is_complete = (
                 result.missing_count == 0 and
@@ -186,6 +180,52 @@ class DataIntegrityChecker:
         
         return result
     
+    def _get_kline_table(self, market_type: str, crypto_type: str) -> Optional[str]:
+        """K线表名，不支持的市场类型返回None"""
+        if market_type != 'crypto':
+            return None
+        model = CryptoSpotKline if crypto_type == 'spot' else CryptoFutureKline
+        return model.__tablename__
+    
+    def _find_missing_ranges(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: datetime,
+        end_time: datetime,
+        market_type: str,
+        crypto_type: str
+    ) -> Tuple[List[Tuple[datetime, datetime]], int]:
+        """由覆盖索引计算缺失时间段，返回 (缺失时间段, 缺失K线数)"""
+        table = self._get_kline_table(market_type, crypto_type)
+        if self.db is None or table is None:
+            if self.db is None:
+                logger.error("数据库会话未初始化")
+            return [(start_time, end_time)], self._calculate_expected_count(start_time, end_time, interval)
+        
+        step_ns = self.INTERVAL_MINUTES.get(interval, 1) * 60 * 1_000_000_000
+        try:
+            gaps = find_missing_ranges(
+                self.db,
+                table,
+                symbol.replace('/', ''),
+                interval,
+                datetime_to_nanoseconds(start_time),
+                datetime_to_nanoseconds(end_time),
+                step_ns=step_ns,
+            )
+            # 提交缺口核实时补录的覆盖索引
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        missing_ranges = [
+            (datetime.fromtimestamp(gap_start / 1e9), datetime.fromtimestamp(gap_end / 1e9))
+            for gap_start, gap_end in gaps
+        ]
+        return missing_ranges, count_bars(gaps, step_ns)
+    
     def _get_existing_data(
         self,
         symbol: str,
@@ -195,48 +235,34 @@ class DataIntegrityChecker:
         market_type: str,
         crypto_type: str
     ) -> pd.DataFrame:
-        """获取现有数据"""
+        """列式读取现有数据，用于数据质量检查"""
         try:
             # 确保数据库会话已初始化
             if self.db is None:
                 logger.error("数据库会话未初始化")
                 return pd.DataFrame()
             
-            # 标准化symbol格式（去除/）
-            normalized_symbol = symbol.replace('/', '')
-
-            # 转换时间戳为微秒字符串（与数据库16位时间戳格式一致）
-            start_timestamp = int(start_time.timestamp() * 1000 * 1000)  # 13位毫秒转16位微秒
-            end_timestamp = int(end_time.timestamp() * 1000 * 1000)  # 13位毫秒转16位微秒
+            table = self._get_kline_table(market_type, crypto_type)
+            if table is None:
+                return pd.DataFrame()
             
-            if market_type == 'crypto':
-                if crypto_type == 'spot':
-                    model = CryptoSpotKline
-                else:
-                    model = CryptoFutureKline
-                
-                # 使用字符串比较（因为数据库中timestamp是String类型）
-                query = self.db.query(model).filter(
-                    model.symbol == normalized_symbol,
-                    model.interval == interval,
-                    model.timestamp >= str(start_timestamp),
-                    model.timestamp <= str(end_timestamp)
-                ).order_by(model.timestamp.asc())
-                
-                records = query.all()
-                
-                if records:
-                    data = {
-                        'timestamp': [int(r.timestamp) for r in records],
-                        'open': [float(r.open) for r in records],
-                        'high': [float(r.high) for r in records],
-                        'low': [float(r.low) for r in records],
-                        'close': [float(r.close) for r in records],
-                        'volume': [float(r.volume) for r in records],
-                    }
-                    return pd.DataFrame(data)
-                
-            return pd.DataFrame()
+            arrays = read_kline_arrays(
+                self.db,
+                symbol.replace('/', ''),
+                interval,
+                start_ns=datetime_to_nanoseconds(start_time),
+                end_ns=datetime_to_nanoseconds(end_time),
+                table=table,
+            )
+            return pd.DataFrame({
+                # 纳秒转毫秒
+                'timestamp': arrays.ts // 1_000_000,
+                'open': arrays.open,
+                'high': arrays.high,
+                'low': arrays.low,
+                'close': arrays.close,
+                'volume': arrays.volume,
+            })
             
         except Exception as e:
             logger.error(f"获取现有数据失败: {e}")
@@ -256,83 +282,6 @@ class DataIntegrityChecker:
         total_minutes = time_diff.total_seconds() / 60
         return int(total_minutes / minutes) + 1
     
-    def _calculate_missing_ranges(
-        self,
-        existing_data: pd.DataFrame,
-        start_time: datetime,
-        end_time: datetime,
-        interval: str
-    ) -> List[Tuple[datetime, datetime]]:
-        """计算缺失时间段"""
-        missing_ranges = []
-        
-        if existing_data.empty:
-            return [(start_time, end_time)]
-        
-        # 生成完整的时间序列
-        minutes = self.INTERVAL_MINUTES.get(interval, 1)
-        freq = f'{minutes}min'
-        
-        full_range = pd.date_range(
-            start=start_time,
-            end=end_time,
-            freq=freq
-        )
-        
-        # 获取现有数据的时间戳（转换为毫秒时间戳以便比较）
-        existing_timestamps = set(existing_data['timestamp'])
-        
-        # 将 pd.date_range 生成的时间戳转换为毫秒时间戳
-        full_range_ms = set(int(ts.timestamp() * 1000) for ts in full_range)
-        
-        # 找出缺失的时间点
-        missing_timestamps_ms = full_range_ms - existing_timestamps
-        
-        if not missing_timestamps_ms:
-            return []
-        
-        # 将毫秒时间戳转换回 datetime 对象
-        missing_timestamps = [
-            datetime.fromtimestamp(ts / 1000) for ts in sorted(missing_timestamps_ms)
-        ]
-        
-        # 合并连续的缺失时间点为时间段
-        missing_ranges = self._merge_continuous_timestamps(
-            missing_timestamps, interval
-        )
-        
-        return missing_ranges
-    
-    def _merge_continuous_timestamps(
-        self,
-        timestamps: List[datetime],
-        interval: str
-    ) -> List[Tuple[datetime, datetime]]:
-        """合并连续的时间戳为时间段"""
-        if not timestamps:
-            return []
-        
-        minutes = self.INTERVAL_MINUTES.get(interval, 1)
-        delta = timedelta(minutes=minutes)
-        
-        ranges = []
-        range_start = timestamps[0]
-        range_end = timestamps[0]
-        
-        for i in range(1, len(timestamps)):
-            # 检查是否连续
-            if timestamps[i] - range_end <= delta * 1.5:  # 允许一点误差
-                range_end = timestamps[i]
-            else:
-                ranges.append((range_start, range_end))
-                range_start = timestamps[i]
-                range_end = timestamps[i]
-        
-        # 添加最后一个范围
-        ranges.append((range_start, range_end))
-        
-        return ranges
-    
     def _check_data_quality(self, data: pd.DataFrame) -> List[Dict[str, Any]]:
         """检查数据质量"""
         issues = []
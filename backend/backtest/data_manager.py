@@ -8,6 +8,10 @@ from utils.logger import get_logger, LogType
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
 from datetime import datetime
+from utils.timestamp_utils import datetime_to_nanoseconds
+from collector.db.kline_cache import invalidate_kline_cache, read_cached_klines, read_resampled_klines
+from collector.db.kline_coverage import missing_from_timestamps
+from collector.db.kline_resample import can_resample, interval_span_ns
 
 class DataManager:
     """
@@ -15,18 +19,25 @@ class DataManager:
     支持策略在回测过程中获取不同周期的数据
     """
     
-    def __init__(self, data_service):
+    def __init__(self, data_service, kline_lake=None, exchange='binance', crypto_type='spot'):
         """
         初始化数据管理器
         
         Args:
             data_service: 数据服务实例，用于获取K线数据
+            kline_lake: K线数据湖实例，设置后优先从数据湖加载数据
+            exchange: 交易所
+            crypto_type: 加密货币类型（spot/future）
         """
         self.data_service = data_service
+        self.kline_lake = kline_lake
+        self.exchange = exchange
+        self.crypto_type = crypto_type
         self.data_cache = {}  # 数据缓存，格式：{symbol: {interval: data}}
         self.supported_intervals = ['1m', '5m', '15m', '30m', '1h', '4h', '1d', '1w']
     
-    def preload_data(self, symbol, base_interval, start_time, end_time, preload_intervals=None, ensure_integrity=True):
+    def preload_data(self, symbol, base_interval, start_time, end_time, preload_intervals=None, ensure_integrity=True,
+                     resample=True):
         """
         预加载多种时间周期的数据
         
@@ -37,9 +48,9 @@ class DataManager:
             end_time: 结束时间
             preload_intervals: 需要预加载的周期列表，默认为None，加载所有支持的周期
             ensure_integrity: 是否确保数据完整性，默认为True
+            resample: 是否只加载最细周期并在内存中重采样出更粗的周期，默认为True
         """
-        if preload_intervals is None:
-            preload_intervals = self.supported_intervals
+        preload_intervals = list(preload_intervals or self.supported_intervals)
         
         # 确保主周期在预加载列表中
         if base_interval not in preload_intervals:
@@ -47,88 +58,248 @@ class DataManager:
         
         logger.info(f"开始预加载数据，交易对: {symbol}, 主周期: {base_interval}, 预加载周期: {preload_intervals}")
         
-        # 如果需要确保数据完整性，先检查并下载缺失数据
-        if ensure_integrity:
-            logger.info(f"[{symbol}] 预加载前检查数据完整性...")
-            from .data_integrity import DataIntegrityChecker
-            from .data_downloader import BacktestDataDownloader
-            
-            integrity_checker = DataIntegrityChecker()
-            data_downloader = BacktestDataDownloader()
-            
-            for interval in preload_intervals:
-                try:
-                    # 检查数据完整性
-                    integrity_result = integrity_checker.check_data_completeness(
-                        symbol=symbol,
-                        interval=interval,
-                        start_time=start_time,
-                        end_time=end_time,
-                        market_type='crypto',
-                        crypto_type='spot'
-                    )
-                    
-                    if not integrity_result.is_complete:
-                        logger.warning(
-                            f"[{symbol}] {interval} 数据不完整，覆盖率: {integrity_result.coverage_percent:.2f}%, "
-                            f"缺失: {integrity_result.missing_count} 条"
-                        )
-                        
-                        # 下载缺失数据
-                        download_success, new_result = data_downloader.ensure_data_complete(
-                            symbol=symbol,
-                            interval=interval,
-                            start_time=start_time,
-                            end_time=end_time,
-                            max_wait_time=300
-                        )
-                        
-                        if download_success:
-                            logger.info(f"[{symbol}] {interval} 数据下载完成")
-                        else:
-                            logger.warning(f"[{symbol}] {interval} 数据下载失败，将使用现有数据")
-                    else:
-                        logger.info(f"[{symbol}] {interval} 数据完整性检查通过")
-                        
-                except Exception as e:
-                    logger.error(f"[{symbol}] {interval} 数据完整性检查失败: {e}")
-        
         # 初始化交易对的数据缓存
         if symbol not in self.data_cache:
             self.data_cache[symbol] = {}
+
+        # 优先从数据湖加载，数据湖完整覆盖时间范围的周期不再检查数据库完整性
+        if self.kline_lake is not None:
+            if resample:
+                preload_intervals = self._preload_resampled(
+                    symbol, preload_intervals, start_time, end_time, kline_lake=self.kline_lake
+                )
+            for interval in preload_intervals:
+                df = self._load_from_lake(symbol, interval, start_time, end_time)
+                if df is not None:
+                    self.data_cache[symbol][interval] = df
+                    logger.info(f"从数据湖预加载 {symbol} 的 {interval} 周期数据，共 {len(df)} 条")
+            preload_intervals = [i for i in preload_intervals if i not in self.data_cache[symbol]]
+            if not preload_intervals:
+                return
+
+        # 重采样时只检查并加载最细周期，最细周期缺失时才回退到逐周期检查和加载
+        checked_intervals = []
+        resample_base = self._resample_base(preload_intervals) if resample else None
+        if resample_base is not None:
+            if ensure_integrity:
+                self._ensure_integrity(symbol, [resample_base], start_time, end_time)
+                checked_intervals.append(resample_base)
+            preload_intervals = self._preload_resampled(
+                symbol, preload_intervals, start_time, end_time, conn=getattr(self.data_service, 'db', None)
+            )
+            if not preload_intervals:
+                return
+
+        # 如果需要确保数据完整性，先检查并下载缺失数据
+        if ensure_integrity:
+            self._ensure_integrity(
+                symbol, [i for i in preload_intervals if i not in checked_intervals], start_time, end_time
+            )
         
         # 预加载数据
         for interval in preload_intervals:
             try:
                 logger.info(f"预加载 {symbol} 的 {interval} 周期数据")
-                
-                # 调用数据服务获取K线数据
-                kline_data = self.data_service.get_kline_data(
+                df = self._load_from_db(symbol, interval, start_time, end_time)
+                if df is not None:
+                    self.data_cache[symbol][interval] = df
+                    logger.info(f"成功预加载 {symbol} 的 {interval} 周期数据，共 {len(df)} 条")
+                else:
+                    logger.warning(f"未获取到 {symbol} 的 {interval} 周期数据")
+            except Exception as e:
+                logger.error(f"预加载 {symbol} 的 {interval} 周期数据失败: {e}")
+                logger.exception(e)
+    
+    def _ensure_integrity(self, symbol, intervals, start_time, end_time):
+        """
+        检查各周期数据完整性，不完整时下载缺失数据
+        
+        Args:
+            symbol: 交易对符号
+            intervals: 需要检查的周期列表
+            start_time: 开始时间
+            end_time: 结束时间
+        """
+        if not intervals:
+            return
+        
+        logger.info(f"[{symbol}] 预加载前检查数据完整性: {intervals}")
+        from .data_integrity import DataIntegrityChecker
+        from .data_downloader import BacktestDataDownloader
+        
+        integrity_checker = DataIntegrityChecker()
+        data_downloader = BacktestDataDownloader()
+        
+        for interval in intervals:
+            try:
+                # 检查数据完整性
+                integrity_result = integrity_checker.check_data_completeness(
                     symbol=symbol,
                     interval=interval,
                     start_time=start_time,
-                    end_time=end_time
+                    end_time=end_time,
+                    market_type='crypto',
+                    crypto_type=self.crypto_type
                 )
                 
-                # 将数据转换为DataFrame
-                if kline_data and 'data' in kline_data:
-                    df = pd.DataFrame(kline_data['data'])
-                    # 确保时间列是datetime类型
-                    if 'datetime' in df.columns:
-                        df['datetime'] = pd.to_datetime(df['datetime'])
-                        df.set_index('datetime', inplace=True)
-                    elif 'open_time' in df.columns:
-                        df['open_time'] = pd.to_datetime(df['open_time'])
-                        df.set_index('open_time', inplace=True)
+                if not integrity_result.is_complete:
+                    logger.warning(
+                        f"[{symbol}] {interval} 数据不完整，覆盖率: {integrity_result.coverage_percent:.2f}%, "
+                        f"缺失: {integrity_result.missing_count} 条"
+                    )
                     
-                    # 缓存数据
-                    self.data_cache[symbol][interval] = df
-                    logger.info(f"成功预加载 {symbol} 的 {interval} 周期数据，共 {len(df)} 条")
+                    # 下载缺失数据
+                    download_success, new_result = data_downloader.ensure_data_complete(
+                        symbol=symbol,
+                        interval=interval,
+                        start_time=start_time,
+                        end_time=end_time,
+                        max_wait_time=300
+                    )
+                    
+                    if download_success:
+                        logger.info(f"[{symbol}] {interval} 数据下载完成")
+                    else:
+                        logger.warning(f"[{symbol}] {interval} 数据下载失败，将使用现有数据")
                 else:
-                    logger.warning(f"未获取到 {symbol} 的 {interval} 周期数据")
+                    logger.info(f"[{symbol}] {interval} 数据完整性检查通过")
+                    
             except Exception as e:
-                logger.error(f"预加载 {symbol} 的 {interval} 周期数据失败: {e}")
-                logger.exception(e)
+                logger.error(f"[{symbol}] {interval} 数据完整性检查失败: {e}")
+    
+    @staticmethod
+    def _resample_base(intervals):
+        """
+        选出可以重采样出其余周期的最细周期，没有可重采样的周期时返回None
+        """
+        try:
+            base = min(intervals, key=interval_span_ns)
+        except ValueError:
+            return None
+        if not any(can_resample(base, interval) for interval in intervals):
+            return None
+        return base
+    
+    def _preload_resampled(self, symbol, intervals, start_time, end_time, **source):
+        """
+        只加载最细周期，由其在内存中重采样出更粗的周期，重采样结果同样经进程级K线缓存共享
+        
+        Args:
+            symbol: 交易对符号
+            intervals: 需要预加载的周期列表
+            start_time: 开始时间
+            end_time: 结束时间
+            **source: 传给 read_cached_klines 的数据来源（kline_lake 或 conn）
+            
+        Returns:
+            List[str]: 仍需逐周期加载的周期；最细周期无数据（或数据湖中不完整）时为全部周期
+        """
+        base = self._resample_base(intervals)
+        if base is None:
+            return intervals
+        
+        start_ns, end_ns = self._to_nanoseconds(start_time), self._to_nanoseconds(end_time)
+        try:
+            arrays = read_cached_klines(
+                symbol, base, start_ns, end_ns, market=self.crypto_type, exchange=self.exchange, **source
+            )
+            if len(arrays) == 0:
+                logger.info(f"{symbol} 的 {base} 周期无数据，逐周期加载 {intervals}")
+                return intervals
+            if source.get('kline_lake') is not None and not self._lake_covers(symbol, base, arrays, start_ns, end_ns):
+                return intervals
+            self.data_cache[symbol][base] = self._arrays_to_frame(arrays)
+            
+            for interval in intervals:
+                if can_resample(base, interval):
+                    arrays = read_resampled_klines(
+                        symbol, interval, base, start_ns, end_ns,
+                        market=self.crypto_type, exchange=self.exchange, **source
+                    )
+                    self.data_cache[symbol][interval] = self._arrays_to_frame(arrays)
+                    logger.info(f"由 {base} 重采样 {symbol} 的 {interval} 周期数据，共 {len(arrays)} 条")
+        except Exception as e:
+            logger.error(f"重采样 {symbol} 的多周期数据失败: {e}")
+            return intervals
+        
+        return [i for i in intervals if i not in self.data_cache[symbol]]
+    
+    @staticmethod
+    def _to_nanoseconds(value):
+        return datetime_to_nanoseconds(pd.Timestamp(value).to_pydatetime()) if value else None
+    
+    @staticmethod
+    def _arrays_to_frame(arrays):
+        """
+        将缓存返回的只读K线数组转换为可修改的DataFrame（小写列名，datetime索引）
+        """
+        df = arrays.to_dataframe().copy()
+        df.columns = df.columns.str.lower()
+        df.index.name = 'datetime'
+        return df
+    
+    def _lake_covers(self, symbol, interval, arrays, start_ns, end_ns):
+        """
+        检查从数据湖读出的K线是否完整覆盖时间范围
+        
+        不完整时丢弃缓存中这段数据湖K线，回退到数据库路径时重新从数据库读取
+        
+        Returns:
+            bool: 是否完整覆盖
+        """
+        gaps = missing_from_timestamps(arrays.ts, interval, start_ns, end_ns)
+        if not gaps:
+            return True
+        logger.info(f"数据湖中 {symbol} 的 {interval} 周期数据不完整（{len(gaps)} 处缺口），回退到数据库加载")
+        invalidate_kline_cache(self.crypto_type, symbol, interval, start_ns, end_ns, exchange=self.exchange)
+        return False
+    
+    def _load_from_lake(self, symbol, interval, start_time, end_time):
+        """
+        经进程级K线缓存从数据湖加载指定周期的数据
+        
+        Args:
+            symbol: 交易对符号
+            interval: 时间周期
+            start_time: 开始时间
+            end_time: 结束时间
+            
+        Returns:
+            pd.DataFrame: 以datetime为索引的K线数据，数据湖中无数据或未完整覆盖时间范围时返回None
+        """
+        try:
+            start_ns, end_ns = self._to_nanoseconds(start_time), self._to_nanoseconds(end_time)
+            arrays = read_cached_klines(
+                symbol, interval, start_ns, end_ns,
+                market=self.crypto_type, exchange=self.exchange, kline_lake=self.kline_lake
+            )
+            if len(arrays) == 0 or not self._lake_covers(symbol, interval, arrays, start_ns, end_ns):
+                return None
+            return self._arrays_to_frame(arrays)
+        except Exception as e:
+            logger.error(f"从数据湖加载 {symbol} 的 {interval} 周期数据失败: {e}")
+            return None
+    
+    def _load_from_db(self, symbol, interval, start_time, end_time):
+        """
+        经进程级K线缓存从数据库加载指定周期的数据，多个回测任务共享同一份K线
+        
+        Args:
+            symbol: 交易对符号
+            interval: 时间周期
+            start_time: 开始时间
+            end_time: 结束时间
+            
+        Returns:
+            pd.DataFrame: 以datetime为索引的K线数据，数据库中无数据时返回None
+        """
+        arrays = read_cached_klines(
+            symbol, interval, self._to_nanoseconds(start_time), self._to_nanoseconds(end_time),
+            market=self.crypto_type, exchange=self.exchange, conn=getattr(self.data_service, 'db', None)
+        )
+        if len(arrays) == 0:
+            return None
+        return self._arrays_to_frame(arrays)
     
     def get_data(self, symbol, interval):
         """
@@ -0,0 +1,423 @@
+"""
+回测进程池
+
+多货币对回测的进程执行模式：数据检查、下载和加载仍在主进程的线程中完成（IO密集型），
+策略回测（CPU密集型）分发到常驻的回测工作进程，不再受GIL限制。
+
+主要功能:
+    - 常驻工作进程，进程内缓存已加载的策略类，多次回测复用
+    - 每个货币对的主周期K线和预加载的多周期数据写入共享内存，工作进程按名称附加，
+      不再序列化DataFrame
+    - 按内存预算和工作进程数共同限制并发：工作进程数受预算限制，
+      在途共享内存总量超过剩余预算时等待已有任务完成
+    - 每个货币对完成后立即回调，由调用方更新回测进度
+    - 多个回测并发共享同一个进程池：每次回测持有进程池的引用计数，
+      超时或损坏的进程池不再分配给新的回测，最后一个使用者释放后终止其工作进程
+
+作者: QuantCell Team
+版本: 1.0.0
+日期: 2026-02-12
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from strategy.core.optimizer import SharedKlineData
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 共享内存中数据键的分隔符和主周期标记，键格式为 "symbol|interval"
+KEY_SEP = "|"
+MAIN_KEY = "__main__"
+
+# 每个工作进程的默认内存预估（MB）
+DEFAULT_WORKER_MEMORY_MB = 512
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+# 工作进程启动方式：回测在线程中运行，fork 时其它线程持有的锁（如日志锁）会在子进程中死锁，
+# 因此使用 forkserver（不支持时使用 spawn）
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def default_memory_budget_mb() -> int:
+    """
+    默认内存预算：环境变量 BACKTEST_MEMORY_BUDGET_MB，未设置时为物理内存的一半
+
+    :return: 内存预算（MB）
+    """
+    env_value = os.environ.get("BACKTEST_MEMORY_BUDGET_MB")
+    if env_value:
+        return int(env_value)
+    try:
+        total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        return max(DEFAULT_WORKER_MEMORY_MB, int(total / 1024 / 1024 / 2))
+    except (ValueError, OSError, AttributeError):
+        return 4096
+
+
+def _create_default_service():
+    from backtest.service import BacktestService
+    return BacktestService()
+
+
+def _init_backtest_worker(service_factory: Callable[[], Any], strategy_keys: List[Tuple[str, Any]]):
+    """工作进程初始化：创建回测服务并预加载策略类"""
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update({
+        "service": service_factory(),
+        "strategies": {},
+    })
+    for strategy_key in strategy_keys:
+        _load_strategy(strategy_key)
+
+
+def _load_strategy(strategy_key: Tuple[str, Any]):
+    """按 (策略名称, 文件版本) 缓存策略类，策略文件修改后重新加载"""
+    strategies = _WORKER_STATE["strategies"]
+    if strategy_key not in strategies:
+        strategies[strategy_key] = _WORKER_STATE["service"].load_strategy_from_file(strategy_key[0])
+    return strategies[strategy_key]
+
+
+def _attach_frames(spec: Dict[str, Any]) -> Tuple[Optional[pd.DataFrame], Dict[str, Dict[str, pd.DataFrame]]]:
+    """
+    从共享内存读取主周期K线和预加载数据
+
+    复制一次到进程内存后立即关闭共享内存（内存拷贝，无反序列化），
+    回测框架可以自由修改数据，共享内存的生命周期也不依赖回测结果中是否残留引用。
+    """
+    shm, frames = SharedKlineData.attach(spec)
+    try:
+        copies = {key: df.copy() for key, df in frames.items()}
+    finally:
+        # 共享内存上的视图释放后才能关闭
+        frames = None
+        shm.close()
+
+    candles = None
+    preloaded: Dict[str, Dict[str, pd.DataFrame]] = {}
+    for key, df in copies.items():
+        symbol, interval = key.split(KEY_SEP, 1)
+        if interval == MAIN_KEY:
+            candles = df
+        else:
+            preloaded.setdefault(symbol, {})[interval] = df
+    return candles, preloaded
+
+
+def _run_symbol_backtest(spec: Dict[str, Any], strategy_key: Tuple[str, Any], strategy_config: Dict[str, Any],
+                         backtest_config: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+    """工作进程任务：在共享内存中的K线上执行单个货币对的回测"""
+    symbol = backtest_config.get("symbol", "BTCUSDT")
+    try:
+        candles, preloaded = _attach_frames(spec)
+        strategy_class = _load_strategy(strategy_key)
+        if not strategy_class:
+            return {
+                "symbol": symbol,
+                "task_id": task_id,
+                "status": "failed",
+                "message": f"策略加载失败: {strategy_key[0]}"
+            }
+
+        from backtest.data_manager import DataManager
+        service = _WORKER_STATE["service"]
+        data_manager = DataManager(None, None)
+        data_manager.data_cache.update(preloaded)
+        return service._execute_single_backtest(
+            strategy_class, candles, data_manager, strategy_config, backtest_config, task_id
+        )
+    except Exception as e:
+        logger.error(f"回测工作进程执行失败: {symbol}, 错误: {e}")
+        logger.exception(e)
+        return {
+            "symbol": symbol,
+            "task_id": task_id,
+            "status": "failed",
+            "message": str(e)
+        }
+
+
+def _terminate_executor(executor: ProcessPoolExecutor) -> None:
+    """不等待在途任务，直接终止进程池的工作进程（超时任务可能永远不会返回）"""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+
+
+def _to_shared_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """保证时间索引为 DatetimeIndex，共享内存只保存数值列和时间索引"""
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df = df.copy()
+        df.index = pd.to_datetime(df.index)
+    return df
+
+
+class BacktestProcessPool:
+    """
+    常驻回测进程池
+
+    工作进程在首次使用时启动，之后在多次回测之间复用；
+    进程池损坏或超时任务占用工作进程时重建。多个回测可以并发调用 run，
+    每次回测按引用计数持有当时的进程池，进程池被替换后由最后一个使用者终止。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, memory_budget_mb: Optional[int] = None,
+                 worker_memory_mb: int = DEFAULT_WORKER_MEMORY_MB,
+                 service_factory: Callable[[], Any] = _create_default_service):
+        """
+        初始化回测进程池
+
+        :param max_workers: 最大工作进程数，默认为CPU核心数
+        :param memory_budget_mb: 内存预算（MB），包括工作进程和共享K线数据，默认见 default_memory_budget_mb
+        :param worker_memory_mb: 每个工作进程的内存预估（MB）
+        :param service_factory: 工作进程内创建回测服务的函数（须可被子进程导入）
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb or default_memory_budget_mb()
+        self.worker_memory_mb = worker_memory_mb
+        self.service_factory = service_factory
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_workers = 0
+        self._strategy_keys: List[Tuple[str, Any]] = []
+        self._lock = threading.Lock()
+        # 进程池 -> 正在使用它的回测数
+        self._users: Dict[ProcessPoolExecutor, int] = {}
+
+    def resolve_workers(self, n_jobs: int) -> int:
+        """
+        计算工作进程数：不超过任务数、最大工作进程数和内存预算允许的进程数
+
+        :param n_jobs: 任务数
+        :return: 工作进程数，至少为1
+        """
+        by_memory = self.memory_budget_mb // max(self.worker_memory_mb, 1)
+        return max(1, min(n_jobs, self.max_workers, by_memory))
+
+    @property
+    def pool_workers(self) -> int:
+        """
+        进程池的工作进程数：按预算允许的最大规模创建，不随单次回测的货币对数量变化，
+        多次回测复用同一批工作进程
+
+        :return: 工作进程数
+        """
+        return self.resolve_workers(self.max_workers)
+
+    def data_budget_bytes(self, workers: int) -> int:
+        """
+        在途共享K线数据的内存上限：预算扣除工作进程占用，至少保留一个工作进程的份额
+
+        :param workers: 工作进程数
+        :return: 字节数
+        """
+        remaining = self.memory_budget_mb - workers * self.worker_memory_mb
+        return max(remaining, self.worker_memory_mb) * 1024 * 1024
+
+    def _acquire(self, workers: int, strategy_key: Tuple[str, Any]) -> ProcessPoolExecutor:
+        """获取当前进程池并增加引用计数，进程池不存在、规模不符或已损坏时重建"""
+        with self._lock:
+            if strategy_key not in self._strategy_keys:
+                self._strategy_keys.append(strategy_key)
+            if self._pool is None or self._pool_workers != workers or getattr(self._pool, "_broken", False):
+                self._retire_locked()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_MP_CONTEXT,
+                    initializer=_init_backtest_worker,
+                    initargs=(self.service_factory, list(self._strategy_keys)),
+                )
+                self._pool_workers = workers
+                logger.info(f"回测进程池已启动: workers={workers}, 内存预算={self.memory_budget_mb}MB")
+            self._users[self._pool] = self._users.get(self._pool, 0) + 1
+            return self._pool
+
+    def _release(self, executor: ProcessPoolExecutor, retire: bool = False) -> None:
+        """
+        释放一次回测对进程池的引用
+
+        :param executor: _acquire 返回的进程池
+        :param retire: 进程池已损坏或有超时任务占用工作进程，不再分配给新的回测
+        """
+        with self._lock:
+            if retire and executor is self._pool:
+                self._retire_locked()
+            self._users[executor] -= 1
+            if self._users[executor] > 0 or executor is self._pool:
+                return
+            del self._users[executor]
+        _terminate_executor(executor)
+
+    def _retire_locked(self) -> None:
+        """摘下当前进程池，无人使用时立即终止，否则由最后一个使用者终止（需持有 self._lock）"""
+        executor, self._pool, self._pool_workers = self._pool, None, 0
+        if executor is not None and not self._users.get(executor):
+            self._users.pop(executor, None)
+            _terminate_executor(executor)
+
+    def shutdown(self) -> None:
+        """
+        关闭工作进程，正在执行的回测结束后才终止它们使用的进程
+        """
+        with self._lock:
+            self._retire_locked()
+
+    @staticmethod
+    def strategy_key(service: Any, strategy_name: str) -> Tuple[str, Any]:
+        """
+        策略缓存键：策略名称和策略文件修改时间，文件修改后工作进程重新加载策略
+
+        :param service: 回测服务
+        :param strategy_name: 策略名称
+        :return: (策略名称, 文件修改时间)
+        """
+        strategy_dir = getattr(getattr(service, "strategy_service", None), "strategy_dir", None)
+        if strategy_dir is not None:
+            strategy_file = strategy_dir / f"{strategy_name}.py"
+            if strategy_file.exists():
+                return strategy_name, strategy_file.stat().st_mtime_ns
+        return strategy_name, None
+
+    def run(self, service: Any, strategy_config: Dict[str, Any], single_configs: List[Dict[str, Any]],
+            task_id: str, on_result: Callable[[str, Dict[str, Any]], None],
+            timeout: float = 3600) -> None:
+        """
+        执行多货币对回测
+
+        :param service: 主进程回测服务，提供 _prepare_backtest_frames
+        :param strategy_config: 策略配置
+        :param single_configs: 每个货币对的回测配置（含 symbol）
+        :param task_id: 回测任务ID
+        :param on_result: 每个货币对完成时的回调 (symbol, result)
+        :param timeout: 单个货币对的超时时间（秒）
+        """
+        total = len(single_configs)
+        if total == 0:
+            return
+        workers = self.pool_workers
+        data_budget = self.data_budget_bytes(workers)
+        strategy_key = self.strategy_key(service, strategy_config.get("strategy_name"))
+        pool = self._acquire(workers, strategy_key)
+        # 本次回测使用的进程池是否需要停用（超时任务仍占用工作进程，或进程池已损坏）
+        retire = False
+
+        # 在途任务：future -> (symbol, 共享内存)
+        inflight: Dict[concurrent.futures.Future, Tuple[str, SharedKlineData]] = {}
+        inflight_bytes = 0
+
+        def collect(done) -> None:
+            nonlocal inflight_bytes
+            for future in done:
+                symbol, shared = inflight.pop(future)
+                inflight_bytes -= shared.nbytes
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    result = {"symbol": symbol, "task_id": task_id, "status": "failed",
+                              "message": f"回测工作进程异常退出: {e}"}
+                except Exception as e:
+                    result = {"symbol": symbol, "task_id": task_id, "status": "failed", "message": str(e)}
+                finally:
+                    shared.close()
+                on_result(symbol, result)
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(total, workers * 2), thread_name_prefix="backtest-prep") as prep:
+                prep_futures = {
+                    prep.submit(service._prepare_backtest_frames, config, task_id, index, total): config
+                    for index, config in enumerate(single_configs)
+                }
+                for prep_future in concurrent.futures.as_completed(prep_futures):
+                    config = prep_futures[prep_future]
+                    symbol = config.get("symbol", "BTCUSDT")
+                    try:
+                        candles, preloaded = prep_future.result()
+                    except Exception as e:
+                        logger.error(f"回测数据准备失败: {symbol}, 错误: {e}")
+                        on_result(symbol, {"symbol": symbol, "task_id": task_id, "status": "failed", "message": str(e)})
+                        continue
+                    if isinstance(candles, dict):
+                        on_result(symbol, candles)
+                        continue
+
+                    frames = {f"{symbol}{KEY_SEP}{MAIN_KEY}": _to_shared_frame(candles)}
+                    for interval, df in (preloaded or {}).items():
+                        frames[f"{symbol}{KEY_SEP}{interval}"] = _to_shared_frame(df)
+                    shared = SharedKlineData(frames)
+                    del candles, preloaded, frames
+
+                    # 在途数据超出预算时先等已提交的任务完成
+                    while inflight and inflight_bytes + shared.nbytes > data_budget:
+                        done, _ = concurrent.futures.wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+                        if not done:
+                            break
+                        collect(done)
+
+                    try:
+                        future = pool.submit(_run_symbol_backtest, shared.spec, strategy_key,
+                                             strategy_config, config, task_id)
+                    except BrokenProcessPool:
+                        shared.close()
+                        self._release(pool, retire=True)
+                        pool = self._acquire(workers, strategy_key)
+                        future = None
+                        on_result(symbol, {"symbol": symbol, "task_id": task_id, "status": "failed",
+                                           "message": "回测工作进程异常退出"})
+                    if future is not None:
+                        inflight[future] = (symbol, shared)
+                        inflight_bytes += shared.nbytes
+
+            while inflight:
+                done, _ = concurrent.futures.wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    for future, (symbol, shared) in list(inflight.items()):
+                        future.cancel()
+                        shared.close()
+                        on_result(symbol, {"symbol": symbol, "task_id": task_id, "status": "failed",
+                                           "message": "回测超时"})
+                    inflight.clear()
+                    # 超时任务仍占用工作进程，后续回测改用新的进程池
+                    retire = True
+                    break
+                collect(done)
+        finally:
+            for symbol, shared in inflight.values():
+                shared.close()
+            self._release(pool, retire=retire or getattr(pool, "_broken", False))
+
+
+_default_pool: Optional[BacktestProcessPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_backtest_process_pool() -> BacktestProcessPool:
+    """
+    获取全局回测进程池，进程池在多次回测之间复用，可被并发的回测共享
+
+    :return: BacktestProcessPool
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = BacktestProcessPool()
+    return _default_pool
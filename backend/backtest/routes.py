@@ -757,7 +757,8 @@ def check_data_integrity(request: DataIntegrityCheckRequest) -> DataIntegrityChe
             start_time=start_time,
             end_time=end_time,
             market_type=request.market_type,
-            crypto_type=request.crypto_type
+            crypto_type=request.crypto_type,
+            check_quality=True
         )
 
         # 转换结果为响应格式
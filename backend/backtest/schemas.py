@@ -43,6 +43,7 @@ class BacktestConfig(BaseSchema):
         commission: 手续费率
         exclusive_orders: 是否取消未完成订单
         engine_type: 回测引擎类型 (default/event)
+        execution_mode: 多货币对执行模式 (thread/process)
         base_currency: 基础货币代码（仅事件驱动引擎）
         leverage: 杠杆倍数（仅事件驱动引擎）
         venue: 交易所名称（仅事件驱动引擎）
@@ -95,6 +96,11 @@ class BacktestConfig(BaseSchema):
         description="回测引擎类型 (default/event)",
         json_schema_extra={"example": "event"},
     )
+    execution_mode: str = Field(
+        default="thread",
+        description="多货币对执行模式 (thread/process)，process 使用常驻回测进程池",
+        json_schema_extra={"example": "thread"},
+    )
     base_currency: str = Field(
         default="USDT",
         description="基础货币代码（仅事件驱动引擎）",
@@ -44,6 +44,7 @@ from i18n.utils import load_translations
 from utils.config_manager import config_manager
 from utils.timezone import format_datetime
 from utils.data_utils import sanitize_for_json, DataSanitizer
+from utils.timestamp_utils import datetime_to_nanoseconds, nanoseconds_to_datetime
 
 # 导入回测引擎
 from backtest.engines import Engine, LegacyEngine, BacktestEngineBase
@@ -57,6 +58,62 @@ class BacktestService:
     回测服务类，用于执行策略回测和分析回测结果
     """
 
+    def _get_kline_data(self, symbol: str, interval: str, start_time: str, end_time: str, db,
+                        exchange: str = 'binance', crypto_type: str = 'spot') -> list:
+        """
+        获取K线数据，启用数据湖时优先从数据湖读取，数据湖未完整覆盖时间范围时再查询数据库
+
+        :param symbol: 货币对，如 "BTCUSDT" 或 "BTC/USDT"
+        :param interval: 时间周期，如 "15m"
+        :param start_time: 开始时间，ISO格式字符串
+        :param end_time: 结束时间，ISO格式字符串
+        :param db: 数据库会话
+        :param exchange: 交易所
+        :param crypto_type: 加密货币类型（spot/future）
+        :return: K线数据列表
+        """
+        if self.kline_lake is not None:
+            kline_data = self._get_kline_data_from_lake(symbol, interval, start_time, end_time, exchange, crypto_type)
+            if kline_data:
+                return kline_data
+        return self._get_kline_data_from_db(symbol, interval, start_time, end_time, db)
+
+    def _get_kline_data_from_lake(self, symbol: str, interval: str, start_time: str, end_time: str,
+                                  exchange: str = 'binance', crypto_type: str = 'spot') -> list:
+        """
+        从K线数据湖获取K线数据，返回格式与 _get_kline_data_from_db 一致
+
+        :param symbol: 货币对
+        :param interval: 时间周期
+        :param start_time: 开始时间，ISO格式字符串
+        :param end_time: 结束时间，ISO格式字符串
+        :param exchange: 交易所
+        :param crypto_type: 加密货币类型（spot/future）
+        :return: K线数据列表，数据湖中无数据或未完整覆盖时间范围时返回空列表
+        """
+        try:
+            from collector.db.kline_coverage import missing_from_timestamps
+
+            start_ns = datetime_to_nanoseconds(datetime.fromisoformat(start_time.replace(' ', 'T')))
+            end_ns = datetime_to_nanoseconds(datetime.fromisoformat(end_time.replace(' ', 'T')))
+            arrays = self.kline_lake.read(
+                exchange, crypto_type, symbol.replace('/', ''), interval, start_ns=start_ns, end_ns=end_ns
+            )
+            gaps = missing_from_timestamps(arrays.ts, interval, start_ns, end_ns)
+            if gaps:
+                logger.info(f"[_get_kline_data_from_lake] 数据湖数据不完整: {symbol} {interval}, {len(gaps)} 处缺口，回退到数据库")
+                return []
+
+            kline_data = arrays.to_records(ts_unit="ms")
+            for item, ts_ns in zip(kline_data, arrays.ts.tolist()):
+                item["datetime"] = nanoseconds_to_datetime(ts_ns).isoformat()
+
+            logger.info(f"[_get_kline_data_from_lake] 从数据湖获取K线数据完成: {symbol} {interval}, 共 {len(kline_data)} 条")
+            return kline_data
+        except Exception as e:
+            logger.error(f"[_get_kline_data_from_lake] 从数据湖获取K线数据失败: {e}")
+            return []
+
     def _get_kline_data_from_db(self, symbol: str, interval: str, start_time: str, end_time: str, db) -> list:
         """
         从数据库K线表获取K线数据
@@ -71,18 +128,17 @@ class BacktestService:
         logger.info(f"[_get_kline_data_from_db] 开始获取K线数据: symbol={symbol}, interval={interval}, start_time={start_time}, end_time={end_time}")
 
         try:
-            from collector.db.models import CryptoSpotKline
-            from datetime import datetime
+            from collector.db.kline_reader import read_kline_arrays
 
             # 解析时间字符串
             logger.info(f"[_get_kline_data_from_db] 解析时间字符串: start_time={start_time}, end_time={end_time}")
             start_dt = datetime.fromisoformat(start_time.replace(' ', 'T'))
             end_dt = datetime.fromisoformat(end_time.replace(' ', 'T'))
 
-            # 转换为微秒级时间戳（数据库中存储的是微秒时间戳）
-            start_timestamp_us = int(start_dt.timestamp() * 1000000)
-            end_timestamp_us = int(end_dt.timestamp() * 1000000)
-            logger.info(f"[_get_kline_data_from_db] 时间解析结果: start_timestamp_us={start_timestamp_us}, end_timestamp_us={end_timestamp_us}")
+            # 转换为纳秒级时间戳（数据库中存储的是BIGINT纳秒时间戳）
+            start_timestamp_ns = datetime_to_nanoseconds(start_dt)
+            end_timestamp_ns = datetime_to_nanoseconds(end_dt)
+            logger.info(f"[_get_kline_data_from_db] 时间解析结果: start_timestamp_ns={start_timestamp_ns}, end_timestamp_ns={end_timestamp_ns}")
 
             # 处理symbol格式，支持 BTCUSDT 和 BTC/USDT 两种格式
             symbol_variants = [symbol]
@@ -95,47 +151,22 @@ class BacktestService:
 
             logger.info(f"[_get_kline_data_from_db] symbol变体: {symbol_variants}")
 
-            # 查询K线数据 - 使用微秒时间戳作为字符串查询
+            # 列式读取K线数据 - 使用纳秒时间戳按整数范围查询
             logger.info(f"[_get_kline_data_from_db] 执行数据库查询: interval={interval}")
-            kline_records = db.query(CryptoSpotKline).filter(
-                CryptoSpotKline.symbol.in_(symbol_variants),
-                CryptoSpotKline.interval == interval,
-                CryptoSpotKline.timestamp >= str(start_timestamp_us),
-                CryptoSpotKline.timestamp <= str(end_timestamp_us)
-            ).order_by(CryptoSpotKline.timestamp).all()
-
-            logger.info(f"[_get_kline_data_from_db] 数据库查询完成，获取到 {len(kline_records)} 条原始记录")
-
-            # 转换为字典列表
-            kline_data = []
-            for idx, record in enumerate(kline_records):
-                try:
-                    # 数据库中存储的是微秒级时间戳(16位)
-                    ts_int = int(record.timestamp)
-                    # 微秒转毫秒
-                    timestamp_ms = ts_int // 1000
-                    # 微秒转秒用于datetime
-                    dt = datetime.fromtimestamp(ts_int / 1000000)
-                    datetime_str = dt.isoformat()
-
-                    kline_item = {
-                        "timestamp": timestamp_ms,
-                        "datetime": datetime_str,
-                        "open": float(record.open),
-                        "close": float(record.close),
-                        "high": float(record.high),
-                        "low": float(record.low),
-                        "volume": float(record.volume),
-                        "turnover": 0.0
-                    }
-                    kline_data.append(kline_item)
+            arrays = read_kline_arrays(
+                db,
+                symbol_variants,
+                interval,
+                start_ns=start_timestamp_ns,
+                end_ns=end_timestamp_ns,
+            )
 
-                    # 只记录前3条和后3条的解析情况
-                    if idx < 3 or idx >= len(kline_records) - 3:
-                        logger.info(f"[_get_kline_data_from_db] 解析记录[{idx}]: timestamp={record.timestamp} -> {timestamp_ms}ms, open={record.open}, close={record.close}")
-                except Exception as e:
-                    logger.warning(f"[_get_kline_data_from_db] 解析K线记录[{idx}]失败: {e}, timestamp={record.timestamp}")
-                    continue
+            logger.info(f"[_get_kline_data_from_db] 数据库查询完成，获取到 {len(arrays)} 条原始记录")
+
+            # 转换为字典列表，补充datetime字段
+            kline_data = arrays.to_records(ts_unit="ms")
+            for item, ts_ns in zip(kline_data, arrays.ts.tolist()):
+                item["datetime"] = nanoseconds_to_datetime(ts_ns).isoformat()
 
             logger.info(f"[_get_kline_data_from_db] 从数据库获取K线数据完成: {symbol} {interval}, 共 {len(kline_data)} 条")
             return kline_data
@@ -515,12 +546,14 @@ class BacktestService:
             # 从数据库获取K线数据作为strategy_data
             strategy_data_list = []
             for symbol in symbols_list:
-                symbol_kline_data = self._get_kline_data_from_db(
+                symbol_kline_data = self._get_kline_data(
                     symbol=symbol,
                     interval=timeframes_list[0],
                     start_time=start_time,
                     end_time=end_time,
-                    db=db
+                    db=db,
+                    exchange=backtest_config.get("exchange", "binance"),
+                    crypto_type=backtest_config.get("crypto_type", "spot")
                 )
                 strategy_data_list.extend(symbol_kline_data)
 
@@ -605,9 +638,13 @@ class BacktestService:
         # 数据服务实例
         self.data_service = DataService()
 
+        # K线数据湖，K线数据源配置为 lake 时启用
+        from collector.db.kline_lake import get_default_kline_lake
+        self.kline_lake = get_default_kline_lake()
+
         # 数据管理器实例，用于管理多时间周期数据
         from .data_manager import DataManager
-        self.data_manager = DataManager(self.data_service)
+        self.data_manager = DataManager(self.data_service, self.kline_lake)
 
         # 需要翻译的指标键列表
         self.metric_keys = [
@@ -754,12 +791,8 @@ class BacktestService:
         :param total_symbols: 总货币对数量（用于进度计算）
         :return: 单个货币对的回测结果数据，不直接保存到数据库
         """
-        # 获取进度跟踪器
-        progress_tracker = get_progress_tracker()
-        
         try:
             from collector.db.database import SessionLocal, init_database_config
-            import json
             
             # 初始化数据库连接
             init_database_config()
@@ -769,349 +802,441 @@ class BacktestService:
             # 注意：在多线程环境中，必须为每个线程创建独立的数据库会话
             local_data_service = DataService(db)
             from .data_manager import DataManager
-            local_data_manager = DataManager(local_data_service)
+            local_data_manager = DataManager(
+                local_data_service, self.kline_lake,
+                exchange=backtest_config.get("exchange", "binance"),
+                crypto_type=backtest_config.get("crypto_type", "spot")
+            )
             
-            strategy_name = strategy_config.get("strategy_name")
-            symbol = backtest_config.get("symbol", "BTCUSDT")
-            interval = backtest_config.get("interval", "1d")
-            start_time = backtest_config.get("start_time")
-            end_time = backtest_config.get("end_time")
+            candles = self._prepare_single_backtest(
+                backtest_config, task_id, local_data_service, local_data_manager, symbol_index, total_symbols
+            )
+            if isinstance(candles, dict):
+                # 数据准备失败
+                return candles
             
-            logger.info(f"开始回测，策略名称: {strategy_name}, 货币对: {symbol}, task_id: {task_id}")
+            # 加载策略类
+            strategy_name = strategy_config.get("strategy_name")
+            strategy_class = self.load_strategy_from_file(strategy_name)
+            if not strategy_class:
+                return {
+                    "symbol": backtest_config.get("symbol", "BTCUSDT"),
+                    "task_id": task_id,
+                    "status": "failed",
+                    "message": f"策略加载失败: {strategy_name}"
+                }
             
-            # ========== 数据完整性检查 ==========
-            logger.info(f"[{symbol}] 开始数据完整性检查...")
+            return self._execute_single_backtest(
+                strategy_class, candles, local_data_manager, strategy_config, backtest_config, task_id, db
+            )
+        except Exception as e:
+            logger.error(f"回测失败: {e}")
+            logger.exception(e)
+            symbol = backtest_config.get("symbol", "BTCUSDT")
+            return {
+                "symbol": symbol,
+                "task_id": task_id,
+                "status": "failed",
+                "message": str(e)
+            }
+    
+    def _prepare_single_backtest(self, backtest_config, task_id, local_data_service, local_data_manager,
+                                 symbol_index=0, total_symbols=1):
+        """
+        准备单个货币对的回测数据：检查并补齐数据、预加载多周期数据、构建主周期K线
+        
+        :param backtest_config: 回测配置，包含单个货币对信息
+        :param task_id: 回测任务ID
+        :param local_data_service: 当前线程的数据服务
+        :param local_data_manager: 当前线程的数据管理器，预加载的多周期数据写入其中
+        :param symbol_index: 当前货币对索引（用于进度计算）
+        :param total_symbols: 总货币对数量（用于进度计算）
+        :return: 以时间为索引的主周期K线DataFrame，失败时返回失败结果字典
+        """
+        progress_tracker = get_progress_tracker()
+        symbol = backtest_config.get("symbol", "BTCUSDT")
+        interval = backtest_config.get("interval", "1d")
+        start_time = backtest_config.get("start_time")
+        end_time = backtest_config.get("end_time")
+        
+        logger.info(f"开始准备回测数据，货币对: {symbol}, task_id: {task_id}")
+        
+        # ========== 数据完整性检查 ==========
+        logger.info(f"[{symbol}] 开始数据完整性检查...")
+        
+        # 更新进度：数据准备阶段 - 检查中
+        progress_tracker.update_progress(
+            task_id,
+            "data_prep",
+            {
+                "status": "running",
+                "current_step": "checking",
+                "checked_symbols": symbol_index,
+                "total_symbols": total_symbols,
+                "message": f"正在检查 {symbol} 数据完整性..."
+            }
+        )
+        
+        from .data_integrity import DataIntegrityChecker
+        from .data_downloader import BacktestDataDownloader
+        
+        integrity_checker = DataIntegrityChecker()
+        data_downloader = BacktestDataDownloader()
+        
+        # 检查数据完整性
+        integrity_result = integrity_checker.check_data_completeness(
+            symbol=symbol,
+            interval=interval,
+            start_time=start_time,
+            end_time=end_time,
+            market_type='crypto',
+            crypto_type=backtest_config.get("crypto_type", "spot")
+        )
+        
+        if not integrity_result.is_complete:
+            logger.warning(
+                f"[{symbol}] 数据不完整，覆盖率: {integrity_result.coverage_percent:.2f}%, "
+                f"缺失: {integrity_result.missing_count} 条"
+            )
             
-            # 更新进度：数据准备阶段 - 检查中
+            # 更新进度：数据准备阶段 - 下载中
             progress_tracker.update_progress(
                 task_id,
                 "data_prep",
                 {
                     "status": "running",
-                    "current_step": "checking",
-                    "checked_symbols": symbol_index,
+                    "current_step": "downloading",
+                    "checked_symbols": symbol_index + 1,
                     "total_symbols": total_symbols,
-                    "message": f"正在检查 {symbol} 数据完整性..."
+                    "downloading": {
+                        "symbol": symbol,
+                        "progress": 0
+                    },
+                    "message": f"正在下载 {symbol} 缺失数据..."
                 }
             )
             
-            from .data_integrity import DataIntegrityChecker
-            from .data_downloader import BacktestDataDownloader
-            
-            integrity_checker = DataIntegrityChecker()
-            data_downloader = BacktestDataDownloader()
-            
-            # 检查数据完整性
-            integrity_result = integrity_checker.check_data_completeness(
+            # 尝试下载缺失数据
+            logger.info(f"[{symbol}] 开始下载缺失数据...")
+            download_success, new_result = data_downloader.ensure_data_complete(
                 symbol=symbol,
                 interval=interval,
                 start_time=start_time,
                 end_time=end_time,
-                market_type='crypto',
-                crypto_type='spot'
+                max_wait_time=300  # 最多等待5分钟
             )
             
-            if not integrity_result.is_complete:
-                logger.warning(
-                    f"[{symbol}] 数据不完整，覆盖率: {integrity_result.coverage_percent:.2f}%, "
-                    f"缺失: {integrity_result.missing_count} 条"
-                )
-                
-                # 更新进度：数据准备阶段 - 下载中
-                progress_tracker.update_progress(
-                    task_id,
-                    "data_prep",
-                    {
-                        "status": "running",
-                        "current_step": "downloading",
-                        "checked_symbols": symbol_index + 1,
-                        "total_symbols": total_symbols,
-                        "downloading": {
-                            "symbol": symbol,
-                            "progress": 0
-                        },
-                        "message": f"正在下载 {symbol} 缺失数据..."
-                    }
-                )
-                
-                # 尝试下载缺失数据
-                logger.info(f"[{symbol}] 开始下载缺失数据...")
-                download_success, new_result = data_downloader.ensure_data_complete(
-                    symbol=symbol,
-                    interval=interval,
-                    start_time=start_time,
-                    end_time=end_time,
-                    max_wait_time=300  # 最多等待5分钟
-                )
-                
-                if not download_success:
-                    # 检查覆盖率，如果达到可接受水平（如80%以上），则继续回测
-                    min_coverage = 80.0  # 最小可接受覆盖率
-                    if new_result.coverage_percent >= min_coverage:
-                        logger.warning(
-                            f"[{symbol}] 数据下载不完全，但覆盖率达到 {new_result.coverage_percent:.2f}%，继续回测"
-                        )
-                        integrity_result = new_result
-                    else:
-                        logger.error(f"[{symbol}] 数据下载失败且覆盖率不足，回测无法继续")
-                        # 更新进度为失败状态
-                        progress_tracker.update_progress(
-                            task_id,
-                            "data_prep",
-                            {
-                                "status": "failed",
-                                "progress": new_result.coverage_percent,
-                                "checked_symbols": symbol_index + 1,
-                                "total_symbols": total_symbols,
-                                "message": f"{symbol} 数据不完整: 覆盖率 {new_result.coverage_percent:.2f}%"
-                            }
-                        )
-                        return {
-                            "symbol": symbol,
-                            "task_id": task_id,
+            if not download_success:
+                # 检查覆盖率，如果达到可接受水平（如80%以上），则继续回测
+                min_coverage = 80.0  # 最小可接受覆盖率
+                if new_result.coverage_percent >= min_coverage:
+                    logger.warning(
+                        f"[{symbol}] 数据下载不完全，但覆盖率达到 {new_result.coverage_percent:.2f}%，继续回测"
+                    )
+                    integrity_result = new_result
+                else:
+                    logger.error(f"[{symbol}] 数据下载失败且覆盖率不足，回测无法继续")
+                    # 更新进度为失败状态
+                    progress_tracker.update_progress(
+                        task_id,
+                        "data_prep",
+                        {
                             "status": "failed",
-                            "message": f"数据不完整且下载失败，覆盖率: {new_result.coverage_percent:.2f}%",
-                            "data_integrity": new_result.to_dict()
+                            "progress": new_result.coverage_percent,
+                            "checked_symbols": symbol_index + 1,
+                            "total_symbols": total_symbols,
+                            "message": f"{symbol} 数据不完整: 覆盖率 {new_result.coverage_percent:.2f}%"
                         }
-                
-                logger.info(f"[{symbol}] 数据下载完成，重新检查完整性...")
-                integrity_result = new_result
-            
-            logger.info(f"[{symbol}] 数据完整性检查通过，覆盖率: {integrity_result.coverage_percent:.2f}%")
-            # ========== 数据完整性检查结束 ==========
-            
-            # 更新进度：数据准备阶段完成
-            progress_tracker.update_progress(
-                task_id,
-                "data_prep",
-                {
-                    "status": "completed" if symbol_index == total_symbols - 1 else "running",
-                    "progress": 100.0,
-                    "current_step": "loading",
-                    "checked_symbols": symbol_index + 1,
-                    "total_symbols": total_symbols,
-                    "message": f"{symbol} 数据准备完成"
-                }
-            )
-            
-            # 加载策略类
-            strategy_class = self.load_strategy_from_file(strategy_name)
-            if not strategy_class:
-                return {
-                    "symbol": symbol,
-                    "task_id": task_id,
-                    "status": "failed",
-                    "message": f"策略加载失败: {strategy_name}"
-                }
-            
-            # 获取回测配置
-            interval = backtest_config.get("interval", "1d")
-            start_time = backtest_config.get("start_time")
-            end_time = backtest_config.get("end_time")
-            
-            logger.info(f"回测配置: {symbol}, {interval}, {start_time} to {end_time}")
-            
-            # 预加载多种时间周期的数据
-            local_data_manager.preload_data(
-                symbol=symbol,
-                base_interval=interval,
-                start_time=start_time,
-                end_time=end_time,
-                preload_intervals=['1m', '5m', '15m', '30m', '1h', '4h', '1d']  # 预加载常用周期
-            )
+                    )
+                    return {
+                        "symbol": symbol,
+                        "task_id": task_id,
+                        "status": "failed",
+                        "message": f"数据不完整且下载失败，覆盖率: {new_result.coverage_percent:.2f}%",
+                        "data_integrity": new_result.to_dict()
+                    }
             
-            # 获取主周期K线数据
-            logger.info(f"获取主周期 {interval} 的K线数据")
+            logger.info(f"[{symbol}] 数据下载完成，重新检查完整性...")
+            integrity_result = new_result
+        
+        logger.info(f"[{symbol}] 数据完整性检查通过，覆盖率: {integrity_result.coverage_percent:.2f}%")
+        # ========== 数据完整性检查结束 ==========
+        
+        # 更新进度：数据准备阶段完成
+        progress_tracker.update_progress(
+            task_id,
+            "data_prep",
+            {
+                "status": "completed" if symbol_index == total_symbols - 1 else "running",
+                "progress": 100.0,
+                "current_step": "loading",
+                "checked_symbols": symbol_index + 1,
+                "total_symbols": total_symbols,
+                "message": f"{symbol} 数据准备完成"
+            }
+        )
+        
+        logger.info(f"回测配置: {symbol}, {interval}, {start_time} to {end_time}")
+        
+        # 预加载多种时间周期的数据
+        local_data_manager.preload_data(
+            symbol=symbol,
+            base_interval=interval,
+            start_time=start_time,
+            end_time=end_time,
+            preload_intervals=['1m', '5m', '15m', '30m', '1h', '4h', '1d']  # 预加载常用周期
+        )
+        
+        # 获取主周期K线数据
+        logger.info(f"获取主周期 {interval} 的K线数据")
+        
+        # 主周期已随多周期数据经共享K线缓存预加载，直接复用
+        preloaded = local_data_manager.data_cache.get(symbol, {}).get(interval)
+        if preloaded is not None and not preloaded.empty:
+            return preloaded.rename(columns=str.capitalize)
+        
+        # 使用数据服务获取K线数据
+        result = local_data_service.get_kline_data(
+            symbol=symbol,
+            interval=interval,
+            start_time=start_time,
+            end_time=end_time
+        )
+        
+        kline_data = result.get("kline_data", [])
+        
+        if not kline_data:
+            logger.error(f"未获取到K线数据: {symbol}, {interval}, {start_time} to {end_time}")
+            return {
+                "symbol": symbol,
+                "task_id": task_id,
+                "status": "failed",
+                "message": f"未获取到货币对 {symbol} 的K线数据"
+            }
             
-            # 使用数据服务获取K线数据
-            result = local_data_service.get_kline_data(
-                symbol=symbol,
-                interval=interval,
-                start_time=start_time,
-                end_time=end_time
+        # Convert to DataFrame
+        candles = pd.DataFrame(kline_data)
+        
+        # 转换数据格式
+        candles.rename(columns={
+            'open': 'Open',
+            'close': 'Close',
+            'high': 'High',
+            'low': 'Low',
+            'volume': 'Volume'
+        }, inplace=True)
+        
+        # 设置时间索引
+        if 'timestamp' in candles.columns:
+            candles['datetime'] = pd.to_datetime(candles['timestamp'], unit='ms')
+            candles.set_index('datetime', inplace=True)
+        elif 'datetime' in candles.columns:
+            candles.set_index('datetime', inplace=True)
+        elif 'open_time' in candles.columns:
+            candles['open_time'] = pd.to_datetime(candles['open_time'])
+            candles.set_index('open_time', inplace=True)
+        
+        return candles
+    
+    def _prepare_backtest_frames(self, backtest_config, task_id, symbol_index=0, total_symbols=1):
+        """
+        进程执行模式下在主进程中准备单个货币对的数据，数据库会话用完即关闭
+        
+        :param backtest_config: 回测配置，包含单个货币对信息
+        :param task_id: 回测任务ID
+        :param symbol_index: 当前货币对索引（用于进度计算）
+        :param total_symbols: 总货币对数量（用于进度计算）
+        :return: (主周期K线DataFrame或失败结果字典, 预加载的多周期数据 {interval: DataFrame})
+        """
+        from collector.db.database import SessionLocal, init_database_config
+        from .data_manager import DataManager
+        
+        init_database_config()
+        db = SessionLocal()
+        try:
+            local_data_service = DataService(db)
+            local_data_manager = DataManager(
+                local_data_service, self.kline_lake,
+                exchange=backtest_config.get("exchange", "binance"),
+                crypto_type=backtest_config.get("crypto_type", "spot")
             )
-            
-            kline_data = result.get("kline_data", [])
-            
-            if not kline_data:
-                logger.error(f"未获取到K线数据: {symbol}, {interval}, {start_time} to {end_time}")
-                return {
-                    "symbol": symbol,
-                    "task_id": task_id,
-                    "status": "failed",
-                    "message": f"未获取到货币对 {symbol} 的K线数据"
-                }
-                
-            # Convert to DataFrame
-            candles = pd.DataFrame(kline_data)
-            
-            # 转换数据格式
-            candles.rename(columns={
-                'open': 'Open',
-                'close': 'Close',
-                'high': 'High',
-                'low': 'Low',
-                'volume': 'Volume'
-            }, inplace=True)
-            
-            # 设置时间索引
-            if 'timestamp' in candles.columns:
-                candles['datetime'] = pd.to_datetime(candles['timestamp'], unit='ms')
-                candles.set_index('datetime', inplace=True)
-            elif 'datetime' in candles.columns:
-                candles.set_index('datetime', inplace=True)
-            elif 'open_time' in candles.columns:
-                candles['open_time'] = pd.to_datetime(candles['open_time'])
-                candles.set_index('open_time', inplace=True)
-            
-            # 初始化回测
-            initial_cash = backtest_config.get("initial_cash", 10000)
-            commission = backtest_config.get("commission", 0.001)
-            
-            # Check if initial cash is sufficient for the asset price
-            max_price = candles['Close'].max()
-            if max_price > initial_cash:
-                logger.warning(f"Initial cash ({initial_cash}) is lower than max price ({max_price}). Increasing cash to avoid warnings.")
-                initial_cash = max_price * 1.1 # Add 10% buffer
-            
-            # 为数据添加交易对符号属性
-            candles.symbol = symbol
-            
-            # 自定义回测运行器，用于在策略实例化后设置数据管理器
-            class CustomBacktest(Backtest):
-                def run(self, **kwargs):
-                    # 执行父类的run方法
-                    result = super().run(**kwargs)
-                    # 获取策略实例并设置数据管理器
-                    if hasattr(result, '_strategy'):
-                        strategy_instance = result['_strategy']
-                        if hasattr(strategy_instance, 'set_data_manager'):
-                            strategy_instance.set_data_manager(local_data_manager)
-                    return result
-            
-            bt = CustomBacktest(
-                candles, 
-                strategy_class, 
-                cash=initial_cash,
-                commission=commission,
-                exclusive_orders=True
+            candles = self._prepare_single_backtest(
+                backtest_config, task_id, local_data_service, local_data_manager, symbol_index, total_symbols
             )
-            
-            # 执行回测
-            stats = bt.run()
-            
-            # 获取策略数据
-            strategy_data = []
-            if '_strategy' in stats:
-                strategy_instance = stats['_strategy']
-                if hasattr(strategy_instance, 'data'):
-                    # Try to access underlying DataFrame
-                    try:
-                        df = None
-                        if hasattr(strategy_instance.data, 'df'):
-                            df = strategy_instance.data.df
-                        elif isinstance(strategy_instance.data, pd.DataFrame):
-                            df = strategy_instance.data
-
-                        if df is not None:
-                            # 重要：保留时间索引作为一个字段
-                            df_copy = df.copy()
-                            df_copy.reset_index(inplace=True)
-
-                            # 重命名索引列为datetime
-                            if 'index' in df_copy.columns:
-                                df_copy.rename(columns={'index': 'datetime'}, inplace=True)
-                            elif df_copy.index.name and df_copy.index.name not in df_copy.columns:
-                                # 如果索引有名称且不是datetime，重命名为datetime
-                                first_col = df_copy.columns[0]
-                                if first_col not in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                                    df_copy.rename(columns={first_col: 'datetime'}, inplace=True)
-
-                            # 如果还是没有datetime列，假设第一列是时间
-                            if 'datetime' not in df_copy.columns and len(df_copy.columns) > 0:
-                                first_col = df_copy.columns[0]
+            symbol = backtest_config.get("symbol", "BTCUSDT")
+            return candles, local_data_manager.data_cache.get(symbol, {})
+        finally:
+            db.close()
+    
+    def _execute_single_backtest(self, strategy_class, candles, local_data_manager, strategy_config,
+                                 backtest_config, task_id, db=None):
+        """
+        在已准备好的K线上执行单个货币对的回测并整理结果
+        
+        :param strategy_class: 策略类
+        :param candles: 以时间为索引的主周期K线DataFrame
+        :param local_data_manager: 已预加载多周期数据的数据管理器
+        :param strategy_config: 策略配置
+        :param backtest_config: 回测配置，包含单个货币对信息
+        :param task_id: 回测任务ID
+        :param db: 数据库会话，策略数据为空时用于读取K线
+        :return: 单个货币对的回测结果数据
+        """
+        strategy_name = strategy_config.get("strategy_name")
+        symbol = backtest_config.get("symbol", "BTCUSDT")
+        interval = backtest_config.get("interval", "1d")
+        start_time = backtest_config.get("start_time")
+        end_time = backtest_config.get("end_time")
+        
+        # 初始化回测
+        initial_cash = backtest_config.get("initial_cash", 10000)
+        commission = backtest_config.get("commission", 0.001)
+        
+        # Check if initial cash is sufficient for the asset price
+        max_price = candles['Close'].max()
+        if max_price > initial_cash:
+            logger.warning(f"Initial cash ({initial_cash}) is lower than max price ({max_price}). Increasing cash to avoid warnings.")
+            initial_cash = max_price * 1.1 # Add 10% buffer
+        
+        # 为数据添加交易对符号属性
+        candles.symbol = symbol
+        
+        # 自定义回测运行器，用于在策略实例化后设置数据管理器
+        class CustomBacktest(Backtest):
+            def run(self, **kwargs):
+                # 执行父类的run方法
+                result = super().run(**kwargs)
+                # 获取策略实例并设置数据管理器
+                if hasattr(result, '_strategy'):
+                    strategy_instance = result['_strategy']
+                    if hasattr(strategy_instance, 'set_data_manager'):
+                        strategy_instance.set_data_manager(local_data_manager)
+                return result
+        
+        bt = CustomBacktest(
+            candles, 
+            strategy_class, 
+            cash=initial_cash,
+            commission=commission,
+            exclusive_orders=True
+        )
+        
+        # 执行回测
+        stats = bt.run()
+        
+        # 获取策略数据
+        strategy_data = []
+        if '_strategy' in stats:
+            strategy_instance = stats['_strategy']
+            if hasattr(strategy_instance, 'data'):
+                # Try to access underlying DataFrame
+                try:
+                    df = None
+                    if hasattr(strategy_instance.data, 'df'):
+                        df = strategy_instance.data.df
+                    elif isinstance(strategy_instance.data, pd.DataFrame):
+                        df = strategy_instance.data
+
+                    if df is not None:
+                        # 重要：保留时间索引作为一个字段
+                        df_copy = df.copy()
+                        df_copy.reset_index(inplace=True)
+
+                        # 重命名索引列为datetime
+                        if 'index' in df_copy.columns:
+                            df_copy.rename(columns={'index': 'datetime'}, inplace=True)
+                        elif df_copy.index.name and df_copy.index.name not in df_copy.columns:
+                            # 如果索引有名称且不是datetime，重命名为datetime
+                            first_col = df_copy.columns[0]
+                            if first_col not in ['Open', 'High', 'Low', 'Close', 'Volume']:
                                 df_copy.rename(columns={first_col: 'datetime'}, inplace=True)
 
-                            strategy_data = df_copy.to_dict('records')
-                    except Exception as e:
-                        logger.warning(f"Failed to extract strategy data: {e}")
-                        logger.exception(e)
-
-            # 如果策略数据为空，从数据库获取K线数据
-            logger.info(f"[run_single_backtest] 检查策略数据: len(strategy_data)={len(strategy_data)}, type={type(strategy_data)}")
-            if not strategy_data:
-                logger.info(f"[run_single_backtest] 策略数据为空，准备从数据库获取K线数据: symbol={symbol}, interval={interval}, start_time={start_time}, end_time={end_time}")
-                logger.info(f"[run_single_backtest] 数据库会话状态: db={db}, type={type(db)}")
-                strategy_data = self._get_kline_data_from_db(
+                        # 如果还是没有datetime列，假设第一列是时间
+                        if 'datetime' not in df_copy.columns and len(df_copy.columns) > 0:
+                            first_col = df_copy.columns[0]
+                            df_copy.rename(columns={first_col: 'datetime'}, inplace=True)
+
+                        strategy_data = df_copy.to_dict('records')
+                except Exception as e:
+                    logger.warning(f"Failed to extract strategy data: {e}")
+                    logger.exception(e)
+
+        # 如果策略数据为空，从数据库获取K线数据
+        logger.info(f"[run_single_backtest] 检查策略数据: len(strategy_data)={len(strategy_data)}, type={type(strategy_data)}")
+        if not strategy_data:
+            logger.info(f"[run_single_backtest] 策略数据为空，准备从数据库获取K线数据: symbol={symbol}, interval={interval}, start_time={start_time}, end_time={end_time}")
+            logger.info(f"[run_single_backtest] 数据库会话状态: db={db}, type={type(db)}")
+            # 回测工作进程中没有常驻会话，临时创建
+            own_session = db is None
+            if own_session:
+                from collector.db.database import SessionLocal, init_database_config
+                init_database_config()
+                db = SessionLocal()
+            try:
+                strategy_data = self._get_kline_data(
                     symbol=symbol,
                     interval=interval,
                     start_time=start_time,
                     end_time=end_time,
-                    db=db
+                    db=db,
+                    exchange=backtest_config.get("exchange", "binance"),
+                    crypto_type=backtest_config.get("crypto_type", "spot")
                 )
-                logger.info(f"[run_single_backtest] 从数据库获取K线数据完成: len(strategy_data)={len(strategy_data)}")
-            else:
-                logger.info(f"[run_single_backtest] 策略数据不为空，跳过数据库查询: len(strategy_data)={len(strategy_data)}")
-
-            # 获取交易记录 - 使用 _convert_trades 转换格式
-            trades = []
-            if '_trades' in stats:
-                trades = _convert_trades(stats)
-                logger.info(f"[run_single_backtest] 转换后获取到 {len(trades)} 条交易记录")
-                if trades:
-                    logger.info(f"[run_single_backtest] 第一条交易字段: {list(trades[0].keys())}")
-                    logger.info(f"[run_single_backtest] 第一条交易数据: {trades[0]}")
-            
-            # 翻译回测结果
-            translated_metrics = self.translate_backtest_results(stats)
-            
-            # 生成回测ID - 使用UUID替代原有格式，避免URL路径问题
-            backtest_id = str(uuid.uuid4())
-            
-            # 准备资金曲线数据，保留时间索引
-            equity_df = stats['_equity_curve'].copy()
-            equity_df.reset_index(inplace=True)
-            # 重命名索引列为datetime，以匹配前端期望
-            if 'index' in equity_df.columns:
-                equity_df.rename(columns={'index': 'datetime'}, inplace=True)
-            elif 'time' in equity_df.columns:
-                equity_df.rename(columns={'time': 'datetime'}, inplace=True)
-            # 如果索引有名称但不是index或time，它会自动成为列名，我们确保它是datetime
-            # 这里做一个通用处理：找到第一个列（原索引）并重命名为datetime
-            if 'datetime' not in equity_df.columns and len(equity_df.columns) > 0:
-                # 假设第一列是时间
-                equity_df.rename(columns={equity_df.columns[0]: 'datetime'}, inplace=True)
-            
-            equity_curve_data = equity_df.to_dict('records')
-            
-            # 构建回测结果数据，不直接保存到数据库
-            result_data = {
-                "id": backtest_id,
-                "symbol": symbol,
-                "task_id": task_id,
-                "status": "success",
-                "message": "回测完成",
-                "strategy_name": strategy_name,
-                "backtest_config": backtest_config,
-                "metrics": sanitize_for_json(translated_metrics),
-                "trades": sanitize_for_json(trades),
-                "equity_curve": sanitize_for_json(equity_curve_data),
-                "strategy_data": sanitize_for_json(strategy_data)
-            }
-            
-            logger.info(f"回测完成，策略: {strategy_name}, 货币对: {symbol}, 回测ID: {backtest_id}, task_id: {task_id}")
-            return result_data
-        except Exception as e:
-            logger.error(f"回测失败: {e}")
-            logger.exception(e)
-            symbol = backtest_config.get("symbol", "BTCUSDT")
-            return {
-                "symbol": symbol,
-                "task_id": task_id,
-                "status": "failed",
-                "message": str(e)
-            }
-    
+            finally:
+                if own_session:
+                    db.close()
+            logger.info(f"[run_single_backtest] 从数据库获取K线数据完成: len(strategy_data)={len(strategy_data)}")
+        else:
+            logger.info(f"[run_single_backtest] 策略数据不为空，跳过数据库查询: len(strategy_data)={len(strategy_data)}")
+
+        # 获取交易记录 - 使用 _convert_trades 转换格式
+        trades = []
+        if '_trades' in stats:
+            trades = _convert_trades(stats)
+            logger.info(f"[run_single_backtest] 转换后获取到 {len(trades)} 条交易记录")
+            if trades:
+                logger.info(f"[run_single_backtest] 第一条交易字段: {list(trades[0].keys())}")
+                logger.info(f"[run_single_backtest] 第一条交易数据: {trades[0]}")
+        
+        # 翻译回测结果
+        translated_metrics = self.translate_backtest_results(stats)
+        
+        # 生成回测ID - 使用UUID替代原有格式，避免URL路径问题
+        backtest_id = str(uuid.uuid4())
+        
+        # 准备资金曲线数据，保留时间索引
+        equity_df = stats['_equity_curve'].copy()
+        equity_df.reset_index(inplace=True)
+        # 重命名索引列为datetime，以匹配前端期望
+        if 'index' in equity_df.columns:
+            equity_df.rename(columns={'index': 'datetime'}, inplace=True)
+        elif 'time' in equity_df.columns:
+            equity_df.rename(columns={'time': 'datetime'}, inplace=True)
+        # 如果索引有名称但不是index或time，它会自动成为列名，我们确保它是datetime
+        # 这里做一个通用处理：找到第一个列（原索引）并重命名为datetime
+        if 'datetime' not in equity_df.columns and len(equity_df.columns) > 0:
+            # 假设第一列是时间
+            equity_df.rename(columns={equity_df.columns[0]: 'datetime'}, inplace=True)
+        
+        equity_curve_data = equity_df.to_dict('records')
+        
+        # 构建回测结果数据，不直接保存到数据库
+        result_data = {
+            "id": backtest_id,
+            "symbol": symbol,
+            "task_id": task_id,
+            "status": "success",
+            "message": "回测完成",
+            "strategy_name": strategy_name,
+            "backtest_config": backtest_config,
+            "metrics": sanitize_for_json(translated_metrics),
+            "trades": sanitize_for_json(trades),
+            "equity_curve": sanitize_for_json(equity_curve_data),
+            "strategy_data": sanitize_for_json(strategy_data)
+        }
+        
+        logger.info(f"回测完成，策略: {strategy_name}, 货币对: {symbol}, 回测ID: {backtest_id}, task_id: {task_id}")
+        return result_data
     def merge_backtest_results(self, results):
         """
         合并多个货币对的回测结果
@@ -1485,87 +1610,109 @@ class BacktestService:
                 db.add(task)
                 db.commit()
             
-            # 限制线程数量，避免系统过载
-            cpu_count = os.cpu_count() or 1
-            max_workers = min(len(symbols), cpu_count * 2)
-            logger.info(f"使用线程池执行回测，最大线程数: {max_workers}")
-            logger.info(f"CPU核心数: {cpu_count}")
+            # 执行模式：thread（默认，线程池）或 process（常驻回测进程池，CPU密集的回测不受GIL限制）
+            execution_mode = backtest_config.get("execution_mode", "thread")
             
-            # 使用线程池并行执行回测
             results = {}
             completed_count = 0
             failed_count = 0
+            total_futures = len(symbols)
             
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交所有回测任务
-                future_to_symbol = {}
-                symbol_index_map = {symbol: idx for idx, symbol in enumerate(symbols)}
-                for symbol in symbols:
-                    # 复制配置，替换货币对
-                    single_config = backtest_config.copy()
-                    single_config["symbol"] = symbol
-                    del single_config["symbols"]
-                    
-                    logger.info(f"提交回测任务: {symbol}, task_id: {task_id}")
-                    future = executor.submit(
-                        self.run_single_backtest,
-                        strategy_config,
-                        single_config,
-                        task_id,  # 传递task_id
-                        symbol_index_map[symbol],  # 传递货币对索引
-                        len(symbols)  # 传递总货币对数
-                    )
-                    future_to_symbol[future] = symbol
+            def record_result(symbol, result):
+                """记录单个货币对的回测结果并更新执行阶段进度"""
+                nonlocal completed_count
+                results[symbol] = result
+                completed_count += 1
                 
-                # 收集回测结果
-                total_futures = len(future_to_symbol)
-                for future in concurrent.futures.as_completed(future_to_symbol):
-                    symbol = future_to_symbol[future]
-                    try:
-                        result = future.result(timeout=3600)  # 1小时超时
-                        results[symbol] = result
-                        completed_count += 1
-                        
-                        # 更新执行阶段进度
-                        progress_tracker.update_progress(
-                            task_id,
-                            "execution",
-                            {
-                                "status": "running",
-                                "current_symbol": symbol,
-                                "completed_symbols": completed_count,
-                                "total_symbols": total_futures,
-                                "progress": (completed_count / total_futures) * 100,
-                                "message": f"已完成 {completed_count}/{total_futures} 个货币对"
-                            }
+                # 更新执行阶段进度
+                progress_tracker.update_progress(
+                    task_id,
+                    "execution",
+                    {
+                        "status": "running",
+                        "current_symbol": symbol,
+                        "completed_symbols": completed_count,
+                        "total_symbols": total_futures,
+                        "progress": (completed_count / total_futures) * 100,
+                        "message": f"已完成 {completed_count}/{total_futures} 个货币对"
+                    }
+                )
+                
+                logger.info(f"回测完成 [{completed_count}/{total_futures}]: {symbol}, 状态: {result.get('status')}")
+                if result.get('status') == 'success':
+                    # 记录关键指标
+                    for metric in result.get('metrics', []):
+                        if metric['name'] == 'Return [%]':
+                            logger.info(f"货币对 {symbol} 收益率: {metric['value']}%")
+                            break
+            
+            single_configs = []
+            for symbol in symbols:
+                # 复制配置，替换货币对
+                single_config = backtest_config.copy()
+                single_config["symbol"] = symbol
+                del single_config["symbols"]
+                single_configs.append(single_config)
+            
+            cpu_count = os.cpu_count() or 1
+            if execution_mode == "process":
+                from .process_pool import get_backtest_process_pool
+                
+                process_pool = get_backtest_process_pool()
+                logger.info(
+                    f"使用进程池执行回测，工作进程数: {process_pool.pool_workers}, "
+                    f"内存预算: {process_pool.memory_budget_mb}MB"
+                )
+                logger.info(f"CPU核心数: {cpu_count}")
+                process_pool.run(self, strategy_config, single_configs, task_id, record_result)
+            else:
+                # 限制线程数量，避免系统过载
+                max_workers = min(len(symbols), cpu_count * 2)
+                logger.info(f"使用线程池执行回测，最大线程数: {max_workers}")
+                logger.info(f"CPU核心数: {cpu_count}")
+                
+                # 使用线程池并行执行回测
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    # 提交所有回测任务
+                    future_to_symbol = {}
+                    for symbol_index, single_config in enumerate(single_configs):
+                        symbol = single_config["symbol"]
+                        logger.info(f"提交回测任务: {symbol}, task_id: {task_id}")
+                        future = executor.submit(
+                            self.run_single_backtest,
+                            strategy_config,
+                            single_config,
+                            task_id,  # 传递task_id
+                            symbol_index,  # 传递货币对索引
+                            len(symbols)  # 传递总货币对数
                         )
-                        
-                        logger.info(f"回测完成 [{completed_count}/{total_futures}]: {symbol}, 状态: {result.get('status')}")
-                        if result.get('status') == 'success':
-                            # 记录关键指标
-                            for metric in result.get('metrics', []):
-                                if metric['name'] == 'Return [%]':
-                                    logger.info(f"货币对 {symbol} 收益率: {metric['value']}%")
-                                    break
-                    except concurrent.futures.TimeoutError:
-                        logger.error(f"回测超时 [{completed_count + failed_count + 1}/{total_futures}]: {symbol}")
-                        results[symbol] = {
-                            "symbol": symbol,
-                            "task_id": task_id,
-                            "status": "failed",
-                            "message": "回测超时"
-                        }
-                        failed_count += 1
-                    except Exception as e:
-                        logger.error(f"回测失败 [{completed_count + failed_count + 1}/{total_futures}]: {symbol}, 错误: {e}")
-                        logger.exception(e)
-                        results[symbol] = {
-                            "symbol": symbol,
-                            "task_id": task_id,
-                            "status": "failed",
-                            "message": str(e)
-                        }
-                        failed_count += 1
+                        future_to_symbol[future] = symbol
+                    
+                    # 收集回测结果
+                    for future in concurrent.futures.as_completed(future_to_symbol):
+                        symbol = future_to_symbol[future]
+                        try:
+                            result = future.result(timeout=3600)  # 1小时超时
+                            record_result(symbol, result)
+                        except concurrent.futures.TimeoutError:
+                            logger.error(f"回测超时 [{completed_count + failed_count + 1}/{total_futures}]: {symbol}")
+                            results[symbol] = {
+                                "symbol": symbol,
+                                "task_id": task_id,
+                                "status": "failed",
+                                "message": "回测超时"
+                            }
+                            failed_count += 1
+                        except Exception as e:
+                            logger.error(f"回测失败 [{completed_count + failed_count + 1}/{total_futures}]: {symbol}, 错误: {e}")
+                            logger.exception(e)
+                            results[symbol] = {
+                                "symbol": symbol,
+                                "task_id": task_id,
+                                "status": "failed",
+                                "message": str(e)
+                            }
+                            failed_count += 1
             
             logger.info(f"=== 所有回测任务执行完毕 ===")
             logger.info(f"总货币对数量: {len(symbols)}")
@@ -2340,25 +2487,21 @@ class BacktestService:
                                 kline_records = db.query(CryptoSpotKline).filter(
                                     CryptoSpotKline.symbol == symbol,
                                     CryptoSpotKline.interval == interval,
-                                    CryptoSpotKline.timestamp >= start_dt.isoformat(),
-                                    CryptoSpotKline.timestamp <= end_dt.isoformat()
+                                    CryptoSpotKline.timestamp >= datetime_to_nanoseconds(start_dt),
+                                    CryptoSpotKline.timestamp <= datetime_to_nanoseconds(end_dt)
                                 ).order_by(CryptoSpotKline.timestamp).all()
                                 
                                 logger.info(f"从数据库获取到 {len(kline_records)} 条K线数据")
                                 
                                 for record in kline_records:
                                     try:
-                                        # 解析时间戳
-                                        dt = datetime.fromisoformat(record.timestamp)
-                                        timestamp_ms = int(dt.timestamp() * 1000)
-                                        
                                         kline_item = {
-                                            "timestamp": timestamp_ms,
-                                            "open": float(record.open),
-                                            "close": float(record.close),
-                                            "high": float(record.high),
-                                            "low": float(record.low),
-                                            "volume": float(record.volume),
+                                            "timestamp": record.timestamp // 1_000_000,
+                                            "open": record.open,
+                                            "close": record.close,
+                                            "high": record.high,
+                                            "low": record.low,
+                                            "volume": record.volume,
                                             "turnover": 0.0
                                         }
                                         kline_data.append(kline_item)
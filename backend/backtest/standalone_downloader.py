@@ -12,15 +12,19 @@
 
 import asyncio
 from datetime import datetime, timedelta
+from itertools import repeat
 from pathlib import Path
 from typing import Callable, List, Optional, Tuple
 
 import pandas as pd
 from utils.logger import get_logger, LogType
-from utils.parquet_utils import save_to_parquet, append_to_parquet
+from collector.db.kline_lake import KlineLake
+from collector.db.kline_writer import upsert_klines
+from utils.timestamp_utils import array_to_nanoseconds, datetime_to_nanoseconds
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+from exchange.archive_downloader import ArchiveDownloader
 from exchange.binance.downloader import BinanceDownloader
 from utils.time_parser import get_date_range
 
@@ -68,7 +72,8 @@ class StandaloneDataDownloader:
 
         # 新增：初始化本地存储路径
         self.save_local = save_local
-        self.local_storage_dir = Path.home() / ".quantcell" / "data" / "kline"
+        self.kline_lake = KlineLake()
+        self.local_storage_dir = self.kline_lake.root
         if save_local:
             self.local_storage_dir.mkdir(parents=True, exist_ok=True)
             logger.info(f"本地存储目录: {self.local_storage_dir}")
@@ -146,47 +151,66 @@ class StandaloneDataDownloader:
             logger.info(f"开始下载 {normalized_symbol} {interval} 数据，"
                        f"日期范围: {start_date} ~ {end_date}，共 {len(date_range)} 天")
 
-            # 逐日下载
-            success_count = 0
-            skipped_count = 0
-            for idx, date in enumerate(date_range):
-                try:
-                    progress.current_date = date
-                    progress.update(
-                        status="downloading",
-                        message=f"正在下载 {date} 的数据...",
-                        current_date=date
+            # 跳过数据库中已有数据的日期
+            pending_dates = []
+            for date in date_range:
+                if self._check_data_exists(normalized_symbol, interval, date, crypto_type):
+                    logger.info(f"✓ {date} 数据已存在，跳过下载")
+                else:
+                    pending_dates.append(date)
+            skipped_count = len(date_range) - len(pending_dates)
+
+            # 缺失的日期并发下载，整月优先使用月度归档；每个归档下载完成后立即入库
+            success_count = skipped_count  # 已存在也算成功
+            # 入库在线程中执行，不阻塞事件循环上的下载；写入串行，避免数据库写锁竞争
+            save_lock = asyncio.Lock()
+
+            async def on_result(task, df):
+                nonlocal success_count
+                if df.empty:
+                    logger.warning(f"⚠ {task.label} 无数据")
+                    return
+                async with save_lock:
+                    saved = await asyncio.to_thread(
+                        self._save_to_database, df, normalized_symbol, interval, crypto_type
                     )
-                    if progress_callback:
-                        progress.progress = (idx / len(date_range)) * 100
-                        progress_callback(progress)
-
-                    # 检查数据库中是否已有该日期的数据
-                    if self._check_data_exists(normalized_symbol, interval, date, crypto_type):
-                        logger.info(f"✓ {date} 数据已存在，跳过下载")
-                        skipped_count += 1
-                        success_count += 1  # 已存在也算成功
-                        continue
-
-                    # 下载单日数据
-                    df = await downloader.get_daily_klines(normalized_symbol, interval, date)
-
-                    if df is not None and not df.empty:
-                        # 直接保存到数据库
-                        self._save_to_database(df, normalized_symbol, interval, crypto_type)
-
-                        # 新增：同时保存到本地 Parquet 文件（可选）
-                        if self.save_local:
-                            self._save_to_local_file(df, normalized_symbol, interval, date, crypto_type)
-
-                        success_count += 1
-                        logger.info(f"✓ {date} 数据下载成功: {len(df)} 条")
-                    else:
-                        logger.warning(f"⚠ {date} 无数据")
-
-                except Exception as e:
-                    logger.error(f"✗ {date} 下载失败: {e}")
-                    continue
+                    if not saved:
+                        # 抛出异常使该归档记为失败，不写入续传状态
+                        raise RuntimeError(f"{task.label} 数据保存到数据库失败")
+                    if self.save_local:
+                        await asyncio.to_thread(
+                            self._save_to_local_file, df, normalized_symbol, interval, task.label, crypto_type
+                        )
+                success_count += len(task.dates)
+                logger.info(f"✓ {task.label} 数据下载成功: {len(df)} 条")
+
+            def on_progress(completed, total, task):
+                progress.update(
+                    status="downloading",
+                    progress=(skipped_count + completed) / len(date_range) * 100,
+                    message=f"已下载 {task.label} 的数据",
+                    current_date=task.label
+                )
+                if progress_callback:
+                    progress_callback(progress)
+
+            # 续传状态只记录已入库的归档和确认不存在的归档，中断或部分失败后重新运行时跳过
+            state_path = self._archive_state_path(normalized_symbol, interval, crypto_type)
+            async with ArchiveDownloader(
+                concurrency=downloader.download_concurrency, state_path=state_path
+            ) as archive_downloader:
+                stats = await archive_downloader.download(
+                    downloader.plan_archive_tasks(normalized_symbol, interval, pending_dates),
+                    downloader.parse_kline_csv,
+                    on_result=on_result,
+                    progress_callback=on_progress,
+                )
+            success_count += stats["skipped"]
+            if stats["missing"] or stats["failed"]:
+                logger.warning(f"⚠ {stats['missing']} 天无归档数据，{stats['failed']} 天下载失败")
+            else:
+                # 全部完成后以数据库为准，删除续传状态，之后删除的数据可以重新下载
+                state_path.unlink(missing_ok=True)
             
             # 更新最终进度
             progress.update(
@@ -212,6 +236,10 @@ class StandaloneDataDownloader:
                 progress_callback(progress)
             return False
 
+    def _archive_state_path(self, symbol: str, interval: str, crypto_type: str) -> Path:
+        """归档下载续传状态文件路径"""
+        return self.temp_dir / "archive_state" / f"{crypto_type}_{symbol}_{interval}.json"
+
     def _check_data_exists(
         self,
         symbol: str,
@@ -252,17 +280,17 @@ class StandaloneDataDownloader:
                 # 选择模型
                 Model = CryptoSpotKline if crypto_type == 'spot' else CryptoFutureKline
 
-                # 计算日期的时间戳范围（毫秒）
+                # 计算日期的时间戳范围（纳秒）
                 date_dt = datetime.strptime(date, '%Y-%m-%d')
-                start_ts = int(date_dt.timestamp() * 1000)
-                end_ts = int((date_dt + timedelta(days=1)).timestamp() * 1000)
+                start_ts = datetime_to_nanoseconds(date_dt)
+                end_ts = datetime_to_nanoseconds(date_dt + timedelta(days=1))
 
                 # 查询该日期是否有数据
                 count = db.query(Model).filter(
                     Model.symbol == symbol,
                     Model.interval == interval,
-                    Model.timestamp >= str(start_ts),
-                    Model.timestamp < str(end_ts)
+                    Model.timestamp >= start_ts,
+                    Model.timestamp < end_ts
                 ).count()
 
                 return count > 0
@@ -315,48 +343,18 @@ class StandaloneDataDownloader:
                 # 选择模型
                 Model = CryptoSpotKline if crypto_type == 'spot' else CryptoFutureKline
                 
-                # 准备记录
-                records = []
-                for _, row in df.iterrows():
-                    # 转换时间戳（毫秒）
-                    timestamp_ms = int(row['open_time'])
-                    
-                    # 生成唯一标识符
-                    unique_kline = f"{symbol}_{interval}_{timestamp_ms}"
-                    
-                    records.append({
-                        'symbol': symbol,
-                        'interval': interval,
-                        'timestamp': str(timestamp_ms),
-                        'open': str(row['open']),
-                        'high': str(row['high']),
-                        'low': str(row['low']),
-                        'close': str(row['close']),
-                        'volume': str(row['volume']),
-                        'unique_kline': unique_kline,
-                        'data_source': 'binance'
-                    })
-                
-                # 批量保存（使用INSERT OR IGNORE避免重复）
-                if records:
-                    from sqlalchemy.dialects.sqlite import insert
-
-                    # 构建INSERT语句
-                    stmt = insert(Model).values(records)
-                    # 添加ON CONFLICT DO NOTHING子句
-                    stmt = stmt.on_conflict_do_nothing(index_elements=['unique_kline'])
-
-                    result = db.execute(stmt)
+                # 归档中的开盘时间为毫秒（新版现货为微秒），统一转换为纳秒
+                timestamps = array_to_nanoseconds(df['open_time'].to_numpy())
+                rows = zip(
+                    repeat(symbol), repeat(interval), timestamps.tolist(),
+                    *(df[col].to_numpy(dtype=float).tolist() for col in ('open', 'high', 'low', 'close', 'volume'))
+                )
+
+                # 批量写入，同时维护覆盖索引并使K线缓存失效
+                written = upsert_klines(db, Model.__tablename__, rows, data_source='binance')
+                if written:
                     db.commit()
-                    logger.info(f"[_save_to_database] 保存 {len(records)} 条记录到数据库: {symbol} {interval}, 影响行数: {result.rowcount}")
-
-                    # 验证数据是否真的写入
-                    verify_count = db.query(Model).filter(
-                        Model.symbol == symbol,
-                        Model.interval == interval
-                    ).count()
-                    logger.info(f"[_save_to_database] 验证: 数据库中 {symbol} {interval} 共有 {verify_count} 条记录")
-
+                    logger.info(f"[_save_to_database] 保存 {written} 条记录到数据库: {symbol} {interval}")
                     return True
                 
                 return False
@@ -381,9 +379,10 @@ class StandaloneDataDownloader:
         crypto_type: str
     ) -> bool:
         """
-        保存数据到本地 Parquet 文件
+        保存数据到本地K线数据湖
 
-        按日期分片存储，支持增量更新。
+        按 binance/{spot|futures}/{symbol}/{interval}/year=/month= 分区存储，
+        与已有分区合并去重并更新清单。
 
         Args:
             df: K线数据DataFrame
@@ -396,20 +395,9 @@ class StandaloneDataDownloader:
             bool: 是否保存成功
         """
         try:
-            # 构建存储路径：{base_dir}/{crypto_type}/{symbol}/{interval}/{date}.parquet
-            storage_type = 'spot' if crypto_type == 'spot' else 'futures'
-            file_dir = self.local_storage_dir / storage_type / symbol / interval
-            file_path = file_dir / f"{date}.parquet"
-
-            # 使用 append_to_parquet 支持增量更新（读取-合并-重写）
-            success = append_to_parquet(df, file_path)
-
-            if success:
-                logger.info(f"已保存到本地文件: {file_path} ({len(df)} 行)")
-                return True
-            else:
-                logger.error(f"保存到本地文件失败: {file_path}")
-                return False
+            written = self.kline_lake.write(df, 'binance', crypto_type, symbol, interval)
+            logger.info(f"已保存到数据湖: {symbol} {interval} {date} ({written} 行)")
+            return True
 
         except Exception as e:
             logger.error(f"保存本地文件异常: {e}")
@@ -694,7 +694,7 @@ class NativeVectorAdapter(StrategyAdapter):
         计算交易统计
 
         Args:
-            trades: 交易记录
+            trades: TRADE_RECORD_DTYPE 结构化交易记录数组
             data: K线数据
 
         Returns:
@@ -711,23 +711,14 @@ class NativeVectorAdapter(StrategyAdapter):
                 'expectancy': 0
             }
 
-        # 提取盈亏
-        pnls = []
-        for trade in trades:
-            if isinstance(trade, dict):
-                pnls.append(trade.get('pnl', 0))
-
-        if not pnls:
-            pnls = [0]
-
-        pnls = np.array(pnls)
+        pnls = trades['pnl']
         winning_trades = pnls[pnls > 0]
         losing_trades = pnls[pnls < 0]
 
         # 计算统计
-        best_trade = np.max(pnls) if len(pnls) > 0 else 0
-        worst_trade = np.min(pnls) if len(pnls) > 0 else 0
-        avg_trade = np.mean(pnls) if len(pnls) > 0 else 0
+        best_trade = np.max(pnls)
+        worst_trade = np.min(pnls)
+        avg_trade = np.mean(pnls)
 
         # 盈亏因子
         gross_profit = np.sum(winning_trades) if len(winning_trades) > 0 else 0
@@ -735,17 +726,24 @@ class NativeVectorAdapter(StrategyAdapter):
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
 
         # 期望值
-        win_rate = len(winning_trades) / len(pnls) if len(pnls) > 0 else 0
+        win_rate = len(winning_trades) / len(pnls)
         avg_win = np.mean(winning_trades) if len(winning_trades) > 0 else 0
         avg_loss = abs(np.mean(losing_trades)) if len(losing_trades) > 0 else 0
         expectancy = (win_rate * avg_win) - ((1 - win_rate) * avg_loss)
 
+        # 持仓时长：出场与入场K线的时间差
+        if isinstance(data.index, pd.DatetimeIndex):
+            durations = data.index[trades['exit_idx']] - data.index[trades['entry_idx']]
+            max_duration, avg_duration = durations.max(), durations.mean()
+        else:
+            max_duration = avg_duration = pd.Timedelta(0)
+
         return {
             'best_trade': best_trade,
             'worst_trade': worst_trade,
             'avg_trade': avg_trade,
-            'max_duration': pd.Timedelta(hours=24),  # 简化估算
-            'avg_duration': pd.Timedelta(hours=12),  # 简化估算
+            'max_duration': max_duration,
+            'avg_duration': avg_duration,
             'profit_factor': profit_factor,
             'expectancy': expectancy
         }
@@ -755,7 +753,7 @@ class NativeVectorAdapter(StrategyAdapter):
         格式化交易记录为 DataFrame
 
         Args:
-            trades: 交易记录数组
+            trades: TRADE_RECORD_DTYPE 结构化交易记录数组
             data: K线数据
 
         Returns:
@@ -764,21 +762,21 @@ class NativeVectorAdapter(StrategyAdapter):
         if len(trades) == 0:
             return pd.DataFrame()
 
-        formatted_trades = []
-        for i, trade in enumerate(trades):
-            if isinstance(trade, dict):
-                formatted_trades.append({
-                    'Entry Time': data.index[trade.get('step', 0)] if 'step' in trade else None,
-                    'Exit Time': data.index[trade.get('step', 0)] if 'step' in trade else None,
-                    'Entry Price': trade.get('price', 0),
-                    'Exit Price': trade.get('price', 0),
-                    'Size': trade.get('size', 0),
-                    'P/L': trade.get('pnl', 0),
-                    'Return %': trade.get('return_pct', 0),
-                    'Direction': trade.get('direction', 'long')
-                })
-
-        return pd.DataFrame(formatted_trades)
+        entry_price = trades['entry_price']
+        exit_price = trades['exit_price']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return_pct = np.where(entry_price > 0, (exit_price - entry_price) / entry_price * 100, 0.0)
+
+        return pd.DataFrame({
+            'Entry Time': data.index[trades['entry_idx']],
+            'Exit Time': data.index[trades['exit_idx']],
+            'Entry Price': entry_price,
+            'Exit Price': exit_price,
+            'Size': trades['size'],
+            'P/L': trades['pnl'],
+            'Return %': return_pct,
+            'Direction': 'long'
+        })
 
 
 class StrategyRunner:
@@ -17,6 +17,9 @@ from ..schemas.data import (DownloadCryptoRequest, ExportCryptoRequest,
                             LoadDataRequest)
 from ..services import DataService
 from ..db.models import CryptoSpotKline, CryptoFutureKline, StockKline
+from ..db.kline_cache import TABLE_MARKETS, invalidate_kline_cache
+from ..db.kline_coverage import drop_coverage
+from utils.timestamp_utils import datetime_to_nanoseconds
 
 # 创建API路由实例
 router = APIRouter(prefix="/data", tags=["data-management"])
@@ -374,6 +377,8 @@ async def resolve_kline_duplicates(
         
         # 提交事务
         db.commit()
+        # 每个时间戳仍保留一条K线，覆盖索引不变，只需丢弃可能读到被删记录的缓存
+        invalidate_kline_cache(TABLE_MARKETS[KlineModel.__tablename__], symbol, interval)
         
         # 计算删除后的记录数量
         after_count = db.query(KlineModel).filter(
@@ -518,9 +523,9 @@ async def clean_kline_data(
         
         # 添加时间范围过滤
         if start_dt:
-            query = query.filter(KlineModel.timestamp >= start_dt)
+            query = query.filter(KlineModel.timestamp >= datetime_to_nanoseconds(start_dt))
         if end_dt:
-            query = query.filter(KlineModel.timestamp <= end_dt)
+            query = query.filter(KlineModel.timestamp <= datetime_to_nanoseconds(end_dt))
         
         # 获取清理前的记录数
         total_before = query.count()
@@ -589,8 +594,15 @@ async def clean_kline_data(
                             db.delete(record)
                             deleted_count += 1
         
+        # 删除了K线时丢弃覆盖索引和进程级缓存，下次读取时重新核实
+        if deleted_count:
+            drop_coverage(db, KlineModel.__tablename__, formatted_symbol, interval)
+        
         # 提交事务
         db.commit()
+        # 提交后再失效缓存，避免并发读取在提交前把旧数据重新写回缓存
+        if deleted_count:
+            invalidate_kline_cache(TABLE_MARKETS[KlineModel.__tablename__], formatted_symbol, interval or "")
         
         return ApiResponse(
             code=0,
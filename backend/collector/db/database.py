@@ -74,7 +74,7 @@ def _import_all_models():
 def fix_duckdb_serial_type(conn, cursor, statement, parameters, context, executemany):
     """修复DuckDB不支持SERIAL类型的问题"""
     # 只处理字符串类型的CREATE TABLE语句
-    if isinstance(statement, str) and statement.startswith('CREATE TABLE'):
+    if isinstance(statement, str) and statement.lstrip().startswith('CREATE TABLE'):
         # 全面替换各种SERIAL相关语法
         fixed_statement = statement
         
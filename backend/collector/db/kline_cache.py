@@ -0,0 +1,441 @@
+"""进程级K线缓存
+
+回测、CLI和指标执行在同一进程内共享一份K线缓存，避免多个任务、多个用户
+反复从数据库/数据湖读取并解析同一 (交易所, 市场, 货币对, 周期) 的相同时间段。
+
+每个键下保存若干按时间排序、互不重叠的只读数组段，每段记录其覆盖的时间范围：
+    - 子区间请求在已覆盖段上用 searchsorted 切片返回视图，不拷贝
+    - 未覆盖的部分调用加载函数只读取缺口，新段与相邻/重叠的段合并
+    - 超出内存预算时按最近最少使用（LRU）淘汰整个键的数据
+
+尚未收线的K线（最近一个周期内）不计入覆盖范围，每次都重新读取。
+由细周期重采样得到的K线以 "1h@1m" 形式的周期作为键，与数据库中存储的同周期K线分开缓存，
+基础周期写入后一并失效。
+写入数据库或数据湖后调用 invalidate() 丢弃相交的段；缓存只在当前进程内有效。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logger import get_logger, LogType
+
+from .kline_lake import normalize_market
+from .kline_reader import KLINE_COLUMNS, KlineArrays, read_kline_arrays
+from .kline_resample import bucket_bounds, resample_kline_arrays
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 默认内存预算（MB），可通过环境变量 KLINE_CACHE_MAX_MB 覆盖，0 表示关闭缓存
+DEFAULT_MAX_MB = 512
+
+# K线表名 -> 市场类型
+TABLE_MARKETS = {
+    "crypto_spot_klines": "spot",
+    "crypto_future_klines": "futures",
+    "stock_klines": "stock",
+}
+
+CacheKey = Tuple[str, str, str, str]
+KlineLoader = Callable[[int, int], KlineArrays]
+
+
+@dataclass
+class _Segment:
+    """一段连续覆盖的K线，start/end为覆盖范围（纳秒，闭区间）"""
+    start: int
+    end: int
+    arrays: KlineArrays
+
+
+@dataclass
+class _Entry:
+    """一个键下按时间升序、互不重叠的数组段"""
+    segments: List[_Segment] = field(default_factory=list)
+    nbytes: int = 0
+
+
+def make_cache_key(exchange: str, market: str, symbol: str, interval: str) -> CacheKey:
+    """规范化缓存键：市场类型与数据湖分区目录名一致，货币对去除分隔符并大写"""
+    return (
+        exchange.lower(),
+        normalize_market(market),
+        symbol.replace("/", "").upper(),
+        interval,
+    )
+
+
+def _freeze(arrays: KlineArrays) -> KlineArrays:
+    """将数组标记为只读，缓存返回的视图不能被调用方原地修改"""
+    for name in KLINE_COLUMNS:
+        getattr(arrays, name).flags.writeable = False
+    return arrays
+
+
+def _slice_range(arrays: KlineArrays, start_ns: int, end_ns: int) -> KlineArrays:
+    lo = int(np.searchsorted(arrays.ts, start_ns, side="left"))
+    hi = int(np.searchsorted(arrays.ts, end_ns, side="right"))
+    if lo == 0 and hi == len(arrays):
+        return arrays
+    return KlineArrays(**{name: getattr(arrays, name)[lo:hi] for name in KLINE_COLUMNS})
+
+
+def _concat(parts: List[KlineArrays]) -> KlineArrays:
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return KlineArrays.empty()
+    if len(parts) == 1:
+        return parts[0]
+    return KlineArrays(**{
+        name: np.concatenate([getattr(part, name) for part in parts])
+        for name in KLINE_COLUMNS
+    })
+
+
+def _interval_ns(interval: str) -> int:
+    from utils.time_parser import get_interval_ms
+
+    try:
+        # 重采样键 "1h@1m" 按目标周期判断是否收线
+        return get_interval_ms(interval.partition("@")[0]) * 1_000_000
+    except Exception:
+        return 0
+
+
+class KlineCache:
+    """按 (exchange, market, symbol, interval) 分段缓存K线数组，受字节预算约束"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """初始化K线缓存
+
+        Args:
+            max_bytes: 内存预算（字节），默认由 KLINE_CACHE_MAX_MB 环境变量决定
+        """
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("KLINE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        # 同一个键的缺口加载串行执行，并发请求等待第一个请求加载完后直接命中
+        self._key_locks: Dict[CacheKey, threading.Lock] = {}
+        # 失效或清空时递增，加载期间发生过失效的结果不再写入缓存
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def nbytes(self) -> int:
+        """缓存数组占用的字节数"""
+        return self._nbytes
+
+    def _key_lock(self, key: CacheKey) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get(
+        self,
+        exchange: str,
+        market: str,
+        symbol: str,
+        interval: str,
+        start_ns: Optional[int],
+        end_ns: Optional[int],
+        loader: KlineLoader,
+    ) -> KlineArrays:
+        """读取时间范围内的K线（闭区间），缺口由 loader 加载
+
+        Args:
+            exchange: 交易所
+            market: 市场类型
+            symbol: 货币对
+            interval: 时间周期
+            start_ns: 开始时间（纳秒，包含），None 表示不限
+            end_ns: 结束时间（纳秒，包含），None 表示到当前时间
+            loader: 加载函数 loader(start_ns, end_ns) -> KlineArrays，返回闭区间内升序的K线
+
+        Returns:
+            KlineArrays: 按时间升序排列的K线，数组为只读，需要修改时调用方自行拷贝
+        """
+        now_ns = time.time_ns()
+        start_ns = 0 if start_ns is None else int(start_ns)
+        end_ns = now_ns if end_ns is None else int(end_ns)
+        if end_ns < start_ns:
+            return KlineArrays.empty()
+        if self.max_bytes <= 0:
+            return loader(start_ns, end_ns)
+
+        key = make_cache_key(exchange, market, symbol, interval)
+        # 最近一个周期内的K线可能尚未收线，不计入覆盖范围
+        settled_ns = now_ns - _interval_ns(interval)
+
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                segments = list(entry.segments) if entry is not None else []
+                generation = self._generation
+                if entry is not None:
+                    self._entries.move_to_end(key)
+
+            # 先在已覆盖的段上切片，得到 (范围起点, 数据) 片段和未覆盖的缺口
+            pieces: List[Tuple[int, KlineArrays]] = []
+            gaps: List[Tuple[int, int]] = []
+            cursor = start_ns
+            for segment in segments:
+                if segment.end < cursor:
+                    continue
+                if segment.start > end_ns:
+                    break
+                if segment.start > cursor:
+                    gaps.append((cursor, segment.start - 1))
+                pieces.append((max(cursor, segment.start), _slice_range(segment.arrays, cursor, end_ns)))
+                cursor = segment.end + 1
+                if cursor > end_ns:
+                    break
+            if cursor <= end_ns:
+                gaps.append((cursor, end_ns))
+
+            loaded: List[_Segment] = []
+            for gap_start, gap_end in gaps:
+                arrays = loader(gap_start, gap_end)
+                pieces.append((gap_start, arrays))
+                segment = self._settled_segment(arrays, gap_start, gap_end, settled_ns)
+                if segment is not None:
+                    loaded.append(segment)
+
+            with self._lock:
+                self._stats["misses" if gaps else "hits"] += 1
+                self._stats["loads"] += len(gaps)
+                if loaded and generation == self._generation:
+                    self._insert(key, loaded)
+
+        pieces.sort(key=lambda piece: piece[0])
+        return _concat([piece for _, piece in pieces])
+
+    @staticmethod
+    def _settled_segment(arrays: KlineArrays, gap_start: int, gap_end: int, settled_ns: int) -> Optional[_Segment]:
+        """由缺口加载结果生成可缓存的段；空结果和未收线部分不缓存"""
+        cover_end = min(gap_end, settled_ns)
+        if len(arrays) == 0 or cover_end < gap_start:
+            return None
+        settled = _slice_range(arrays, gap_start, cover_end)
+        # 调用方持有加载出的数组，缓存一份独立的只读拷贝
+        settled = KlineArrays(**{name: getattr(settled, name).copy() for name in KLINE_COLUMNS})
+        return _Segment(gap_start, cover_end, _freeze(settled))
+
+    def _insert(self, key: CacheKey, new_segments: List[_Segment]) -> None:
+        """插入新段并与相邻/重叠的段合并，随后按预算淘汰（需持有 self._lock）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        self._entries.move_to_end(key)
+
+        merged: List[_Segment] = []
+        for segment in sorted(entry.segments + new_segments, key=lambda s: s.start):
+            if merged and segment.start <= merged[-1].end + 1:
+                last = merged[-1]
+                if segment.end > last.end:
+                    tail = _slice_range(segment.arrays, last.end + 1, segment.end)
+                    merged[-1] = _Segment(last.start, segment.end, _freeze(_concat([last.arrays, tail])))
+            else:
+                merged.append(segment)
+
+        self._nbytes -= entry.nbytes
+        entry.segments = merged
+        entry.nbytes = sum(segment.arrays.nbytes for segment in merged)
+        self._nbytes += entry.nbytes
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._nbytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._nbytes -= entry.nbytes
+            self._stats["evictions"] += 1
+            logger.debug(f"K线缓存淘汰: {key}, 释放 {entry.nbytes} 字节")
+
+    def invalidate(
+        self,
+        exchange: Optional[str] = None,
+        market: Optional[str] = None,
+        symbol: Optional[str] = None,
+        interval: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> int:
+        """丢弃与给定条件相交的缓存段，未指定的条件匹配全部
+
+        Returns:
+            int: 丢弃的段数
+        """
+        exchange, market, symbol, interval = make_cache_key(
+            exchange or "", market or "", symbol or "", interval or ""
+        )
+        start_ns = 0 if start_ns is None else int(start_ns)
+        end_ns = np.iinfo(np.int64).max if end_ns is None else int(end_ns)
+        dropped = 0
+        with self._lock:
+            for key in list(self._entries):
+                if any(want and want != have for want, have in zip((exchange, market, symbol), key)):
+                    continue
+                # 基础周期失效时，由其重采样得到的周期一并失效
+                if interval and interval not in (key[3], key[3].rpartition("@")[2]):
+                    continue
+                entry = self._entries[key]
+                key_start = start_ns
+                if "@" in key[3] and start_ns > 0:
+                    # 聚合K线以周期开盘时间为键，写入点所在周期的聚合K线同样过期
+                    key_start = bucket_bounds(start_ns, key[3].partition("@")[0])[0]
+                kept = [s for s in entry.segments if s.end < key_start or s.start > end_ns]
+                if len(kept) == len(entry.segments):
+                    continue
+                dropped += len(entry.segments) - len(kept)
+                self._nbytes -= entry.nbytes
+                entry.segments = kept
+                entry.nbytes = sum(segment.arrays.nbytes for segment in kept)
+                self._nbytes += entry.nbytes
+                if not kept:
+                    del self._entries[key]
+            self._generation += 1
+            self._stats["invalidations"] += dropped
+        if dropped:
+            logger.debug(f"K线缓存失效: {symbol or '*'} {interval or '*'}, 丢弃 {dropped} 段")
+        return dropped
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：命中/缺失/加载/淘汰/失效次数，以及键数、段数和占用字节"""
+        with self._lock:
+            return {
+                **self._stats,
+                "keys": len(self._entries),
+                "segments": sum(len(entry.segments) for entry in self._entries.values()),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_kline_cache: Optional[KlineCache] = None
+_kline_cache_lock = threading.Lock()
+
+
+def get_kline_cache() -> KlineCache:
+    """获取进程级K线缓存单例"""
+    global _kline_cache
+    if _kline_cache is None:
+        with _kline_cache_lock:
+            if _kline_cache is None:
+                _kline_cache = KlineCache()
+    return _kline_cache
+
+
+def read_cached_klines(
+    symbol: str,
+    interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    market: str = "spot",
+    exchange: str = "binance",
+    conn: Any = None,
+    kline_lake: Any = None,
+) -> KlineArrays:
+    """经进程级缓存读取K线，缺口从数据湖或数据库加载
+
+    Args:
+        symbol: 货币对，BTCUSDT 与 BTC/USDT 视为同一个
+        interval: 时间周期
+        start_ns: 开始时间（纳秒，包含）
+        end_ns: 结束时间（纳秒，包含）
+        market: 市场类型 spot/futures/perpetual
+        exchange: 交易所
+        conn: 数据库会话或连接，为None时使用全局连接
+        kline_lake: 数据湖实例，设置后缺口只从数据湖加载
+
+    Returns:
+        KlineArrays: 按时间升序排列的只读K线数组
+    """
+    normalized = symbol.replace("/", "")
+
+    if kline_lake is not None:
+        def loader(gap_start: int, gap_end: int) -> KlineArrays:
+            return kline_lake.read(exchange, market, normalized, interval, start_ns=gap_start, end_ns=gap_end)
+    else:
+        crypto_type = "spot" if market == "spot" else "future"
+        symbols = list(dict.fromkeys([normalized, symbol]))
+
+        def loader(gap_start: int, gap_end: int) -> KlineArrays:
+            return read_kline_arrays(
+                conn, symbols, interval, start_ns=gap_start, end_ns=gap_end, crypto_type=crypto_type
+            )
+
+    return get_kline_cache().get(exchange, market, normalized, interval, start_ns, end_ns, loader)
+
+
+def read_resampled_klines(
+    symbol: str,
+    interval: str,
+    base_interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    market: str = "spot",
+    exchange: str = "binance",
+    conn: Any = None,
+    kline_lake: Any = None,
+) -> KlineArrays:
+    """经进程级缓存读取由 base_interval 重采样得到的 interval 周期K线
+
+    缺口对应的基础周期K线同样经缓存读取，并扩展到缺口首尾所在的完整周期，
+    保证每根聚合K线都由该周期内全部的基础K线构成。
+
+    Args:
+        symbol: 货币对
+        interval: 目标周期，需满足 can_resample(base_interval, interval)
+        base_interval: 基础周期
+        start_ns: 开始时间（纳秒，包含），按聚合K线的开盘时间过滤
+        end_ns: 结束时间（纳秒，包含）
+        market: 市场类型 spot/futures/perpetual
+        exchange: 交易所
+        conn: 数据库会话或连接，为None时使用全局连接
+        kline_lake: 数据湖实例，设置后基础周期只从数据湖加载
+
+    Returns:
+        KlineArrays: 按时间升序排列的只读K线数组
+    """
+    def loader(gap_start: int, gap_end: int) -> KlineArrays:
+        base_start = bucket_bounds(gap_start, interval)[0]
+        base_end = bucket_bounds(gap_end, interval)[1] - 1
+        base = read_cached_klines(
+            symbol, base_interval, base_start, base_end,
+            market=market, exchange=exchange, conn=conn, kline_lake=kline_lake,
+        )
+        return _slice_range(resample_kline_arrays(base, interval), gap_start, gap_end)
+
+    return get_kline_cache().get(
+        exchange, market, symbol.replace("/", ""), f"{interval}@{base_interval}", start_ns, end_ns, loader
+    )
+
+
+def invalidate_kline_cache(
+    market: Optional[str],
+    symbol: str,
+    interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    exchange: Optional[str] = None,
+) -> None:
+    """写入K线后使缓存中相交的段失效；未创建缓存时不做任何事"""
+    if _kline_cache is not None:
+        _kline_cache.invalidate(exchange, market, symbol, interval, start_ns, end_ns)
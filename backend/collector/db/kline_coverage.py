@@ -0,0 +1,341 @@
+"""K线覆盖索引
+
+为每个 (K线表, symbol, interval) 持久化一组互不相邻的已覆盖区间 [start_ts, end_ts]
+（纳秒，K线开盘时间，闭区间），"[a, b] 中缺少哪些K线"只需做区间运算：
+    - upsert_klines 写入时在同一事务内把本批K线的连续段并入索引
+    - 查询缺口时先由索引算出候选缺口，再只在缺口内扫描K线表核实，
+      核实到的K线（由未接入索引的写入路径写入）顺带并入索引
+    - 删除K线后调用 drop_coverage 丢弃索引，下次查询时在缺口内重新核实
+
+索引只记录确实存在的K线，缺口核实保证结果不依赖所有写入路径都维护索引；
+首次查询相当于一次只读时间戳列的全量扫描，此后的开销与缺口数量成正比。
+"""
+
+import time
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logger import get_logger, LogType
+
+from .kline_reader import _get_dbapi_connection, _is_duckdb
+from .kline_resample import WEEK_OFFSET_NS, interval_span_ns
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+COVERAGE_TABLE = "kline_coverage"
+
+# 候选缺口过多时合并为一次范围扫描，避免逐个缺口查询
+MAX_GAP_QUERIES = 64
+
+CoveredRange = Tuple[int, int]
+
+_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {COVERAGE_TABLE} (
+        kline_table VARCHAR NOT NULL,
+        symbol VARCHAR NOT NULL,
+        "interval" VARCHAR NOT NULL,
+        start_ts BIGINT NOT NULL,
+        end_ts BIGINT NOT NULL,
+        PRIMARY KEY (kline_table, symbol, "interval", start_ts)
+    )
+"""
+
+_KEY_FILTER = 'kline_table = ? AND symbol = ? AND "interval" = ?'
+
+
+def interval_step_ns(interval: str) -> Optional[int]:
+    """相邻K线的间隔（纳秒），月线等不等长周期返回None"""
+    if interval.endswith("M"):
+        return None
+    try:
+        return interval_span_ns(interval)
+    except ValueError:
+        return None
+
+
+def _grid_offset(interval: str) -> int:
+    return WEEK_OFFSET_NS if interval.endswith("w") else 0
+
+
+def runs_from_timestamps(ts: np.ndarray, step_ns: int) -> List[CoveredRange]:
+    """将升序去重的时间戳拆分为连续段
+
+    Args:
+        ts: K线开盘时间（纳秒），升序且不重复
+        step_ns: 相邻K线的间隔
+
+    Returns:
+        List[CoveredRange]: 连续段 [(start, end), ...]
+    """
+    if len(ts) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(ts) > step_ns)
+    starts = np.concatenate(([ts[0]], ts[breaks + 1]))
+    ends = np.concatenate((ts[breaks], [ts[-1]]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def merge_ranges(ranges: Iterable[CoveredRange], step_ns: int) -> List[CoveredRange]:
+    """合并重叠或首尾相接（间隔不超过一个周期）的区间"""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + step_ns:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def missing_ranges(
+    covered: List[CoveredRange],
+    start_ns: int,
+    end_ns: int,
+    step_ns: int,
+    offset_ns: int = 0,
+) -> List[CoveredRange]:
+    """计算 [start_ns, end_ns] 内未被覆盖的K线开盘时间段
+
+    Args:
+        covered: 已覆盖区间，升序且互不相邻
+        start_ns: 开始时间（纳秒，包含）
+        end_ns: 结束时间（纳秒，包含）
+        step_ns: 周期长度
+        offset_ns: 周期网格相对UTC纪元的偏移（周线从星期一开始）
+
+    Returns:
+        List[CoveredRange]: 缺失区间，端点为缺失的第一根和最后一根K线的开盘时间
+    """
+    # 对齐到周期网格上的第一根和最后一根K线
+    cursor = -((offset_ns - start_ns) // step_ns) * step_ns + offset_ns
+    last = (end_ns - offset_ns) // step_ns * step_ns + offset_ns
+    gaps: List[CoveredRange] = []
+    for cov_start, cov_end in covered:
+        if cov_end < cursor:
+            continue
+        if cov_start > last:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, min(last, cov_start - step_ns)))
+        cursor = max(cursor, cov_end + step_ns)
+        if cursor > last:
+            break
+    if cursor <= last:
+        gaps.append((cursor, last))
+    return [(gap_start, gap_end) for gap_start, gap_end in gaps if gap_start <= gap_end]
+
+
+def count_bars(ranges: List[CoveredRange], step_ns: int) -> int:
+    """区间内的K线根数"""
+    return sum((end - start) // step_ns + 1 for start, end in ranges)
+
+
+def missing_from_timestamps(
+    ts: np.ndarray,
+    interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+) -> List[CoveredRange]:
+    """计算一组已读出的K线在 [start_ns, end_ns] 内缺失的区间，尚未收线的K线不计入
+
+    用于判断数据湖等不维护覆盖索引的数据源能否完整满足一次范围请求。
+    月线等不等长周期只判断是否有数据。
+
+    Args:
+        ts: K线开盘时间（纳秒），升序且不重复
+        interval: 时间周期
+        start_ns: 开始时间（纳秒，包含），None 表示从第一根K线开始
+        end_ns: 结束时间（纳秒，包含），None 表示到最后一根已收线的K线
+
+    Returns:
+        List[CoveredRange]: 缺失区间，端点为缺失的第一根和最后一根K线的开盘时间
+    """
+    now_ns = time.time_ns()
+    if len(ts) == 0:
+        return [(0 if start_ns is None else int(start_ns), now_ns if end_ns is None else int(end_ns))]
+    step_ns = interval_step_ns(interval)
+    if step_ns is None:
+        return []
+    start_ns = int(ts[0]) if start_ns is None else int(start_ns)
+    # 最近一个周期内开盘的K线尚未收线，数据源中没有也不算缺失
+    end_ns = min(now_ns - step_ns, int(ts[-1]) if end_ns is None else int(end_ns))
+    if end_ns < start_ns:
+        return []
+    covered = runs_from_timestamps(ts, step_ns)
+    return missing_ranges(covered, start_ns, end_ns, step_ns, covered[0][0] % step_ns)
+
+
+def _ensure_table(raw: Any) -> None:
+    raw.execute(_CREATE_SQL)
+
+
+def _fetch_ranges(raw: Any, sql: str, params: List[Any]) -> List[CoveredRange]:
+    # 直接在连接上执行：DuckDB的cursor()是新连接，不在调用方的事务内
+    return [(int(row[0]), int(row[1])) for row in raw.execute(sql, params).fetchall()]
+
+
+def load_coverage(
+    conn: Any,
+    table: str,
+    symbol: str,
+    interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+) -> List[CoveredRange]:
+    """读取与 [start_ns, end_ns] 相交的已覆盖区间
+
+    Args:
+        conn: SQLAlchemy Session/Connection、sqlite3/duckdb连接
+        table: K线表名
+        symbol: 货币对
+        interval: 时间周期
+        start_ns: 开始时间（纳秒），None 表示不限
+        end_ns: 结束时间（纳秒），None 表示不限
+
+    Returns:
+        List[CoveredRange]: 按开始时间升序的已覆盖区间
+    """
+    raw = _get_dbapi_connection(conn)
+    _ensure_table(raw)
+    sql = f"SELECT start_ts, end_ts FROM {COVERAGE_TABLE} WHERE {_KEY_FILTER}"
+    params: List[Any] = [table, symbol, interval]
+    if start_ns is not None:
+        sql += " AND end_ts >= ?"
+        params.append(int(start_ns))
+    if end_ns is not None:
+        sql += " AND start_ts <= ?"
+        params.append(int(end_ns))
+    return _fetch_ranges(raw, sql + " ORDER BY start_ts", params)
+
+
+def update_coverage(conn: Any, table: str, symbol: str, interval: str, timestamps: Iterable[int]) -> int:
+    """将写入的K线并入覆盖索引，不提交事务
+
+    只读取、改写与本批K线相交或相接的索引行；保留起点不变的行只更新终点，
+    不在同一事务中删除后再插入相同主键。
+
+    Args:
+        conn: SQLAlchemy Session/Connection、sqlite3/duckdb连接
+        table: K线表名
+        symbol: 货币对
+        interval: 时间周期，不等长周期（如1M）不建立索引
+        timestamps: 写入的K线开盘时间（纳秒）
+
+    Returns:
+        int: 并入后受影响的索引区间数
+    """
+    step_ns = interval_step_ns(interval)
+    ts = np.unique(np.fromiter(timestamps, dtype=np.int64))
+    if step_ns is None or len(ts) == 0:
+        return 0
+
+    raw = _get_dbapi_connection(conn)
+    _ensure_table(raw)
+    key = [table, symbol, interval]
+    existing = _fetch_ranges(
+        raw,
+        f"SELECT start_ts, end_ts FROM {COVERAGE_TABLE} "
+        f"WHERE {_KEY_FILTER} AND end_ts >= ? AND start_ts <= ? ORDER BY start_ts",
+        [*key, int(ts[0]) - step_ns, int(ts[-1]) + step_ns],
+    )
+    merged = merge_ranges(existing + runs_from_timestamps(ts, step_ns), step_ns)
+
+    existing_ends = dict(existing)
+    merged_starts = {start for start, _ in merged}
+    absorbed = [start for start in existing_ends if start not in merged_starts]
+    if absorbed:
+        raw.execute(
+            f"DELETE FROM {COVERAGE_TABLE} WHERE {_KEY_FILTER} "
+            f"AND start_ts IN ({', '.join('?' * len(absorbed))})",
+            [*key, *absorbed],
+        )
+    for start, end in merged:
+        if start not in existing_ends:
+            raw.execute(
+                f'INSERT INTO {COVERAGE_TABLE} (kline_table, symbol, "interval", start_ts, end_ts) '
+                f"VALUES (?, ?, ?, ?, ?)",
+                [*key, start, end],
+            )
+        elif existing_ends[start] != end:
+            raw.execute(
+                f"UPDATE {COVERAGE_TABLE} SET end_ts = ? WHERE {_KEY_FILTER} AND start_ts = ?",
+                [end, *key, start],
+            )
+    return len(merged)
+
+
+def drop_coverage(conn: Any, table: str, symbol: str, interval: Optional[str] = None) -> None:
+    """删除K线后丢弃对应的覆盖索引，不提交事务"""
+    raw = _get_dbapi_connection(conn)
+    _ensure_table(raw)
+    sql = f"DELETE FROM {COVERAGE_TABLE} WHERE kline_table = ? AND symbol = ?"
+    params: List[Any] = [table, symbol]
+    if interval is not None:
+        sql += ' AND "interval" = ?'
+        params.append(interval)
+    raw.execute(sql, params)
+
+
+def _read_timestamps(raw: Any, table: str, symbol: str, interval: str, start_ns: int, end_ns: int) -> np.ndarray:
+    """只读取时间戳列"""
+    result = raw.execute(
+        f'SELECT "timestamp" FROM {table} WHERE symbol = ? AND "interval" = ? '
+        f'AND "timestamp" >= ? AND "timestamp" <= ? ORDER BY "timestamp"',
+        [symbol, interval, int(start_ns), int(end_ns)],
+    )
+    if _is_duckdb(raw):
+        return np.ascontiguousarray(result.fetchnumpy()["timestamp"], dtype=np.int64)
+    return np.fromiter((row[0] for row in result), dtype=np.int64)
+
+
+def find_missing_ranges(
+    conn: Any,
+    table: str,
+    symbol: str,
+    interval: str,
+    start_ns: int,
+    end_ns: int,
+    step_ns: Optional[int] = None,
+) -> List[CoveredRange]:
+    """计算 [start_ns, end_ns] 内缺失的K线，不提交事务
+
+    先由覆盖索引得到候选缺口，再在K线表中只扫描候选缺口核实，
+    核实到的K线并入索引后重新计算缺口。
+
+    Args:
+        conn: SQLAlchemy Session/Connection、sqlite3/duckdb连接
+        table: K线表名
+        symbol: 货币对
+        interval: 时间周期
+        start_ns: 开始时间（纳秒，包含）
+        end_ns: 结束时间（纳秒，包含）
+        step_ns: 周期长度，默认由 interval 推算
+
+    Returns:
+        List[CoveredRange]: 缺失区间，端点为缺失的第一根和最后一根K线的开盘时间
+
+    Raises:
+        ValueError: 无法确定周期长度
+    """
+    step_ns = step_ns or interval_step_ns(interval)
+    if step_ns is None:
+        raise ValueError(f"不支持的K线周期: {interval}")
+    covered = load_coverage(conn, table, symbol, interval, start_ns, end_ns)
+    # 已有K线决定周期网格（如按本地时区开盘的股票日线），否则按UTC纪元对齐
+    offset_ns = covered[0][0] % step_ns if covered else _grid_offset(interval)
+    gaps = missing_ranges(covered, start_ns, end_ns, step_ns, offset_ns)
+    if not gaps:
+        return []
+
+    raw = _get_dbapi_connection(conn)
+    scans = gaps if len(gaps) <= MAX_GAP_QUERIES else [(gaps[0][0], gaps[-1][1])]
+    found = [_read_timestamps(raw, table, symbol, interval, lo, hi) for lo, hi in scans]
+    found_ts = np.concatenate(found)
+    if len(found_ts) == 0:
+        return gaps
+
+    logger.debug(f"覆盖索引补录: {table} {symbol} {interval}, {len(found_ts)} 根K线")
+    update_coverage(raw, table, symbol, interval, found_ts)
+    covered = merge_ranges(covered + runs_from_timestamps(np.unique(found_ts), step_ns), step_ns)
+    return missing_ranges(covered, start_ns, end_ns, step_ns, covered[0][0] % step_ns)
@@ -0,0 +1,392 @@
+"""K线数据湖
+
+按 exchange/market/symbol/interval/year=YYYY/month=MM 分区存储K线Parquet文件，
+每个数据集目录下的 _manifest.json 记录各文件的最小/最大时间戳和行数。
+
+读取时先用清单裁剪出与时间范围相交的文件，再用行组统计信息裁剪行组，
+以内存映射方式只读取命中的列块，读取量与请求的时间范围成正比。
+
+文件列：ts(int64纳秒), open/high/low/close/volume(float64)，按ts升序且唯一。
+"""
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.logger import get_logger, LogType
+from utils.timestamp_utils import array_to_nanoseconds
+
+from .kline_reader import KLINE_COLUMNS, KlineArrays
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 默认数据湖目录，可通过环境变量 KLINE_LAKE_DIR 覆盖
+DEFAULT_LAKE_DIR = Path.home() / ".quantcell" / "data" / "lake"
+
+MANIFEST_NAME = "_manifest.json"
+
+# 行组大小：1m K线约一个半月一个行组，范围读取时按行组裁剪
+ROW_GROUP_SIZE = 65_536
+
+LAKE_SCHEMA = pa.schema(
+    [("ts", pa.int64())] + [(name, pa.float64()) for name in KLINE_COLUMNS[1:]]
+)
+
+# 数据集目录 -> 写入锁；调用方通常每次新建 KlineLake 实例，锁放在模块级才能串行化同一数据集的写入
+_dataset_locks: Dict[str, threading.Lock] = {}
+_dataset_locks_guard = threading.Lock()
+
+# 市场类型别名 -> 分区目录名
+_MARKET_ALIASES = {
+    "spot": "spot",
+    "future": "futures",
+    "futures": "futures",
+    "perpetual": "futures",
+}
+
+
+@dataclass
+class LakeFile:
+    """数据湖清单中的一个分区文件"""
+    path: str
+    year: int
+    month: int
+    min_ts: int
+    max_ts: int
+    rows: int
+    size_bytes: int
+
+
+def normalize_market(market: str) -> str:
+    """将 spot/future/futures/perpetual 等写法统一为分区目录名"""
+    return _MARKET_ALIASES.get(market, market)
+
+
+def _dataset_lock(dataset_dir: Path) -> threading.Lock:
+    """获取数据集目录的写入锁，同一目录的不同 KlineLake 实例共享同一把锁"""
+    key = os.path.abspath(dataset_dir)
+    with _dataset_locks_guard:
+        lock = _dataset_locks.get(key)
+        if lock is None:
+            lock = _dataset_locks[key] = threading.Lock()
+        return lock
+
+
+def get_kline_lake_dir() -> Path:
+    """获取数据湖根目录"""
+    return Path(os.environ.get("KLINE_LAKE_DIR", str(DEFAULT_LAKE_DIR)))
+
+
+def get_kline_source() -> str:
+    """获取回测K线数据源配置，'db'（默认）或 'lake'，由环境变量 KLINE_SOURCE 指定"""
+    return os.environ.get("KLINE_SOURCE", "db").lower()
+
+
+def get_default_kline_lake() -> Optional["KlineLake"]:
+    """K线数据源配置为 lake 时返回数据湖实例，否则返回None"""
+    if get_kline_source() != "lake":
+        return None
+    return KlineLake(get_kline_lake_dir())
+
+
+def _dataframe_to_arrays(df: pd.DataFrame) -> KlineArrays:
+    """将含 timestamp/open/high/low/close/volume 列的DataFrame转换为K线数组
+
+    timestamp 可以是任意精度的整数时间戳或datetime列，也可以是DatetimeIndex。
+    列名大小写不敏感。
+    """
+    columns = {str(col).lower(): col for col in df.columns}
+    if "timestamp" in columns:
+        ts = df[columns["timestamp"]]
+    elif "open_time" in columns:
+        ts = df[columns["open_time"]]
+    elif isinstance(df.index, pd.DatetimeIndex):
+        ts = df.index.to_series()
+    else:
+        raise ValueError("DataFrame缺少timestamp列")
+
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        ts_ns = pd.DatetimeIndex(ts).as_unit("ns").asi8
+    else:
+        ts_ns = array_to_nanoseconds(pd.to_numeric(ts).to_numpy())
+
+    return KlineArrays(
+        ts=np.ascontiguousarray(ts_ns, dtype=np.int64),
+        **{
+            name: pd.to_numeric(df[columns[name]]).to_numpy(dtype=np.float64)
+            for name in KLINE_COLUMNS[1:]
+        }
+    )
+
+
+def _merge_arrays(existing: KlineArrays, new: KlineArrays) -> KlineArrays:
+    """合并两组K线，按时间升序，同一时间戳保留new中的值"""
+    merged = {
+        name: np.concatenate([getattr(existing, name), getattr(new, name)])
+        for name in KLINE_COLUMNS
+    }
+    order = np.argsort(merged["ts"], kind="stable")
+    ts = merged["ts"][order]
+    # 稳定排序后同一时间戳的最后一条来自new
+    keep = np.append(ts[1:] != ts[:-1], True) if len(ts) else np.empty(0, dtype=bool)
+    return KlineArrays(**{name: merged[name][order][keep] for name in KLINE_COLUMNS})
+
+
+def _slice_arrays(arrays: KlineArrays, start: int, stop: int) -> KlineArrays:
+    return KlineArrays(**{name: getattr(arrays, name)[start:stop] for name in KLINE_COLUMNS})
+
+
+def _table_to_arrays(table: pa.Table) -> KlineArrays:
+    return KlineArrays(**{
+        name: table.column(name).to_numpy()
+        for name in KLINE_COLUMNS
+    })
+
+
+class KlineLake:
+    """分区Parquet K线数据湖"""
+
+    def __init__(
+        self,
+        root: Union[str, Path, None] = None,
+        compression: str = "snappy",
+        row_group_size: int = ROW_GROUP_SIZE,
+    ):
+        """初始化数据湖
+
+        Args:
+            root: 数据湖根目录，默认 get_kline_lake_dir()
+            compression: Parquet压缩算法
+            row_group_size: 每个行组的最大行数
+        """
+        self.root = Path(root) if root is not None else get_kline_lake_dir()
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def dataset_dir(self, exchange: str, market: str, symbol: str, interval: str) -> Path:
+        """获取数据集目录 {root}/{exchange}/{market}/{symbol}/{interval}"""
+        return self.root / exchange / normalize_market(market) / symbol.replace("/", "") / interval
+
+    # ---------------------------------------------------------------- 清单
+
+    def manifest(self, exchange: str, market: str, symbol: str, interval: str) -> List[LakeFile]:
+        """读取数据集清单，按时间升序"""
+        return self._load_manifest(self.dataset_dir(exchange, market, symbol, interval))
+
+    def coverage(self, exchange: str, market: str, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """获取数据集覆盖的时间范围 (min_ts, max_ts)，无数据时返回None"""
+        files = self.manifest(exchange, market, symbol, interval)
+        if not files:
+            return None
+        return files[0].min_ts, files[-1].max_ts
+
+    def _load_manifest(self, dataset_dir: Path) -> List[LakeFile]:
+        manifest_path = dataset_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return []
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("files", [])
+        return sorted((LakeFile(**entry) for entry in entries), key=lambda e: e.min_ts)
+
+    def _save_manifest(self, dataset_dir: Path, files: List[LakeFile]) -> None:
+        manifest_path = dataset_dir / MANIFEST_NAME
+        temp_path = manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"schema": LAKE_SCHEMA.names, "files": [asdict(e) for e in sorted(files, key=lambda e: e.min_ts)]},
+                f,
+                indent=2,
+            )
+        os.replace(temp_path, manifest_path)
+
+    # ---------------------------------------------------------------- 写入
+
+    def write(
+        self,
+        data: Union[KlineArrays, pd.DataFrame],
+        exchange: str,
+        market: str,
+        symbol: str,
+        interval: str,
+    ) -> int:
+        """写入K线，按年月分区与已有文件合并去重
+
+        Args:
+            data: K线数组，或含timestamp与OHLCV列的DataFrame
+            exchange: 交易所，如 binance
+            market: 市场类型，如 spot/futures
+            symbol: 货币对
+            interval: 时间周期
+
+        Returns:
+            int: 写入的K线条数
+        """
+        arrays = _dataframe_to_arrays(data) if isinstance(data, pd.DataFrame) else data
+        if len(arrays) == 0:
+            return 0
+        # 先排序去重，保证分区切分时同一月份的数据连续
+        arrays = _merge_arrays(KlineArrays.empty(), arrays)
+
+        dataset_dir = self.dataset_dir(exchange, market, symbol, interval)
+        months = arrays.ts.astype("datetime64[ns]").astype("datetime64[M]")
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(arrays)]])
+
+        with _dataset_lock(dataset_dir):
+            dataset_dir.mkdir(parents=True, exist_ok=True)
+            files: Dict[str, LakeFile] = {e.path: e for e in self._load_manifest(dataset_dir)}
+
+            for start, stop in zip(starts, stops):
+                month = months[start].astype(object)
+                entry = self._write_partition(
+                    dataset_dir, month.year, month.month, _slice_arrays(arrays, start, stop)
+                )
+                files[entry.path] = entry
+
+            self._save_manifest(dataset_dir, list(files.values()))
+
+        from .kline_cache import invalidate_kline_cache
+        invalidate_kline_cache(market, symbol, interval, int(arrays.ts[0]), int(arrays.ts[-1]), exchange=exchange)
+
+        logger.info(
+            f"写入数据湖: {exchange}/{normalize_market(market)}/{symbol}/{interval}, "
+            f"{len(arrays)} 条, {len(starts)} 个分区"
+        )
+        return len(arrays)
+
+    def _write_partition(self, dataset_dir: Path, year: int, month: int, arrays: KlineArrays) -> LakeFile:
+        rel_path = f"year={year:04d}/month={month:02d}/part.parquet"
+        file_path = dataset_dir / rel_path
+        if file_path.exists():
+            arrays = _merge_arrays(self._read_file(file_path), arrays)
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_arrays(
+            [pa.array(getattr(arrays, name)) for name in KLINE_COLUMNS], schema=LAKE_SCHEMA
+        )
+        # 写入临时文件再原子性替换，防止写入中断导致文件损坏
+        temp_path = file_path.with_suffix(".tmp")
+        pq.write_table(
+            table,
+            temp_path,
+            compression=self.compression,
+            row_group_size=self.row_group_size,
+            write_statistics=True,
+        )
+        os.replace(temp_path, file_path)
+
+        return LakeFile(
+            path=rel_path,
+            year=year,
+            month=month,
+            min_ts=int(arrays.ts[0]),
+            max_ts=int(arrays.ts[-1]),
+            rows=len(arrays),
+            size_bytes=file_path.stat().st_size,
+        )
+
+    # ---------------------------------------------------------------- 读取
+
+    def files(
+        self,
+        exchange: str,
+        market: str,
+        symbol: str,
+        interval: str,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> List[LakeFile]:
+        """根据清单筛选与时间范围相交的文件"""
+        return [
+            entry for entry in self.manifest(exchange, market, symbol, interval)
+            if (end_ns is None or entry.min_ts <= end_ns)
+            and (start_ns is None or entry.max_ts >= start_ns)
+        ]
+
+    def read(
+        self,
+        exchange: str,
+        market: str,
+        symbol: str,
+        interval: str,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> KlineArrays:
+        """读取时间范围内的K线（闭区间）
+
+        Args:
+            exchange: 交易所
+            market: 市场类型
+            symbol: 货币对
+            interval: 时间周期
+            start_ns: 开始时间（纳秒，包含）
+            end_ns: 结束时间（纳秒，包含）
+
+        Returns:
+            KlineArrays: 按时间升序排列的K线列式数据
+        """
+        dataset_dir = self.dataset_dir(exchange, market, symbol, interval)
+        parts = [
+            self._read_file(dataset_dir / entry.path, start_ns, end_ns)
+            for entry in self.files(exchange, market, symbol, interval, start_ns, end_ns)
+        ]
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return KlineArrays.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return KlineArrays(**{
+            name: np.concatenate([getattr(part, name) for part in parts])
+            for name in KLINE_COLUMNS
+        })
+
+    def read_dataframe(
+        self,
+        exchange: str,
+        market: str,
+        symbol: str,
+        interval: str,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """读取时间范围内的K线为以时间为索引的DataFrame（Open/High/Low/Close/Volume列）"""
+        return self.read(exchange, market, symbol, interval, start_ns, end_ns).to_dataframe()
+
+    def _read_file(
+        self,
+        file_path: Path,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> KlineArrays:
+        """以内存映射方式读取文件中与时间范围相交的行组"""
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        metadata = parquet_file.metadata
+        ts_index = parquet_file.schema_arrow.get_field_index("ts")
+
+        row_groups = []
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(ts_index).statistics
+            if stats is not None and stats.has_min_max:
+                if (end_ns is not None and stats.min > end_ns) or (start_ns is not None and stats.max < start_ns):
+                    continue
+            row_groups.append(i)
+        if not row_groups:
+            return KlineArrays.empty()
+
+        arrays = _table_to_arrays(
+            parquet_file.read_row_groups(row_groups, columns=list(KLINE_COLUMNS))
+        )
+        # 行组内按时间升序，二分定位精确边界
+        lo = 0 if start_ns is None else int(np.searchsorted(arrays.ts, start_ns, side="left"))
+        hi = len(arrays) if end_ns is None else int(np.searchsorted(arrays.ts, end_ns, side="right"))
+        return _slice_arrays(arrays, lo, hi)
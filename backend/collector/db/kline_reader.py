@@ -0,0 +1,232 @@
+"""K线列式读取层
+
+绕过ORM直接在DBAPI游标上执行SQL，将K线数据读取为结构化数组（struct-of-arrays），
+不为每根K线创建ORM对象或字典：
+    - DuckDB: 使用 fetchnumpy() 直接得到列数组
+    - SQLite: 使用 np.fromiter 将游标流式写入预定义dtype的结构化数组
+
+时间戳统一为 int64 纳秒，OHLCV统一为 float64。
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 市场类型 -> K线表名
+KLINE_TABLES = {
+    ("crypto", "spot"): "crypto_spot_klines",
+    ("crypto", "future"): "crypto_future_klines",
+    ("crypto", "futures"): "crypto_future_klines",
+    ("crypto", "perpetual"): "crypto_future_klines",
+    ("stock", None): "stock_klines",
+}
+
+KLINE_COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+
+# SQLite游标行的结构化dtype，与SELECT列顺序一致
+_ROW_DTYPE = np.dtype([
+    ("ts", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+])
+
+
+@dataclass(frozen=True)
+class KlineArrays:
+    """K线列式数据
+
+    Attributes:
+        ts: 纳秒级时间戳，int64，升序
+        open/high/low/close/volume: float64价格与成交量
+    """
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def empty(cls) -> "KlineArrays":
+        """创建空的K线数组"""
+        return cls(
+            ts=np.empty(0, dtype=np.int64),
+            **{name: np.empty(0, dtype=np.float64) for name in KLINE_COLUMNS[1:]}
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """所有列占用的字节数"""
+        return sum(getattr(self, name).nbytes for name in KLINE_COLUMNS)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """转换为以时间为索引的DataFrame（Open/High/Low/Close/Volume列）"""
+        return pd.DataFrame(
+            {
+                "Open": self.open,
+                "High": self.high,
+                "Low": self.low,
+                "Close": self.close,
+                "Volume": self.volume,
+            },
+            index=pd.DatetimeIndex(pd.to_datetime(self.ts, unit="ns"), name="timestamp"),
+            copy=False,
+        )
+
+    def to_records(self, ts_unit: str = "ms") -> List[Dict[str, Any]]:
+        """转换为字典列表，用于需要JSON输出的接口
+
+        Args:
+            ts_unit: timestamp字段的输出精度，'ms' 或 'ns'
+
+        Returns:
+            List[Dict[str, Any]]: 每根K线一个字典
+        """
+        divisor = 1_000_000 if ts_unit == "ms" else 1
+        ts_out = (self.ts // divisor).tolist()
+        return [
+            {
+                "timestamp": t,
+                "open": o,
+                "close": c,
+                "high": h,
+                "low": lo,
+                "volume": v,
+                "turnover": 0.0,
+            }
+            for t, o, h, lo, c, v in zip(
+                ts_out,
+                self.open.tolist(),
+                self.high.tolist(),
+                self.low.tolist(),
+                self.close.tolist(),
+                self.volume.tolist(),
+            )
+        ]
+
+
+def get_kline_table(market_type: str = "crypto", crypto_type: Optional[str] = "spot") -> str:
+    """根据市场类型获取K线表名
+
+    Raises:
+        ValueError: 不支持的市场类型
+    """
+    key = (market_type, crypto_type if market_type == "crypto" else None)
+    if key not in KLINE_TABLES:
+        raise ValueError(f"不支持的市场类型: market_type={market_type}, crypto_type={crypto_type}")
+    return KLINE_TABLES[key]
+
+
+def _get_dbapi_connection(conn: Any) -> Any:
+    """从Session/Connection/DBAPI连接中取出底层驱动连接"""
+    if conn is None:
+        from collector.db.connection import get_db_connection
+        return get_db_connection()
+    # SQLAlchemy Session
+    if hasattr(conn, "connection") and hasattr(conn, "query"):
+        conn = conn.connection()
+    # SQLAlchemy Connection
+    if hasattr(conn, "connection") and hasattr(conn.connection, "driver_connection"):
+        return conn.connection.driver_connection
+    return conn
+
+
+def _is_duckdb(raw: Any) -> bool:
+    return type(raw).__module__.lstrip("_").startswith("duckdb")
+
+
+def read_kline_arrays(
+    conn: Any,
+    symbol: Union[str, Sequence[str]],
+    interval: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    market_type: str = "crypto",
+    crypto_type: Optional[str] = "spot",
+    limit: Optional[int] = None,
+    latest: bool = False,
+    table: Optional[str] = None,
+) -> KlineArrays:
+    """批量读取K线数据为列式数组
+
+    Args:
+        conn: SQLAlchemy Session/Connection、sqlite3/duckdb连接，为None时使用全局连接
+        symbol: 货币对，或多个等价写法（如 ["BTCUSDT", "BTC/USDT"]）
+        interval: 时间周期
+        start_ns: 开始时间（纳秒，包含）
+        end_ns: 结束时间（纳秒，包含）
+        market_type: 市场类型
+        crypto_type: 加密货币类型
+        limit: 最大返回条数
+        latest: 为True时与limit配合返回最新的limit条
+        table: 直接指定K线表名（如 model.__tablename__），优先于market_type/crypto_type
+
+    Returns:
+        KlineArrays: 按时间升序排列的K线列式数据
+    """
+    if table is None:
+        table = get_kline_table(market_type, crypto_type)
+    elif table not in KLINE_TABLES.values():
+        raise ValueError(f"不支持的K线表: {table}")
+    symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+
+    conditions = [f"symbol IN ({', '.join('?' * len(symbols))})", '"interval" = ?']
+    params: List[Any] = [*symbols, interval]
+    if start_ns is not None:
+        conditions.append('"timestamp" >= ?')
+        params.append(int(start_ns))
+    if end_ns is not None:
+        conditions.append('"timestamp" <= ?')
+        params.append(int(end_ns))
+
+    sql = (
+        f'SELECT "timestamp", open, high, low, close, volume FROM {table} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'ORDER BY "timestamp" {"DESC" if latest else "ASC"}'
+    )
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    if latest:
+        sql = f'SELECT * FROM ({sql}) AS recent ORDER BY "timestamp" ASC'
+
+    raw = _get_dbapi_connection(conn)
+
+    if _is_duckdb(raw):
+        columns = raw.execute(sql, params).fetchnumpy()
+        values = list(columns.values())
+        if len(values[0]) == 0:
+            return KlineArrays.empty()
+        return KlineArrays(
+            ts=np.ascontiguousarray(values[0], dtype=np.int64),
+            **{
+                name: np.ascontiguousarray(col, dtype=np.float64)
+                for name, col in zip(KLINE_COLUMNS[1:], values[1:])
+            }
+        )
+
+    cursor = raw.cursor()
+    try:
+        # 关闭行工厂（如sqlite3.Row），直接以元组流式写入结构化数组
+        if hasattr(cursor, "row_factory"):
+            cursor.row_factory = None
+        cursor.execute(sql, params)
+        rows = np.fromiter(cursor, dtype=_ROW_DTYPE)
+    finally:
+        cursor.close()
+
+    if len(rows) == 0:
+        return KlineArrays.empty()
+    return KlineArrays(**{name: np.ascontiguousarray(rows[name]) for name in KLINE_COLUMNS})
@@ -0,0 +1,98 @@
+"""K线周期重采样
+
+由细周期K线在内存中向量化聚合出粗周期K线（np.maximum/minimum/add.reduceat），
+多周期回测只需从数据库或数据湖加载最细的一个周期。
+
+周期边界与币安一致：分钟线到3日线按UTC纪元对齐，周线从星期一开始，月线(1M)按自然月。
+"""
+
+import re
+
+import numpy as np
+
+from .kline_reader import KlineArrays
+
+MINUTE_NS = 60 * 1_000_000_000
+DAY_NS = 1440 * MINUTE_NS
+# 1970-01-01 是星期四，周线从其后第4天（星期一）开始对齐
+WEEK_OFFSET_NS = 4 * DAY_NS
+
+_UNIT_NS = {"m": MINUTE_NS, "h": 60 * MINUTE_NS, "d": DAY_NS, "w": 7 * DAY_NS}
+_INTERVAL_RE = re.compile(r"^(\d+)([mhdwM])$")
+
+
+def interval_span_ns(interval: str) -> int:
+    """周期长度（纳秒），月线按31天计，仅用于比较周期粗细
+
+    Raises:
+        ValueError: 无法识别的周期
+    """
+    match = _INTERVAL_RE.match(interval)
+    if match is None:
+        raise ValueError(f"不支持的K线周期: {interval}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "M":
+        return count * 31 * DAY_NS
+    return count * _UNIT_NS[unit]
+
+
+def can_resample(base_interval: str, interval: str) -> bool:
+    """interval 的每根K线是否恰好由若干根完整的 base_interval K线组成"""
+    try:
+        base_ns = interval_span_ns(base_interval)
+        target_ns = interval_span_ns(interval)
+    except ValueError:
+        return False
+    if target_ns <= base_ns or base_interval.endswith("M"):
+        return False
+    if interval == "1M":
+        return DAY_NS % base_ns == 0
+    if interval.endswith("M"):
+        return False
+    if interval.endswith("w") and WEEK_OFFSET_NS % base_ns != 0:
+        return False
+    return target_ns % base_ns == 0
+
+
+def bucket_starts(ts: np.ndarray, interval: str) -> np.ndarray:
+    """计算每个时间戳（纳秒）所在 interval 周期K线的开盘时间"""
+    if interval == "1M":
+        return ts.astype("datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]").astype(np.int64)
+    span = interval_span_ns(interval)
+    offset = WEEK_OFFSET_NS if interval.endswith("w") else 0
+    return (ts - offset) // span * span + offset
+
+
+def bucket_bounds(ts_ns: int, interval: str) -> tuple:
+    """时间戳所在K线的 (开盘时间, 下一根K线开盘时间)，纳秒"""
+    start = int(bucket_starts(np.array([ts_ns], dtype=np.int64), interval)[0])
+    if interval == "1M":
+        month = np.datetime64(start, "ns").astype("datetime64[M]") + 1
+        return start, int(month.astype("datetime64[ns]").astype(np.int64))
+    return start, start + interval_span_ns(interval)
+
+
+def resample_kline_arrays(arrays: KlineArrays, interval: str) -> KlineArrays:
+    """将升序的细周期K线聚合为 interval 周期
+
+    Args:
+        arrays: 细周期K线，时间戳升序
+        interval: 目标周期
+
+    Returns:
+        KlineArrays: 聚合后的K线，时间戳为各周期的开盘时间
+    """
+    if len(arrays) == 0:
+        return KlineArrays.empty()
+    buckets = bucket_starts(arrays.ts, interval)
+    # 每个周期第一根和最后一根细周期K线的位置
+    first = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    last = np.append(first[1:], len(buckets)) - 1
+    return KlineArrays(
+        ts=buckets[first],
+        open=arrays.open[first],
+        high=np.maximum.reduceat(arrays.high, first),
+        low=np.minimum.reduceat(arrays.low, first),
+        close=arrays.close[last],
+        volume=np.add.reduceat(arrays.volume, first),
+    )
@@ -0,0 +1,332 @@
+"""K线批量写入层
+
+将一批K线在内存中按 (symbol, interval, timestamp) 去重后，以单条
+INSERT ... ON CONFLICT DO UPDATE 写入数据库，替代逐条查询再插入/更新：
+    - SQLite: executemany 执行UPSERT，整批共享一个事务
+    - DuckDB: 将整批数据注册为DataFrame，以 INSERT ... SELECT 一次写入
+
+KlineBulkWriter 在此基础上提供缓冲：按条数或时间间隔合并写入，
+用于实时K线持久化等逐条到达的场景。
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.logger import get_logger, LogType
+
+from .kline_cache import TABLE_MARKETS, invalidate_kline_cache
+from .kline_coverage import update_coverage
+from .kline_reader import KLINE_TABLES, _get_dbapi_connection, _is_duckdb
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 一根K线的写入行：(symbol, interval, timestamp_ns, open, high, low, close, volume)
+KlineRow = Tuple[str, str, int, float, float, float, float, float]
+
+_UPDATE_COLUMNS = ("open", "high", "low", "close", "volume", "data_source")
+
+# Session.info 中记录待提交后失效的缓存范围：(table, symbol, interval) -> (start_ns, end_ns)
+_PENDING_INVALIDATIONS = "kline_cache_pending_invalidations"
+
+_SQLITE_UPSERT_SQL = """
+    INSERT INTO {table} (
+        symbol, "interval", "timestamp", open, high, low, close, volume,
+        unique_kline, data_source
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (symbol, "interval", "timestamp") DO UPDATE SET
+        {updates}, updated_at = CURRENT_TIMESTAMP
+"""
+
+# DuckDB中id列没有自增默认值，按当前最大id顺延分配
+_DUCKDB_UPSERT_SQL = """
+    INSERT INTO {table} (
+        id, symbol, "interval", "timestamp", open, high, low, close, volume,
+        unique_kline, data_source
+    )
+    SELECT
+        (SELECT COALESCE(MAX(id), 0) FROM {table}) + ROW_NUMBER() OVER (),
+        symbol, "interval", "timestamp", open, high, low, close, volume,
+        symbol || '_' || "interval" || '_' || CAST("timestamp" AS VARCHAR),
+        ?
+    FROM {batch}
+    ON CONFLICT (symbol, "interval", "timestamp") DO UPDATE SET
+        {updates}, updated_at = now()
+"""
+
+
+def dedupe_kline_rows(rows: Iterable[Sequence[Any]]) -> List[KlineRow]:
+    """按 (symbol, interval, timestamp) 去重，同一根K线保留最后一条
+
+    Args:
+        rows: K线写入行
+
+    Returns:
+        List[KlineRow]: 去重并规范类型后的写入行，按时间升序
+    """
+    latest: Dict[Tuple[str, str, int], KlineRow] = {}
+    for symbol, interval, ts, o, h, lo, c, v in rows:
+        key = (symbol, interval, int(ts))
+        latest[key] = (*key, float(o), float(h), float(lo), float(c), float(v))
+    return sorted(latest.values(), key=lambda row: row[2])
+
+
+def upsert_klines(
+    conn: Any,
+    table: str,
+    rows: Iterable[Sequence[Any]],
+    data_source: str = "unknown",
+) -> int:
+    """批量写入K线，已存在的K线更新OHLCV
+
+    不提交事务，由调用方在同一会话/连接上提交。传入Session时进程级K线缓存在提交后失效，
+    回滚则不失效；其他连接没有提交事件，写入后立即失效。
+
+    Args:
+        conn: SQLAlchemy Session/Connection、sqlite3/duckdb连接
+        table: K线表名
+        rows: K线写入行 (symbol, interval, timestamp_ns, open, high, low, close, volume)
+        data_source: 数据来源
+
+    Returns:
+        int: 去重后写入的K线条数
+
+    Raises:
+        ValueError: 不支持的K线表
+    """
+    if table not in KLINE_TABLES.values():
+        raise ValueError(f"不支持的K线表: {table}")
+
+    batch = dedupe_kline_rows(rows)
+    if not batch:
+        return 0
+
+    raw = _get_dbapi_connection(conn)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in _UPDATE_COLUMNS)
+
+    if _is_duckdb(raw):
+        symbols, intervals, timestamps, opens, highs, lows, closes, volumes = zip(*batch)
+        frame = pd.DataFrame({
+            "symbol": symbols,
+            "interval": intervals,
+            "timestamp": np.fromiter(timestamps, dtype=np.int64, count=len(batch)),
+            "open": np.fromiter(opens, dtype=np.float64, count=len(batch)),
+            "high": np.fromiter(highs, dtype=np.float64, count=len(batch)),
+            "low": np.fromiter(lows, dtype=np.float64, count=len(batch)),
+            "close": np.fromiter(closes, dtype=np.float64, count=len(batch)),
+            "volume": np.fromiter(volumes, dtype=np.float64, count=len(batch)),
+        })
+        batch_name = f"kline_batch_{threading.get_ident()}"
+        raw.register(batch_name, frame)
+        try:
+            raw.execute(
+                _DUCKDB_UPSERT_SQL.format(table=table, batch=batch_name, updates=updates),
+                [data_source],
+            )
+        finally:
+            raw.unregister(batch_name)
+    else:
+        cursor = raw.cursor()
+        try:
+            cursor.executemany(
+                _SQLITE_UPSERT_SQL.format(table=table, updates=updates),
+                [(*row, f"{row[0]}_{row[1]}_{row[2]}", data_source) for row in batch],
+            )
+        finally:
+            cursor.close()
+
+    _update_indexes(conn, table, batch)
+    logger.debug(f"批量写入K线: table={table}, rows={len(batch)}, data_source={data_source}")
+    return len(batch)
+
+
+def _update_indexes(conn: Any, table: str, batch: List[KlineRow]) -> None:
+    """按 (symbol, interval) 将写入的K线并入覆盖索引，并使进程级K线缓存中相交的段失效"""
+    timestamps: Dict[Tuple[str, str], List[int]] = {}
+    for symbol, interval, ts, *_ in batch:
+        timestamps.setdefault((symbol, interval), []).append(ts)
+    for (symbol, interval), key_ts in timestamps.items():
+        update_coverage(conn, table, symbol, interval, key_ts)
+        # batch 按时间升序
+        _invalidate_on_commit(conn, table, symbol, interval, key_ts[0], key_ts[-1])
+
+
+def _invalidate_on_commit(
+    conn: Any, table: str, symbol: str, interval: str, start_ns: int, end_ns: int
+) -> None:
+    """提交后使缓存失效
+
+    提交前失效时，并发读取仍会读到旧数据并重新放入缓存，因此Session上的写入
+    记录到 Session.info，在 after_commit 事件中统一失效。
+    """
+    if not isinstance(conn, Session):
+        invalidate_kline_cache(TABLE_MARKETS[table], symbol, interval, start_ns, end_ns)
+        return
+
+    pending = conn.info.get(_PENDING_INVALIDATIONS)
+    if pending is None:
+        pending = conn.info[_PENDING_INVALIDATIONS] = {}
+        event.listen(conn, "after_commit", _flush_pending_invalidations)
+        event.listen(conn, "after_rollback", _discard_pending_invalidations)
+    key = (table, symbol, interval)
+    if key in pending:
+        start_ns, end_ns = min(start_ns, pending[key][0]), max(end_ns, pending[key][1])
+    pending[key] = (start_ns, end_ns)
+
+
+def _flush_pending_invalidations(session: Session) -> None:
+    pending = session.info.get(_PENDING_INVALIDATIONS)
+    while pending:
+        (table, symbol, interval), (start_ns, end_ns) = pending.popitem()
+        invalidate_kline_cache(TABLE_MARKETS[table], symbol, interval, start_ns, end_ns)
+
+
+def _discard_pending_invalidations(session: Session) -> None:
+    pending = session.info.get(_PENDING_INVALIDATIONS)
+    if pending:
+        pending.clear()
+
+
+def _resolve(futures: List[Future], written: bool) -> None:
+    for future in futures:
+        if not future.done():
+            future.set_result(written)
+
+
+class KlineBulkWriter:
+    """带缓冲的K线批量写入器
+
+    K线逐条加入缓冲区，缓冲达到 batch_size 条时在调用线程中整批写入；
+    后台线程每隔 flush_interval 秒写出缓冲区中残留的数据。
+    add() 返回的 Future 在所在批次提交后得到写入结果；关闭后加入的K线在调用线程中立即写入。
+    """
+
+    def __init__(
+        self,
+        table: str,
+        data_source: str = "unknown",
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        session_factory: Optional[Any] = None,
+    ):
+        """初始化批量写入器
+
+        Args:
+            table: K线表名
+            data_source: 数据来源
+            batch_size: 触发写入的缓冲条数
+            flush_interval: 最长缓冲时间（秒）
+            session_factory: 会话工厂，默认使用 SessionLocal
+        """
+        if table not in KLINE_TABLES.values():
+            raise ValueError(f"不支持的K线表: {table}")
+        self.table = table
+        self.data_source = data_source
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._buffer: List[KlineRow] = []
+        # 与缓冲区一一对应，批次提交成功后置为True，关闭时仍未写入的置为False
+        self._futures: List[Future] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def add(self, row: Sequence[Any]) -> Future:
+        """加入一根K线，必要时触发写入
+
+        Returns:
+            Future: 结果为是否已写入数据库
+        """
+        future: Future = Future()
+        with self._lock:
+            self._buffer.append(tuple(row))
+            self._futures.append(future)
+            closed = self._closed
+            due = closed or len(self._buffer) >= self.batch_size
+        if not closed:
+            self._ensure_flush_thread()
+        if due:
+            self.flush()
+        return future
+
+    def flush(self) -> int:
+        """写出缓冲区中的全部K线
+
+        Returns:
+            int: 写入的K线条数，失败时数据放回缓冲区（已关闭时丢弃）并返回0
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                futures, self._futures = self._futures, []
+            if not batch:
+                return 0
+
+            session_factory = self._session_factory
+            if session_factory is None:
+                from collector.db.database import SessionLocal
+                session_factory = SessionLocal
+
+            db = session_factory()
+            try:
+                written = upsert_klines(db, self.table, batch, self.data_source)
+                db.commit()
+                logger.info(f"[KlineBulkWriter] 写入K线 {written} 条: table={self.table}")
+                _resolve(futures, True)
+                return written
+            except Exception as e:
+                db.rollback()
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._buffer[:0] = batch
+                        self._futures[:0] = futures
+                if closed:
+                    # 关闭后不再有后台重试，失败的K线直接丢弃
+                    logger.error(f"[KlineBulkWriter] 批量写入K线失败，丢弃 {len(batch)} 条: {e}")
+                    _resolve(futures, False)
+                else:
+                    logger.error(f"[KlineBulkWriter] 批量写入K线失败: {e}")
+                return 0
+            finally:
+                db.close()
+
+    def close(self) -> None:
+        """停止后台线程并写出剩余数据，之后加入的K线在调用线程中立即写入"""
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=self.flush_interval * 2)
+            self._flush_thread = None
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def pending(self) -> int:
+        """缓冲区中待写入的K线条数"""
+        with self._lock:
+            return len(self._buffer)
+
+    def _ensure_flush_thread(self) -> None:
+        if self._flush_thread is not None or self._stop_event.is_set():
+            return
+        with self._lock:
+            if self._flush_thread is None:
+                self._flush_thread = threading.Thread(
+                    target=self._flush_loop, name="kline-bulk-writer", daemon=True
+                )
+                self._flush_thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            if self.pending():
+                self.flush()
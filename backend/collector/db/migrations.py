@@ -5,6 +5,7 @@
 用于管理和更新数据库表结构，确保表结构与模型定义保持一致
 """
 
+import sqlalchemy
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from utils.logger import get_logger, LogType
@@ -482,10 +483,115 @@ def update_kline_tables(session: Session, db_type: str) -> None:
             logger.info("stock_klines表不存在，跳过")
     except Exception as e:
         logger.error(f"更新stock_klines表失败: {e}")
-    
+
     logger.info("K线表结构更新完成")
 
 
+# 按数值大小推断精度并统一为纳秒级，与 utils.timestamp_utils.detect_precision 保持一致
+TIMESTAMP_NS_EXPR = """
+    CASE
+        WHEN CAST("timestamp" AS BIGINT) > 1000000000000000000 THEN CAST("timestamp" AS BIGINT)
+        WHEN CAST("timestamp" AS BIGINT) > 1000000000000000 THEN CAST("timestamp" AS BIGINT) * 1000
+        WHEN CAST("timestamp" AS BIGINT) > 1000000000000 THEN CAST("timestamp" AS BIGINT) * 1000000
+        ELSE CAST("timestamp" AS BIGINT) * 1000000000
+    END
+"""
+
+
+def typed_kline_backfill_sql(source: str, target: str) -> str:
+    """生成将String列K线表回填到数值类型列新表的SQL
+
+    统一纳秒时间戳、转换价格类型、重建unique_kline，并按(symbol, interval, timestamp)
+    去重（保留id最大的记录）。启动迁移与alembic版本15共用此SQL。
+
+    Args:
+        source: 旧表名
+        target: 已创建的数值类型新表名
+
+    Returns:
+        str: INSERT ... SELECT 语句
+    """
+    return f"""
+        INSERT INTO {target} (
+            id, symbol, "interval", "timestamp", open, high, low, close, volume,
+            unique_kline, data_source, created_at, updated_at
+        )
+        SELECT
+            id, symbol, "interval", ts_ns,
+            CAST(open AS DOUBLE), CAST(high AS DOUBLE), CAST(low AS DOUBLE),
+            CAST(close AS DOUBLE), CAST(volume AS DOUBLE),
+            symbol || '_' || "interval" || '_' || CAST(ts_ns AS VARCHAR),
+            data_source, created_at, updated_at
+        FROM (
+            SELECT src.*,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY symbol, "interval", ts_ns ORDER BY id DESC
+                   ) AS rn
+            FROM (
+                SELECT *, {TIMESTAMP_NS_EXPR} AS ts_ns
+                FROM {source}
+                WHERE "timestamp" IS NOT NULL
+            ) src
+        ) dedup
+        WHERE rn = 1
+    """
+
+
+def update_kline_column_types(session: Session, db_type: str) -> None:
+    """将K线表的String列迁移为数值类型列
+
+    timestamp迁移为BIGINT纳秒时间戳，OHLCV迁移为DOUBLE，并创建
+    (symbol, interval, timestamp)联合唯一索引。SQLite不支持修改列类型，
+    因此统一采用重建表的方式，回填时按联合键去重（保留id最大的记录）。
+
+    Args:
+        session: SQLAlchemy会话对象
+        db_type: 数据库类型（sqlite或duckdb）
+    """
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from collector.db.models import CryptoSpotKline, CryptoFutureKline, StockKline
+
+    logger.info("开始检查K线表列类型...")
+
+    for model in (CryptoSpotKline, CryptoFutureKline, StockKline):
+        table = model.__tablename__
+        try:
+            if db_type == "duckdb":
+                column_type = session.execute(
+                    text(f"SELECT data_type FROM information_schema.columns WHERE table_name='{table}' AND column_name='timestamp'")
+                ).scalar()
+            else:
+                column_type = session.execute(
+                    text(f"SELECT type FROM pragma_table_info('{table}') WHERE name='timestamp'")
+                ).scalar()
+
+            if column_type is None:
+                logger.info(f"{table}表不存在，跳过")
+                continue
+            if 'CHAR' not in column_type.upper() and 'TEXT' not in column_type.upper():
+                logger.info(f"{table}表已是数值类型，跳过")
+                continue
+
+            logger.info(f"{table}表timestamp列类型为{column_type}，开始迁移为数值类型...")
+            new_table = model.__table__.to_metadata(sqlalchemy.MetaData(), name=f"{table}_typed")
+
+            session.execute(text(f"DROP TABLE IF EXISTS {table}_typed"))
+            session.execute(CreateTable(new_table))
+            session.execute(text(typed_kline_backfill_sql(table, f"{table}_typed")))
+            session.execute(text(f"DROP TABLE {table}"))
+            session.execute(text(f"ALTER TABLE {table}_typed RENAME TO {table}"))
+
+            # 重命名后再创建索引，避免与旧表索引重名
+            for index in model.__table__.indexes:
+                session.execute(CreateIndex(index))
+
+            count = session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            logger.info(f"{table}表迁移完成，共 {count} 条记录")
+        except Exception as e:
+            logger.error(f"迁移{table}表列类型失败: {e}")
+            raise
+
+
 def create_users_table(session: Session, db_type: str) -> None:
     """创建users表（如果不存在）
 
@@ -712,6 +818,9 @@ def run_migrations() -> None:
             
             # 更新K线表结构，添加data_source列
             update_kline_tables(session, db_type)
+
+            # 迁移K线表为数值类型列
+            update_kline_column_types(session, db_type)
             
             # 提交所有更改
             session.commit()
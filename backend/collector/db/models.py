@@ -6,7 +6,7 @@ from utils.logger import get_logger, LogType
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
-from sqlalchemy import Boolean, Column, DateTime, Integer, Identity, String, Text, func, text, ForeignKey
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Double, Integer, Identity, String, Text, func, text, ForeignKey
 from sqlalchemy.orm import Session, relationship, foreign
 
 from .database import Base
@@ -257,17 +257,22 @@ class CryptoSpotKline(TimezoneAwareBase):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     symbol = Column(String, nullable=False, index=True)
     interval = Column(String, nullable=False, index=True)
-    timestamp = Column(String, nullable=False, index=True)
-    open = Column(String, nullable=False)
-    high = Column(String, nullable=False)
-    low = Column(String, nullable=False)
-    close = Column(String, nullable=False)
-    volume = Column(String, nullable=False)
+    timestamp = Column(BigInteger, nullable=False, index=True)  # 纳秒级时间戳
+    open = Column(Double, nullable=False)
+    high = Column(Double, nullable=False)
+    low = Column(Double, nullable=False)
+    close = Column(Double, nullable=False)
+    volume = Column(Double, nullable=False)
     unique_kline = Column(String, nullable=False, unique=True, index=True)
     data_source = Column(String(50), nullable=False, default='unknown', index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
+    # (symbol, interval, timestamp) 联合唯一索引，范围查询直接走索引
+    __table_args__ = (
+        sqlalchemy.Index('ix_crypto_spot_klines_symbol_interval_timestamp', 'symbol', 'interval', 'timestamp', unique=True),
+    )
+
 
 class CryptoFutureKline(TimezoneAwareBase):
     """加密货币合约K线数据SQLAlchemy模型
@@ -279,17 +284,22 @@ class CryptoFutureKline(TimezoneAwareBase):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     symbol = Column(String, nullable=False, index=True)
     interval = Column(String, nullable=False, index=True)
-    timestamp = Column(String, nullable=False, index=True)
-    open = Column(String, nullable=False)
-    high = Column(String, nullable=False)
-    low = Column(String, nullable=False)
-    close = Column(String, nullable=False)
-    volume = Column(String, nullable=False)
+    timestamp = Column(BigInteger, nullable=False, index=True)  # 纳秒级时间戳
+    open = Column(Double, nullable=False)
+    high = Column(Double, nullable=False)
+    low = Column(Double, nullable=False)
+    close = Column(Double, nullable=False)
+    volume = Column(Double, nullable=False)
     unique_kline = Column(String, nullable=False, unique=True, index=True)
     data_source = Column(String(50), nullable=False, default='unknown', index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
+    # (symbol, interval, timestamp) 联合唯一索引，范围查询直接走索引
+    __table_args__ = (
+        sqlalchemy.Index('ix_crypto_future_klines_symbol_interval_timestamp', 'symbol', 'interval', 'timestamp', unique=True),
+    )
+
 
 class StockKline(TimezoneAwareBase):
     """股票K线数据SQLAlchemy模型
@@ -301,17 +311,37 @@ class StockKline(TimezoneAwareBase):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     symbol = Column(String, nullable=False, index=True)
     interval = Column(String, nullable=False, index=True)
-    timestamp = Column(String, nullable=False, index=True)
-    open = Column(String, nullable=False)
-    high = Column(String, nullable=False)
-    low = Column(String, nullable=False)
-    close = Column(String, nullable=False)
-    volume = Column(String, nullable=False)
+    timestamp = Column(BigInteger, nullable=False, index=True)  # 纳秒级时间戳
+    open = Column(Double, nullable=False)
+    high = Column(Double, nullable=False)
+    low = Column(Double, nullable=False)
+    close = Column(Double, nullable=False)
+    volume = Column(Double, nullable=False)
     unique_kline = Column(String, nullable=False, unique=True, index=True)
     data_source = Column(String(50), nullable=False, default='unknown', index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
+    # (symbol, interval, timestamp) 联合唯一索引，范围查询直接走索引
+    __table_args__ = (
+        sqlalchemy.Index('ix_stock_klines_symbol_interval_timestamp', 'symbol', 'interval', 'timestamp', unique=True),
+    )
+
+
+class KlineCoverage(Base):
+    """K线覆盖索引SQLAlchemy模型
+    
+    每行是某个 (K线表, symbol, interval) 的一段连续已覆盖区间，
+    由 collector.db.kline_coverage 在写入K线时维护
+    """
+    __tablename__ = "kline_coverage"
+    
+    kline_table = Column(String, primary_key=True)
+    symbol = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    start_ts = Column(BigInteger, primary_key=True)  # 区间内第一根K线的开盘时间（纳秒）
+    end_ts = Column(BigInteger, nullable=False)  # 区间内最后一根K线的开盘时间（纳秒）
+
 
 class ScheduledTask(TimezoneAwareBase):
     """定时任务SQLAlchemy模型
@@ -18,6 +18,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
 from collector.db.database import SessionLocal, init_database_config
 from collector.db.models import CryptoSpotKline, CryptoFutureKline
 from collector.scripts.get_data import GetData
+from utils.timestamp_utils import datetime_to_nanoseconds
 
 
 class ExportData:
@@ -72,8 +73,8 @@ class ExportData:
             query = session.query(model).filter(
                 model.symbol == symbol,
                 model.interval == interval,
-                model.timestamp >= start,
-                model.timestamp <= end
+                model.timestamp >= datetime_to_nanoseconds(start),
+                model.timestamp <= datetime_to_nanoseconds(end)
             )
             
             # 执行查询并转换为DataFrame
@@ -20,6 +20,7 @@ logger = get_logger(__name__, LogType.APPLICATION)
 from exchange import BinanceCollector, OKXCollector
 from collector.db.models import SystemConfigBusiness as SystemConfig
 from utils.parquet_utils import load_from_parquet, load_kline_data_auto, list_parquet_files
+from utils.timestamp_utils import to_nanoseconds
 
 
 class GetData:
@@ -160,9 +161,9 @@ class GetData:
                 if row[['timestamp', 'open', 'high', 'low', 'close', 'volume']].isna().any(axis=None):
                     continue
                 
-                # 将timestamp转换为整数，去除小数点
+                # 将timestamp统一转换为纳秒级整数
                 try:
-                    timestamp = int(float(row['timestamp']))
+                    timestamp = to_nanoseconds(row['timestamp'])
                 except (ValueError, TypeError):
                     logger.warning(f"无效的timestamp值: {row['timestamp']}，跳过该行")
                     continue
@@ -173,12 +174,12 @@ class GetData:
                 kline_list.append({
                     'symbol': symbol,
                     'interval': interval,
-                    'timestamp': str(timestamp),  # 转换为字符串存储
-                    'open': row['open'],
-                    'high': row['high'],
-                    'low': row['low'],
-                    'close': row['close'],
-                    'volume': row['volume'],
+                    'timestamp': timestamp,
+                    'open': float(row['open']),
+                    'high': float(row['high']),
+                    'low': float(row['low']),
+                    'close': float(row['close']),
+                    'volume': float(row['volume']),
                     'unique_kline': unique_kline
                 })
             
@@ -4,13 +4,15 @@ from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 from utils.logger import get_logger, LogType
-from utils.timestamp_utils import normalize_to_nanoseconds, from_nanoseconds
+from utils.timestamp_utils import to_nanoseconds, datetime_to_nanoseconds
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
 from sqlalchemy.orm import Session
 
 from ..db.models import CryptoSpotKline, CryptoFutureKline, StockKline
+from ..db.kline_reader import read_kline_arrays
+from ..db.kline_writer import upsert_klines
 
 
 class KlineDataFetcher(ABC):
@@ -132,52 +134,28 @@ class BaseKlineFetcher(KlineDataFetcher):
                 logger.error(f"保存K线数据到数据库失败: 未设置kline_model")
                 return False
 
-            inserted_count = 0
-            updated_count = 0
-
-            for kline in kline_data:
-                # 转换timestamp为纳秒级字符串 (ccxt返回的是毫秒级)
-                timestamp_ms = kline.get("timestamp")
-                timestamp_ns = normalize_to_nanoseconds(timestamp_ms, input_precision='ms')
-
-                # 生成unique_kline字段 (使用纳秒级时间戳)
-                unique_kline = f"{symbol}_{interval}_{timestamp_ns}"
-
-                # 检查是否已存在
-                existing = db.query(self.kline_model).filter(
-                    self.kline_model.unique_kline == unique_kline
-                ).first()
-
-                if existing:
-                    # 更新现有记录
-                    existing.open = str(kline.get("open"))
-                    existing.high = str(kline.get("high"))
-                    existing.low = str(kline.get("low"))
-                    existing.close = str(kline.get("close"))
-                    existing.volume = str(kline.get("volume"))
-                    existing.data_source = 'ccxt_binance'
-                    updated_count += 1
-                else:
-                    # 创建新记录 (使用纳秒级时间戳)
-                    kline_instance = self.kline_model(
-                        symbol=symbol,
-                        interval=interval,
-                        timestamp=timestamp_ns,  # 统一为纳秒级
-                        open=str(kline.get("open")),
-                        high=str(kline.get("high")),
-                        low=str(kline.get("low")),
-                        close=str(kline.get("close")),
-                        volume=str(kline.get("volume")),
-                        unique_kline=unique_kline,
-                        data_source='ccxt_binance'
-                    )
-                    db.add(kline_instance)
-                    inserted_count += 1
+            # 转换timestamp为纳秒级 (ccxt返回的是毫秒级)，整批去重后一次UPSERT
+            rows = (
+                (
+                    symbol,
+                    interval,
+                    to_nanoseconds(kline.get("timestamp"), input_precision='ms'),
+                    kline.get("open"),
+                    kline.get("high"),
+                    kline.get("low"),
+                    kline.get("close"),
+                    kline.get("volume"),
+                )
+                for kline in kline_data
+            )
+            written_count = upsert_klines(
+                db, self.kline_model.__tablename__, rows, data_source='ccxt_binance'
+            )
 
             # 提交事务
             db.commit()
 
-            logger.info(f"成功保存{len(kline_data)}条K线数据到数据库: symbol={symbol}, interval={interval}, 插入={inserted_count}, 更新={updated_count}")
+            logger.info(f"成功保存{len(kline_data)}条K线数据到数据库: symbol={symbol}, interval={interval}, 去重后写入={written_count}")
             return True
         except Exception as e:
             logger.error(f"保存K线数据到数据库失败: symbol={symbol}, interval={interval}, error={e}")
@@ -305,18 +283,13 @@ class BaseKlineFetcher(KlineDataFetcher):
                 "kline_data": []
             }
         
-        # 构建查询
-        query = db.query(self.kline_model).filter(
-            self.kline_model.symbol == symbol,
-            self.kline_model.interval == interval
-        )
-        
         # 处理时间过滤 (使用纳秒级时间戳)
+        start_ts_ns = None
+        end_ts_ns = None
         if start_time:
             try:
                 start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
                 start_ts_ns = datetime_to_nanoseconds(start_dt)
-                query = query.filter(self.kline_model.timestamp >= str(start_ts_ns))
             except ValueError:
                 logger.warning(f"无效的开始时间格式: {start_time}，忽略该过滤条件")
 
@@ -324,36 +297,24 @@ class BaseKlineFetcher(KlineDataFetcher):
             try:
                 end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
                 end_ts_ns = datetime_to_nanoseconds(end_dt)
-                query = query.filter(self.kline_model.timestamp <= str(end_ts_ns))
             except ValueError:
                 logger.warning(f"无效的结束时间格式: {end_time}，忽略该过滤条件")
-        
-        # 按时间降序排序并限制数量
-        query = query.order_by(self.kline_model.timestamp.desc()).limit(limit)
-        
-        # 执行查询
-        klines = query.all()
-        
-        # 转换为指定格式
-        kline_data = []
-        for kline in klines:
-            # 转换时间戳：纳秒 -> 毫秒（klinecharts 需要毫秒级时间戳）
-            timestamp_ns = int(kline.timestamp)
-            timestamp_ms = from_nanoseconds(timestamp_ns, 'ms')
-
-            kline_data.append({
-                "timestamp": timestamp_ms,
-                "open": float(kline.open),
-                "close": float(kline.close),
-                "high": float(kline.high),
-                "low": float(kline.low),
-                "volume": float(kline.volume),
-                "turnover": 0.0  # 成交额字段，当前版本返回0
-            })
-        
-        # 按时间升序返回
-        kline_data.reverse()
-        
+
+        # 列式读取最新的limit条K线（按时间升序返回）
+        arrays = read_kline_arrays(
+            db,
+            symbol,
+            interval,
+            start_ns=start_ts_ns,
+            end_ns=end_ts_ns,
+            limit=limit,
+            latest=True,
+            table=self.kline_model.__tablename__,
+        )
+
+        # 时间戳：纳秒 -> 毫秒（klinecharts 需要毫秒级时间戳）
+        kline_data = arrays.to_records(ts_unit="ms")
+
         return {
             "success": True,
             "message": "查询K线数据成功",
@@ -9,17 +9,48 @@ K线数据健康检查服务
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 
+import numpy as np
 import pandas as pd
 from utils.logger import get_logger, LogType
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
-from sqlalchemy import and_
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from backend.collector.db.database import SessionLocal
 # 数据库连接和模型
 from backend.collector.db.models import CryptoSpotKline, CryptoFutureKline, StockKline
+from utils.timestamp_utils import datetime_to_nanoseconds
+
+
+# 列式读取K线的结构化dtype，与SELECT列顺序一致
+_ROW_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("timestamp", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+])
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """向后移动一位，首位为NaN（等价于 Series.shift(1)）"""
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """滑动平均，不足window根的位置为NaN（等价于 Series.rolling(window).mean()）"""
+    mean = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.concatenate(([0.0], values)))
+        mean[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return mean
 
 
 class KlineHealthChecker:
@@ -82,39 +113,24 @@ class KlineHealthChecker:
             logger.warning(f"不支持的市场类型: {market_type}")
             return pd.DataFrame()
         
-        query = self.db.query(KlineModel)
-        
-        # 添加过滤条件
-        query = query.filter(
-            and_(
-                KlineModel.symbol == symbol,
-                KlineModel.interval == interval
-            )
-        )
-        
+        # 列式读取，不为每根K线创建ORM对象
+        conditions = ['symbol = :symbol', '"interval" = :interval']
+        params: Dict[str, Any] = {"symbol": symbol, "interval": interval}
         if start:
-            query = query.filter(KlineModel.date >= start)
-        
+            conditions.append('"timestamp" >= :start_ns')
+            params["start_ns"] = datetime_to_nanoseconds(start)
         if end:
-            query = query.filter(KlineModel.date <= end)
-        
-        # 执行查询并转换为DataFrame
-        kline_list = query.all()
-        df = pd.DataFrame([{
-            'id': k.id,
-            'timestamp': k.timestamp,
-            'open': float(k.open),
-            'high': float(k.high),
-            'low': float(k.low),
-            'close': float(k.close),
-            'volume': float(k.volume)
-        } for k in kline_list])
-        
-        if not df.empty:
-            # 按时间戳排序
-            df.sort_values('timestamp', inplace=True)
-        
-        return df
+            conditions.append('"timestamp" <= :end_ns')
+            params["end_ns"] = datetime_to_nanoseconds(end)
+        
+        rows = self.db.execute(text(
+            f'SELECT id, "timestamp", open, high, low, close, volume FROM {KlineModel.__tablename__} '
+            f'WHERE {" AND ".join(conditions)} ORDER BY "timestamp"'
+        ), params)
+        records = np.fromiter(map(tuple, rows), dtype=_ROW_DTYPE)
+        if len(records) == 0:
+            return pd.DataFrame()
+        return pd.DataFrame(records)
     
     def check_integrity(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -156,6 +172,8 @@ class KlineHealthChecker:
         """
         检查数据连续性
         
+        由相邻时间戳之差直接得到缺口，不生成完整的期望时间序列
+        
         Args:
             df: k线数据DataFrame
             interval: 时间周期，如1m, 5m, 1h, 1d
@@ -192,64 +210,43 @@ class KlineHealthChecker:
             return result
         
         delta = interval_mapping[interval]
+        step = int(delta.total_seconds()) * 1_000_000_000
         
-        # 生成完整的时间序列（使用timestamp字符串的数值排序）
-        df_sorted = df.sort_values('timestamp')
-        timestamp_numeric = pd.to_numeric(df_sorted['timestamp'], errors='coerce')
-        
-        if timestamp_numeric.empty:
+        # 纳秒时间戳，升序去重
+        ts = np.unique(pd.to_numeric(df['timestamp'], errors='coerce').dropna().to_numpy(dtype=np.int64))
+        if len(ts) == 0:
             return result
         
-        # 生成完整的时间序列
-        expected_index = pd.date_range(start=timestamp_numeric.min(), end=timestamp_numeric.max(), freq=delta)
-        # 将numpy.int64转换为Python int
-        result["expected_records"] = int(len(expected_index))
+        expected_records = int((ts[-1] - ts[0]) // step + 1)
+        result["expected_records"] = expected_records
         result["actual_records"] = int(len(df))
+        result["coverage_ratio"] = float(len(df) / expected_records)
         
-        # 计算覆盖率，转换为Python float
-        if len(expected_index) > 0:
-            result["coverage_ratio"] = float(len(df) / len(expected_index))
+        # 相邻时间戳之差超过一个周期处即为缺口
+        gap_at = np.flatnonzero(np.diff(ts) > step)
+        if len(gap_at) == 0:
+            return result
         
-        # 找出缺失的时间点
-        missing_periods = expected_index.difference(timestamp_numeric)
-        if len(missing_periods) > 0:
-            result["status"] = "fail"
-            # 将numpy.int64转换为Python int
-            result["missing_records"] = int(len(missing_periods))
-            result["missing_periods"] = [str(period) for period in missing_periods]
-            
-            # 分析缺失时间段
-            if len(missing_periods) > 0:
-                # 排序缺失的时间点
-                missing_sorted = sorted(missing_periods)
-                
-                # 找出连续缺失的时间段
-                ranges = []
-                start_range = missing_sorted[0]
-                
-                prev = missing_sorted[0]
-                
-                for period in missing_sorted[1:]:
-                    # 如果当前时间与前一个时间间隔超过预期，则视为新的缺失时间段
-                    if (period - prev) > delta:
-                        ranges.append({
-                            "start": str(start_range),
-                            "end": str(prev),
-                            "duration": str(prev - start_range),
-                            "count": int((prev - start_range) / delta) + 1
-                        })
-                        start_range = period
-                    prev = period
-                
-                # 添加最后一个时间段
-                ranges.append({
-                    "start": str(start_range),
-                    "end": str(missing_sorted[-1]),
-                    "duration": str(missing_sorted[-1] - start_range),
-                    "count": int((missing_sorted[-1] - start_range) / delta) + 1
-                })
-                
-                result["missing_time_ranges"] = ranges
+        gap_starts = ts[gap_at] + step
+        gap_counts = (ts[gap_at + 1] - gap_starts - 1) // step + 1
+        gap_ends = gap_starts + (gap_counts - 1) * step
+        
+        result["status"] = "fail"
+        result["missing_records"] = int(gap_counts.sum())
+        result["missing_periods"] = [
+            str(period) for period in pd.to_datetime(
+                np.concatenate([np.arange(start, end + 1, step) for start, end in zip(gap_starts, gap_ends)])
+            )
+        ]
+        result["missing_time_ranges"] = [
+            {
+                "start": str(pd.Timestamp(start)),
+                "end": str(pd.Timestamp(end)),
+                "duration": str(pd.Timedelta(int(end - start))),
+                "count": int(count)
+            }
+            for start, end, count in zip(gap_starts, gap_ends, gap_counts)
+        ]
         
         return result
     
@@ -282,8 +279,8 @@ class KlineHealthChecker:
             return result
         
         # 数据的实际起止时间
-        data_start = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce').min()
-        data_end = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce').max()
+        data_start = pd.to_datetime(df['timestamp'], unit='ns', errors='coerce').min()
+        data_end = pd.to_datetime(df['timestamp'], unit='ns', errors='coerce').max()
         result["data_start_date"] = str(data_start)
         result["data_end_date"] = str(data_end)
         
@@ -313,6 +310,8 @@ class KlineHealthChecker:
         """
         检查数据有效性
         
+        所有规则都是对OHLCV列数组的一次向量化运算，不修改传入的DataFrame
+        
         Args:
             df: k线数据DataFrame
             
@@ -334,86 +333,60 @@ class KlineHealthChecker:
         if df.empty:
             return result
         
+        o, h, l, c, v = (df[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close', 'volume'))
+        labels = df.index.to_numpy()
+        prev_close = _shift(c)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 涨跌幅与开盘跳空（相对上一根K线收盘价，%）
+            change_pct = (c - prev_close) / prev_close * 100
+            gap_pct = (o - prev_close) / prev_close * 100
+            # 成交量异常：超过过去30根K线平均成交量的10倍
+            volume_ma30 = _rolling_mean(v, 30)
+            abnormal_volume = v > volume_ma30 * 10
+        
+        checks = {
+            "negative_prices": (o < 0) | (h < 0) | (l < 0) | (c < 0),
+            "negative_volumes": v < 0,
+            "invalid_high_low": h < l,
+            # high >= max(open, close) 且 low <= min(open, close)
+            "invalid_price_logic": (h < np.fmax(o, c)) | (l > np.fmin(o, c)),
+        }
         invalid_records = 0
-        
-        # 检查价格是否为负数
-        negative_prices = df[(df['open'] < 0) | (df['high'] < 0) | (df['low'] < 0) | (df['close'] < 0)]
-        if not negative_prices.empty:
-            result["status"] = "fail"
-            result["negative_prices"] = [str(idx) for idx in negative_prices.index]
-            invalid_records += len(negative_prices)
-        
-        # 检查成交量是否为负数
-        negative_volumes = df[df['volume'] < 0]
-        if not negative_volumes.empty:
-            result["status"] = "fail"
-            result["negative_volumes"] = [str(idx) for idx in negative_volumes.index]
-            invalid_records += len(negative_volumes)
-        
-        # 检查high是否大于等于low
-        invalid_high_low = df[df['high'] < df['low']]
-        if not invalid_high_low.empty:
-            result["status"] = "fail"
-            result["invalid_high_low"] = [str(idx) for idx in invalid_high_low.index]
-            invalid_records += len(invalid_high_low)
-        
-        # 检查价格逻辑：high >= max(open, close) 且 low <= min(open, close)
-        invalid_price_logic = df[
-            (df['high'] < df[['open', 'close']].max(axis=1)) | 
-            (df['low'] > df[['open', 'close']].min(axis=1))
-        ]
-        if not invalid_price_logic.empty:
-            result["status"] = "fail"
-            result["invalid_price_logic"] = [str(idx) for idx in invalid_price_logic.index]
-            invalid_records += len(invalid_price_logic)
-        
-        # 计算涨跌幅
-        df['price_change_pct'] = (df['close'] - df['close'].shift(1)) / df['close'].shift(1) * 100
+        for name, mask in checks.items():
+            if mask.any():
+                result["status"] = "fail"
+                result[name] = [str(idx) for idx in labels[mask]]
+                invalid_records += int(mask.sum())
         
         # 检查单日涨跌幅超过±20%
-        abnormal_price_changes = df[abs(df['price_change_pct']) > 20]
-        if not abnormal_price_changes.empty:
+        mask = np.abs(change_pct) > 20
+        if mask.any():
             result["status"] = "fail"
             result["abnormal_price_changes"] = [
-                {
-                    "timestamp": str(idx),
-                    "change_pct": round(row['price_change_pct'], 2)
-                }
-                for idx, row in abnormal_price_changes.iterrows()
+                {"timestamp": str(idx), "change_pct": round(float(pct), 2)}
+                for idx, pct in zip(labels[mask], change_pct[mask])
             ]
-            invalid_records += len(abnormal_price_changes)
+            invalid_records += int(mask.sum())
         
-        # 检查成交量异常（超过过去1年平均成交量的10倍，此处简化为过去30天）
-        df['volume_ma30'] = df['volume'].rolling(window=30).mean()
-        abnormal_volumes = df[df['volume'] > df['volume_ma30'] * 10]
-        if not abnormal_volumes.empty:
+        if abnormal_volume.any():
             result["status"] = "fail"
             result["abnormal_volumes"] = [
-                {
-                    "timestamp": str(idx),
-                    "volume": row['volume'],
-                    "avg_30d_volume": round(row['volume_ma30'], 2)
-                }
-                for idx, row in abnormal_volumes.iterrows()
-                if not pd.isna(row['volume_ma30'])  # 排除ma30计算结果为NaN的情况
+                {"timestamp": str(idx), "volume": float(vol), "avg_30d_volume": round(float(ma), 2)}
+                for idx, vol, ma in zip(labels[abnormal_volume], v[abnormal_volume], volume_ma30[abnormal_volume])
             ]
             invalid_records += len(result["abnormal_volumes"])
         
         # 检查非除权除息日的价格跳空异常（此处简化为跳空超过5%）
-        df['open_gap_pct'] = (df['open'] - df['close'].shift(1)) / df['close'].shift(1) * 100
-        price_gaps = df[abs(df['open_gap_pct']) > 5]
-        if not price_gaps.empty:
+        mask = np.abs(gap_pct) > 5
+        if mask.any():
             result["status"] = "fail"
             result["price_gaps"] = [
-                {
-                    "timestamp": str(idx),
-                    "gap_pct": round(row['open_gap_pct'], 2)
-                }
-                for idx, row in price_gaps.iterrows()
+                {"timestamp": str(idx), "gap_pct": round(float(pct), 2)}
+                for idx, pct in zip(labels[mask], gap_pct[mask])
             ]
-            invalid_records += len(price_gaps)
+            invalid_records += int(mask.sum())
         
-        # 将numpy.int64转换为Python int
         result["total_invalid_records"] = int(invalid_records)
         
         return result
@@ -502,55 +475,45 @@ class KlineHealthChecker:
             "duplicate_details": []
         }
         
-        if df.empty:
+        if df.empty or 'timestamp' not in df.columns:
             return result
         
-        # 检查时间戳字段的重复（而不是索引的重复）
-        if 'timestamp' in df.columns:
-            duplicate_timestamps = df.duplicated(subset=['timestamp'], keep=False)
-        else:
-            return result
+        # 稳定排序后相邻相等即为重复，组内保持原有行序
+        ts = df['timestamp'].to_numpy()
+        order = np.argsort(ts, kind='stable')
+        sorted_ts = ts[order]
+        same_as_next = sorted_ts[1:] == sorted_ts[:-1]
+        duplicated = np.zeros(len(ts), dtype=bool)
+        duplicated[:-1] |= same_as_next
+        duplicated[1:] |= same_as_next
         
-        if duplicate_timestamps.any():
+        if duplicated.any():
             result["status"] = "fail"
-            duplicate_count = int(duplicate_timestamps.sum())
-            result["duplicate_records"] = duplicate_count
-            
-            # 获取所有重复的时间戳值
-            if 'timestamp' in df.columns:
-                duplicate_dates = df[duplicate_timestamps]['timestamp'].unique()
-            else:
-                duplicate_dates = []
+            result["duplicate_records"] = int(duplicated.sum())
             
-            result["duplicate_periods"] = [str(dt) for dt in duplicate_dates]
+            # 按首次出现的顺序列出重复的时间戳
+            dup_rows = order[duplicated]
+            group_starts = np.flatnonzero(np.diff(sorted_ts[duplicated], prepend=sorted_ts[duplicated][0] - 1) != 0)
+            groups = np.split(dup_rows, group_starts[1:])
+            groups.sort(key=lambda rows: rows[0])
+            result["duplicate_periods"] = [str(ts[rows[0]]) for rows in groups]
             
-            # 为每个重复的时间戳获取详细信息
-            for duplicate_date in duplicate_dates:
-                # 获取该时间戳下的所有记录
-                if 'timestamp' in df.columns:
-                    duplicate_rows = df[df['timestamp'] == duplicate_date]
-                else:
-                    continue
-                
-                # 转换为可序列化的格式
-                duplicate_records = []
-                for i, row in duplicate_rows.iterrows():
-                    record = {
-                        "id": row['id'],
-                        "timestamp": str(i),
-                        "open": float(row['open']),
-                        "high": float(row['high']),
-                        "low": float(row['low']),
-                        "close": float(row['close']),
-                        "volume": float(row['volume']),
-                        "row_number": len(duplicate_records) + 1
+            labels = df.index.to_numpy()
+            ids = df['id'].to_numpy() if 'id' in df.columns else np.full(len(df), None)
+            columns = {col: df[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close', 'volume')}
+            for rows in groups:
+                duplicate_records = [
+                    {
+                        "id": ids[row].item() if hasattr(ids[row], 'item') else ids[row],
+                        "timestamp": str(labels[row]),
+                        **{col: float(values[row]) for col, values in columns.items()},
+                        "row_number": number
                     }
-                    duplicate_records.append(record)
-                
-                # 添加到重复详情
+                    for number, row in enumerate(rows, start=1)
+                ]
                 result["duplicate_details"].append({
                     "group_type": "timestamp_duplicate",
-                    "key": str(duplicate_date),
+                    "key": str(ts[rows[0]]),
                     "records": duplicate_records,
                     "count": len(duplicate_records)
                 })
@@ -564,8 +527,6 @@ class KlineHealthChecker:
                 code_dup_count = int(duplicate_code_timestamp.sum())
                 result["duplicate_records"] += code_dup_count
                 result["duplicate_code_timestamp"].append(f"存在 {code_dup_count} 条重复的(代码+时间戳)记录")
-                
-                # 对于code+timestamp重复，我们已经在上面的timestamp_duplicate中处理了，这里不再重复
         
         return result
     
@@ -590,40 +551,28 @@ class KlineHealthChecker:
         if df.empty:
             return result
         
-        # 检查交易时间匹配（仅对日内K线）
-        if interval in ['1m', '5m', '15m', '30m', '1h', '4h']:
-            # 检查timestamp列是否存在
-            if 'timestamp' in df.columns:
-                # 直接使用timestamp字段，不进行转换
-                pass
+        prices = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        close = prices[:, 3]
+        volume = df['volume'].to_numpy(dtype=np.float64)
+        prev_close = _shift(close)
         
         # 检查停牌数据处理
-        # 假设成交量为0且价格不变表示停牌
-        df['price_change'] = df['close'] - df['close'].shift(1)
-        potential_suspension = df[(df['volume'] == 0) & (df['price_change'] == 0)]
-        
-        if not potential_suspension.empty:
-            # 检查停牌期间的价格字段是否完整
-            suspension_missing_prices = potential_suspension[(potential_suspension['open'].isnull()) | \
-                                                           (potential_suspension['high'].isnull()) | \
-                                                           (potential_suspension['low'].isnull()) | \
-                                                           (potential_suspension['close'].isnull())]
-            
-            if not suspension_missing_prices.empty:
-                result["status"] = "fail"
-                result["suspension_issues"].append(f"停牌期间价格字段缺失: {int(len(suspension_missing_prices))} 条记录")
+        # 假设成交量为0且价格不变表示停牌，停牌期间价格字段应完整
+        suspension = (volume == 0) & (close - prev_close == 0)
+        suspension_missing_prices = int((suspension & np.isnan(prices).any(axis=1)).sum())
+        if suspension_missing_prices:
+            result["status"] = "fail"
+            result["suspension_issues"].append(f"停牌期间价格字段缺失: {suspension_missing_prices} 条记录")
         
         # 检查涨跌停规则
-        # 计算涨跌幅
-        df['price_change_pct'] = (df['close'] - df['close'].shift(1)) / df['close'].shift(1) * 100
-        
         # 假设A股涨跌停限制为±10%
         # 注意：实际情况可能更复杂，如ST股票±5%，新股上市首日无限制等
-        price_limit_issues = df[(df['price_change_pct'] > 10.1) | (df['price_change_pct'] < -10.1)]
-        
-        if not price_limit_issues.empty:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = (close - prev_close) / prev_close * 100
+        price_limit_issues = int(((change_pct > 10.1) | (change_pct < -10.1)).sum())
+        if price_limit_issues:
             result["status"] = "fail"
-            result["price_limit_issues"].append(f"发现 {int(len(price_limit_issues))} 条记录超出涨跌停限制")
+            result["price_limit_issues"].append(f"发现 {price_limit_issues} 条记录超出涨跌停限制")
         
         return result
     
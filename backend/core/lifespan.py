@@ -210,6 +210,7 @@ async def lifespan(app: FastAPI):
         # 注册K线持久化消费者（新增）
         from realtime.kline_persistence import kline_persistence_consumer
         realtime_engine.register_consumer("kline", kline_persistence_consumer.process_kline)
+        realtime_engine.bar_aggregator.register_consumer(kline_persistence_consumer.process_kline)
         logger.info("已注册K线持久化消费者")
 
         logger.info("实时引擎初始化成功")
@@ -275,6 +276,10 @@ async def lifespan(app: FastAPI):
         try:
             await realtime_engine.stop()
             logger.info("实时引擎已停止")
+
+            # 写出K线持久化缓冲区中剩余的数据
+            from realtime.kline_persistence import kline_persistence_consumer
+            await asyncio.to_thread(kline_persistence_consumer.close)
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+K线归档并发下载引擎
+
+为按日/按月发布的K线归档（如 data.binance.vision）和分页REST接口提供共享的下载能力：
+    - 整个下载任务共用一个带连接池的 aiohttp 会话（一次TLS握手、DNS缓存）
+    - 信号量限制同时进行的请求数
+    - 整月且已结束的月份优先下载月度归档，月度归档不存在时回退到日度归档
+    - 网络错误、429 和 5xx 按指数退避重试，404 视为归档不存在
+    - 可选的JSON状态文件记录已完成的归档，中断后重新运行只下载剩余部分
+    - 响应体逐块写入临时文件，解压时逐块交给解析函数，不在内存中复制压缩包和CSV全文
+
+下载地址由调用方给出，测试时可指向本地HTTP服务。
+"""
+
+import asyncio
+import calendar
+import inspect
+import json
+import os
+import ssl
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+import aiohttp
+import certifi
+
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+from exchange.exceptions import ExchangeError, NetworkError, RateLimitError, TemporaryError
+
+# 归档在周期结束后陆续发布，结束超过该天数仍不存在的归档才记为缺失，续传时不再请求
+MISSING_SETTLE_DAYS = 2
+
+# 响应体写入临时文件的块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+ARCHIVE_DONE = "done"
+ARCHIVE_MISSING = "missing"
+
+_RETRYABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, TemporaryError, RateLimitError, zipfile.BadZipFile)
+
+
+@dataclass
+class ArchiveTask:
+    """一个归档文件的下载任务"""
+
+    url: str
+    label: str                      # 归档覆盖的周期，如 2024-01 或 2024-01-15
+    dates: List[str]                # 覆盖的日期（YYYY-MM-DD）
+    fallback: List["ArchiveTask"] = field(default_factory=list)  # 归档不存在时改为下载的任务
+
+    def is_settled(self, today: Optional[date] = None) -> bool:
+        """归档周期是否已结束足够久，此时仍不存在即视为确实缺失"""
+        today = today or datetime.now(timezone.utc).date()
+        last = datetime.strptime(self.dates[-1], "%Y-%m-%d").date()
+        return today - last > timedelta(days=MISSING_SETTLE_DAYS)
+
+
+def plan_archive_tasks(
+    dates: Iterable[str],
+    daily_url: Callable[[str], str],
+    monthly_url: Optional[Callable[[str], str]] = None,
+    today: Optional[date] = None,
+) -> List[ArchiveTask]:
+    """
+    将待下载的日期规划为归档任务
+
+    整月都需要且已结束的月份使用月度归档，并以该月的日度归档作为回退；其余日期使用日度归档。
+
+    :param dates: 日期列表，格式为'YYYY-MM-DD'
+    :param daily_url: 由日期生成日度归档地址的函数
+    :param monthly_url: 由月份（'YYYY-MM'）生成月度归档地址的函数，为None时只使用日度归档
+    :param today: 当前UTC日期，默认取系统时间
+    :return: 归档任务列表
+    """
+    today = today or datetime.now(timezone.utc).date()
+    current_month = today.strftime("%Y-%m")
+
+    by_month: Dict[str, List[str]] = {}
+    for day in sorted(set(dates)):
+        by_month.setdefault(day[:7], []).append(day)
+
+    tasks = []
+    for month, month_dates in by_month.items():
+        daily = [ArchiveTask(url=daily_url(day), label=day, dates=[day]) for day in month_dates]
+        year, mon = int(month[:4]), int(month[5:])
+        full_month = len(month_dates) == calendar.monthrange(year, mon)[1]
+        if monthly_url is not None and full_month and month < current_month:
+            tasks.append(ArchiveTask(url=monthly_url(month), label=month, dates=month_dates, fallback=daily))
+        else:
+            tasks.extend(daily)
+    return tasks
+
+
+def read_zipped_csv(file: IO[bytes], parse: Callable[[IO[bytes]], Any]) -> Any:
+    """
+    以流的方式解压归档中的第一个文件并交给解析函数
+
+    :param file: 可随机读取的压缩包文件对象
+    :param parse: 解析函数，参数为解压流（支持 peek）
+    :return: 解析结果
+    """
+    with zipfile.ZipFile(file) as zipf:
+        with zipf.open(zipf.namelist()[0]) as stream:
+            return parse(stream)
+
+
+class ArchiveState:
+    """断点续传状态，记录每个归档地址的下载结果（已完成或确认缺失）"""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        :param path: 状态文件路径，为None时只在内存中记录
+        """
+        self.path = Path(path) if path else None
+        self._entries: Dict[str, str] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取下载状态文件失败，将重新下载: {self.path}, {e}")
+
+    def get(self, url: str) -> Optional[str]:
+        return self._entries.get(url)
+
+    def mark(self, url: str, status: str) -> None:
+        self._entries[url] = status
+        if self.path is None:
+            return
+        # 先写临时文件再替换，中断时不会留下损坏的状态文件
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self._entries), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+class ArchiveDownloader:
+    """
+    K线归档并发下载引擎
+
+    用法::
+
+        async with ArchiveDownloader(concurrency=16, state_path="state.json") as downloader:
+            stats = await downloader.download(tasks, parse, on_result=save)
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        max_retry: int = 4,
+        backoff: float = 0.5,
+        timeout: float = 120.0,
+        state_path: Optional[Union[str, Path]] = None,
+        rate_limit: Optional[float] = None,
+    ):
+        """
+        :param concurrency: 同时进行的最大请求数，也是连接池大小
+        :param max_retry: 单个请求的最大尝试次数
+        :param backoff: 首次重试前的等待时间（秒），之后每次加倍
+        :param timeout: 单个请求的超时时间（秒）
+        :param state_path: 断点续传状态文件路径，为None时不持久化
+        :param rate_limit: 每秒最多发出的请求数（含重试），为None时只受并发数限制
+        """
+        self.concurrency = concurrency
+        self.max_retry = max_retry
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.state = ArchiveState(state_path)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._next_request_at = 0.0
+
+    async def __aenter__(self) -> "ArchiveDownloader":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """创建共享会话"""
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            ttl_dns_cache=300,
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._rate_lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        """关闭共享会话"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(
+        self,
+        url: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Any]],
+        params: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        """
+        发送GET请求，失败时按指数退避重试
+
+        :param url: 请求地址
+        :param read: 读取响应的协程函数，在持有连接时调用
+        :param params: 查询参数
+        :return: read 的返回值，资源不存在（404）时返回None
+        :raises ExchangeError: 不可重试的HTTP错误
+        """
+        await self.open()
+        for attempt in range(1, self.max_retry + 1):
+            try:
+                async with self._semaphore:
+                    await self._throttle()
+                    async with self._session.get(url, params=params) as resp:
+                        if resp.status == 404:
+                            return None
+                        if resp.status == 429:
+                            raise RateLimitError(
+                                f"请求过于频繁 {url}", retry_after=_parse_retry_after(resp.headers.get("Retry-After"))
+                            )
+                        if resp.status >= 500:
+                            raise NetworkError(f"服务端错误 {url}，状态码: {resp.status}")
+                        if resp.status >= 400:
+                            raise ExchangeError(f"请求失败 {url}，状态码: {resp.status}")
+                        return await read(resp)
+            except _RETRYABLE_ERRORS as e:
+                if attempt == self.max_retry:
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1)
+                if isinstance(e, RateLimitError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                logger.warning(f"请求 {url} 失败，{delay:.1f} 秒后第 {attempt}/{self.max_retry - 1} 次重试: {e}")
+                await asyncio.sleep(delay)
+
+    async def _throttle(self) -> None:
+        """按 rate_limit 均匀分配请求的发出时间"""
+        if not self.rate_limit:
+            return
+        async with self._rate_lock:
+            now = asyncio.get_running_loop().time()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + 1.0 / self.rate_limit
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def fetch_json(self, url: str, params: Optional[Dict[str, str]] = None) -> Any:
+        """
+        请求JSON接口
+
+        :return: 解析后的JSON，资源不存在时返回None
+        """
+        async def read(resp):
+            return await resp.json(content_type=None)
+
+        return await self.request(url, read, params)
+
+    async def fetch_zip_csv(self, url: str, parse: Callable[[IO[bytes]], Any]) -> Any:
+        """
+        下载归档压缩包并解析其中的CSV
+
+        响应体逐块写入临时文件，在线程中边解压边解析；压缩包损坏时重新下载。
+
+        :param url: 归档地址
+        :param parse: 解析函数，参数为解压流
+        :return: parse 的返回值，归档不存在时返回None
+        """
+        async def read(resp):
+            with tempfile.TemporaryFile() as spool:
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+                spool.seek(0)
+                return await asyncio.to_thread(read_zipped_csv, spool, parse)
+
+        return await self.request(url, read)
+
+    async def download(
+        self,
+        tasks: List[ArchiveTask],
+        parse: Callable[[IO[bytes]], Any],
+        on_result: Optional[Callable[[ArchiveTask, Any], Any]] = None,
+        progress_callback: Optional[Callable[[int, int, ArchiveTask], None]] = None,
+    ) -> Dict[str, int]:
+        """
+        并发下载归档任务
+
+        on_result 在事件循环中按完成顺序调用（可以是协程函数），返回后该归档才记入续传状态；
+        on_result 抛出异常时该归档记为失败，下次运行会重新下载。
+
+        :param tasks: 归档任务，通常由 plan_archive_tasks 生成
+        :param parse: 解析函数，参数为解压流
+        :param on_result: 结果回调，格式为 callback(task, data)
+        :param progress_callback: 进度回调，格式为 callback(completed_days, total_days, task)
+        :return: 按天统计的结果，包含 downloaded、skipped、missing、failed
+        """
+        stats = {"downloaded": 0, "skipped": 0, "missing": 0, "failed": 0}
+        total = sum(len(task.dates) for task in tasks)
+
+        def finish(task, outcome):
+            stats[outcome] += len(task.dates)
+            if progress_callback:
+                progress_callback(sum(stats.values()), total, task)
+
+        async def run(task):
+            status = self.state.get(task.url)
+            if status == ARCHIVE_DONE:
+                finish(task, "skipped")
+                return
+            if status != ARCHIVE_MISSING:
+                try:
+                    data = await self.fetch_zip_csv(task.url, parse)
+                    if data is not None:
+                        if on_result is not None:
+                            result = on_result(task, data)
+                            if inspect.isawaitable(result):
+                                await result
+                        self.state.mark(task.url, ARCHIVE_DONE)
+                        finish(task, "downloaded")
+                        return
+                except Exception as e:
+                    logger.error(f"下载归档失败 {task.url}: {e}")
+                    finish(task, "failed")
+                    return
+                if task.is_settled():
+                    self.state.mark(task.url, ARCHIVE_MISSING)
+
+            if task.fallback:
+                logger.info(f"归档 {task.label} 不存在，改为下载 {len(task.fallback)} 个日度归档")
+                await asyncio.gather(*(run(sub) for sub in task.fallback))
+            else:
+                logger.debug(f"归档不存在: {task.url}")
+                finish(task, "missing")
+
+        await asyncio.gather(*(run(task) for task in tasks))
+        return stats
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+__all__ = [
+    "ArchiveDownloader",
+    "ArchiveState",
+    "ArchiveTask",
+    "plan_archive_tasks",
+    "read_zipped_csv",
+]
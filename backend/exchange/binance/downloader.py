@@ -5,26 +5,25 @@
 支持 Parquet 格式本地存储，提供更高的压缩率和查询性能。
 """
 import asyncio
-import ssl
-import zipfile
-from io import BytesIO
 from pathlib import Path
-from typing import Optional, Union
+from typing import IO, List, Optional, Union
 
-import aiohttp
-import certifi
 import pandas as pd
 import requests
 from utils.logger import get_logger, LogType
-from utils.timestamp_utils import normalize_to_nanoseconds
+from utils.timestamp_utils import array_to_nanoseconds
 from utils.parquet_utils import save_to_parquet, append_to_parquet
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+from exchange.archive_downloader import ArchiveDownloader, ArchiveTask, plan_archive_tasks
 from exchange.base import BaseCollector
-from utils.decorators import async_deco_retry, deco_retry
+from utils.decorators import deco_retry
 from utils.time_parser import get_date_range
 
+# 币安历史数据归档地址
+BINANCE_ARCHIVE_URL = "https://data.binance.vision"
+
 
 class BinanceDownloader(BaseCollector):
     """
@@ -48,6 +47,8 @@ class BinanceDownloader(BaseCollector):
         limit_nums: Optional[int] = None,
         symbols=None,
         mode='inc',
+        download_concurrency: int = 8,
+        archive_base_url: str = BINANCE_ARCHIVE_URL,
     ):
         """
         初始化币安数据下载器和收集器
@@ -64,7 +65,11 @@ class BinanceDownloader(BaseCollector):
         :param limit_nums: 限制收集的标的数量，用于调试
         :param symbols: 交易对列表，如['BTCUSDT', 'ETHUSDT']，如果为None则获取全量交易对
         :param mode: 下载模式，可选'inc'（增量）或'full'（全量），默认'inc'
+        :param download_concurrency: 同一交易对并发下载的归档数
+        :param archive_base_url: 历史数据归档地址，测试时可指向本地服务
         """
+        self.download_concurrency = download_concurrency
+        self.archive_base_url = archive_base_url.rstrip('/')
         # 先设置 candle_type 和 symbols，因为父类初始化会调用 get_instrument_list()
         self.candle_type = candle_type
         self.symbols = symbols
@@ -125,96 +130,109 @@ class BinanceDownloader(BaseCollector):
         """
         return f"{symbol}-{timeframe}-{date}.zip"
 
-    def get_zip_url(self, symbol, timeframe, date):
+    def get_zip_url(self, symbol, timeframe, date, period='daily'):
         """
         获取压缩文件下载地址
 
         :param symbol: 交易对，如'BTCUSDT'
         :param timeframe: 时间间隔，如'1m'、'1h'、'1d'等
-        :param date: 日期，格式为'YYYY-MM-DD'
+        :param date: 日度归档为日期'YYYY-MM-DD'，月度归档为月份'YYYY-MM'
+        :param period: 归档周期，可选'daily'或'monthly'
         :return: 压缩文件下载URL
         """
         symbol = symbol.replace('/', '')
         asset_type = self.get_url_by_candle_type(self.candle_type)
         zip_name = self.get_zip_name(symbol, timeframe, date)
         url = (
-            f"https://data.binance.vision/data/{asset_type}/daily/klines/{symbol}"
+            f"{self.archive_base_url}/data/{asset_type}/{period}/klines/{symbol}"
             f"/{timeframe}/{zip_name}"
         )
         return url
 
-    @async_deco_retry(max_retry=3, delay=1.0)
-    async def get_daily_klines(self, symbol, timeframe, date):
+    def plan_archive_tasks(self, symbol, timeframe, dates) -> List[ArchiveTask]:
         """
-        异步获取指定日期的K线数据
+        规划日期对应的归档任务：整月优先下载月度归档，月度归档不存在时回退到日度归档
 
         :param symbol: 交易对，如'BTCUSDT'
         :param timeframe: 时间间隔，如'1m'、'1h'、'1d'等
-        :param date: 日期，格式为'YYYY-MM-DD'
-        :return: K线数据DataFrame
+        :param dates: 日期列表，格式为'YYYY-MM-DD'
+        :return: 归档任务列表
         """
-        url = self.get_zip_url(symbol, timeframe, date)
-        connector = aiohttp.TCPConnector(
-            ssl=ssl.create_default_context(cafile=certifi.where())
+        return plan_archive_tasks(
+            dates,
+            daily_url=lambda date: self.get_zip_url(symbol, timeframe, date),
+            monthly_url=lambda month: self.get_zip_url(symbol, timeframe, month, period='monthly'),
         )
 
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    content = await resp.read()
-                    logger.debug(f"成功下载 {url}")
-
-                    with zipfile.ZipFile(BytesIO(content)) as zipf:
-                        filename = zipf.namelist()[0]
-                        with zipf.open(filename) as csvf:
-                            csv_content = BytesIO(csvf.read())
-                            csv_content.seek(0)
+    def parse_kline_csv(self, stream: IO[bytes]) -> pd.DataFrame:
+        """
+        解析归档中的K线CSV，直接从解压流读取为列式DataFrame
 
-                            first_line = csv_content.readline().decode('utf-8')
-                            csv_content.seek(0)
+        :param stream: 解压流（支持 peek）
+        :return: 以 candle_names 为列名的K线数据
+        """
+        # 新版归档带表头，旧版没有
+        has_header = not stream.peek(1)[:1].isdigit()
+        return pd.read_csv(stream, names=self.candle_names, header=0 if has_header else None)
 
-                            has_header = not first_line.strip()[0].isdigit()
-                            header = 0 if has_header else None
+    async def get_daily_klines(self, symbol, timeframe, date, downloader: Optional[ArchiveDownloader] = None):
+        """
+        异步获取指定日期的K线数据
 
-                            df = pd.read_csv(
-                                csv_content,
-                                names=self.candle_names,
-                                header=header
-                            )
+        :param symbol: 交易对，如'BTCUSDT'
+        :param timeframe: 时间间隔，如'1m'、'1h'、'1d'等
+        :param date: 日期，格式为'YYYY-MM-DD'
+        :param downloader: 共享的归档下载引擎，为None时临时创建
+        :return: K线数据DataFrame，归档不存在时返回None
+        """
+        if downloader is None:
+            async with ArchiveDownloader(concurrency=1) as downloader:
+                return await self.get_daily_klines(symbol, timeframe, date, downloader)
 
-                            df.columns = self.candle_names
+        url = self.get_zip_url(symbol, timeframe, date)
+        df = await downloader.fetch_zip_csv(url, self.parse_kline_csv)
+        if df is None:
+            logger.warning(f"下载失败 {url}，归档不存在")
+            return None
 
-                            logger.info(f"成功处理 {symbol} {timeframe} 数据 ({date}): 共 {len(df)} 条记录, 文件: {filename}, 表头: {'有' if has_header else '无'}")
-                            return df
-                else:
-                    logger.warning(f"下载失败 {url}，状态码: {resp.status}")
-                    return None
+        logger.info(f"成功处理 {symbol} {timeframe} 数据 ({date}): 共 {len(df)} 条记录")
+        return df
 
-    async def download_daily_klines(self, symbol, timeframe, start_date, end_date, progress_callback=None):
+    async def download_daily_klines(
+        self, symbol, timeframe, start_date, end_date, progress_callback=None
+    ):
         """
-        异步下载指定日期范围内的K线数据
+        异步并发下载指定日期范围内的K线数据
+
+        所有归档共用一个连接池会话并发下载，整月优先使用月度归档。结果只保存在内存中，
+        不记录续传状态；需要断点续传时直接使用 ArchiveDownloader，并在 on_result 中持久化。
 
         :param symbol: 交易对，如'BTCUSDT'
         :param timeframe: 时间间隔，如'1m'、'1h'、'1d'等
         :param start_date: 开始日期，格式为'YYYY-MM-DD'
         :param end_date: 结束日期，格式为'YYYY-MM-DD'
         :param progress_callback: 进度回调函数，格式为 callback(symbol, current, total, status)
-        :return: K线数据DataFrame
+        :return: 按开盘时间排序的K线数据DataFrame
         """
-        date_range = get_date_range(start_date, end_date)
-        all_data = []
-        total_dates = len(date_range)
-
-        for idx, date in enumerate(date_range):
-            df = await self.get_daily_klines(symbol, timeframe, date)
-            if df is not None and not df.empty:
-                all_data.append(df)
+        tasks = self.plan_archive_tasks(symbol, timeframe, get_date_range(start_date, end_date))
+        frames = []
 
+        def on_progress(current, total, task):
             if progress_callback:
-                progress_callback(symbol, idx + 1, total_dates, f"Downloaded {date}")
+                progress_callback(symbol, current, total, f"Downloaded {task.label}")
+
+        async with ArchiveDownloader(concurrency=self.download_concurrency) as downloader:
+            stats = await downloader.download(
+                tasks, self.parse_kline_csv,
+                on_result=lambda task, df: frames.append(df),
+                progress_callback=on_progress,
+            )
+        logger.info(f"{symbol} {timeframe} 归档下载完成: {stats}")
 
-        if all_data:
-            return pd.concat(all_data, ignore_index=True)
+        frames = [df for df in frames if not df.empty]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            return df.sort_values('open_time', kind='stable').drop_duplicates('open_time', keep='last').reset_index(drop=True)
         else:
             return pd.DataFrame()
 
@@ -342,21 +360,8 @@ class BinanceDownloader(BaseCollector):
             filtered_df = df.loc[:, ['open_time', 'open', 'high', 'low', 'close', 'volume']]
             filtered_df.columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
 
-            # 统一转换为纳秒级时间戳
-            if not filtered_df.empty:
-                # 根据时间戳长度判断精度并转换为纳秒级
-                def convert_to_nanoseconds(ts):
-                    ts_str = str(int(ts))
-                    if len(ts_str) > 18:  # 已经是纳秒级
-                        return int(ts)
-                    elif len(ts_str) > 15:  # 微秒级
-                        return int(ts) * 1_000
-                    elif len(ts_str) > 12:  # 毫秒级
-                        return int(ts) * 1_000_000
-                    else:  # 秒级
-                        return int(ts) * 1_000_000_000
-                
-                filtered_df['timestamp'] = filtered_df['timestamp'].apply(convert_to_nanoseconds)
+            # 统一转换为纳秒级时间戳（按数值大小逐元素判断精度，新版归档为微秒级）
+            filtered_df['timestamp'] = array_to_nanoseconds(filtered_df['timestamp'].to_numpy())
 
             # 时间范围筛选使用纳秒级时间戳
             start_ts_ns = int(start_datetime.timestamp() * 1_000_000_000)
@@ -85,6 +85,7 @@ class PaperTradingAccount:
         initial_balance: Optional[Dict[str, float]] = None,
         maker_fee: float = 0.001,
         taker_fee: float = 0.001,
+        order_books: Optional[Any] = None,
     ):
         """
         初始化模拟交易账户
@@ -93,6 +94,8 @@ class PaperTradingAccount:
             initial_balance: 初始资金，如 {"USDT": 10000.0, "BTC": 0.5}
             maker_fee: Maker手续费率
             taker_fee: Taker手续费率
+            order_books: 本地订单簿来源（提供 get_book(symbol)，如 realtime.OrderBookManager），
+                设置后按盘口撮合，None时按最新价撮合
         """
         self.balances: Dict[str, float] = initial_balance if initial_balance is not None else {"USDT": 10000.0}
         self.maker_fee = maker_fee
@@ -108,6 +111,9 @@ class PaperTradingAccount:
         # 当前市场价格
         self.market_prices: Dict[str, float] = {}
         
+        # 本地订单簿
+        self.order_books = order_books
+        
         logger.info(f"PaperTradingAccount initialized with balance: {self.balances}")
     
     def update_market_price(self, symbol: str, price: float):
@@ -278,9 +284,22 @@ class PaperTradingAccount:
             "open_order_count": len(self.get_open_orders()),
         }
     
+    def _get_synced_book(self, symbol: str):
+        """获取已同步的本地订单簿"""
+        if self.order_books is None:
+            return None
+        book = self.order_books.get_book(symbol)
+        if book is None or not book.synced:
+            return None
+        return book
+    
     def _process_order(self, order: PaperOrder):
         """处理订单成交"""
         symbol = order.symbol
+        book = self._get_synced_book(symbol)
+        if book is not None and self._process_order_with_book(order, book):
+            return
+        
         current_price = self.market_prices.get(symbol)
         
         if not current_price:
@@ -300,6 +319,35 @@ class PaperTradingAccount:
                 # 卖出限价单：限价 <= 市价，可以成交
                 self._execute_order(order, order.price, order.quantity)
     
+    def _process_order_with_book(self, order: PaperOrder, book) -> bool:
+        """
+        按本地订单簿撮合
+        
+        市价单按吃单均价成交，限价单与对手方最优价比较
+        
+        Returns:
+            bool: 订单簿是否给出了撮合结果（False时回退到最新价撮合）
+        """
+        is_buy = order.side == OrderSide.BUY
+        
+        if order.order_type == OrderType.MARKET:
+            fill = book.vwap("buy" if is_buy else "sell", order.quantity)
+            if fill is None or fill[1] < order.quantity:
+                # 盘口深度不足
+                return False
+            self._execute_order(order, fill[0], order.quantity)
+            return True
+        
+        if order.order_type == OrderType.LIMIT and order.price is not None:
+            best = book.best_ask() if is_buy else book.best_bid()
+            if best is None:
+                return False
+            if (is_buy and order.price >= best[0]) or (not is_buy and order.price <= best[0]):
+                self._execute_order(order, order.price, order.quantity)
+            return True
+        
+        return False
+    
     def _execute_order(self, order: PaperOrder, price: float, quantity: float):
         """执行订单"""
         symbol = order.symbol
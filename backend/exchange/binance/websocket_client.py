@@ -11,6 +11,12 @@ from typing import Optional, Dict, Any, List, Callable
 from datetime import datetime
 import time
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    _json_loads = json.loads
+
 from binance import AsyncClient
 from binance.ws.streams import BinanceSocketManager
 from utils.logger import get_logger, LogType
@@ -32,12 +38,18 @@ class BinanceWebSocketClient(AbstractExchangeClient):
     
     exchange_name: str = "binance"
     
-    def __init__(self, config: Optional[BinanceConfig] = None):
+    # 支持的流类型（kline_<interval> 之外）
+    SUPPORTED_STREAM_TYPES = frozenset({
+        'depth', 'trade', 'aggTrade', 'ticker', 'miniTicker', 'bookTicker',
+    })
+    
+    def __init__(self, config: Optional[BinanceConfig] = None, max_streams_per_connection: int = 200):
         """
         初始化Binance WebSocket客户端
         
         Args:
             config: Binance配置
+            max_streams_per_connection: 每个组合流连接的最大流数量（币安上限1024）
         """
         # 将BinanceConfig转换为字典格式
         if config is None:
@@ -56,9 +68,16 @@ class BinanceWebSocketClient(AbstractExchangeClient):
         self._client: Optional[AsyncClient] = None
         self._socket_manager: Optional[BinanceSocketManager] = None
         self._connected = False
-        self._active_sockets: Dict[str, Any] = {}
         self._callbacks: List[Callable[[Dict[str, Any]], None]] = []
-        self._receive_task: Optional[asyncio.Task] = None
+        
+        # 组合流连接：多个交易对/频道复用一个socket
+        self._max_streams_per_connection = max(1, min(max_streams_per_connection, 1024))
+        self._active_sockets: Dict[str, Any] = {}  # 连接ID -> 组合流socket
+        self._connection_channels: Dict[str, List[str]] = {}  # 连接ID -> 频道列表
+        self._channel_connections: Dict[str, str] = {}  # 频道 -> 连接ID
+        self._stream_channels: Dict[str, str] = {}  # 小写流名 -> 频道
+        self._reader_tasks: Dict[str, asyncio.Task] = {}  # 连接ID -> 接收任务
+        self._connection_seq = 0
         
         # 重连相关
         self._reconnect_enabled = True
@@ -115,40 +134,14 @@ class BinanceWebSocketClient(AbstractExchangeClient):
         try:
             self._connected = False
 
-            # 取消接收任务
-            if self._receive_task:
-                try:
-                    self._receive_task.cancel()
-                    # 等待任务取消，设置超时
-                    await asyncio.wait_for(
-                        asyncio.shield(self._receive_task),
-                        timeout=2.0
-                    )
-                except asyncio.CancelledError:
-                    pass
-                except asyncio.TimeoutError:
-                    logger.warning("接收任务取消超时")
-                except Exception as e:
-                    logger.warning(f"等待接收任务取消时出错: {e}")
-                finally:
-                    self._receive_task = None
-
-            # 关闭所有活跃的socket
-            close_tasks = []
-            for channel, socket in list(self._active_sockets.items()):
-                try:
-                    if hasattr(socket, 'close'):
-                        close_tasks.append(socket.close())
-                except Exception as e:
-                    logger.warning(f"准备关闭socket {channel} 时出错: {e}")
-
-            if close_tasks:
-                try:
-                    await asyncio.gather(*close_tasks, return_exceptions=True)
-                except Exception as e:
-                    logger.warning(f"关闭socket时出错: {e}")
-
-            self._active_sockets.clear()
+            # 取消接收任务并关闭所有组合流连接
+            await asyncio.gather(
+                *(self._close_connection(conn_id) for conn_id in list(self._active_sockets)),
+                return_exceptions=True
+            )
+            self._connection_channels.clear()
+            self._channel_connections.clear()
+            self._stream_channels.clear()
 
             # 关闭客户端连接
             if self._client:
@@ -209,10 +202,32 @@ class BinanceWebSocketClient(AbstractExchangeClient):
         
         return False
     
+    @classmethod
+    def _channel_to_stream(cls, channel: str) -> Optional[str]:
+        """
+        将频道名转换为币安流名
+
+        Args:
+            channel: 频道名，格式如 "BTCUSDT@kline_1m"
+
+        Returns:
+            Optional[str]: 小写流名，不支持的频道返回None
+        """
+        if '@' not in channel:
+            return None
+        symbol, stream_type = channel.split('@', 1)
+        if not symbol:
+            return None
+        if not stream_type.startswith('kline_') and stream_type not in cls.SUPPORTED_STREAM_TYPES:
+            return None
+        return f"{symbol.lower()}@{stream_type}"
+    
     async def subscribe(self, channels: List[str]) -> bool:
         """
         订阅指定的WebSocket频道
         
+        新频道按 max_streams_per_connection 分组，每组使用一个组合流连接
+        
         Args:
             channels: 要订阅的频道列表，格式如 ["BTCUSDT@kline_1m", "ETHUSDT@depth"]
         
@@ -224,58 +239,19 @@ class BinanceWebSocketClient(AbstractExchangeClient):
                 logger.error("WebSocket not connected")
                 return False
             
-            for channel in channels:
-                try:
-                    # 如果已经订阅，跳过
-                    if channel in self._active_sockets:
-                        logger.debug(f"Channel {channel} already subscribed")
-                        continue
-                    
-                    # 解析频道名
-                    if '@' in channel:
-                        symbol, stream_type = channel.split('@', 1)
-                    else:
-                        logger.warning(f"Invalid channel format: {channel}")
-                        continue
-                    
-                    # 根据类型创建对应的socket
-                    if stream_type.startswith('kline_'):
-                        interval = stream_type.split('_', 1)[1]
-                        socket = self._socket_manager.kline_socket(
-                            symbol=symbol,
-                            interval=interval
-                        )
-                    elif stream_type == 'depth':
-                        socket = self._socket_manager.depth_socket(symbol=symbol)
-                    elif stream_type == 'trade':
-                        socket = self._socket_manager.trade_socket(symbol=symbol)
-                    elif stream_type == 'ticker':
-                        socket = self._socket_manager.ticker_socket(symbol=symbol)
-                    else:
-                        logger.warning(f"Unsupported stream type: {stream_type}")
-                        continue
-                    
-                    # 建立WebSocket连接
-                    try:
-                        await socket.connect()
-                        logger.info(f"Socket connected for channel: {channel}")
-                    except Exception as e:
-                        logger.error(f"Failed to connect socket for {channel}: {e}")
-                        continue
-                    
-                    # 存储socket引用
-                    self._active_sockets[channel] = socket
-                    self.subscribed_channels.add(channel)
-                    
-                    logger.info(f"Subscribed to channel: {channel}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to subscribe to {channel}: {e}")
+            new_channels = []
+            for channel in dict.fromkeys(channels):
+                if channel in self._channel_connections:
+                    logger.debug(f"Channel {channel} already subscribed")
+                    continue
+                if self._channel_to_stream(channel) is None:
+                    logger.warning(f"Invalid or unsupported channel: {channel}")
                     continue
+                new_channels.append(channel)
             
-            # 启动消息接收任务（如果未启动）
-            if not self._receive_task or self._receive_task.done():
-                self._receive_task = asyncio.create_task(self._receive_messages())
+            size = self._max_streams_per_connection
+            for i in range(0, len(new_channels), size):
+                await self._open_connection(new_channels[i:i + size])
             
             return True
             
@@ -283,10 +259,76 @@ class BinanceWebSocketClient(AbstractExchangeClient):
             logger.error(f"Error subscribing to channels: {e}")
             return False
     
+    async def _open_connection(self, channels: List[str]) -> Optional[str]:
+        """
+        为一组频道建立组合流连接并启动接收任务
+        
+        Args:
+            channels: 频道列表
+        
+        Returns:
+            Optional[str]: 连接ID，失败返回None
+        """
+        streams = [self._channel_to_stream(channel) for channel in channels]
+        socket = self._socket_manager.multiplex_socket(streams)
+        try:
+            await socket.connect()
+        except Exception as e:
+            logger.error(f"Failed to connect combined stream ({len(streams)} streams): {e}")
+            return None
+        
+        self._connection_seq += 1
+        conn_id = f"combined-{self._connection_seq}"
+        self._active_sockets[conn_id] = socket
+        self._connection_channels[conn_id] = list(channels)
+        for channel, stream in zip(channels, streams):
+            self._channel_connections[channel] = conn_id
+            self._stream_channels[stream] = channel
+            self.subscribed_channels.add(channel)
+        self._reader_tasks[conn_id] = asyncio.create_task(self._receive_messages(conn_id, socket))
+        
+        logger.info(f"Combined stream {conn_id} connected with {len(streams)} streams")
+        return conn_id
+    
+    async def _close_connection(self, conn_id: str) -> List[str]:
+        """
+        关闭组合流连接并取消其接收任务
+        
+        Args:
+            conn_id: 连接ID
+        
+        Returns:
+            List[str]: 该连接承载的频道列表
+        """
+        task = self._reader_tasks.pop(conn_id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await asyncio.wait_for(task, timeout=2.0)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+            except Exception as e:
+                logger.warning(f"等待接收任务 {conn_id} 取消时出错: {e}")
+        
+        socket = self._active_sockets.pop(conn_id, None)
+        if socket is not None and hasattr(socket, 'close'):
+            try:
+                await socket.close()
+            except Exception as e:
+                logger.warning(f"Error closing socket {conn_id}: {e}")
+        
+        channels = self._connection_channels.pop(conn_id, [])
+        for channel in channels:
+            self._channel_connections.pop(channel, None)
+            self._stream_channels.pop(self._channel_to_stream(channel), None)
+        return channels
+    
     async def unsubscribe(self, channels: List[str]) -> bool:
         """
         取消订阅指定的WebSocket频道
         
+        受影响的组合流连接会以剩余频道重建
+        
         Args:
             channels: 要取消订阅的频道列表
         
@@ -294,18 +336,16 @@ class BinanceWebSocketClient(AbstractExchangeClient):
             bool: 取消订阅是否成功
         """
         try:
-            for channel in channels:
-                if channel in self._active_sockets:
-                    try:
-                        socket = self._active_sockets.pop(channel)
-                        if hasattr(socket, 'close'):
-                            await socket.close()
-                    except Exception as e:
-                        logger.warning(f"Error closing socket {channel}: {e}")
-                    
-                    if channel in self.subscribed_channels:
-                        self.subscribed_channels.remove(channel)
-                    
+            removed = set(channels)
+            affected = {self._channel_connections[c] for c in removed if c in self._channel_connections}
+            for conn_id in affected:
+                remaining = [c for c in await self._close_connection(conn_id) if c not in removed]
+                if remaining:
+                    await self._open_connection(remaining)
+            
+            for channel in removed:
+                if channel in self.subscribed_channels:
+                    self.subscribed_channels.remove(channel)
                     logger.info(f"Unsubscribed from channel: {channel}")
             
             return True
@@ -314,6 +354,26 @@ class BinanceWebSocketClient(AbstractExchangeClient):
             logger.error(f"Error unsubscribing from channels: {e}")
             return False
     
+    async def get_depth_snapshot(self, symbol: str, limit: int = 1000) -> Dict[str, Any]:
+        """
+        获取REST深度快照，用于本地订单簿同步
+        
+        Args:
+            symbol: 交易对
+            limit: 档位数量
+        
+        Returns:
+            Dict[str, Any]: {"last_update_id", "bids", "asks"}
+        """
+        if not self._client:
+            raise BinanceConnectionError("WebSocket not connected")
+        depth = await self._client.get_order_book(symbol=symbol.upper(), limit=limit)
+        return {
+            "last_update_id": depth["lastUpdateId"],
+            "bids": [[float(price), float(qty)] for price, qty in depth["bids"]],
+            "asks": [[float(price), float(qty)] for price, qty in depth["asks"]],
+        }
+    
     async def receive_message(self) -> Optional[Dict[str, Any]]:
         """
         接收并处理WebSocket消息
@@ -325,126 +385,125 @@ class BinanceWebSocketClient(AbstractExchangeClient):
         # 这里返回None，因为消息通过回调处理
         return None
     
-    async def _receive_messages(self):
+    def _unwrap_message(self, msg: Any) -> Optional[Dict[str, Any]]:
         """
-        后台任务：接收所有活跃socket的消息（优化版：并发接收）
-        包含连接断开检测和自动重连逻辑
+        拆开组合流消息 {"stream": ..., "data": ...} 并标注频道
+        
+        Args:
+            msg: socket 收到的消息（已解析的字典或原始帧）
+        
+        Returns:
+            Optional[Dict[str, Any]]: 数据消息，无效消息返回None
+        """
+        if isinstance(msg, (str, bytes, bytearray)):
+            msg = _json_loads(msg)
+        if not isinstance(msg, dict):
+            return None
+        
+        stream = msg.get('stream')
+        data = msg.get('data') if stream is not None else msg
+        if not isinstance(data, dict):
+            return None
+        if stream is not None:
+            data['channel'] = self._stream_channels.get(stream, stream)
+        return data
+    
+    async def _receive_messages(self, conn_id: str, socket):
+        """
+        后台任务：持续接收一个组合流连接的消息并交给回调
+        
+        回调只应做轻量操作（如放入解析队列），解析在下游完成
+        连接断开时按重连设置重建该连接承载的频道
+        
+        Args:
+            conn_id: 连接ID
+            socket: 组合流socket
         """
         consecutive_errors = 0
         max_consecutive_errors = 5
-
-        async def receive_from_socket(channel: str, socket):
-            """从单个socket接收消息"""
-            try:
-                # 检查socket是否已关闭
-                if hasattr(socket, '_conn') and socket._conn is None:
-                    logger.warning(f"Socket {channel} connection is None, removing")
-                    return {'type': 'socket_closed', 'channel': channel}
-
-                # 使用asyncio.wait_for设置超时
-                msg = await asyncio.wait_for(socket.recv(), timeout=0.1)
-
-                if msg:
-                    # 解析消息
-                    data = json.loads(msg) if isinstance(msg, str) else msg
-                    # 添加频道信息
-                    data['channel'] = channel
-                    return {'type': 'message', 'data': data}
-
-            except asyncio.TimeoutError:
-                # 超时是正常的
-                return None
-            except Exception as e:
-                error_msg = str(e).lower()
-                # 检查是否是连接关闭的错误
-                if 'read loop has been closed' in error_msg or \
-                   'websocket connection is closed' in error_msg or \
-                   'connection reset' in error_msg:
-                    logger.warning(f"Socket {channel} connection closed: {e}")
-                    return {'type': 'socket_closed', 'channel': channel}
-                else:
-                    logger.error(f"Error receiving message from {channel}: {e}")
-                    return {'type': 'error', 'channel': channel, 'error': e}
-
-            return None
-
+        
         try:
             while self._connected:
                 try:
-                    # 检查是否需要发送ping保持连接
-                    current_time = time.time()
-                    if current_time - self._last_ping_time > self._ping_interval:
-                        # 更新ping时间
-                        self._last_ping_time = current_time
-
-                    # 并发从所有socket接收消息
-                    if self._active_sockets:
-                        tasks = [
-                            receive_from_socket(channel, socket)
-                            for channel, socket in self._active_sockets.items()
-                        ]
-
-                        # 等待所有任务完成，设置整体超时
-                        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                        # 处理结果
-                        has_message = False
-                        for result in results:
-                            if isinstance(result, Exception):
-                                consecutive_errors += 1
-                                continue
-
-                            if result is None:
-                                continue
-
-                            if result['type'] == 'message':
-                                has_message = True
-                                consecutive_errors = 0
-                                data = result['data']
-
-                                # 调用回调（使用create_task避免阻塞）
-                                for callback in self._callbacks:
-                                    try:
-                                        callback(data)
-                                    except Exception as e:
-                                        logger.error(f"[KlinePush] 回调函数执行失败: {e}")
-
-                            elif result['type'] == 'socket_closed':
-                                channel = result['channel']
-                                self._active_sockets.pop(channel, None)
-                                consecutive_errors += 1
-
-                            elif result['type'] == 'error':
-                                consecutive_errors += 1
-
-                    # 如果没有活跃的socket，退出循环
-                    if not self._active_sockets and self.subscribed_channels:
-                        logger.warning("No active sockets but channels still subscribed")
+                    msg = await socket.recv()
+                    data = self._unwrap_message(msg)
+                    if data is None:
+                        continue
+                    
+                    if data.get('e') == 'error':
+                        # python-binance 将连接错误作为消息放入队列
+                        logger.warning(f"Combined stream {conn_id} error: {data.get('type')} {data.get('m')}")
                         consecutive_errors += 1
-
-                    # 如果连续错误过多，尝试重连
-                    if consecutive_errors >= max_consecutive_errors:
-                        logger.warning(f"Too many consecutive errors ({consecutive_errors}), attempting reconnect")
-                        if await self._reconnect():
-                            consecutive_errors = 0
-                        else:
-                            logger.error("Reconnection failed")
+                        if consecutive_errors >= max_consecutive_errors:
                             break
-
-                    # 短暂休眠避免CPU占用过高（如果没有消息，减少CPU使用）
-                    await asyncio.sleep(0.001 if has_message else 0.01)
-
+                        continue
+                    
+                    consecutive_errors = 0
+                    for callback in self._callbacks:
+                        try:
+                            callback(data)
+                        except Exception as e:
+                            logger.error(f"[KlinePush] 回调函数执行失败: {e}")
+                
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
-                    logger.error(f"Error in message receive loop: {e}")
+                    error_msg = str(e).lower()
+                    if 'read loop has been closed' in error_msg or \
+                       'websocket connection is closed' in error_msg or \
+                       'connection reset' in error_msg:
+                        logger.warning(f"Combined stream {conn_id} connection closed: {e}")
+                        break
+                    logger.error(f"Error receiving message from {conn_id}: {e}")
                     consecutive_errors += 1
-                    await asyncio.sleep(1.0)
-
+                    if consecutive_errors >= max_consecutive_errors:
+                        break
+                    await asyncio.sleep(0.1)
+            else:
+                return
+            
+            # 连接失效，重建该连接的频道
+            if self._connected and self._reconnect_enabled:
+                self._reader_tasks.pop(conn_id, None)
+                asyncio.create_task(self._reopen_connection(conn_id))
+        
         except asyncio.CancelledError:
-            logger.info("Message receive task cancelled")
+            logger.info(f"Message receive task for {conn_id} cancelled")
         except Exception as e:
-            logger.error(f"Fatal error in receive messages loop: {e}")
+            logger.error(f"Fatal error in receive loop of {conn_id}: {e}")
         finally:
-            logger.info("Message receive task ended")
+            logger.info(f"Message receive task for {conn_id} ended")
+    
+    async def _reopen_connection(self, conn_id: str) -> bool:
+        """
+        重建失效的组合流连接
+        
+        Args:
+            conn_id: 失效的连接ID
+        
+        Returns:
+            bool: 是否重建成功
+        """
+        channels = await self._close_connection(conn_id)
+        if not channels:
+            return False
+        
+        for attempt in range(1, self._max_reconnect_attempts + 1):
+            self._reconnect_attempts = attempt
+            logger.info(
+                f"Reopening combined stream for {len(channels)} channels "
+                f"(attempt {attempt}/{self._max_reconnect_attempts})"
+            )
+            await asyncio.sleep(self._reconnect_delay)
+            if not self._connected:
+                return False
+            if await self._open_connection(channels):
+                self._reconnect_attempts = 0
+                return True
+        
+        logger.error(f"Max reconnection attempts ({self._max_reconnect_attempts}) reached, falling back to full reconnect")
+        self._reconnect_attempts = 0
+        return await self._reconnect()
     
     def is_connected(self) -> bool:
         """
@@ -465,6 +524,9 @@ class BinanceWebSocketClient(AbstractExchangeClient):
         return {
             'connected': self._connected,
             'active_sockets': len(self._active_sockets),
+            'streams_per_connection': {
+                conn_id: len(channels) for conn_id, channels in self._connection_channels.items()
+            },
             'subscribed_channels': len(self.subscribed_channels),
             'reconnect_attempts': self._reconnect_attempts,
         }
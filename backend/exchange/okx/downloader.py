@@ -4,19 +4,32 @@ OKX数据下载器和收集器
 
 支持 Parquet 格式本地存储，提供更高的压缩率和查询性能。
 """
+import asyncio
 from pathlib import Path
 from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
 import requests
 from utils.logger import get_logger, LogType
-from utils.timestamp_utils import normalize_to_nanoseconds
+from utils.timestamp_utils import array_to_nanoseconds
 from utils.parquet_utils import append_to_parquet
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+from exchange.archive_downloader import ArchiveDownloader
 from exchange.base import BaseCollector
+from exchange.exceptions import ExchangeError
 from utils.decorators import deco_retry
+from utils.time_parser import get_interval_ms
+
+# 历史K线接口单次最多返回的条数
+OKX_CANDLES_LIMIT = 100
+
+# 历史K线接口限速：20次/2秒
+OKX_CANDLES_RATE_LIMIT = 10.0
+
+_CANDLE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'volume_currency', 'unknown']
 
 
 class OKXDownloader(BaseCollector):
@@ -40,6 +53,9 @@ class OKXDownloader(BaseCollector):
         limit_nums: Optional[int] = None,
         symbols=None,
         mode='inc',
+        download_concurrency: int = 8,
+        base_url: str = 'https://www.okx.com/api/v5/market',
+        request_rate: float = OKX_CANDLES_RATE_LIMIT,
     ):
         """
         初始化OKX数据下载器和收集器
@@ -56,6 +72,9 @@ class OKXDownloader(BaseCollector):
         :param limit_nums: 限制收集的标的数量，用于调试
         :param symbols: 交易对列表，如['BTC-USDT', 'ETH-USDT']，如果为None则获取全量交易对
         :param mode: 下载模式，可选'inc'（增量）或'full'（全量），默认'inc'
+        :param download_concurrency: 同一交易对并发请求的分页数
+        :param base_url: 行情接口地址，测试时可指向本地服务
+        :param request_rate: 历史K线接口每秒最多请求数
         """
         super().__init__(
             save_dir=save_dir,
@@ -72,16 +91,60 @@ class OKXDownloader(BaseCollector):
 
         self.candle_type = candle_type
         self.symbols = symbols
-        self.base_url = 'https://www.okx.com/api/v5/market'
+        self.download_concurrency = download_concurrency
+        self.base_url = base_url.rstrip('/')
+        self.request_rate = request_rate
 
     @property
     def _timezone(self):
         """获取时区"""
         return "UTC"
 
-    def download(self, symbol, interval, start_date, end_date):
+    @staticmethod
+    def get_bar(interval):
+        """
+        转换为OKX的K线周期格式，如'1h'转换为'1H'
+
+        :param interval: 时间间隔，如'1m', '1h', '1d'等
+        :return: OKX的K线周期
+        """
+        if interval[-1:] in ('h', 'd', 'w'):
+            return interval[:-1] + interval[-1].upper()
+        return interval
+
+    async def fetch_candle_page(self, downloader, symbol, interval, page_start):
         """
-        下载指定交易对的K线数据
+        获取从 page_start 开始的一页K线
+
+        :param downloader: 共享的下载引擎
+        :param symbol: 交易对符号，如'BTC-USDT'
+        :param interval: 时间间隔
+        :param page_start: 本页第一根K线的开盘时间（毫秒）
+        :return: 原始K线行列表
+        """
+        page_end = page_start + OKX_CANDLES_LIMIT * get_interval_ms(interval)
+        # after 返回早于该时间的K线，before 返回晚于该时间的K线
+        params = {
+            'instId': symbol,
+            'bar': self.get_bar(interval),
+            'after': str(page_end),
+            'before': str(page_start - 1),
+            'limit': str(OKX_CANDLES_LIMIT),
+        }
+        payload = await downloader.fetch_json(f'{self.base_url}/history-candles', params)
+        if not payload:
+            return []
+        if str(payload.get('code', '0')) != '0':
+            raise ExchangeError(f"OKX接口返回错误: {payload.get('msg')}", 'okx')
+        return payload.get('data') or []
+
+    async def download_async(self, symbol, interval, start_date, end_date):
+        """
+        并发下载指定交易对的K线数据
+
+        按接口单页条数将时间范围切分为若干页，所有页共用一个连接池会话并按接口限速并发请求。
+        重试用尽的分页在其余分页完成后再请求一轮，仍然失败的分页不影响已下载的数据，
+        其时间范围 [(开始毫秒, 结束毫秒), ...] 记录在结果的 attrs['failed_ranges'] 中。
 
         :param symbol: 交易对符号，如'BTC-USDT'
         :param interval: 时间间隔，如'1m', '1h', '1d'等
@@ -89,47 +152,69 @@ class OKXDownloader(BaseCollector):
         :param end_date: 结束日期，格式为'YYYY-MM-DD'
         :return: K线数据DataFrame
         """
-        try:
-            start_ts = int(pd.Timestamp(start_date).timestamp() * 1000)
-            end_ts = int(pd.Timestamp(end_date).timestamp() * 1000)
-
-            params = {
-                'instId': symbol,
-                'bar': interval,
-                'after': str(start_ts),
-                'before': str(end_ts),
-                'limit': '100'
-            }
-
-            response = requests.get(f'{self.base_url}/candles', params=params)
-            response.raise_for_status()
-
-            data = response.json()['data']
-
-            if not data:
-                return pd.DataFrame()
-
-            df = pd.DataFrame(
-                data,
-                columns=['open_time', 'open', 'high', 'low', 'close', 'volume', 'volume_currency', 'unknown']
+        start_ts = int(pd.Timestamp(start_date).timestamp() * 1000)
+        end_ts = int(pd.Timestamp(end_date).timestamp() * 1000)
+        page_ms = OKX_CANDLES_LIMIT * get_interval_ms(interval)
+        pending = list(range(start_ts, end_ts + 1, page_ms))
+
+        pages = []
+        async with ArchiveDownloader(concurrency=self.download_concurrency, rate_limit=self.request_rate) as downloader:
+            for _ in range(2):
+                results = await asyncio.gather(
+                    *(self.fetch_candle_page(downloader, symbol, interval, page_start) for page_start in pending),
+                    return_exceptions=True,
+                )
+                failed = []
+                for page_start, result in zip(pending, results):
+                    if isinstance(result, Exception):
+                        failed.append((page_start, result))
+                    else:
+                        pages.append(result)
+                pending = [page_start for page_start, _ in failed]
+                if not pending:
+                    break
+
+        failed_ranges = [(page_start, min(page_start + page_ms, end_ts + 1) - 1) for page_start in pending]
+        if failed:
+            logger.error(
+                f"{symbol} {interval} 有 {len(failed)} 页K线下载失败，已保留其余分页: "
+                f"{failed_ranges}, 首个错误: {failed[0][1]}"
             )
 
-            df['open_time'] = pd.to_numeric(df['open_time'])
-            df['open'] = pd.to_numeric(df['open'])
-            df['high'] = pd.to_numeric(df['high'])
-            df['low'] = pd.to_numeric(df['low'])
-            df['close'] = pd.to_numeric(df['close'])
-            df['volume'] = pd.to_numeric(df['volume'])
+        rows = [row[:len(_CANDLE_COLUMNS)] for page in pages for row in page]
+        if not rows:
+            df = pd.DataFrame()
+            df.attrs['failed_ranges'] = failed_ranges
+            return df
 
-            df = df.sort_values('open_time')
+        # 整批转换为列式数组
+        values = np.array(rows, dtype=object)
+        df = pd.DataFrame({
+            col: values[:, i] for i, col in enumerate(_CANDLE_COLUMNS[:values.shape[1]])
+        })
+        for col in ('open', 'high', 'low', 'close', 'volume'):
+            df[col] = pd.to_numeric(df[col])
 
-            # 统一转换为纳秒级时间戳 (OKX返回的是毫秒级)
-            df['open_time'] = df['open_time'].apply(
-                lambda x: normalize_to_nanoseconds(x, input_precision='ms')
-            )
+        # 统一转换为纳秒级时间戳 (OKX返回的是毫秒级)
+        df['open_time'] = array_to_nanoseconds(pd.to_numeric(df['open_time']).to_numpy(), input_precision='ms')
+        df = df[df['open_time'] <= end_ts * 1_000_000]
 
-            return df
+        df = df.sort_values('open_time').drop_duplicates('open_time').reset_index(drop=True)
+        df.attrs['failed_ranges'] = failed_ranges
+        return df
 
+    def download(self, symbol, interval, start_date, end_date):
+        """
+        下载指定交易对的K线数据（同步接口）
+
+        :param symbol: 交易对符号，如'BTC-USDT'
+        :param interval: 时间间隔，如'1m', '1h', '1d'等
+        :param start_date: 开始日期，格式为'YYYY-MM-DD'
+        :param end_date: 结束日期，格式为'YYYY-MM-DD'
+        :return: K线数据DataFrame
+        """
+        try:
+            return asyncio.run(self.download_async(symbol, interval, start_date, end_date))
         except Exception as e:
             logger.error(f"下载OKX数据失败: {e}")
             return pd.DataFrame()
@@ -233,8 +318,8 @@ class OKXDownloader(BaseCollector):
             df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
             df.columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
 
-            start_timestamp = int(start_datetime.timestamp() * 1000)
-            end_timestamp = int(end_datetime.timestamp() * 1000)
+            start_timestamp = int(start_datetime.timestamp() * 1_000_000_000)
+            end_timestamp = int(end_datetime.timestamp() * 1_000_000_000)
             df = df[(df['timestamp'] >= start_timestamp) & (df['timestamp'] <= end_timestamp)]
 
             logger.info(f"成功下载 {symbol} {interval} 数据，共 {len(df)} 条")
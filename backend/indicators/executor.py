@@ -111,6 +111,36 @@ def _build_kline_dataframe(kline_data: List[Dict[str, Any]]) -> pd.DataFrame:
     return df
 
 
+def _load_kline_dataframe(symbol: str, period: str, limit: int) -> pd.DataFrame:
+    """经进程级K线缓存加载最近 limit 根K线
+    
+    已收线的历史K线在多次执行之间共享，只有最近一个周期的K线会重新查询。
+    
+    Args:
+        symbol: 交易对符号
+        period: K线周期
+        limit: K线条数
+        
+    Returns:
+        包含time(秒)/open/high/low/close/volume列的DataFrame，无数据时为空
+    """
+    from collector.db.kline_cache import read_cached_klines
+    from utils.time_parser import get_interval_ms
+    
+    end_ns = time.time_ns()
+    start_ns = end_ns - (limit + 1) * get_interval_ms(period) * 1_000_000
+    arrays = read_cached_klines(symbol, period, start_ns, end_ns)
+    
+    return pd.DataFrame({
+        "time": arrays.ts[-limit:] // 10**9,
+        "open": arrays.open[-limit:],
+        "high": arrays.high[-limit:],
+        "low": arrays.low[-limit:],
+        "close": arrays.close[-limit:],
+        "volume": arrays.volume[-limit:],
+    })
+
+
 def clean_nan(obj):
     """
     递归清理NaN/Inf值，确保JSON序列化安全
@@ -289,6 +319,9 @@ class IndicatorExecutor:
         *,
         use_mock: bool = False,
         mock_df: pd.DataFrame = None,
+        symbol: Optional[str] = None,
+        period: str = "1h",
+        limit: int = MAX_KLINE_LIMIT,
     ) -> Dict[str, Any]:
         """执行用户Python指标代码
         
@@ -298,6 +331,9 @@ class IndicatorExecutor:
             params: 用户配置的参数字典
             use_mock: 是否使用mock数据
             mock_df: 预生成的mock DataFrame
+            symbol: 交易对符号，未传入kline_data时从共享K线缓存加载该交易对的K线
+            period: K线周期
+            limit: 从缓存加载的K线条数
             
         Returns:
             执行结果字典:
@@ -321,7 +357,16 @@ class IndicatorExecutor:
             limited_data = kline_data[:MAX_KLINE_LIMIT]
             df = _build_kline_dataframe(limited_data)
         else:
-            df = _generate_mock_df(100)
+            df = None
+            if symbol:
+                try:
+                    df = await asyncio.get_event_loop().run_in_executor(
+                        None, _load_kline_dataframe, symbol, period, min(limit, MAX_KLINE_LIMIT)
+                    )
+                except Exception as e:
+                    logger.warning(f"加载K线数据失败，使用mock数据: {symbol} {period}, {e}")
+            if df is None or df.empty:
+                df = _generate_mock_df(100)
         
         # 构建安全执行环境
         exec_env = self._create_safe_exec_env(df, params)
@@ -314,6 +314,9 @@ async def execute_indicator(indicator_id: int, request: ExecuteIndicatorRequest)
             code=code,
             kline_data=[],
             params=request.params or {},
+            symbol=request.symbol,
+            period=request.period,
+            limit=request.limit,
         )
         
         if result["success"]:
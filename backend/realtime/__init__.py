@@ -4,6 +4,9 @@ from .factory import ExchangeClientFactory
 from .websocket_manager import WebSocketManager
 from .data_distributor import DataDistributor
 from .data_processor import DataProcessor
+from .ingest_pipeline import IngestPipeline
+from .order_book import LocalOrderBook, OrderBookManager, OrderBookSnapshot
+from .bar_aggregator import StreamingBarAggregator
 from .config import RealtimeConfig
 from .monitor import RealtimeMonitor
 from .engine import RealtimeEngine
@@ -13,6 +16,11 @@ __all__ = [
     'WebSocketManager',
     'DataDistributor',
     'DataProcessor',
+    'IngestPipeline',
+    'LocalOrderBook',
+    'OrderBookManager',
+    'OrderBookSnapshot',
+    'StreamingBarAggregator',
     'RealtimeConfig',
     'RealtimeMonitor',
     'RealtimeEngine',
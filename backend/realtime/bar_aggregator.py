@@ -0,0 +1,431 @@
+# 流式多周期K线聚合
+import asyncio
+import inspect
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple
+
+import numpy as np
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+MINUTE_MS = 60_000
+DAY_MS = 86_400_000
+# 1970-01-01 是星期四，周线按币安规则从星期一开始
+WEEK_OFFSET_MS = 4 * DAY_MS
+
+# 可选的源数据类型，同一交易对只使用其中一路
+SOURCE_TYPES = ('kline', 'trade', 'aggTrade')
+
+INTERVAL_MS = {
+    '1m': MINUTE_MS, '3m': 3 * MINUTE_MS, '5m': 5 * MINUTE_MS, '15m': 15 * MINUTE_MS, '30m': 30 * MINUTE_MS,
+    '1h': 60 * MINUTE_MS, '2h': 120 * MINUTE_MS, '4h': 240 * MINUTE_MS, '6h': 360 * MINUTE_MS,
+    '8h': 480 * MINUTE_MS, '12h': 720 * MINUTE_MS, '1d': DAY_MS, '3d': 3 * DAY_MS, '1w': 7 * DAY_MS,
+}
+
+
+def bucket_bounds(interval: str, timestamp_ms: int) -> Tuple[int, int]:
+    """
+    计算时间戳所在K线的起止时间
+
+    Args:
+        interval: K线周期（支持月线 1M）
+        timestamp_ms: 毫秒时间戳
+
+    Returns:
+        Tuple[int, int]: (开盘时间, 下一根K线开盘时间)，毫秒
+    """
+    if interval == '1M':
+        dt = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+        start = datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+        end = datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1, tzinfo=timezone.utc)
+        return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+    span = INTERVAL_MS[interval]
+    offset = WEEK_OFFSET_MS if interval == '1w' else 0
+    start = (timestamp_ms - offset) // span * span + offset
+    return start, start + span
+
+
+class _IntervalState:
+    """
+    单个交易对单个周期的聚合状态
+
+    当前K线由两部分组成：已完结分量的累计值和未完结的源K线（只在源为K线时存在），
+    源K线的多次未完结推送会覆盖而不会重复累加。已完结的K线写入定长环形数组。
+    """
+
+    __slots__ = (
+        'interval', 'bucket_start', 'bucket_end', 'contiguous', 'components', 'first_start',
+        'open', 'high', 'low', 'close', 'volume', 'quote_volume', 'trades', 'has_closed',
+        'partial', 'partial_start', 'last_emit',
+        'open_time', 'ohlcv', 'trade_counts', 'count',
+    )
+
+    def __init__(self, interval: str, capacity: int):
+        self.interval = interval
+        self.bucket_start: Optional[int] = None
+        self.bucket_end = 0
+        self.contiguous = False
+        self.partial: Optional[Tuple[float, float, float, float, float, float, int]] = None
+        self.partial_start = 0
+        self.last_emit = 0
+        self._reset_closed()
+        # 环形数组：开盘时间、OHLCV+成交额、成交笔数
+        self.open_time = np.zeros(capacity, dtype=np.int64)
+        self.ohlcv = np.zeros((capacity, 6), dtype=np.float64)
+        self.trade_counts = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def _reset_closed(self) -> None:
+        self.has_closed = False
+        self.components = 0
+        self.first_start = 0
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = self.quote_volume = 0.0
+        self.trades = 0
+
+    def open_bucket(self, start: int, end: int, contiguous: bool) -> None:
+        self.bucket_start = start
+        self.bucket_end = end
+        self.contiguous = contiguous
+        self.partial = None
+        self._reset_closed()
+
+    def fold(self, start: int, o: float, h: float, l: float, c: float, v: float, q: float, n: int) -> None:
+        """累加一个已完结的分量（一根完结的源K线或一笔成交）"""
+        if not self.has_closed:
+            self.has_closed = True
+            self.first_start = start
+            self.open, self.high, self.low = o, h, l
+        else:
+            if h > self.high:
+                self.high = h
+            if l < self.low:
+                self.low = l
+        self.close = c
+        self.volume += v
+        self.quote_volume += q
+        self.trades += n
+        self.components += 1
+
+    def current(self) -> Tuple[float, float, float, float, float, float, int]:
+        """当前K线 (open, high, low, close, volume, quote_volume, trades)"""
+        p = self.partial
+        if p is None:
+            return self.open, self.high, self.low, self.close, self.volume, self.quote_volume, self.trades
+        if not self.has_closed:
+            return p
+        return (
+            self.open, max(self.high, p[1]), min(self.low, p[2]), p[3],
+            self.volume + p[4], self.quote_volume + p[5], self.trades + p[6],
+        )
+
+    @property
+    def has_data(self) -> bool:
+        return self.has_closed or self.partial is not None
+
+    def record(self, values: Tuple[float, float, float, float, float, float, int]) -> None:
+        """写入一根完结K线到环形数组"""
+        i = self.count % len(self.open_time)
+        self.open_time[i] = self.bucket_start
+        self.ohlcv[i] = values[:6]
+        self.trade_counts[i] = values[6]
+        self.count += 1
+
+
+class StreamingBarAggregator:
+    """
+    流式多周期K线聚合器
+
+    每个交易对只需订阅一路源数据（1m K线或 trade/aggTrade 成交）；同时收到多路时只使用
+    配置的源，未配置时使用该交易对最先到达的源，其余源的数据被忽略，避免重复计入成交量。
+    增量维护所有更高周期的当前K线和最近的完结K线，
+    并将未完结（按事件时间节流）和完结K线推送给 KlineSubscriptionManager.push_kline 和注册的消费者。
+    输出格式与 DataProcessor 处理后的K线消息一致（含币安原始格式的 k 字段）。
+    """
+
+    def __init__(
+        self,
+        intervals: Iterable[str] = ('5m', '15m', '1h', '4h', '1d'),
+        source_interval: str = '1m',
+        subscription_manager: Optional[Any] = None,
+        history_size: int = 1000,
+        partial_throttle_ms: int = 1000,
+        exchange: str = 'binance',
+        source: Optional[str] = None,
+    ):
+        """
+        初始化聚合器
+
+        Args:
+            intervals: 需要维护的周期（须为源周期的整数倍）
+            source_interval: 源K线周期，on_kline 只处理该周期的K线
+            subscription_manager: K线订阅管理器（提供 push_kline），None表示不推送
+            history_size: 每个周期保留的完结K线数量
+            partial_throttle_ms: 同一周期未完结K线的最小推送间隔（按事件时间，毫秒）
+            exchange: 输出消息中的交易所名称
+            source: 源数据类型（kline/trade/aggTrade），None表示每个交易对使用最先到达的源
+        """
+        if source is not None and source not in SOURCE_TYPES:
+            raise ValueError(f"不支持的源数据类型: {source}")
+        source_ms = INTERVAL_MS[source_interval]
+        self.intervals: List[str] = []
+        for interval in intervals:
+            if interval != '1M' and (interval not in INTERVAL_MS or INTERVAL_MS[interval] % source_ms):
+                raise ValueError(f"周期 {interval} 不是源周期 {source_interval} 的整数倍")
+            self.intervals.append(interval)
+        self.source_interval = source_interval
+        self.source_ms = source_ms
+        self.subscription_manager = subscription_manager
+        self.history_size = history_size
+        self.partial_throttle_ms = partial_throttle_ms
+        self.exchange = exchange
+        self.source = source
+
+        self._states: Dict[str, List[_IntervalState]] = {}
+        self._sources: Dict[str, str] = {}
+        self._consumers: List[Tuple[Callable[[Dict[str, Any]], None], bool, bool]] = []
+        self.stats = {'source_updates': 0, 'partial_emitted': 0, 'closed_emitted': 0, 'late_dropped': 0,
+                      'source_ignored': 0}
+
+    def register_consumer(self, consumer: Callable[[Dict[str, Any]], None], closed_only: bool = True,
+                          complete_only: bool = True) -> None:
+        """
+        注册聚合K线消费者
+
+        Args:
+            consumer: 回调函数，接收K线消息
+            closed_only: 只接收完结K线
+            complete_only: 只接收覆盖完整周期的K线（聚合开始前已过去的部分周期不推送）
+        """
+        self._consumers.append((consumer, closed_only, complete_only))
+
+    def _symbol_states(self, symbol: str) -> List[_IntervalState]:
+        states = self._states.get(symbol)
+        if states is None:
+            states = self._states[symbol] = [_IntervalState(i, self.history_size) for i in self.intervals]
+        return states
+
+    def _accept_source(self, symbol: str, source: str) -> bool:
+        """同一交易对只接受一路源数据"""
+        expected = self.source or self._sources.setdefault(symbol, source)
+        if expected != source:
+            self.stats['source_ignored'] += 1
+            return False
+        return True
+
+    def on_kline(self, data: Dict[str, Any]) -> None:
+        """
+        源K线消费者（注册到 DataDistributor 的 kline 类型）
+
+        Args:
+            data: DataProcessor 处理后的K线消息
+        """
+        k = data.get('k')
+        if not k or k.get('i') != self.source_interval:
+            return
+        symbol = k.get('s') or data.get('symbol')
+        if not self._accept_source(symbol, 'kline'):
+            return
+        start = int(k['t'])
+        o, h, l, c = float(k['o']), float(k['h']), float(k['l']), float(k['c'])
+        values = (o, h, l, c, float(k['v']), float(k.get('q', 0.0)), int(k.get('n', 0)))
+        final = bool(k.get('x', False))
+        self.stats['source_updates'] += 1
+
+        event_time = int(data.get('E') or k.get('T') or start)
+        for state in self._symbol_states(symbol):
+            if not self._roll(symbol, state, start):
+                continue
+            if state.partial is not None and state.partial_start != start:
+                # 上一根源K线未收到完结消息，按最后一次推送值计入
+                state.fold(state.partial_start, *state.partial)
+                state.partial = None
+            if final:
+                state.partial = None
+                state.fold(start, *values)
+                if start + self.source_ms >= state.bucket_end:
+                    # 周期内最后一根源K线完结，立即收线
+                    self._close(symbol, state)
+                    continue
+            else:
+                state.partial = values
+                state.partial_start = start
+            self._emit_partial(symbol, state, event_time)
+
+    def on_trade(self, data: Dict[str, Any]) -> None:
+        """
+        成交消费者（注册到 DataDistributor 的 trade/aggTrade 类型）
+
+        Args:
+            data: DataProcessor 处理后的成交消息
+        """
+        symbol = data['symbol']
+        if not self._accept_source(symbol, data.get('data_type', 'trade')):
+            return
+        timestamp = int(data['timestamp'])
+        price = float(data['price'])
+        quantity = float(data['quantity'])
+        self.stats['source_updates'] += 1
+
+        for state in self._symbol_states(symbol):
+            if not self._roll(symbol, state, timestamp):
+                continue
+            state.fold(timestamp, price, price, price, price, quantity, price * quantity, 1)
+            self._emit_partial(symbol, state, timestamp)
+
+    def close_expired(self, now_ms: int) -> int:
+        """
+        收掉已到期但没有新数据触发换线的K线（成交稀疏时由定时任务调用）
+
+        Args:
+            now_ms: 当前毫秒时间戳
+
+        Returns:
+            int: 收线数量
+        """
+        closed = 0
+        for symbol, states in self._states.items():
+            for state in states:
+                if state.bucket_start is not None and state.has_data and now_ms >= state.bucket_end:
+                    self._close(symbol, state)
+                    closed += 1
+        return closed
+
+    def _roll(self, symbol: str, state: _IntervalState, timestamp: int) -> bool:
+        """按时间戳切换到所属K线，返回数据是否可以计入"""
+        if state.bucket_start is not None and timestamp < state.bucket_start:
+            self.stats['late_dropped'] += 1
+            return False
+        if state.bucket_start is not None and timestamp < state.bucket_end:
+            return True
+
+        contiguous = False
+        if state.bucket_start is not None:
+            if state.has_data:
+                self._close(symbol, state)
+            contiguous = state.bucket_end == bucket_bounds(state.interval, timestamp)[0]
+        start, end = bucket_bounds(state.interval, timestamp)
+        state.open_bucket(start, end, contiguous)
+        return True
+
+    def _close(self, symbol: str, state: _IntervalState) -> None:
+        values = state.current()
+        state.record(values)
+        message = self._build_message(symbol, state, values, True)
+        state.partial = None
+        # 下一根K线必然与本根相邻
+        state.open_bucket(state.bucket_end, bucket_bounds(state.interval, state.bucket_end)[1], True)
+        self.stats['closed_emitted'] += 1
+        self._emit(symbol, message)
+
+    def _emit_partial(self, symbol: str, state: _IntervalState, event_time: int) -> None:
+        if event_time - state.last_emit < self.partial_throttle_ms:
+            return
+        state.last_emit = event_time
+        self.stats['partial_emitted'] += 1
+        self._emit(symbol, self._build_message(symbol, state, state.current(), False))
+
+    def _is_complete(self, symbol: str, state: _IntervalState) -> bool:
+        if (self.source or self._sources.get(symbol)) == 'kline':
+            # 源为K线时要求周期内的源K线没有缺失（未收到完结消息的源K线按最后一次推送计入）
+            components = state.components + (state.partial is not None)
+            return components == (state.bucket_end - state.bucket_start) // self.source_ms
+        # 成交源无法判断缺失，聚合开始前已过去的部分周期视为不完整
+        return state.contiguous
+
+    def _build_message(self, symbol: str, state: _IntervalState, values, is_final: bool) -> Dict[str, Any]:
+        o, h, l, c, v, q, n = values
+        start, end = state.bucket_start, state.bucket_end
+        return {
+            'exchange': self.exchange,
+            'symbol': symbol,
+            'data_type': 'kline',
+            'interval': state.interval,
+            'open_time': start * 1_000_000,
+            'close_time': (end - 1) * 1_000_000,
+            'timestamp': start * 1_000_000,
+            'open': o, 'high': h, 'low': l, 'close': c,
+            'volume': v, 'quote_volume': q, 'trades': n,
+            'is_final': is_final,
+            'complete': self._is_complete(symbol, state),
+            'aggregated': True,
+            'k': {
+                't': start, 'T': end - 1, 's': symbol, 'i': state.interval,
+                'o': o, 'h': h, 'l': l, 'c': c, 'v': v, 'q': q, 'n': n, 'x': is_final,
+            },
+        }
+
+    def _emit(self, symbol: str, message: Dict[str, Any]) -> None:
+        is_final = message['is_final']
+        complete = message['complete']
+        for consumer, closed_only, complete_only in self._consumers:
+            if (closed_only and not is_final) or (complete_only and not complete):
+                continue
+            try:
+                consumer(message)
+            except Exception as e:
+                logger.error(f"[KlinePush] 聚合K线消费者执行失败: {e}")
+
+        manager = self.subscription_manager
+        if manager is not None and manager.get_subscribed_clients(symbol, message['interval']):
+            result = manager.push_kline(symbol, message['interval'], message)
+            if inspect.isawaitable(result):
+                try:
+                    asyncio.get_running_loop().create_task(result)
+                except RuntimeError:
+                    result.close()
+                    logger.warning("[KlinePush] 没有运行中的事件循环，跳过聚合K线推送")
+
+    def get_current_bar(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        """
+        获取当前未完结的K线
+
+        Args:
+            symbol: 交易对
+            interval: 周期
+
+        Returns:
+            Optional[Dict[str, Any]]: K线消息，没有数据时为None
+        """
+        for state in self._states.get(symbol, []):
+            if state.interval == interval:
+                if state.bucket_start is None or not state.has_data:
+                    return None
+                return self._build_message(symbol, state, state.current(), False)
+        return None
+
+    def get_bars(self, symbol: str, interval: str, include_partial: bool = False) -> Dict[str, np.ndarray]:
+        """
+        获取最近的完结K线（按时间升序的数组副本）
+
+        Args:
+            symbol: 交易对
+            interval: 周期
+            include_partial: 是否在末尾附加当前未完结的K线
+
+        Returns:
+            Dict[str, np.ndarray]: open_time(毫秒)/open/high/low/close/volume/quote_volume/trades
+        """
+        state = next((s for s in self._states.get(symbol, []) if s.interval == interval), None)
+        if state is None:
+            empty = np.empty(0)
+            return {name: empty for name in ('open_time', 'open', 'high', 'low', 'close', 'volume', 'quote_volume', 'trades')}
+
+        capacity = len(state.open_time)
+        n = min(state.count, capacity)
+        order = (np.arange(state.count - n, state.count) % capacity)
+        open_time = state.open_time[order]
+        ohlcv = state.ohlcv[order]
+        trades = state.trade_counts[order]
+        if include_partial and state.bucket_start is not None and state.has_data:
+            values = state.current()
+            open_time = np.append(open_time, state.bucket_start)
+            ohlcv = np.vstack([ohlcv, values[:6]])
+            trades = np.append(trades, values[6])
+        return {
+            'open_time': open_time,
+            'open': ohlcv[:, 0], 'high': ohlcv[:, 1], 'low': ohlcv[:, 2], 'close': ohlcv[:, 3],
+            'volume': ohlcv[:, 4], 'quote_volume': ohlcv[:, 5], 'trades': trades,
+        }
@@ -26,6 +26,17 @@ class RealtimeConfig:
             'binance_max_reconnect': 5,
             'binance_reconnect_delay': 5,
             
+            # 行情接入配置
+            'binance_max_streams_per_connection': 200,  # 每个组合流连接的最大流数量
+            'ingest_parsers': 2,  # 线程解析通道数量
+            'ingest_queue_size': 10000,  # 每个解析通道的队列上限
+            'ingest_batch_size': 256,  # 单次解析的最大消息数
+            'ingest_process_data_types': ['depth'],  # 交给解析进程的数据类型
+            'ingest_process_workers': 0,  # 解析进程数量，0表示只用线程解析
+            'aggregate_intervals': ['5m', '15m', '1h', '4h', '1d'],  # 由1m K线/成交流聚合的周期
+            'aggregate_partial_throttle_ms': 1000,  # 聚合K线未完结推送的最小间隔（毫秒）
+            'aggregate_source': None,  # 聚合源数据类型（kline/trade/aggTrade），None表示每个交易对使用最先到达的源
+            
             # 数据配置
             'symbols': ['BTCUSDT', 'ETHUSDT'],
             'data_types': ['kline'],
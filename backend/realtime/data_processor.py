@@ -5,6 +5,15 @@ from utils.timestamp_utils import normalize_to_nanoseconds
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+
+# 币安事件名与数据类型不一致的映射
+BINANCE_EVENT_TYPES = {
+    'depthUpdate': 'depth',
+    '24hrTicker': 'ticker',
+    '24hrMiniTicker': 'miniTicker',
+}
+
+
 class DataProcessor:
     """数据处理器，负责处理和标准化从WebSocket接收到的数据"""
     
@@ -25,6 +34,24 @@ class DataProcessor:
             'bookTicker'
         }
     
+    @staticmethod
+    def normalize_message(message: Dict[str, Any]) -> bool:
+        """
+        识别原始消息的交易所和数据类型并写入消息
+
+        Args:
+            message: 原始消息
+
+        Returns:
+            bool: 消息是否可以继续处理
+        """
+        if 'e' in message:
+            # 币安消息格式
+            message['exchange'] = 'binance'
+            message['data_type'] = BINANCE_EVENT_TYPES.get(message['e'], message['e'])
+            return True
+        return 'exchange' in message and 'data_type' in message
+
     def process_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         处理消息
@@ -171,15 +198,17 @@ class DataProcessor:
         # 调用通用处理方法
         processed = self._process_generic(message)
         
-        # 标准化深度数据字段名
+        # 标准化深度数据字段名，兼容币安原始字段（s/E/U/u/pu/b/a）
         depth_standard = {
             'exchange': processed['exchange'],
-            'symbol': processed['symbol'],
+            'symbol': processed['symbol'] if 'symbol' in processed else processed['s'],
             'data_type': 'depth',
-            'timestamp': processed['event_time'],
-            'last_update_id': processed['last_update_id'],
-            'bids': processed['bids'],
-            'asks': processed['asks'],
+            'timestamp': processed['event_time'] if 'event_time' in processed else processed['E'],
+            'first_update_id': processed.get('first_update_id', processed.get('U')),
+            'last_update_id': processed['last_update_id'] if 'last_update_id' in processed else processed['u'],
+            'prev_update_id': processed.get('prev_update_id', processed.get('pu')),
+            'bids': [[float(p), float(q)] for p, q in processed.get('bids', processed.get('b', ()))],
+            'asks': [[float(p), float(q)] for p, q in processed.get('asks', processed.get('a', ()))],
             'processed_timestamp': processed['processed_timestamp']
         }
         
@@ -198,23 +227,26 @@ class DataProcessor:
         # 调用通用处理方法
         processed = self._process_generic(message)
         
-        # 标准化聚合交易数据字段名
+        # 标准化聚合交易数据字段名，兼容币安原始字段（s/T/a/p/q/f/l/m）
         aggtrade_standard = {
             'exchange': processed['exchange'],
-            'symbol': processed['symbol'],
+            'symbol': processed['symbol'] if 'symbol' in processed else processed['s'],
             'data_type': 'aggTrade',
-            'timestamp': processed['trade_time'],
-            'agg_trade_id': processed['agg_trade_id'],
-            'price': processed['price'],
-            'quantity': processed['quantity'],
-            'first_trade_id': processed['first_trade_id'],
-            'last_trade_id': processed['last_trade_id'],
-            'is_buyer_maker': processed['is_buyer_maker'],
+            'timestamp': processed['trade_time'] if 'trade_time' in processed else processed['T'],
+            'agg_trade_id': processed['agg_trade_id'] if 'agg_trade_id' in processed else processed['a'],
+            'price': float(processed['price'] if 'price' in processed else processed['p']),
+            'quantity': float(processed['quantity'] if 'quantity' in processed else processed['q']),
+            'first_trade_id': processed.get('first_trade_id', processed.get('f')),
+            'last_trade_id': processed.get('last_trade_id', processed.get('l')),
+            'is_buyer_maker': processed.get('is_buyer_maker', processed.get('m')),
             'processed_timestamp': processed['processed_timestamp']
         }
         
         return aggtrade_standard
     
+    # process_message 按 "_process_{交易所}_{数据类型}" 查找处理方法，数据类型为 aggTrade
+    _process_binance_aggTrade = _process_binance_aggtrade
+    
     def _process_binance_trade(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         处理币安交易数据
@@ -228,18 +260,18 @@ class DataProcessor:
         # 调用通用处理方法
         processed = self._process_generic(message)
         
-        # 标准化交易数据字段名
+        # 标准化交易数据字段名，兼容币安原始字段（s/T/t/p/q/b/a/m）
         trade_standard = {
             'exchange': processed['exchange'],
-            'symbol': processed['symbol'],
+            'symbol': processed['symbol'] if 'symbol' in processed else processed['s'],
             'data_type': 'trade',
-            'timestamp': processed['trade_time'],
-            'trade_id': processed['trade_id'],
-            'price': processed['price'],
-            'quantity': processed['quantity'],
-            'buyer_order_id': processed['buyer_order_id'],
-            'seller_order_id': processed['seller_order_id'],
-            'is_buyer_maker': processed['is_buyer_maker'],
+            'timestamp': processed['trade_time'] if 'trade_time' in processed else processed['T'],
+            'trade_id': processed['trade_id'] if 'trade_id' in processed else processed['t'],
+            'price': float(processed['price'] if 'price' in processed else processed['p']),
+            'quantity': float(processed['quantity'] if 'quantity' in processed else processed['q']),
+            'buyer_order_id': processed.get('buyer_order_id', processed.get('b')),
+            'seller_order_id': processed.get('seller_order_id', processed.get('a')),
+            'is_buyer_maker': processed.get('is_buyer_maker', processed.get('m')),
             'processed_timestamp': processed['processed_timestamp']
         }
         
@@ -9,6 +9,10 @@ from .factory import ExchangeClientFactory
 from .websocket_manager import WebSocketManager
 from .data_processor import DataProcessor
 from .data_distributor import DataDistributor
+from .ingest_pipeline import IngestPipeline
+from .order_book import OrderBookManager
+from .bar_aggregator import StreamingBarAggregator
+from .kline_subscription import kline_subscription_manager
 from .config import RealtimeConfig
 from .monitor import RealtimeMonitor
 
@@ -25,6 +29,14 @@ class RealtimeEngine:
         self.data_distributor = DataDistributor()
         self.config = RealtimeConfig()
         self.monitor = RealtimeMonitor(interval=self.config.get_config('monitor_interval'))
+        self.pipeline = self._create_pipeline()
+        self.order_books = OrderBookManager(snapshot_fetcher=self._fetch_depth_snapshot)
+        self.bar_aggregator = StreamingBarAggregator(
+            intervals=self.config.get_config('aggregate_intervals', []),
+            subscription_manager=kline_subscription_manager,
+            partial_throttle_ms=self.config.get_config('aggregate_partial_throttle_ms', 1000),
+            source=self.config.get_config('aggregate_source'),
+        )
 
         # 运行状态
         self.running = False
@@ -33,19 +45,84 @@ class RealtimeEngine:
         # 初始化组件间的连接
         self._init_component_connections()
 
+    def _create_pipeline(self) -> IngestPipeline:
+        """
+        根据配置创建行情接入流水线
+
+        Returns:
+            IngestPipeline: 行情接入流水线
+        """
+        return IngestPipeline(
+            self.data_processor,
+            self.data_distributor,
+            self.monitor,
+            num_parsers=self.config.get_config('ingest_parsers', 2),
+            queue_size=self.config.get_config('ingest_queue_size', 10000),
+            batch_size=self.config.get_config('ingest_batch_size', 256),
+            process_data_types=self.config.get_config('ingest_process_data_types', ['depth']),
+            process_workers=self.config.get_config('ingest_process_workers', 0),
+        )
+
     def _init_component_connections(self) -> None:
         """
         初始化组件间的连接
         """
         # 注册消息处理器到WebSocket管理器
-        self.ws_manager.add_message_handler(self._handle_message)
+        self.ws_manager.add_message_handler(self._on_raw_message)
+
+        # 本地订单簿作为深度数据消费者
+        self.data_distributor.register_consumer('depth', self.order_books.on_depth)
+
+        # 多周期K线由一路1m K线或成交流聚合
+        self.data_distributor.register_consumer('kline', self.bar_aggregator.on_kline)
+        self.data_distributor.register_consumer('trade', self.bar_aggregator.on_trade)
+        self.data_distributor.register_consumer('aggTrade', self.bar_aggregator.on_trade)
 
         # 注册监控器到数据处理器（可选，用于性能监控）
         # 注意：这里需要根据实际情况调整，可能需要修改DataProcessor来支持监控
 
+    async def _fetch_depth_snapshot(self, symbol: str) -> Dict[str, Any]:
+        """
+        从默认交易所客户端获取深度快照，供本地订单簿重新同步
+
+        Args:
+            symbol: 交易对
+
+        Returns:
+            Dict[str, Any]: {"last_update_id", "bids", "asks"}
+        """
+        client = self.ws_manager.get_client(self.config.get_config('default_exchange'))
+        if client is None or not hasattr(client, 'get_depth_snapshot'):
+            raise RuntimeError(f"交易所客户端不支持深度快照: {symbol}")
+        return await client.get_depth_snapshot(symbol)
+
+    def get_order_book(self, symbol: str):
+        """
+        获取交易对的本地订单簿
+
+        Args:
+            symbol: 交易对
+
+        Returns:
+            Optional[LocalOrderBook]: 本地订单簿，未收到深度数据时为None
+        """
+        return self.order_books.get_book(symbol)
+
+    def _on_raw_message(self, message: Dict[str, Any]) -> None:
+        """
+        接收客户端推送的原始消息：流水线运行时只入队，否则同步处理
+
+        Args:
+            message: 接收到的原始消息
+        """
+        if self.pipeline.running:
+            self.pipeline.submit(message)
+        else:
+            self._handle_message(message)
+
     def _handle_message(self, message: Dict[str, Any]) -> None:
         """
-        处理接收到的消息
+        同步处理接收到的消息
 
         Args:
             message: 接收到的消息
@@ -56,11 +133,7 @@ class RealtimeEngine:
 
             # 【KlinePush】自动识别并添加必要字段
             # 从币安消息中识别交易所和数据类型
-            if 'e' in message:
-                # 币安消息格式
-                message['exchange'] = 'binance'
-                message['data_type'] = message['e']
-            elif 'exchange' not in message or 'data_type' not in message:
+            if not self.data_processor.normalize_message(message):
                 logger.warning(f"[KlinePush] 消息缺少exchange/data_type字段，无法处理: {message}")
                 return
 
@@ -114,7 +187,8 @@ class RealtimeEngine:
             "connected_exchanges": connected_clients,
             "total_exchanges": len(self.ws_manager.get_all_clients()),
             "config": self.config.get_config(),
-            "stats": monitor_stats
+            "stats": monitor_stats,
+            "ingest": self.pipeline.get_stats()
         }
 
     def get_config(self) -> Dict[str, Any]:
@@ -151,6 +225,13 @@ class RealtimeEngine:
         # 更新监控间隔
         self.monitor.interval = self.config.get_config('monitor_interval')
 
+        # 流水线未运行时按新配置重建，运行中的流水线在下次启动时生效
+        if not self.pipeline.running:
+            self.pipeline = self._create_pipeline()
+
+        # 聚合周期变化需要重建状态，这里只更新推送节流
+        self.bar_aggregator.partial_throttle_ms = self.config.get_config('aggregate_partial_throttle_ms', 1000)
+
         # 更新其他组件配置...
 
     async def start(self) -> bool:
@@ -175,10 +256,14 @@ class RealtimeEngine:
             # 启动监控器
             self.monitor.start()
 
+            # 启动行情接入流水线
+            await self.pipeline.start()
+
             # 创建交易所客户端（但不连接）
             success = await self._create_clients()
             if not success:
                 logger.error("创建交易所客户端失败")
+                await self.pipeline.stop(drain=False)
                 self.monitor.stop()
                 return False
 
@@ -317,6 +402,13 @@ class RealtimeEngine:
                 logger.error(f"断开交易所连接时出错: {e}")
                 logger.exception(e)
 
+            # 停止行情接入流水线（处理完已接收的消息）
+            try:
+                await self.pipeline.stop()
+            except Exception as e:
+                logger.error(f"停止行情接入流水线时出错: {e}")
+                logger.exception(e)
+
             # 停止监控器
             try:
                 self.monitor.stop()
@@ -56,7 +56,10 @@ class ExchangeClientFactory:
                     api_secret=config.get('api_secret', ''),
                     testnet=config.get('testnet', True),
                 )
-                client = client_class(binance_config)
+                client = client_class(
+                    binance_config,
+                    max_streams_per_connection=config.get('binance_max_streams_per_connection', 200),
+                )
             else:
                 # 其他交易所直接使用字典
                 client = client_class(config)
@@ -0,0 +1,292 @@
+# 行情接入流水线
+import asyncio
+import time
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+from .data_processor import DataProcessor
+from .data_distributor import DataDistributor
+from .monitor import RealtimeMonitor
+
+# 解析进程内的数据处理器（每个进程创建一次）
+_worker_processor: Optional[DataProcessor] = None
+
+
+def _process_batch(processor: DataProcessor, batch: List[Dict[str, Any]]) -> List[Tuple[Optional[Dict[str, Any]], float]]:
+    """
+    批量处理消息（在解析线程或解析进程中执行）
+
+    Args:
+        processor: 数据处理器
+        batch: 已识别类型的原始消息列表
+
+    Returns:
+        List[Tuple[Optional[Dict[str, Any]], float]]: (处理结果, 处理耗时秒) 列表
+    """
+    results = []
+    for message in batch:
+        start_time = time.perf_counter()
+        processed = processor.process_message(message)
+        results.append((processed, time.perf_counter() - start_time))
+    return results
+
+
+def _process_batch_in_worker(batch: List[Dict[str, Any]]) -> List[Tuple[Optional[Dict[str, Any]], float]]:
+    """解析进程入口，复用进程内的数据处理器"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DataProcessor()
+    return _process_batch(_worker_processor, batch)
+
+
+class _ParserLane:
+    """单个解析通道：一个有界队列 + 一个解析协程，同一交易对的消息固定落在同一通道以保持顺序"""
+
+    def __init__(self, name: str, queue_size: int, executor: Executor, use_process: bool):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = executor
+        self.use_process = use_process
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.max_depth = 0
+
+
+class IngestPipeline:
+    """
+    行情接入流水线
+
+    客户端回调只负责把原始消息放入有界队列，解析在线程池（或进程池）中批量执行，
+    解析结果回到事件循环后交给 DataDistributor 分发，避免大量订阅时阻塞事件循环。
+    队列满时丢弃该通道最旧的消息并计数。
+    """
+
+    def __init__(
+        self,
+        processor: DataProcessor,
+        distributor: DataDistributor,
+        monitor: Optional[RealtimeMonitor] = None,
+        num_parsers: int = 2,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        process_data_types: Iterable[str] = ('depth',),
+        process_workers: int = 0,
+    ):
+        """
+        初始化行情接入流水线
+
+        Args:
+            processor: 数据处理器
+            distributor: 数据分发器
+            monitor: 实时监控器，None表示不记录
+            num_parsers: 线程解析通道数量
+            queue_size: 每个通道的队列上限
+            batch_size: 单次解析的最大消息数
+            process_data_types: 交给解析进程处理的数据类型（仅在 process_workers > 0 时生效）
+            process_workers: 解析进程数量，0表示全部在线程中解析
+        """
+        self.processor = processor
+        self.distributor = distributor
+        self.monitor = monitor
+        self.num_parsers = max(1, num_parsers)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.process_data_types = frozenset(process_data_types) if process_workers > 0 else frozenset()
+        self.process_workers = process_workers
+
+        self.running = False
+        self._thread_lanes: List[_ParserLane] = []
+        self._process_lanes: List[_ParserLane] = []
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+
+        self.stats = {
+            'received': 0,
+            'invalid': 0,
+            'processed': 0,
+            'failed': 0,
+            'batches': 0,
+            'dropped': 0,
+        }
+
+    async def start(self) -> bool:
+        """
+        启动解析通道
+
+        Returns:
+            bool: 启动是否成功
+        """
+        if self.running:
+            logger.warning("行情接入流水线已在运行")
+            return False
+
+        self._thread_executor = ThreadPoolExecutor(max_workers=self.num_parsers, thread_name_prefix="ingest-parser")
+        self._thread_lanes = [
+            _ParserLane(f"thread-{i}", self.queue_size, self._thread_executor, False)
+            for i in range(self.num_parsers)
+        ]
+        if self.process_data_types:
+            self._process_executor = ProcessPoolExecutor(max_workers=self.process_workers)
+            self._process_lanes = [
+                _ParserLane(f"process-{i}", self.queue_size, self._process_executor, True)
+                for i in range(self.process_workers)
+            ]
+
+        for lane in self._thread_lanes + self._process_lanes:
+            lane.task = asyncio.create_task(self._run_lane(lane))
+
+        self.running = True
+        logger.info(
+            f"行情接入流水线启动成功: 线程通道={len(self._thread_lanes)}, 进程通道={len(self._process_lanes)}"
+        )
+        return True
+
+    async def stop(self, drain: bool = True, timeout: float = 5.0) -> bool:
+        """
+        停止解析通道
+
+        Args:
+            drain: 是否先处理完队列中的消息
+            timeout: 等待队列清空的超时时间（秒）
+
+        Returns:
+            bool: 停止是否成功
+        """
+        if not self.running:
+            return False
+
+        self.running = False
+        lanes = self._thread_lanes + self._process_lanes
+        if drain:
+            try:
+                await asyncio.wait_for(self.join(lanes), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("行情接入流水线清空队列超时，剩余消息将被丢弃")
+
+        for lane in lanes:
+            if lane.task:
+                lane.task.cancel()
+        await asyncio.gather(*(lane.task for lane in lanes if lane.task), return_exceptions=True)
+
+        if self._thread_executor:
+            self._thread_executor.shutdown(wait=False)
+            self._thread_executor = None
+        if self._process_executor:
+            self._process_executor.shutdown(wait=False, cancel_futures=True)
+            self._process_executor = None
+
+        self._thread_lanes = []
+        self._process_lanes = []
+        logger.info("行情接入流水线已停止")
+        return True
+
+    async def join(self, lanes: Optional[List[_ParserLane]] = None) -> None:
+        """等待所有已提交的消息处理并分发完成"""
+        lanes = lanes if lanes is not None else self._thread_lanes + self._process_lanes
+        await asyncio.gather(*(lane.queue.join() for lane in lanes))
+
+    def submit(self, message: Dict[str, Any]) -> bool:
+        """
+        提交一条原始消息（在事件循环中调用，不阻塞）
+
+        Args:
+            message: 原始消息
+
+        Returns:
+            bool: 是否已入队
+        """
+        if not self.running:
+            return False
+
+        self.stats['received'] += 1
+        if not isinstance(message, dict) or not self.processor.normalize_message(message):
+            self.stats['invalid'] += 1
+            return False
+
+        lane = self._select_lane(message)
+        queue = lane.queue
+        if queue.full():
+            # 丢弃最旧的消息，保证最新行情优先
+            queue.get_nowait()
+            queue.task_done()
+            lane.dropped += 1
+            self.stats['dropped'] += 1
+        queue.put_nowait(message)
+        depth = queue.qsize()
+        if depth > lane.max_depth:
+            lane.max_depth = depth
+        return True
+
+    def _select_lane(self, message: Dict[str, Any]) -> _ParserLane:
+        """按数据类型选择线程/进程通道，按交易对哈希选择具体通道"""
+        lanes = self._process_lanes if message['data_type'] in self.process_data_types else self._thread_lanes
+        if len(lanes) == 1:
+            return lanes[0]
+        symbol = message.get('s') or message.get('symbol') or ''
+        return lanes[zlib.crc32(symbol.encode()) % len(lanes)]
+
+    async def _run_lane(self, lane: _ParserLane) -> None:
+        """解析协程：批量取出消息交给执行器解析，再在事件循环中分发"""
+        loop = asyncio.get_running_loop()
+        queue = lane.queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                if lane.use_process:
+                    results = await loop.run_in_executor(lane.executor, _process_batch_in_worker, batch)
+                else:
+                    results = await loop.run_in_executor(lane.executor, _process_batch, self.processor, batch)
+                self._dispatch(batch, results)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[KlinePush] 解析通道 {lane.name} 处理批量消息失败: {e}")
+                self.stats['failed'] += len(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _dispatch(self, batch: List[Dict[str, Any]], results: List[Tuple[Optional[Dict[str, Any]], float]]) -> None:
+        """记录监控并分发一批处理结果"""
+        self.stats['batches'] += 1
+        monitor = self.monitor
+        for message, (processed, processing_time) in zip(batch, results):
+            if processed:
+                self.stats['processed'] += 1
+                if monitor:
+                    monitor.record_message(processed.get('data_type', 'unknown'), True, processing_time)
+                self.distributor.distribute(processed)
+            else:
+                self.stats['failed'] += 1
+                if monitor:
+                    monitor.record_message(message.get('data_type', 'unknown'), False)
+        if monitor:
+            monitor.monitor()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取流水线统计信息
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        lanes = self._thread_lanes + self._process_lanes
+        return {
+            **self.stats,
+            'running': self.running,
+            'lanes': {
+                lane.name: {
+                    'queue_size': lane.queue.qsize(),
+                    'max_queue_size': lane.max_depth,
+                    'dropped': lane.dropped,
+                }
+                for lane in lanes
+            },
+        }
@@ -3,26 +3,41 @@
 K线数据持久化模块
 
 当收到完结的K线数据(is_final=True)时，自动保存到数据库
+
+完结K线先进入批量写入缓冲区，按条数或时间间隔合并为一次UPSERT写入，
+避免每根K线单独开启会话和查询。写入结果通过 Future 返回，消费者线程不等待数据库写入
 """
 
-from typing import Dict, Any
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
 from utils.logger import get_logger, LogType
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+from collector.db.kline_writer import KlineBulkWriter
 from collector.db.models import CryptoSpotKline
-from collector.db.database import SessionLocal
+from utils.timestamp_utils import to_nanoseconds
 
 
 class KlinePersistenceConsumer:
     """K线数据持久化消费者"""
 
-    def __init__(self):
-        """初始化持久化消费者"""
-        self.db_session = None
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0):
+        """初始化持久化消费者
+
+        Args:
+            batch_size: 触发批量写入的缓冲K线条数
+            flush_interval: 最长缓冲时间（秒）
+        """
+        self.writer = KlineBulkWriter(
+            CryptoSpotKline.__tablename__,
+            data_source='binance_websocket',
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
         logger.info("KlinePersistenceConsumer initialized")
 
-    def process_kline(self, data: Dict[str, Any]) -> bool:
+    def process_kline(self, data: Dict[str, Any]) -> Optional[Future]:
         """
         处理K线数据，只保存完结的K线
 
@@ -30,106 +45,81 @@ class KlinePersistenceConsumer:
             data: K线数据，包含k字段
 
         Returns:
-            bool: 是否成功保存
+            Optional[Future]: 写入结果（所在批次提交后为True，最终未能写入为False），
+                未完结或无效的K线返回None
         """
         try:
             # 获取K线数据
             kline = data.get('k', {})
             if not kline:
-                return False
+                return None
 
             # 只处理完结的K线
             is_final = kline.get('x', False)
             if not is_final:
                 # K线未完结，跳过
-                return False
+                return None
 
             # 保存到数据库
             return self._save_to_database(kline)
 
         except Exception as e:
             logger.error(f"[KlinePersistence] 处理K线数据失败: {e}")
-            return False
+            return None
 
-    def _save_to_database(self, kline: Dict[str, Any]) -> bool:
+    def _save_to_database(self, kline: Dict[str, Any]) -> Optional[Future]:
         """
-        保存K线数据到数据库
+        将K线数据加入批量写入缓冲区
 
         Args:
             kline: 币安K线数据格式
 
         Returns:
-            bool: 是否成功保存
+            Optional[Future]: 写入结果，K线缺少必要字段时返回None
         """
-        db = None
         try:
             # 提取字段
             symbol = kline.get('s', '')
             interval = kline.get('i', '')
-            timestamp = kline.get('t', 0)
-            open_price = float(kline.get('o', 0))
-            high_price = float(kline.get('h', 0))
-            low_price = float(kline.get('l', 0))
-            close_price = float(kline.get('c', 0))
-            volume = float(kline.get('v', 0))
-            quote_volume = float(kline.get('q', 0))
+            timestamp = to_nanoseconds(kline.get('t', 0), input_precision='ms')
 
             if not symbol or not interval or not timestamp:
                 logger.warning(f"[KlinePersistence] K线数据缺少必要字段: symbol={symbol}, interval={interval}, timestamp={timestamp}")
-                return False
+                return None
 
             # 转换symbol格式 BTCUSDT -> BTC/USDT
             base_symbol = symbol.replace('USDT', '/USDT').replace('BTC', '/BTC').replace('ETH', '/ETH')
             if '/' not in base_symbol:
                 base_symbol = f"{symbol[:-4]}/{symbol[-4:]}" if symbol.endswith('USDT') else symbol
 
-            # 创建数据库会话
-            db = SessionLocal()
-
-            # 检查是否已存在相同记录
-            existing = db.query(CryptoSpotKline).filter(
-                CryptoSpotKline.symbol == base_symbol,
-                CryptoSpotKline.interval == interval,
-                CryptoSpotKline.timestamp == timestamp
-            ).first()
-
-            if existing:
-                # 更新现有记录
-                existing.open = str(open_price)
-                existing.high = str(high_price)
-                existing.low = str(low_price)
-                existing.close = str(close_price)
-                existing.volume = str(volume)
-                logger.debug(f"[KlinePersistence] 更新K线数据: {symbol}@{interval}, timestamp={timestamp}")
-            else:
-                # 创建新记录
-                kline_record = CryptoSpotKline(
-                    symbol=base_symbol,
-                    interval=interval,
-                    timestamp=str(timestamp),
-                    open=str(open_price),
-                    high=str(high_price),
-                    low=str(low_price),
-                    close=str(close_price),
-                    volume=str(volume),
-                    unique_kline=f"{base_symbol}_{interval}_{timestamp}",
-                    data_source='binance_websocket'
-                )
-                db.add(kline_record)
-                logger.info(f"[KlinePersistence] 保存新K线数据: {symbol}@{interval}, timestamp={timestamp}, close={close_price}")
-
-            # 提交事务
-            db.commit()
-            return True
+            future = self.writer.add((
+                base_symbol,
+                interval,
+                timestamp,
+                float(kline.get('o', 0)),
+                float(kline.get('h', 0)),
+                float(kline.get('l', 0)),
+                float(kline.get('c', 0)),
+                float(kline.get('v', 0)),
+            ))
+            logger.debug(f"[KlinePersistence] K线加入写入缓冲: {symbol}@{interval}, timestamp={timestamp}")
+            return future
 
         except Exception as e:
             logger.error(f"[KlinePersistence] 保存K线数据到数据库失败: {e}")
-            if db:
-                db.rollback()
-            return False
-        finally:
-            if db:
-                db.close()
+            return None
+
+    def flush(self) -> int:
+        """立即写出缓冲区中的K线
+
+        Returns:
+            int: 写入的K线条数
+        """
+        return self.writer.flush()
+
+    def close(self) -> None:
+        """停止后台写入线程并写出剩余K线"""
+        self.writer.close()
 
 
 # 全局持久化消费者实例
@@ -152,8 +152,11 @@ class RealtimeMonitor:
         
         # 更新性能统计
         if processing_time > 0:
-            self.stats['processing_times'].append(processing_time)
-            self.stats['average_processing_time'] = sum(self.stats['processing_times']) / len(self.stats['processing_times'])
+            processing_times = self.stats['processing_times']
+            processing_times.append(processing_time)
+            # 增量更新均值，避免每条消息都对全部历史求和
+            average = self.stats['average_processing_time']
+            self.stats['average_processing_time'] = average + (processing_time - average) / len(processing_times)
             self.stats['max_processing_time'] = max(self.stats['max_processing_time'], processing_time)
             self.stats['min_processing_time'] = min(self.stats['min_processing_time'], processing_time)
     
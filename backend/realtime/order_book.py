@@ -0,0 +1,501 @@
+# 本地订单簿
+import asyncio
+import inspect
+import json
+import time
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple, Union
+
+import numpy as np
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+from .data_processor import DataProcessor
+
+
+class _BookSide:
+    """
+    订单簿单边档位
+
+    价格和数量分别存放在连续的 array('d') 中，按排序键升序排列，最优价位于末尾：
+    买盘排序键为价格，卖盘排序键为负价格。最优价读取 O(1)，档位查找 O(log n)，
+    增删档位为一次内存移动。
+    """
+
+    __slots__ = ('_sign', '_keys', '_sizes')
+
+    def __init__(self, is_bid: bool):
+        self._sign = 1.0 if is_bid else -1.0
+        self._keys = array('d')
+        self._sizes = array('d')
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self) -> None:
+        del self._keys[:]
+        del self._sizes[:]
+
+    def set(self, price: float, size: float) -> None:
+        """设置档位数量，数量为0时删除档位"""
+        key = self._sign * price
+        keys = self._keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size > 0:
+                self._sizes[i] = size
+            else:
+                del keys[i]
+                del self._sizes[i]
+        elif size > 0:
+            keys.insert(i, key)
+            self._sizes.insert(i, size)
+
+    def load(self, levels: Iterable[Iterable[Any]]) -> None:
+        """用快照档位整体替换"""
+        pairs = sorted((self._sign * float(p), float(q)) for p, q in levels if float(q) > 0)
+        self._keys = array('d', (k for k, _ in pairs))
+        self._sizes = array('d', (q for _, q in pairs))
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self._keys:
+            return None
+        return self._sign * self._keys[-1], self._sizes[-1]
+
+    def get(self, price: float) -> float:
+        key = self._sign * price
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._sizes[i]
+        return 0.0
+
+    def walk(self, size: float) -> Tuple[float, float]:
+        """从最优价开始吃单，返回 (成交额, 成交量)"""
+        keys, sizes = self._keys, self._sizes
+        notional = filled = 0.0
+        i = len(keys) - 1
+        while i >= 0 and filled < size:
+            take = min(sizes[i], size - filled)
+            notional += take * self._sign * keys[i]
+            filled += take
+            i -= 1
+        return notional, filled
+
+    def top(self, depth: int) -> Tuple[np.ndarray, np.ndarray]:
+        """最优的 depth 档价格和数量（最优在前）"""
+        n = min(depth, len(self._keys)) if depth else len(self._keys)
+        if n == 0:
+            return np.empty(0), np.empty(0)
+        start = len(self._keys) - n
+        prices = np.frombuffer(self._keys[start:], dtype=np.float64)[::-1] * self._sign
+        sizes = np.frombuffer(self._sizes[start:], dtype=np.float64)[::-1]
+        return prices, sizes
+
+
+@dataclass(slots=True)
+class OrderBookSnapshot:
+    """订单簿快照视图（最优价在前的只读数组）"""
+    symbol: str
+    last_update_id: int
+    timestamp: Optional[int]
+    bid_prices: np.ndarray
+    bid_sizes: np.ndarray
+    ask_prices: np.ndarray
+    ask_sizes: np.ndarray
+
+    def __post_init__(self):
+        for values in (self.bid_prices, self.bid_sizes, self.ask_prices, self.ask_sizes):
+            values.flags.writeable = False
+
+
+class LocalOrderBook:
+    """
+    单个交易对的本地订单簿
+
+    按币安增量深度规则维护：快照到达前缓存增量，丢弃 last_update_id 不晚于快照的增量，
+    快照之后的第一条增量（缓存中的或实时到达的）需满足 U <= lastUpdateId+1 <= u，
+    之后要求每条增量的 first_update_id 与上一条的 last_update_id 连续
+    （合约流按 pu 字段校验），出现缺口时标记失步并等待新快照。
+    """
+
+    def __init__(self, symbol: str, max_buffer: int = 1000):
+        """
+        初始化本地订单簿
+
+        Args:
+            symbol: 交易对
+            max_buffer: 等待快照期间缓存增量的上限
+        """
+        self.symbol = symbol
+        self.max_buffer = max_buffer
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.timestamp: Optional[int] = None
+        self.synced = False
+        self.gaps = 0
+        self._buffer: List[Dict[str, Any]] = []
+        # 快照之后尚未应用任何增量，第一条增量按覆盖规则而不是连续规则校验
+        self._awaiting_first = False
+
+    @property
+    def needs_snapshot(self) -> bool:
+        """是否需要新的快照"""
+        return not self.synced
+
+    def apply_snapshot(self, last_update_id: int, bids: Iterable, asks: Iterable, timestamp: Optional[int] = None) -> bool:
+        """
+        应用 REST 快照并重放缓存的增量
+
+        Args:
+            last_update_id: 快照的 lastUpdateId
+            bids: 买盘档位 [[价格, 数量], ...]
+            asks: 卖盘档位 [[价格, 数量], ...]
+            timestamp: 快照时间戳
+
+        Returns:
+            bool: 重放后是否已同步
+        """
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.last_update_id = int(last_update_id)
+        self.timestamp = timestamp
+        self.synced = True
+        self._awaiting_first = True
+
+        buffered, self._buffer = self._buffer, []
+        for i, update in enumerate(buffered):
+            self.apply_update(update)
+            if not self.synced:
+                # 失步后保留剩余增量等待下一个快照
+                self._buffer.extend(buffered[i + 1:])
+                return False
+        return True
+
+    def apply_update(self, update: Dict[str, Any]) -> bool:
+        """
+        应用一条增量深度
+
+        Args:
+            update: DataProcessor 处理后的深度消息（含 first_update_id/last_update_id/bids/asks）
+
+        Returns:
+            bool: 是否已应用到订单簿
+        """
+        if not self.synced:
+            self._buffer_update(update)
+            return False
+        if update['last_update_id'] <= self.last_update_id:
+            # 过期增量
+            return False
+
+        if self._awaiting_first:
+            # 第一条增量需覆盖快照之后的下一个更新ID，快照可能晚于缓存的全部增量
+            if update['first_update_id'] > self.last_update_id + 1:
+                self._mark_gap(update, "快照早于增量")
+                return False
+            self._awaiting_first = False
+            self._apply(update)
+            return True
+
+        prev = update.get('prev_update_id')
+        if prev is not None:
+            contiguous = prev == self.last_update_id
+        else:
+            contiguous = update['first_update_id'] == self.last_update_id + 1
+        if not contiguous:
+            self._mark_gap(update, f"更新ID不连续: 期望 {self.last_update_id + 1}, 收到 {update['first_update_id']}")
+            return False
+
+        self._apply(update)
+        return True
+
+    def _apply(self, update: Dict[str, Any]) -> None:
+        bids, asks = self.bids, self.asks
+        for price, size in update['bids']:
+            bids.set(price, size)
+        for price, size in update['asks']:
+            asks.set(price, size)
+        self.last_update_id = update['last_update_id']
+        self.timestamp = update.get('timestamp', self.timestamp)
+
+    def _buffer_update(self, update: Dict[str, Any]) -> None:
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.pop(0)
+        self._buffer.append(update)
+
+    def _mark_gap(self, update: Dict[str, Any], reason: str) -> None:
+        logger.warning(f"订单簿 {self.symbol} {reason}，等待重新同步")
+        self.synced = False
+        self.gaps += 1
+        self.bids.clear()
+        self.asks.clear()
+        self._buffer = [update]
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        """最优买价和数量"""
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        """最优卖价和数量"""
+        return self.asks.best()
+
+    def mid_price(self) -> Optional[float]:
+        """中间价"""
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread(self) -> Optional[float]:
+        """买卖价差"""
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def get_level(self, side: str, price: float) -> float:
+        """
+        查询指定价位的数量
+
+        Args:
+            side: 'bid' 或 'ask'
+            price: 价格
+
+        Returns:
+            float: 档位数量，不存在时为0
+        """
+        return (self.bids if side == 'bid' else self.asks).get(price)
+
+    def vwap(self, side: str, size: float) -> Optional[Tuple[float, float]]:
+        """
+        按数量吃单的成交均价
+
+        Args:
+            side: 'buy' 吃卖盘，'sell' 吃买盘
+            size: 数量
+
+        Returns:
+            Optional[Tuple[float, float]]: (成交均价, 可成交数量)，盘口为空时返回None
+        """
+        notional, filled = (self.asks if side == 'buy' else self.bids).walk(size)
+        if filled <= 0:
+            return None
+        return notional / filled, filled
+
+    def snapshot(self, depth: int = 20) -> OrderBookSnapshot:
+        """
+        生成最优 depth 档的快照视图
+
+        Args:
+            depth: 档位数量，0表示全部
+
+        Returns:
+            OrderBookSnapshot: 快照
+        """
+        bid_prices, bid_sizes = self.bids.top(depth)
+        ask_prices, ask_sizes = self.asks.top(depth)
+        return OrderBookSnapshot(
+            self.symbol, self.last_update_id, self.timestamp,
+            bid_prices, bid_sizes, ask_prices, ask_sizes,
+        )
+
+
+class OrderBookManager:
+    """
+    订单簿管理器
+
+    作为 RealtimeEngine 的 depth 消费者维护各交易对的本地订单簿，
+    失步时通过 snapshot_fetcher 拉取快照，更新后向订阅者推送快照视图。
+    """
+
+    def __init__(
+        self,
+        snapshot_fetcher: Optional[Callable[[str], Any]] = None,
+        snapshot_depth: int = 20,
+        max_buffer: int = 1000,
+        snapshot_retry_base: float = 1.0,
+        snapshot_retry_max: float = 60.0,
+    ):
+        """
+        初始化订单簿管理器
+
+        Args:
+            snapshot_fetcher: 快照获取函数 symbol -> {"last_update_id", "bids", "asks"}，
+                可以是普通函数（在线程池中执行）或协程函数，None表示只接受手动快照
+            snapshot_depth: 推送给订阅者的快照档位数
+            max_buffer: 每个订单簿等待快照期间缓存增量的上限
+            snapshot_retry_base: 快照拉取失败后的首次重试间隔（秒），连续失败时指数递增
+            snapshot_retry_max: 快照拉取重试间隔上限（秒）
+        """
+        self.snapshot_fetcher = snapshot_fetcher
+        self.snapshot_depth = snapshot_depth
+        self.max_buffer = max_buffer
+        self.books: Dict[str, LocalOrderBook] = {}
+        self.subscribers: Dict[str, List[Callable[[OrderBookSnapshot], None]]] = {}
+        self.snapshot_retry_base = snapshot_retry_base
+        self.snapshot_retry_max = snapshot_retry_max
+        self._pending_snapshots: Dict[str, asyncio.Future] = {}
+        # 快照拉取失败记录：symbol -> (连续失败次数, 允许重试的 monotonic 时间)
+        self._snapshot_failures: Dict[str, Tuple[int, float]] = {}
+
+    def get_book(self, symbol: str) -> Optional[LocalOrderBook]:
+        """获取交易对的订单簿"""
+        return self.books.get(symbol.upper())
+
+    def subscribe(self, symbol: str, callback: Callable[[OrderBookSnapshot], None]) -> None:
+        """
+        订阅订单簿快照推送
+
+        Args:
+            symbol: 交易对，'*' 表示全部
+            callback: 回调函数，接收 OrderBookSnapshot
+        """
+        self.subscribers.setdefault(symbol if symbol == '*' else symbol.upper(), []).append(callback)
+
+    def unsubscribe(self, symbol: str, callback: Callable[[OrderBookSnapshot], None]) -> bool:
+        """取消订阅订单簿快照推送"""
+        callbacks = self.subscribers.get(symbol if symbol == '*' else symbol.upper(), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            return True
+        return False
+
+    def on_depth(self, data: Dict[str, Any]) -> None:
+        """
+        depth 消费者入口（注册到 DataDistributor）
+
+        Args:
+            data: DataProcessor 处理后的深度消息
+        """
+        symbol = data['symbol'].upper()
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LocalOrderBook(symbol, self.max_buffer)
+
+        if book.apply_update(data):
+            self._notify(book)
+        elif book.needs_snapshot:
+            self._request_snapshot(symbol)
+
+    def apply_snapshot(self, symbol: str, snapshot: Dict[str, Any]) -> bool:
+        """
+        应用快照（REST 返回或录制文件中的快照）
+
+        Args:
+            symbol: 交易对
+            snapshot: {"last_update_id"/"lastUpdateId", "bids", "asks"}
+
+        Returns:
+            bool: 是否已同步
+        """
+        symbol = symbol.upper()
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LocalOrderBook(symbol, self.max_buffer)
+        last_update_id = snapshot.get('last_update_id', snapshot.get('lastUpdateId'))
+        synced = book.apply_snapshot(last_update_id, snapshot['bids'], snapshot['asks'], snapshot.get('timestamp'))
+        if synced:
+            self._notify(book)
+        return synced
+
+    def _request_snapshot(self, symbol: str) -> None:
+        """失步时拉取快照（同一交易对只保留一个进行中的请求，失败后退避期内不再请求）"""
+        if self.snapshot_fetcher is None or symbol in self._pending_snapshots:
+            return
+        failure = self._snapshot_failures.get(symbol)
+        if failure is not None and time.monotonic() < failure[1]:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                snapshot = self.snapshot_fetcher(symbol)
+            except Exception as e:
+                self._snapshot_failed(symbol, e)
+                return
+            self._snapshot_applied(symbol, snapshot)
+            return
+
+        if inspect.iscoroutinefunction(self.snapshot_fetcher):
+            future = asyncio.ensure_future(self.snapshot_fetcher(symbol))
+        else:
+            future = loop.run_in_executor(None, self.snapshot_fetcher, symbol)
+        self._pending_snapshots[symbol] = future
+        future.add_done_callback(lambda f: self._on_snapshot_done(symbol, f))
+
+    def _on_snapshot_done(self, symbol: str, future: asyncio.Future) -> None:
+        self._pending_snapshots.pop(symbol, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._snapshot_failed(symbol, error)
+            return
+        self._snapshot_applied(symbol, future.result())
+
+    def _snapshot_applied(self, symbol: str, snapshot: Dict[str, Any]) -> None:
+        """应用拉取到的快照；快照早于缓存的增量时与拉取失败一样退避后重新拉取"""
+        if self.apply_snapshot(symbol, snapshot):
+            self._snapshot_failures.pop(symbol, None)
+        else:
+            self._snapshot_failed(symbol, "快照早于缓存的增量")
+
+    def _snapshot_failed(self, symbol: str, error: Any) -> None:
+        """记录快照拉取失败，重试间隔按连续失败次数指数递增，期间到达的增量触发重新拉取"""
+        failures = self._snapshot_failures.get(symbol, (0, 0.0))[0] + 1
+        delay = min(self.snapshot_retry_max, self.snapshot_retry_base * 2 ** (failures - 1))
+        self._snapshot_failures[symbol] = (failures, time.monotonic() + delay)
+        logger.error(f"获取订单簿快照失败: {symbol}, 第{failures}次, {delay:.1f}秒后重试, 错误: {error}")
+
+    def _notify(self, book: LocalOrderBook) -> None:
+        callbacks = self.subscribers.get(book.symbol, []) + self.subscribers.get('*', [])
+        if not callbacks:
+            return
+        snapshot = book.snapshot(self.snapshot_depth)
+        for callback in callbacks:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"订单簿订阅者执行失败: {e}")
+
+    def replay(self, source: Union[str, Path, Iterable[str]], processor: Optional[DataProcessor] = None) -> int:
+        """
+        重放录制的行情文件（JSON Lines）
+
+        每行可以是 REST 快照（含 lastUpdateId 和 symbol）、币安原始 depthUpdate 事件，
+        或组合流包装的事件 {"stream": ..., "data": ...}
+
+        Args:
+            source: 文件路径或行迭代器
+            processor: 数据处理器，None时新建
+
+        Returns:
+            int: 处理的增量条数
+        """
+        processor = processor or DataProcessor()
+        if isinstance(source, (str, Path)):
+            with open(source, 'r', encoding='utf-8') as f:
+                return self.replay(list(f), processor)
+
+        count = 0
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record = record.get('data', record)
+            if 'lastUpdateId' in record or 'last_update_id' in record:
+                self.apply_snapshot(record['symbol'], record)
+                continue
+            if not processor.normalize_message(record):
+                continue
+            processed = processor.process_message(record)
+            if processed and processed['data_type'] == 'depth':
+                self.on_depth(processed)
+                count += 1
+        return count
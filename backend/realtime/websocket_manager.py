@@ -63,7 +63,6 @@ class WebSocketManager:
             if hasattr(client, 'add_message_callback'):
                 # 创建一个统一的回调函数，将消息分发给所有处理器
                 def message_callback(message: Dict[str, Any]) -> None:
-                    logger.debug(f"[KlinePush] WebSocketManager收到消息回调，分发给{len(self.message_handlers)}个处理器")
                     for handler in self.message_handlers:
                         try:
                             handler(message)
@@ -206,21 +205,26 @@ class WebSocketManager:
     
     async def _process_messages(self) -> None:
         """
-        异步处理消息，从所有客户端接收消息并分发给处理器
+        异步处理消息，从轮询模式的客户端接收消息并分发给处理器
+
+        支持 add_message_callback 的客户端通过回调推送消息，不参与轮询
         """
         while self.running:
-            if not self.clients:
+            polling_clients = [
+                (exchange_name, client) for exchange_name, client in self.clients.items()
+                if not hasattr(client, 'add_message_callback')
+            ]
+            if not polling_clients:
                 await asyncio.sleep(1)
                 continue
             
-            # 从所有客户端接收消息
-            tasks = [client.receive_message() for client in self.clients.values()]
+            # 从轮询客户端接收消息
+            tasks = [client.receive_message() for _, client in polling_clients]
             messages = await asyncio.gather(*tasks, return_exceptions=True)
             
             # 处理收到的消息
-            for i, message in enumerate(messages):
+            for (exchange_name, _), message in zip(polling_clients, messages):
                 if isinstance(message, Exception):
-                    exchange_name = list(self.clients.keys())[i]
                     logger.error(f"接收消息失败: {exchange_name}, 错误: {message}")
                 elif message:
                     # 分发给所有消息处理器
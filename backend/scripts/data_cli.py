@@ -21,7 +21,7 @@ import typer
 from typing_extensions import Annotated
 from utils.logger import get_logger, LogType
 from utils.timestamp_utils import (
-    to_nanoseconds, normalize_to_nanoseconds, format_nanoseconds,
+    to_nanoseconds, format_nanoseconds,
     nanoseconds_to_milliseconds, detect_precision, datetime_to_nanoseconds,
     from_nanoseconds
 )
@@ -48,6 +48,7 @@ try:
     from collector.utils.task_manager import task_manager
     from collector.db.database import init_database_config, SessionLocal
     from collector.db.models import CryptoSpotKline, CryptoFutureKline, CryptoSymbol
+    from collector.db.kline_coverage import drop_coverage
     from settings.models import SystemConfigBusiness as SystemConfig
     # 可选导入回测CLI核心模块（用于 list_symbols 等功能）
     try:
@@ -196,7 +197,7 @@ def _query_kline_data_from_db(
                 # 转换为纳秒级时间戳
                 start_dt = datetime.strptime(start, "%Y%m%d")
                 start_ts_ns = datetime_to_nanoseconds(start_dt)
-                query = query.filter(KlineModel.timestamp >= str(start_ts_ns))
+                query = query.filter(KlineModel.timestamp >= start_ts_ns)
             except ValueError:
                 raise ValueError(f"开始时间格式不正确: {start}，请使用 YYYYMMDD 格式")
 
@@ -205,7 +206,7 @@ def _query_kline_data_from_db(
                 # 转换为纳秒级时间戳，并设置为当天23:59:59
                 end_dt = datetime.strptime(end, "%Y%m%d").replace(hour=23, minute=59, second=59)
                 end_ts_ns = datetime_to_nanoseconds(end_dt)
-                query = query.filter(KlineModel.timestamp <= str(end_ts_ns))
+                query = query.filter(KlineModel.timestamp <= end_ts_ns)
             except ValueError:
                 raise ValueError(f"结束时间格式不正确: {end}，请使用 YYYYMMDD 格式")
 
@@ -450,7 +451,7 @@ def export_csv(
                     # 转换为纳秒级时间戳
                     start_dt = datetime.strptime(start, "%Y%m%d")
                     start_ts_ns = datetime_to_nanoseconds(start_dt)
-                    query = query.filter(KlineModel.timestamp >= str(start_ts_ns))
+                    query = query.filter(KlineModel.timestamp >= start_ts_ns)
                 except ValueError:
                     typer.echo("错误: 开始时间格式不正确，请使用 YYYYMMDD 格式", err=True)
                     raise typer.Exit(1)
@@ -460,7 +461,7 @@ def export_csv(
                     # 转换为纳秒级时间戳，并设置为当天23:59:59
                     end_dt = datetime.strptime(end, "%Y%m%d").replace(hour=23, minute=59, second=59)
                     end_ts_ns = datetime_to_nanoseconds(end_dt)
-                    query = query.filter(KlineModel.timestamp <= str(end_ts_ns))
+                    query = query.filter(KlineModel.timestamp <= end_ts_ns)
                 except ValueError:
                     typer.echo("错误: 结束时间格式不正确，请使用 YYYYMMDD 格式", err=True)
                     raise typer.Exit(1)
@@ -929,7 +930,7 @@ def import_csv(
             try:
                 ts_value = str(row['timestamp'])
                 # 使用工具函数统一转换为纳秒级
-                timestamp_ns = normalize_to_nanoseconds(ts_value, input_precision='auto')
+                timestamp_ns = to_nanoseconds(ts_value, input_precision='auto')
             except (ValueError, TypeError) as e:
                 logger.warning(f"无效的timestamp值: {row['timestamp']}，跳过该行，错误: {e}")
                 continue
@@ -946,11 +947,11 @@ def import_csv(
                 'symbol': symbol,
                 'interval': interval_value,
                 'timestamp': timestamp_ns,  # 统一为纳秒级
-                'open': str(row['open']),
-                'high': str(row['high']),
-                'low': str(row['low']),
-                'close': str(row['close']),
-                'volume': str(row['volume']),
+                'open': float(row['open']),
+                'high': float(row['high']),
+                'low': float(row['low']),
+                'close': float(row['close']),
+                'volume': float(row['volume']),
                 'unique_kline': unique_kline,
                 'data_source': data_source_value,
             })
@@ -1786,8 +1787,9 @@ def delete_local_data(
                     typer.echo("已取消删除")
                     return
             
-            # 执行删除
+            # 执行删除，同一事务内丢弃覆盖索引，下次查询时重新核实
             query.delete(synchronize_session=False)
+            drop_coverage(db, KlineModel.__tablename__, symbol.upper(), interval)
             db.commit()
             
             typer.echo(f"✓ 成功删除 {count} 条数据")
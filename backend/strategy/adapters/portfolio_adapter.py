@@ -19,7 +19,7 @@ logger = get_logger(__name__, LogType.APPLICATION)
 from datetime import datetime
 
 from strategy.core.vector_engine import VectorEngine
-from strategy.core import StrategyBase
+from strategy.core import StrategyBase, StrategyCore
 
 
 @dataclass
@@ -130,10 +130,11 @@ class PortfolioBacktestAdapter:
         
         # 获取统一的时间索引
         common_index = self._get_common_index(aligned_data)
+        symbols = list(aligned_data.keys())
         
         # 初始化各交易对的策略状态
         symbol_states = {}
-        for symbol in aligned_data.keys():
+        for symbol in symbols:
             self.portfolio.positions[symbol] = Position(symbol=symbol)
             symbol_states[symbol] = {
                 'signals': [],
@@ -147,148 +148,29 @@ class PortfolioBacktestAdapter:
             signals = self._generate_signals(df, symbol)
             all_signals[symbol] = signals
         
-        # 运行组合回测
-        portfolio_equity_curve = []
-        portfolio_trades = []
-        
-        for i, timestamp in enumerate(common_index):
-            # 获取当前时刻所有交易对的价格
-            current_prices = {}
-            for symbol, df in aligned_data.items():
-                if timestamp in df.index:
-                    current_prices[symbol] = df.loc[timestamp, 'Close']
-            
-            # 更新组合权益
-            self.portfolio.update_equity(current_prices)
-            
-            # 记录组合权益
-            portfolio_equity_curve.append({
-                'timestamp': timestamp,
-                'datetime': timestamp.isoformat() if isinstance(timestamp, pd.Timestamp) else str(timestamp),
-                'equity': self.portfolio.total_equity,
-                'cash': self.portfolio.cash,
-                'position_value': self.portfolio.total_equity - self.portfolio.cash
-            })
-            
-            # 处理每个交易对的信号
-            for symbol in aligned_data.keys():
-                if timestamp not in aligned_data[symbol].index:
-                    continue
-                
-                df = aligned_data[symbol]
-                signals = all_signals[symbol]
-                price = float(df.loc[timestamp, 'Close'])
-
-                # 检查信号
-                entry_signal = signals['entries'].loc[timestamp] if timestamp in signals['entries'].index else False
-                exit_signal = signals['exits'].loc[timestamp] if timestamp in signals['exits'].index else False
-
-                position = self.portfolio.positions[symbol]
-
-                # 处理入场信号
-                if entry_signal and not position.is_open:
-                    # 计算可用资金（考虑已用资金）
-                    available_cash = self.portfolio.cash
-                    trade_cash = min(available_cash * position_size_pct, available_cash * 0.95)
-
-                    if trade_cash > 0:
-                        # 计算可买入数量
-                        size = trade_cash / price
-                        
-                        # 扣除资金和手续费
-                        cost = size * price * (1 + fees)
-                        if self.portfolio.cash >= cost:
-                            self.portfolio.cash -= cost
-                            position.size = size
-                            position.entry_price = price
-                            position.entry_time = timestamp
-                            
-                            trade = {
-                                'symbol': symbol,
-                                'direction': 'buy',
-                                'size': size,
-                                'price': price,
-                                'timestamp': timestamp,
-                                'cost': cost,
-                                'fees': size * price * fees
-                            }
-                            portfolio_trades.append(trade)
-                            symbol_states[symbol]['trades'].append(trade)
-                            if verbose:
-                                logger.info(f"【买入】{symbol} @ {price:.2f}, 数量: {size:.4f}")
-                
-                # 处理出场信号
-                elif exit_signal and position.is_open:
-                    # 卖出持仓
-                    revenue = position.size * price * (1 - fees)
-                    pnl = position.size * (price - position.entry_price) - (position.size * price * fees)
-                    
-                    self.portfolio.cash += revenue
-                    
-                    trade = {
-                        'symbol': symbol,
-                        'direction': 'sell',
-                        'size': position.size,
-                        'price': price,
-                        'timestamp': timestamp,
-                        'revenue': revenue,
-                        'pnl': pnl,
-                        'fees': position.size * price * fees,
-                        'entry_price': position.entry_price,
-                        'entry_time': position.entry_time
-                    }
-                    portfolio_trades.append(trade)
-                    symbol_states[symbol]['trades'].append(trade)
-
-                    # 清空持仓
-                    position.size = 0
-                    position.entry_price = 0
-                    position.entry_time = None
-
-                    if verbose:
-                        logger.info(f"【卖出】{symbol} @ {price:.2f}, 盈亏: {pnl:.2f}")
-        
-        # 回测结束，强制平仓所有持仓
-        final_timestamp = common_index[-1]
-        for symbol, position in self.portfolio.positions.items():
-            if position.is_open:
-                df = aligned_data[symbol]
-                if final_timestamp in df.index:
-                    price = float(df.loc[final_timestamp, 'Close'])
-                    position_size = float(position.size)
-                    entry_price = float(position.entry_price) if position.entry_price else 0.0
-
-                    revenue = position_size * price * (1 - fees)
-                    pnl = position_size * (price - entry_price) - (position_size * price * fees)
-
-                    self.portfolio.cash += revenue
-
-                    trade = {
-                        'symbol': symbol,
-                        'direction': 'sell',
-                        'size': position_size,
-                        'price': price,
-                        'timestamp': final_timestamp,
-                        'revenue': revenue,
-                        'pnl': pnl,
-                        'fees': position_size * price * fees,
-                        'entry_price': entry_price,
-                        'entry_time': position.entry_time,
-                        'forced_exit': True
-                    }
-                    portfolio_trades.append(trade)
-                    symbol_states[symbol]['trades'].append(trade)
-
-                    position.size = 0.0
-                    if verbose:
-                        logger.info(f"【强制平仓】{symbol} @ {price:.2f}, 盈亏: {pnl:.2f}")
+        # 一次性对齐为 (时间 × 交易对) 稠密矩阵，在编译内核中运行组合回测
+        close, valid, entries, exits = self._build_matrices(aligned_data, all_signals, common_index)
+        equity, cash_history, trade_records, n_closed = self.engine.simulate_portfolio(
+            close, valid, entries, exits, float(init_cash), float(fees), float(position_size_pct)
+        )
         
-        # 计算最终权益
-        final_prices = {}
-        for symbol, df in aligned_data.items():
-            if final_timestamp in df.index:
-                final_prices[symbol] = df.loc[final_timestamp, 'Close']
-        self.portfolio.update_equity(final_prices)
+        portfolio_equity_curve = self._build_equity_curve(common_index, equity, cash_history)
+        portfolio_trades = self._records_to_trades(
+            trade_records, n_closed, symbols, common_index, fees
+        )
+        for trade in portfolio_trades:
+            symbol_states[trade['symbol']]['trades'].append(trade)
+            if verbose:
+                if trade['direction'] == 'buy':
+                    logger.info(f"【买入】{trade['symbol']} @ {trade['price']:.2f}, 数量: {trade['size']:.4f}")
+                elif trade.get('forced_exit'):
+                    logger.info(f"【强制平仓】{trade['symbol']} @ {trade['price']:.2f}, 盈亏: {trade['pnl']:.2f}")
+                else:
+                    logger.info(f"【卖出】{trade['symbol']} @ {trade['price']:.2f}, 盈亏: {trade['pnl']:.2f}")
+        
+        # 回测结束时所有持仓均已平仓，现金即为最终权益
+        self.portfolio.cash = float(init_cash + trade_records['pnl'].sum())
+        self.portfolio.update_equity({})
         
         # 计算组合绩效指标
         metrics = self._calculate_portfolio_metrics(
@@ -300,6 +182,7 @@ class PortfolioBacktestAdapter:
             'portfolio': {
                 'equity_curve': portfolio_equity_curve,
                 'trades': portfolio_trades,
+                'trade_records': trade_records,
                 'metrics': metrics,
                 'cash_history': [e['cash'] for e in portfolio_equity_curve],
                 'final_cash': self.portfolio.cash,
@@ -355,16 +238,112 @@ class PortfolioBacktestAdapter:
             return index
         return pd.DatetimeIndex(index)
     
+    def _build_matrices(
+        self,
+        data: Dict[str, pd.DataFrame],
+        signals: Dict[str, Dict[str, pd.Series]],
+        index: pd.DatetimeIndex
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        将各交易对的收盘价和信号对齐为 (时间 × 交易对) 稠密矩阵
+
+        统一时间索引上缺少K线或收盘价为NaN的位置在有效性掩码中为 False。
+
+        返回：
+            (收盘价矩阵, 有效性掩码, 入场信号矩阵, 出场信号矩阵)
+        """
+        n_steps, n_assets = len(index), len(data)
+        close = np.full((n_steps, n_assets), np.nan, dtype=np.float64)
+        entries = np.zeros((n_steps, n_assets), dtype=np.bool_)
+        exits = np.zeros((n_steps, n_assets), dtype=np.bool_)
+
+        for j, (symbol, df) in enumerate(data.items()):
+            unique = ~df.index.duplicated(keep='first')
+            close[:, j] = df['Close'][unique].reindex(index).to_numpy(dtype=np.float64, na_value=np.nan)
+            for name, target in (('entries', entries), ('exits', exits)):
+                series = signals[symbol][name]
+                series = series[~series.index.duplicated(keep='first')]
+                target[:, j] = series.reindex(index, fill_value=False).fillna(False).to_numpy(dtype=np.bool_)
+
+        valid = ~np.isnan(close)
+        return close, valid, entries, exits
+
+    def _build_equity_curve(
+        self,
+        index: pd.DatetimeIndex,
+        equity: np.ndarray,
+        cash: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """由权益和现金数组生成组合权益曲线记录"""
+        position_value = equity - cash
+        return [
+            {
+                'timestamp': timestamp,
+                'datetime': timestamp.isoformat() if isinstance(timestamp, pd.Timestamp) else str(timestamp),
+                'equity': e,
+                'cash': c,
+                'position_value': v
+            }
+            for timestamp, e, c, v in zip(index, equity.tolist(), cash.tolist(), position_value.tolist())
+        ]
+
+    def _records_to_trades(
+        self,
+        records: np.ndarray,
+        n_closed: int,
+        symbols: List[str],
+        index: pd.DatetimeIndex,
+        fees: float
+    ) -> List[Dict[str, Any]]:
+        """
+        将结构化交易记录展开为按时间排序的买入/卖出成交列表
+
+        每条交易记录对应一笔买入和一笔卖出；同一时间步内按交易对顺序排列，
+        强制平仓排在最后。卖出的 pnl 为扣除双边手续费后的净盈亏。
+        """
+        timestamps = list(index)
+        events = []
+        for k, record in enumerate(records.tolist()):
+            asset, entry_idx, exit_idx, entry_price, exit_price, size, _, pnl, value = record
+            symbol = symbols[asset]
+            forced = k >= n_closed
+            entry_time = timestamps[entry_idx]
+            buy_value = size * entry_price
+            events.append(((entry_idx, 0, asset), {
+                'symbol': symbol,
+                'direction': 'buy',
+                'size': size,
+                'price': entry_price,
+                'timestamp': entry_time,
+                'cost': buy_value * (1 + fees),
+                'fees': buy_value * fees
+            }))
+            sell = {
+                'symbol': symbol,
+                'direction': 'sell',
+                'size': size,
+                'price': exit_price,
+                'timestamp': timestamps[exit_idx],
+                'revenue': value * (1 - fees),
+                'pnl': pnl,
+                'fees': value * fees,
+                'entry_price': entry_price,
+                'entry_time': entry_time
+            }
+            if forced:
+                sell['forced_exit'] = True
+            events.append(((exit_idx, 1 if forced else 0, asset), sell))
+
+        events.sort(key=lambda event: event[0])
+        return [trade for _, trade in events]
+
     def _generate_signals(self, df: pd.DataFrame, symbol: str) -> Dict[str, pd.Series]:
         """
         生成交易信号
         
-        通过调用策略的 on_bar 方法来生成信号，确保策略逻辑被正确执行。
-        每个交易对使用独立的策略实例。
+        通过调用策略的 on_bar 方法来生成信号，确保策略逻辑被正确执行；
+        StrategyCore 策略直接使用其向量化信号。每个交易对使用独立的策略实例。
         """
-        entries = pd.Series(False, index=df.index)
-        exits = pd.Series(False, index=df.index)
-        
         # 为每个交易对创建独立的策略实例
         # 复制当前策略的参数
         strategy_params = getattr(self.strategy, 'params', {})
@@ -377,18 +356,32 @@ class PortfolioBacktestAdapter:
             logger.warning(f"无法为 {symbol} 创建独立策略实例，使用共享实例: {e}")
             symbol_strategy = self.strategy
         
+        # 向量化策略直接计算整段信号
+        if isinstance(symbol_strategy, StrategyCore):
+            signals = symbol_strategy.run(df)['signals']
+            return {
+                name: signals[name].reindex(df.index, fill_value=False).fillna(False).astype(bool)
+                for name in ('entries', 'exits')
+            }
+        
+        n = len(df)
+        entries = np.zeros(n, dtype=np.bool_)
+        exits = np.zeros(n, dtype=np.bool_)
+        
         # 初始化策略
         symbol_strategy.on_init()
         
+        # 逐K线调用策略，直接遍历列数组，避免 iterrows 和逐个 .loc 赋值
+        columns = [df[name].to_numpy(dtype=np.float64) for name in ('Open', 'High', 'Low', 'Close', 'Volume')]
         last_bar = None
-        for idx, row in df.iterrows():
+        for i, (idx, open_, high, low, close, volume) in enumerate(zip(df.index, *(c.tolist() for c in columns))):
             bar = {
                 'datetime': idx,
-                'open': float(row['Open']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'close': float(row['Close']),
-                'volume': float(row['Volume']),
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume,
                 'symbol': symbol
             }
             last_bar = bar
@@ -401,15 +394,18 @@ class PortfolioBacktestAdapter:
             if last_order and isinstance(last_order, dict):
                 direction = last_order.get('direction', '')
                 if direction in ['buy', 'long']:
-                    entries.loc[idx] = True
+                    entries[i] = True
                 elif direction in ['sell', 'short', 'close']:
-                    exits.loc[idx] = True
+                    exits[i] = True
         
         # 回测结束强制平仓
         if last_bar is not None:
             symbol_strategy.on_stop(last_bar)
         
-        return {'entries': entries, 'exits': exits}
+        return {
+            'entries': pd.Series(entries, index=df.index),
+            'exits': pd.Series(exits, index=df.index)
+        }
     
     def _calculate_portfolio_metrics(
         self,
@@ -421,37 +417,32 @@ class PortfolioBacktestAdapter:
         if not equity_curve:
             return {}
         
-        equities = [e['equity'] for e in equity_curve]
-        final_equity = equities[-1]
+        equities = np.array([e['equity'] for e in equity_curve], dtype=np.float64)
+        final_equity = float(equities[-1])
         total_return = (final_equity - init_cash) / init_cash * 100 if init_cash > 0 else 0
         
         # 计算最大回撤
-        max_drawdown = 0.0
-        peak = equities[0]
-        for equity in equities:
-            if equity > peak:
-                peak = equity
-            drawdown = (peak - equity) / peak * 100 if peak > 0 else 0
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
+        peaks = np.maximum.accumulate(equities)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peaks > 0, (peaks - equities) / peaks * 100, 0.0)
+        max_drawdown = float(max(drawdowns.max(), 0.0))
         
         # 计算夏普比率
-        returns = []
-        for i in range(1, len(equities)):
-            if equities[i-1] > 0:
-                ret = (equities[i] - equities[i-1]) / equities[i-1]
-                returns.append(ret)
+        prev = equities[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = ((equities[1:] - prev) / prev)[prev > 0]
         
         sharpe_ratio = 0.0
-        if returns and np.std(returns) > 0:
-            sharpe_ratio = np.mean(returns) / np.std(returns) * np.sqrt(252)
+        if returns.size and np.std(returns) > 0:
+            sharpe_ratio = float(np.mean(returns) / np.std(returns) * np.sqrt(252))
         
         # 统计交易
-        total_trades = len([t for t in trades if 'pnl' in t])
-        winning_trades = len([t for t in trades if t.get('pnl', 0) > 0])
+        pnls = np.array([t['pnl'] for t in trades if 'pnl' in t], dtype=np.float64)
+        total_trades = int(pnls.size)
+        winning_trades = int((pnls > 0).sum())
         win_rate = winning_trades / total_trades * 100 if total_trades > 0 else 0
         
-        total_pnl = sum(t.get('pnl', 0) for t in trades if 'pnl' in t)
+        total_pnl = float(pnls.sum())
         total_fees = sum(t.get('fees', 0) for t in trades)
         
         return {
@@ -478,8 +469,8 @@ class PortfolioBacktestAdapter:
         init_cash: float
     ) -> Dict[str, Any]:
         """生成单个交易对的结果"""
-        # 筛选该交易对的交易
-        symbol_trades = [t for t in all_trades if t['symbol'] == symbol]
+        # 该交易对的交易（运行回测时已按交易对分组）
+        symbol_trades = state['trades']
         
         # 计算该交易对的盈亏
         symbol_pnl = sum(t.get('pnl', 0) for t in symbol_trades if 'pnl' in t)
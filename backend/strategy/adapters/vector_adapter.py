@@ -1,6 +1,7 @@
 # 向量回测适配器
 # 将 StrategyCore 适配到 VectorEngine
 
+import copy
 import numpy as np
 import pandas as pd
 from typing import Dict, Any, Optional
@@ -10,6 +11,11 @@ from utils.logger import get_logger, LogType
 logger = get_logger(__name__, LogType.APPLICATION)
 from strategy.core.vector_engine import VectorEngine
 from strategy.core import StrategyBase
+from strategy.core.optimizer import ParameterOptimizer, SweepEvaluator
+from strategy.core.indicator_cache import IndicatorCache
+
+# 工作进程指标缓存中存放共享 IndicatorCache 的键
+_INDICATOR_CACHE_KEY = ('vector_adapter', 'indicator_cache')
 
 
 class VectorBacktestAdapter:
@@ -189,55 +195,70 @@ class VectorBacktestAdapter:
     
     def optimize_parameters(self, data: Dict[str, pd.DataFrame], 
                        param_ranges: Dict[str, list],
-                       metric: str = 'sharpe_ratio') -> Dict[str, Any]:
+                       metric: str = 'sharpe_ratio',
+                       method: str = 'grid',
+                       n_jobs: Optional[int] = None,
+                       n_iter: int = 100,
+                       patience: Optional[int] = None,
+                       progress: Optional[Any] = None,
+                       init_cash: float = 100000.0,
+                       fees: float = 0.001,
+                       slippage: float = 0.0001) -> Dict[str, Any]:
         """
         参数优化
         
+        参数组合在进程池中并行评估，每个组合使用策略的独立副本，
+        不再修改 self.strategy.params；优化结束后将最优参数写回策略。
+        
         参数：
         - data: 多交易对数据
-        - param_ranges: 参数范围
+        - param_ranges: 参数范围 {参数名: 取值列表}
         - metric: 优化指标
+        - method: 搜索方法，grid / random / halving
+        - n_jobs: 工作进程数，None 为CPU核数
+        - n_iter: 随机搜索的采样数量
+        - patience: 早停耐心值
+        - progress: 进度追踪器
+        - init_cash: 初始资金
+        - fees: 手续费率
+        - slippage: 滑点
         
         返回：
         - dict: 最优参数组合
         """
-        from itertools import product
-        
-        # 生成参数组合
-        param_combinations = list(product(*param_ranges.values()))
+        optimizer = ParameterOptimizer(
+            _AdapterSweepEvaluator(self.strategy, init_cash, fees, slippage),
+            data,
+            metric=metric,
+            n_jobs=n_jobs,
+            progress=progress
+        )
+        
+        logger.info(f"开始参数优化: 方法={method}, 参数={list(param_ranges.keys())}")
+        if method == 'grid':
+            summary = optimizer.grid_search(param_ranges, patience=patience)
+        elif method == 'random':
+            summary = optimizer.random_search(param_ranges, n_iter=n_iter, patience=patience)
+        elif method == 'halving':
+            summary = optimizer.successive_halving(param_ranges)
+        else:
+            raise ValueError(f"不支持的优化方法: {method}")
         
-        best_result = None
-        best_score = -float('inf')
+        if not summary['best_params']:
+            logger.warning("参数优化没有得到有效结果")
+            return {'params': {}, 'score': summary['best_score'], 'results': {}, 'optimization': summary}
         
-        total_combinations = len(param_combinations)
-        logger.info(f"开始参数优化，总组合数: {total_combinations}")
+        # 使用最优参数重新回测，得到完整结果
+        self.strategy.params.update(summary['best_params'])
+        results = self.run_backtest(data, init_cash=init_cash, fees=fees, slippage=slippage)
         
-        for idx, params in enumerate(param_combinations):
-            param_dict = dict(zip(param_ranges.keys(), params))
-            
-            # 设置策略参数
-            self.strategy.params.update(param_dict)
-            
-            # 运行回测
-            results = self.run_backtest(data)
-            
-            # 计算平均分数
-            scores = [r['metrics'][metric] for r in results.values()]
-            avg_score = np.mean(scores)
-            
-            if avg_score > best_score:
-                best_score = avg_score
-                best_result = {
-                    'params': param_dict,
-                    'score': avg_score,
-                    'results': results
-                }
-            
-            if (idx + 1) % 10 == 0:
-                logger.info(f"参数优化进度: {idx + 1}/{total_combinations}, 当前最优分数: {best_score:.4f}")
-        
-        logger.info(f"参数优化完成，最优参数: {best_result['params']}, 最优分数: {best_result['score']:.4f}")
-        return best_result
+        logger.info(f"参数优化完成，最优参数: {summary['best_params']}, 最优分数: {summary['best_score']:.4f}")
+        return {
+            'params': summary['best_params'],
+            'score': summary['best_score'],
+            'results': results,
+            'optimization': summary
+        }
     
     def _generate_equity_curve(self, result: Dict[str, Any], df: pd.DataFrame) -> list:
         """
@@ -318,81 +339,31 @@ class VectorBacktestAdapter:
         engine_trades = result.get('trades', [])
 
         if isinstance(engine_trades, np.ndarray) and len(engine_trades) > 0:
-            # 处理引擎返回的交易记录
-            # 引擎返回的格式: [{'step': i, 'direction': 'long'/'short', 'size': ..., 'price': ..., 'value': ..., 'fees': ..., 'pnl': ...}]
-            # 需要配对入场和出场记录
-
-            entries = []  # 入场记录
-            exits = []    # 出场记录
-
-            for i, trade in enumerate(engine_trades):
-                if isinstance(trade, dict):
-                    direction = trade.get('direction', 'long')
-                    size = float(trade.get('size', 0))
-                    price = float(trade.get('price', 0))
-                    fees = float(trade.get('fees', 0))
-                    step = int(trade.get('step', i))
+            # 引擎返回 TRADE_RECORD_DTYPE 结构化数组，每条记录已是配对好的完整交易
+            def _iso(step: int) -> str:
+                if step >= len(df.index):
+                    return ''
+                ts = df.index[step]
+                return ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)
 
-                    # 获取时间戳
-                    timestamp = ''
-                    if step < len(df.index):
-                        ts = df.index[step]
-                        if hasattr(ts, 'isoformat'):
-                            timestamp = ts.isoformat()
-                        else:
-                            timestamp = str(ts)
-
-                    # size > 0 表示入场，size < 0 表示出场
-                    if size > 0:
-                        entries.append({
-                            'step': step,
-                            'time': timestamp,
-                            'price': price,
-                            'size': size,
-                            'fees': fees,
-                            'direction': direction
-                        })
-                    else:
-                        exits.append({
-                            'step': step,
-                            'time': timestamp,
-                            'price': price,
-                            'size': abs(size),
-                            'fees': fees,
-                            'direction': direction
-                        })
-
-            # 配对交易（简单配对：按顺序配对入场和出场）
-            trade_id = 0
-            min_len = min(len(entries), len(exits))
-            for i in range(min_len):
-                entry = entries[i]
-                exit = exits[i]
-
-                total_fees = entry['fees'] + exit['fees']
-                direction = entry['direction']
-
-                if direction == 'long':
-                    realized_pnl = (exit['price'] - entry['price']) * entry['size'] - total_fees
-                    return_pct = ((exit['price'] - entry['price']) / entry['price']) * 100 if entry['price'] > 0 else 0
-                else:  # short
-                    realized_pnl = (entry['price'] - exit['price']) * entry['size'] - total_fees
-                    return_pct = ((entry['price'] - exit['price']) / entry['price']) * 100 if entry['price'] > 0 else 0
+            for trade_id, trade in enumerate(engine_trades):
+                entry_price = float(trade['entry_price'])
+                exit_price = float(trade['exit_price'])
+                return_pct = ((exit_price - entry_price) / entry_price) * 100 if entry_price > 0 else 0
 
                 trades.append({
-                        'trade_id': trade_id,
-                        'entry_time': entry['time'],
-                        'exit_time': exit['time'],
-                        'entry_price': entry['price'],
-                        'exit_price': exit['price'],
-                        'price': entry['price'],  # 兼容性：保持 price 字段
-                        'size': entry['size'],
-                        'pnl': round(realized_pnl, 2),
-                        'return_pct': round(return_pct, 4),
-                        'direction': direction,
-                        'fees': round(total_fees, 2)
-                    })
-                trade_id += 1
+                    'trade_id': trade_id,
+                    'entry_time': _iso(int(trade['entry_idx'])),
+                    'exit_time': _iso(int(trade['exit_idx'])),
+                    'entry_price': entry_price,
+                    'exit_price': exit_price,
+                    'price': entry_price,  # 兼容性：保持 price 字段
+                    'size': float(trade['size']),
+                    'pnl': round(float(trade['pnl']), 2),
+                    'return_pct': round(return_pct, 4),
+                    'direction': 'long',
+                    'fees': round(float(trade['fees']), 2)
+                })
 
         # 如果没有引擎交易记录，从订单生成交易记录
         if not trades and 'orders' in result:
@@ -508,3 +479,47 @@ class VectorBacktestAdapter:
             summary['avg_win_rate'] /= n_symbols
         
         return summary
+
+
+class _AdapterSweepEvaluator(SweepEvaluator):
+    """
+    VectorBacktestAdapter 参数优化评估器
+
+    每个工作进程只复制一次策略，各参数组合在该副本上运行完整回测（回测前 on_init 重置状态），
+    多交易对指标取平均。策略支持 set_indicator_cache 时接入工作进程共享的指标缓存，
+    指标相关参数相同的组合不再重复计算指标。
+    """
+
+    def __init__(self, strategy: StrategyBase, init_cash: float, fees: float, slippage: float):
+        self.strategy = strategy
+        self.base_params = dict(strategy.params)
+        self.init_cash = init_cash
+        self.fees = fees
+        self.slippage = slippage
+        self._adapter = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_adapter'] = None
+        return state
+
+    def evaluate(self, params: Dict[str, Any],
+                 data: Dict[str, pd.DataFrame],
+                 cache: Any) -> Dict[str, float]:
+        adapter = self._get_adapter(cache)
+        adapter.strategy.params = {**self.base_params, **params}
+        results = adapter.run_backtest(data, init_cash=self.init_cash, fees=self.fees, slippage=self.slippage)
+        metrics = [r['metrics'] for r in results.values()]
+        return {key: float(np.mean([m[key] for m in metrics])) for key in metrics[0]}
+
+    def _get_adapter(self, cache: Any) -> VectorBacktestAdapter:
+        """每个进程复用一个策略副本及其适配器，并接入工作进程的指标缓存"""
+        if self._adapter is None:
+            self._adapter = VectorBacktestAdapter(copy.deepcopy(self.strategy))
+        strategy = self._adapter.strategy
+        if hasattr(strategy, 'set_indicator_cache'):
+            indicator_cache = cache.get(_INDICATOR_CACHE_KEY)
+            if indicator_cache is None:
+                indicator_cache = cache[_INDICATOR_CACHE_KEY] = IndicatorCache()
+            strategy.set_indicator_cache(indicator_cache)
+        return self._adapter
@@ -21,14 +21,26 @@ from .strategy import (
 # 核心引擎模块
 from .event_engine import EventEngine, EventType
 from .vector_engine import VectorEngine
+from .trade_records import TRADE_RECORD_DTYPE
 from .numba_functions import (
     simulate_orders,
+    simulate_orders_multi,
+    extract_trades,
     signals_to_orders,
     calculate_metrics,
     calculate_funding_rate,
     calculate_funding_payment
 )
 
+# 参数优化
+from .optimizer import (
+    ParameterOptimizer,
+    SweepEvaluator,
+    StrategyCoreEvaluator,
+    SharedKlineData,
+    SweepResult,
+)
+
 # 优化的事件引擎
 from .event_engine_optimized import (
     OptimizedEventEngine,
@@ -51,6 +63,7 @@ from .async_event_engine import (
 from .concurrent_event_engine import (
     ConcurrentEventEngine,
     SymbolShard,
+    ProcessSymbolShard,
     SymbolEvent,
     ConcurrentEventMetrics,
     create_concurrent_engine
@@ -61,8 +74,10 @@ from .batching_engine import (
     BatchingEngine,
     BatchEvent,
     EventBatch,
+    ColumnarBatch,
     BatchStrategy,
     VectorizedBatchProcessor,
+    columnar_handler,
     create_batching_engine
 )
 
@@ -73,6 +88,8 @@ from .memory_pool import (
     TickEvent,
     BarEvent,
     EventObjectPools,
+    MarketRingBuffer,
+    SharedEventQueue,
     SharedMemoryMarketData,
     PreallocatedBuffers,
     get_event_pools,
@@ -134,14 +151,24 @@ __all__ = [
     "EventEngine",
     "EventType",
     "VectorEngine",
+    "TRADE_RECORD_DTYPE",
 
     # Numba函数
     "simulate_orders",
+    "simulate_orders_multi",
+    "extract_trades",
     "signals_to_orders",
     "calculate_metrics",
     "calculate_funding_rate",
     "calculate_funding_payment",
 
+    # 参数优化
+    "ParameterOptimizer",
+    "SweepEvaluator",
+    "StrategyCoreEvaluator",
+    "SharedKlineData",
+    "SweepResult",
+
     # 优化的事件引擎
     "OptimizedEventEngine",
     "EventPriority",
@@ -159,6 +186,7 @@ __all__ = [
     # 并发事件引擎
     "ConcurrentEventEngine",
     "SymbolShard",
+    "ProcessSymbolShard",
     "SymbolEvent",
     "ConcurrentEventMetrics",
     "create_concurrent_engine",
@@ -167,8 +195,10 @@ __all__ = [
     "BatchingEngine",
     "BatchEvent",
     "EventBatch",
+    "ColumnarBatch",
     "BatchStrategy",
     "VectorizedBatchProcessor",
+    "columnar_handler",
     "create_batching_engine",
 
     # 内存池
@@ -177,6 +207,8 @@ __all__ = [
     "TickEvent",
     "BarEvent",
     "EventObjectPools",
+    "MarketRingBuffer",
+    "SharedEventQueue",
     "SharedMemoryMarketData",
     "PreallocatedBuffers",
     "get_event_pools",
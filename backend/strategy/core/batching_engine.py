@@ -6,12 +6,14 @@
 2. 向量化策略执行
 3. 批量订单提交
 4. 减少Python循环开销
+5. 列式批次 - 数值事件直接写入预分配的列缓冲区，处理器拿到无拷贝的数组视图
 """
 
 import threading
 import time
 import logging
-from typing import Dict, List, Callable, Any, Optional
+from datetime import datetime
+from typing import Dict, List, Callable, Any, Optional, Union
 from dataclasses import dataclass, field
 from collections import defaultdict
 from enum import IntEnum
@@ -94,6 +96,139 @@ class BatchEvent:
     timestamp: float = field(default_factory=time.time)
 
 
+def columnar_handler(handler: Callable) -> Callable:
+    """
+    声明处理器接受列式批次
+
+    被标记的处理器收到 ColumnarBatch，通过 timestamps/prices/volumes 数组视图读取数据；
+    事件类型的处理器全部为列式时，引擎不再为每个事件创建 BatchEvent 对象
+    """
+    handler.__columnar__ = True
+    return handler
+
+
+def _to_epoch_seconds(value: Any) -> float:
+    """时间戳列转换为 float，datetime/datetime64 转换为纪元秒"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[ns]").astype(np.int64) / 1e9
+    return float(value)
+
+
+def _extract_columns(data: Any, default_timestamp: float) -> Optional[tuple]:
+    """
+    从事件数据中提取 (timestamp, price, volume)
+
+    支持数值、含 price 或 close 键的字典以及带 price/close 属性的事件对象，
+    时间戳可以是 datetime；无法提取或无法转换为数值时返回 None，由调用方走对象路径
+    """
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        return default_timestamp, data, 0.0
+    if isinstance(data, dict):
+        price = data.get("price", data.get("close"))
+        if price is None:
+            return None
+        row = data.get("timestamp", default_timestamp), price, data.get("volume", 0.0)
+    else:
+        price = getattr(data, "price", None)
+        if price is None:
+            price = getattr(data, "close", None)
+        if price is None:
+            return None
+        row = getattr(data, "timestamp", default_timestamp), price, getattr(data, "volume", 0.0)
+    timestamp, price, volume = row
+    try:
+        return _to_epoch_seconds(timestamp), float(price), float(volume)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColumnBlock:
+    """预分配的列缓冲块：timestamps/prices/volumes 三列 float64"""
+
+    __slots__ = ("timestamps", "prices", "volumes", "size")
+
+    def __init__(self, capacity: int):
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.volumes = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        """块容量"""
+        return len(self.prices)
+
+    def append(self, timestamp: float, price: float, volume: float) -> None:
+        """写入一行"""
+        i = self.size
+        self.timestamps[i] = timestamp
+        self.prices[i] = price
+        self.volumes[i] = volume
+        self.size = i + 1
+
+
+class ColumnarBatch:
+    """
+    列式事件批次
+
+    timestamps/prices/volumes 是列缓冲块的只读视图，处理完成后由引擎调用
+    release() 把缓冲块归还给交易对缓冲区复用；处理器不应在返回后继续持有视图
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        event_type: str,
+        block: ColumnBlock,
+        release: Optional[Callable[[ColumnBlock], None]] = None
+    ):
+        self.symbol = symbol
+        self.event_type = event_type
+        self._block = block
+        self._release = release
+        n = block.size
+        self.timestamps = block.timestamps[:n]
+        self.prices = block.prices[:n]
+        self.volumes = block.volumes[:n]
+        for column in (self.timestamps, self.prices, self.volumes):
+            column.flags.writeable = False
+
+    @classmethod
+    def from_events(cls, symbol: str, event_type: str, events: List[BatchEvent]) -> 'ColumnarBatch':
+        """由事件对象列表构建列式批次（无法提取数值的事件被跳过）"""
+        block = ColumnBlock(max(len(events), 1))
+        for event in events:
+            row = _extract_columns(event.data, event.timestamp)
+            if row is not None:
+                block.append(*row)
+        return cls(symbol, event_type, block)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换为与顺序处理相同格式的字典列表（供未声明列式的处理器使用）"""
+        return [
+            {
+                "event_type": self.event_type,
+                "symbol": self.symbol,
+                "data": {"timestamp": timestamp, "price": price, "volume": volume},
+                "timestamp": timestamp
+            }
+            for timestamp, price, volume in zip(
+                self.timestamps.tolist(), self.prices.tolist(), self.volumes.tolist()
+            )
+        ]
+
+    def release(self) -> None:
+        """归还列缓冲块，之后视图内容可能被覆盖"""
+        if self._release is not None and self._block is not None:
+            self._release(self._block)
+        self._block = None
+
+
 @dataclass
 class EventBatch:
     """事件批次"""
@@ -101,6 +236,7 @@ class EventBatch:
     events: List[BatchEvent] = field(default_factory=list)
     created_at: float = field(default_factory=time.time)
     max_size: int = 100  # 最大批次大小
+    columns: Dict[str, ColumnarBatch] = field(default_factory=dict)  # 事件类型 -> 列式批次
 
     def add(self, event: Any) -> None:
         """添加事件到批次"""
@@ -114,8 +250,8 @@ class EventBatch:
         return len(self.events)
 
     def size(self) -> int:
-        """获取批次大小"""
-        return len(self.events)
+        """获取批次大小（含列式事件）"""
+        return len(self.events) + sum(len(column) for column in self.columns.values())
 
     def is_full(self) -> bool:
         """检查批次是否已满"""
@@ -244,7 +380,12 @@ class BatchingMetrics:
 
 
 class SymbolBatchBuffer:
-    """交易对批次缓冲区"""
+    """
+    交易对批次缓冲区
+
+    对象事件保存在 EventBatch 中；列式事件按事件类型写入预分配的列缓冲块，
+    刷新时缓冲块整体交给批次，换上空闲块继续写入，不拷贝数据
+    """
     
     def __init__(
         self,
@@ -258,6 +399,11 @@ class SymbolBatchBuffer:
         self.batch = EventBatch(symbol=symbol)
         self._lock = threading.RLock()
         self._last_flush_time = time.time()
+
+        # 列式缓冲：事件类型 -> 当前写入块，以及处理完成后归还的空闲块
+        self._column_blocks: Dict[str, ColumnBlock] = {}
+        self._free_blocks: List[ColumnBlock] = []
+        self._column_rows = 0
     
     def add(self, event: BatchEvent) -> Optional[EventBatch]:
         """
@@ -268,20 +414,60 @@ class SymbolBatchBuffer:
         """
         with self._lock:
             self.batch.add(event)
-            
-            # 检查是否需要刷新
-            if self.batch.size() >= self.max_batch_size:
-                return self._flush()
-            
-            if self.batch.age_ms() >= self.max_batch_age_ms:
-                return self._flush()
-            
-            return None
+            return self._check_flush()
+
+    def add_columns(
+        self,
+        event_type: str,
+        timestamp: float,
+        price: float,
+        volume: float = 0.0
+    ) -> Optional[EventBatch]:
+        """
+        直接写入一行列式数据，不创建事件对象
+
+        Returns:
+            EventBatch or None: 如果批次已满或超时，返回批次
+        """
+        with self._lock:
+            block = self._column_blocks.get(event_type)
+            if block is None:
+                block = self._column_blocks[event_type] = self._acquire_block()
+            block.append(timestamp, price, volume)
+            self._column_rows += 1
+            return self._check_flush()
+
+    def _check_flush(self) -> Optional[EventBatch]:
+        """达到批次大小或批次年龄时刷新（调用方持有锁）"""
+        if self.size() >= self.max_batch_size:
+            return self._flush()
+
+        if self.batch.age_ms() >= self.max_batch_age_ms:
+            return self._flush()
+
+        return None
+
+    def size(self) -> int:
+        """缓冲中的事件数（含列式事件）"""
+        return len(self.batch.events) + self._column_rows
+
+    def _acquire_block(self) -> ColumnBlock:
+        """取一个空闲列缓冲块（调用方持有锁）"""
+        if self._free_blocks:
+            block = self._free_blocks.pop()
+            block.size = 0
+            return block
+        return ColumnBlock(self.max_batch_size)
+
+    def _release_block(self, block: ColumnBlock) -> None:
+        """归还列缓冲块"""
+        with self._lock:
+            self._free_blocks.append(block)
     
     def flush(self) -> Optional[EventBatch]:
         """强制刷新缓冲区"""
         with self._lock:
-            if self.batch.size() > 0:
+            if self.size() > 0:
                 return self._flush()
             return None
     
@@ -292,6 +478,13 @@ class SymbolBatchBuffer:
             events=self.batch.events.copy(),
             created_at=self.batch.created_at
         )
+        if self._column_rows:
+            batch.columns = {
+                event_type: ColumnarBatch(self.symbol, event_type, block, self._release_block)
+                for event_type, block in self._column_blocks.items()
+            }
+            self._column_blocks = {}
+            self._column_rows = 0
         self.batch.clear()
         self._last_flush_time = time.time()
         return batch
@@ -299,7 +492,7 @@ class SymbolBatchBuffer:
     def should_flush(self) -> bool:
         """检查是否应该刷新"""
         with self._lock:
-            if self.batch.size() == 0:
+            if self.size() == 0:
                 return False
             return self.batch.age_ms() >= self.max_batch_age_ms
 
@@ -351,6 +544,8 @@ class BatchingEngine:
         # 批处理器 - 支持每个事件类型多个处理器
         self.batch_handlers: Dict[str, List[Callable]] = {}
         self._handlers_lock = threading.RLock()
+        # 处理器全部声明为列式的事件类型，这些事件直接写入列缓冲区
+        self._columnar_types: frozenset = frozenset()
         
         # 工作线程
         self._executor = ThreadPoolExecutor(max_workers=num_workers)
@@ -371,7 +566,15 @@ class BatchingEngine:
             if event_type not in self.batch_handlers:
                 self.batch_handlers[event_type] = []
             self.batch_handlers[event_type].append(handler)
+            self._refresh_columnar_types()
             logger.debug(f"注册批处理器: {event_type}")
+
+    def _refresh_columnar_types(self) -> None:
+        """重新计算可走列式路径的事件类型（调用方持有 _handlers_lock）"""
+        self._columnar_types = frozenset(
+            event_type for event_type, handlers in self.batch_handlers.items()
+            if handlers and all(getattr(h, '__columnar__', False) for h in handlers)
+        )
     
     def put(self, event_type: str, data: Any, symbol: str = "DEFAULT") -> bool:
         """
@@ -391,15 +594,23 @@ class BatchingEngine:
         # 获取或创建缓冲区
         buffer = self._get_or_create_buffer(symbol)
 
-        # 创建事件
-        event = BatchEvent(
-            event_type=event_type,
-            symbol=symbol,
-            data=data
-        )
+        row = None
+        if self.enable_vectorization and event_type in self._columnar_types:
+            row = _extract_columns(data, time.time())
+
+        if row is not None:
+            # 列式路径：直接写入列缓冲区
+            batch = buffer.add_columns(event_type, *row)
+        else:
+            # 创建事件
+            event = BatchEvent(
+                event_type=event_type,
+                symbol=symbol,
+                data=data
+            )
 
-        # 添加到缓冲区
-        batch = buffer.add(event)
+            # 添加到缓冲区
+            batch = buffer.add(event)
 
         # 如果批次已满，提交处理
         if batch is not None:
@@ -450,6 +661,10 @@ class BatchingEngine:
                         self._process_vectorized(handler, events)
                     else:
                         self._process_sequential(handler, events)
+
+            # 处理列式批次
+            for event_type, columns in batch.columns.items():
+                self._process_columnar(event_type, columns)
             
             # 记录处理时间
             processing_time = time.time() - start_time
@@ -461,10 +676,40 @@ class BatchingEngine:
             
         except Exception as e:
             logger.error(f"处理批次时出错: {e}")
+        finally:
+            for columns in batch.columns.values():
+                columns.release()
+
+    def _process_columnar(self, event_type: str, columns: ColumnarBatch) -> None:
+        """把列式批次交给处理器，未声明列式的处理器（写入后才注册）收到字典列表"""
+        with self._handlers_lock:
+            handlers = self.batch_handlers.get(event_type, [])
+
+        if not handlers:
+            logger.warning(f"未找到批处理器: {event_type}")
+            return
+
+        records = None
+        for handler in handlers:
+            try:
+                if getattr(handler, '__columnar__', False):
+                    handler(columns)
+                else:
+                    if records is None:
+                        records = columns.to_records()
+                    handler(records)
+            except Exception as e:
+                logger.error(f"列式批次处理时出错: {e}")
     
     def _process_sequential(self, handler: Callable, events: List[BatchEvent]) -> None:
         """顺序处理事件 - 传递完整的事件列表给处理器"""
         try:
+            # 列式处理器在未启用向量化时同样收到列式批次
+            if getattr(handler, '__columnar__', False):
+                first = events[0]
+                handler(ColumnarBatch.from_events(first.symbol, first.event_type, events))
+                return
+
             # 构建批次数据，包含完整的事件信息
             batch_data = [
                 {
@@ -483,6 +728,12 @@ class BatchingEngine:
     def _process_vectorized(self, handler: Callable, events: List[BatchEvent]) -> None:
         """向量化处理事件"""
         try:
+            # 列式处理器收到由事件对象构建的列式批次
+            if getattr(handler, '__columnar__', False):
+                first = events[0]
+                handler(ColumnarBatch.from_events(first.symbol, first.event_type, events))
+                return
+
             # 提取数据
             data_list = [event.data for event in events]
             
@@ -602,7 +853,7 @@ class BatchingEngine:
         with self._buffers_lock:
             return {
                 "buffer_count": len(self.buffers),
-                "total_buffered_events": sum(b.batch.size() for b in self.buffers.values()),
+                "total_buffered_events": sum(b.size() for b in self.buffers.values()),
                 "symbols": list(self.buffers.keys())[:100]  # 只返回前100个
             }
 
@@ -634,6 +885,7 @@ class BatchingEngine:
                     handlers.remove(handler)
                     if not handlers:
                         del self.batch_handlers[event_type]
+                    self._refresh_columnar_types()
                     return True
             return False
 
@@ -647,6 +899,7 @@ class BatchingEngine:
         with self._handlers_lock:
             if event_type in self.batch_handlers:
                 del self.batch_handlers[event_type]
+                self._refresh_columnar_types()
 
     def get_all_handlers(self) -> Dict[str, List[Callable]]:
         """
@@ -675,36 +928,40 @@ class VectorizedBatchProcessor:
     def __init__(self):
         self._cache: Dict[str, np.ndarray] = {}
     
-    def process_prices(self, batch: List[Dict]) -> Dict[str, float]:
+    def process_prices(self, batch: Union[List[Dict], ColumnarBatch]) -> Dict[str, float]:
         """
         向量化处理价格数据
 
         Args:
-            batch: 批次数据列表，每个元素包含 price 键
+            batch: 批次数据列表（每个元素包含 price 键）或列式批次
 
         Returns:
             Dict: 统计指标
         """
-        if not batch:
-            return {"count": 0}
+        if isinstance(batch, ColumnarBatch):
+            # 列式批次直接使用价格列视图
+            price_array = batch.prices
+        else:
+            if not batch:
+                return {"count": 0}
 
-        # 提取价格数据
-        prices = []
-        for item in batch:
-            if isinstance(item, dict) and "price" in item:
-                prices.append(item["price"])
-            elif isinstance(item, (int, float)):
-                prices.append(item)
+            # 提取价格数据
+            prices = []
+            for item in batch:
+                if isinstance(item, dict) and "price" in item:
+                    prices.append(item["price"])
+                elif isinstance(item, (int, float)):
+                    prices.append(item)
 
-        if not prices:
-            return {"count": 0}
+            # 转换为NumPy数组
+            price_array = np.array(prices, dtype=np.float32)
 
-        # 转换为NumPy数组
-        price_array = np.array(prices, dtype=np.float32)
+        if len(price_array) == 0:
+            return {"count": 0}
 
         # 计算统计指标
         return {
-            "count": len(prices),
+            "count": len(price_array),
             "mean": float(np.mean(price_array)),
             "std": float(np.std(price_array)),
             "min": float(np.min(price_array)),
@@ -7,17 +7,24 @@
 3. 每交易对专用队列
 4. 线程池管理
 5. 符号级别的并发控制
+6. 进程分片模式 - 每个分片运行在独立进程中，绕开 GIL
 """
 
+import secrets
 import threading
 import time
 import logging
+import multiprocessing
+import weakref
 from queue import Queue, Empty
 from typing import Dict, List, Callable, Any, Optional, Set
 from dataclasses import dataclass, field
 from enum import IntEnum
 import hashlib
 
+from .hardware_optimizer import ThreadAffinityManager, pin_current_thread_to_core
+from .memory_pool import SharedEventQueue
+
 logger = logging.getLogger(__name__)
 
 
@@ -230,6 +237,187 @@ class SymbolShard:
                 logger.error(f"分片 {self.shard_id} 处理事件时出错: {e}")
 
 
+
+def _shard_process_main(
+    shard_id: int,
+    queue_name: str,
+    handlers: Dict[str, List[Callable]],
+    result_queue,
+    stop_event,
+    core_id: Optional[int]
+) -> None:
+    """
+    分片进程主循环
+
+    从共享内存队列读取事件并顺序执行处理器，处理器返回值不为 None 时
+    以 (shard_id, event_type, symbol, result) 发送回主进程
+    """
+    if core_id is not None:
+        pin_current_thread_to_core(core_id)
+
+    queue = SharedEventQueue.attach(queue_name)
+    idle_sleep = 0.0
+    try:
+        while True:
+            record = queue.get()
+            if record is None:
+                if stop_event.is_set():
+                    break
+                # 空闲时逐步退避，避免空转占满核心
+                idle_sleep = min(idle_sleep * 2 or 0.0001, 0.005)
+                time.sleep(idle_sleep)
+                continue
+            idle_sleep = 0.0
+
+            event_type, symbol, data, _ = record
+            start_ns = time.perf_counter_ns()
+            for handler in handlers.get(event_type, ()):
+                try:
+                    result = handler(data)
+                except Exception as e:
+                    logger.error(f"分片进程 {shard_id} 事件处理器执行失败: {event_type}, 错误: {e}")
+                    continue
+                if result is not None:
+                    result_queue.put((shard_id, event_type, symbol, result))
+            queue.task_done(time.perf_counter_ns() - start_ns)
+    finally:
+        queue.close()
+
+
+class ProcessSymbolShard:
+    """
+    进程分片 - 与 SymbolShard 接口一致，处理器运行在独立进程中
+
+    特性：
+    1. 主进程写入、分片进程读取的共享内存队列，BarEvent/TickEvent 使用紧凑布局
+    2. 处理器在启动时传给分片进程，之后注册的处理器不会生效
+    3. 可按分配的核心绑定分片进程
+    """
+
+    def __init__(
+        self,
+        shard_id: int,
+        max_queue_size: int = 10000,
+        slot_size: int = 256,
+        mp_context=None
+    ):
+        self.shard_id = shard_id
+        self.max_queue_size = max_queue_size
+        self.queue = SharedEventQueue.create(
+            f"qshard_{secrets.token_hex(4)}_{shard_id}", max_queue_size, slot_size
+        )
+        self.symbols: Set[str] = set()
+        self.core_id: Optional[int] = None
+        self._lock = threading.RLock()
+        self._ctx = mp_context or multiprocessing.get_context()
+        self._process = None
+        self._stop_event = None
+        self._running = False
+        # 引擎未调用 close() 时，随分片回收释放共享内存
+        self._finalizer = weakref.finalize(self, self.queue.close)
+
+        # 统计
+        self.events_dropped = 0
+
+    def add_symbol(self, symbol: str) -> None:
+        """添加交易对到分片"""
+        with self._lock:
+            self.symbols.add(symbol)
+
+    def remove_symbol(self, symbol: str) -> None:
+        """从分片移除交易对"""
+        with self._lock:
+            self.symbols.discard(symbol)
+
+    def has_symbol(self, symbol: str) -> bool:
+        """检查分片是否包含交易对"""
+        with self._lock:
+            return symbol in self.symbols
+
+    def put(self, event: SymbolEvent, block: bool = False, timeout: Optional[float] = None) -> bool:
+        """写入事件到共享内存队列，阻塞模式下轮询等待空间
+
+        共享内存队列只支持单个写入方，多个线程写入同一分片时逐次加锁，等待空间时不持有锁
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self.queue.put(event.event_type, event.symbol, event.data, event.priority):
+                    return True
+                full = self.queue.qsize() >= self.max_queue_size
+            if not block or not full:
+                # 非阻塞或事件超出槽位大小
+                self.events_dropped += 1
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                self.events_dropped += 1
+                return False
+            time.sleep(0.0005)
+
+    def qsize(self) -> int:
+        """获取当前队列大小"""
+        return self.queue.qsize()
+
+    @property
+    def events_processed(self) -> int:
+        """分片进程已处理的事件数"""
+        return self.queue.processed
+
+    @property
+    def avg_processing_time(self) -> float:
+        """分片进程平均单事件处理耗时（秒）"""
+        processed = self.queue.processed
+        return self.queue.processing_ns / processed / 1e9 if processed else 0.0
+
+    @property
+    def running(self) -> bool:
+        """获取分片运行状态"""
+        return self._running
+
+    def start(self, handlers: Dict[str, List[Callable]], result_queue) -> None:
+        """
+        启动分片进程
+
+        Args:
+            handlers: 事件类型到处理器列表的映射（spawn/forkserver 下需可 pickle）
+            result_queue: 处理结果回传队列
+        """
+        if self._running:
+            return
+
+        self._stop_event = self._ctx.Event()
+        self._process = self._ctx.Process(
+            target=_shard_process_main,
+            args=(self.shard_id, self.queue.name, handlers, result_queue, self._stop_event, self.core_id),
+            name=f"SymbolShard-{self.shard_id}",
+            daemon=True
+        )
+        self._process.start()
+        self._running = True
+        logger.debug(f"分片进程 {self.shard_id} 已启动: pid={self._process.pid}, 核心={self.core_id}")
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """停止分片进程，进程退出前处理完队列中已有的事件"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._stop_event.set()
+        self._process.join(timeout=timeout)
+        if self._process.is_alive():
+            logger.warning(f"分片进程 {self.shard_id} 未在超时内退出，强制终止")
+            self._process.terminate()
+            self._process.join(timeout=1.0)
+        self._process = None
+
+        logger.debug(f"分片进程 {self.shard_id} 已停止，处理了 {self.events_processed} 个事件")
+
+    def close(self) -> None:
+        """释放共享内存队列"""
+        self.stop()
+        self._finalizer()
+
+
 class ConcurrentEventMetrics:
     """并发事件引擎性能指标"""
     
@@ -291,34 +479,68 @@ class ConcurrentEventEngine:
     2. 一致性哈希 - 确保同一交易对始终路由到同一分片
     3. 独立队列 - 每个分片有独立的事件队列
     4. 并行处理 - 多个分片并行处理事件
+
+    进程分片模式（shard_mode="process"）下每个分片是一个独立进程，
+    事件经共享内存队列传递，CPU 密集的处理器不再受 GIL 限制：
+    - 处理器在 start() 时传给分片进程，之后注册的处理器要到下次启动才生效
+    - 处理器的非 None 返回值回传主进程，交给 register_result_handler 注册的回调
+    - 提供 affinity_manager 时按其 CPU 分配把分片进程绑定到核心
     """
     
+    SHARD_MODES = ("thread", "process")
+
     def __init__(
         self,
         num_shards: int = 16,
         max_queue_size_per_shard: int = 10000,
         enable_backpressure: bool = True,
-        backpressure_threshold: float = 0.8
+        backpressure_threshold: float = 0.8,
+        shard_mode: str = "thread",
+        affinity_manager: Optional[ThreadAffinityManager] = None,
+        start_method: Optional[str] = None,
+        slot_size: int = 256
     ):
         """
         初始化并发事件引擎
 
         Args:
-            num_shards: 分片数量（建议为CPU核心数的2-4倍）
+            num_shards: 分片数量（建议为CPU核心数的2-4倍，进程模式下建议不超过核心数）
             max_queue_size_per_shard: 每个分片的最大队列大小
             enable_backpressure: 是否启用背压机制
             backpressure_threshold: 背压阈值
+            shard_mode: 分片模式，"thread" 或 "process"
+            affinity_manager: 进程模式下用于分配分片核心的亲和性管理器
+            start_method: 进程模式的启动方式（fork/spawn/forkserver），默认使用平台默认值
+            slot_size: 进程模式下共享内存队列每个事件槽位的字节数
         """
+        if shard_mode not in self.SHARD_MODES:
+            raise ValueError(f"不支持的分片模式: {shard_mode}，可选: {self.SHARD_MODES}")
+
         self.num_shards = num_shards
         self.max_queue_size_per_shard = max_queue_size_per_shard
         self.enable_backpressure = enable_backpressure
         self.backpressure_threshold = backpressure_threshold
+        self.shard_mode = shard_mode
+        self.affinity_manager = affinity_manager
         
         # 创建分片
-        self.shards: List[SymbolShard] = [
-            SymbolShard(shard_id=i, max_queue_size=max_queue_size_per_shard)
-            for i in range(num_shards)
-        ]
+        self._mp_context = None
+        if shard_mode == "process":
+            self._mp_context = multiprocessing.get_context(start_method)
+            self.shards: List[Any] = [
+                ProcessSymbolShard(
+                    shard_id=i,
+                    max_queue_size=max_queue_size_per_shard,
+                    slot_size=slot_size,
+                    mp_context=self._mp_context
+                )
+                for i in range(num_shards)
+            ]
+        else:
+            self.shards = [
+                SymbolShard(shard_id=i, max_queue_size=max_queue_size_per_shard)
+                for i in range(num_shards)
+            ]
         
         # 交易对到分片的映射缓存
         self._symbol_to_shard: Dict[str, int] = {}
@@ -329,6 +551,12 @@ class ConcurrentEventEngine:
         
         # 运行状态
         self._running = False
+
+        # 进程模式的结果回传
+        self._result_handlers: List[Callable] = []
+        self._result_queue = None
+        self._result_thread: Optional[threading.Thread] = None
+        self._results_received = 0
         
         # 性能指标
         self.metrics = ConcurrentEventMetrics(num_shards)
@@ -337,7 +565,10 @@ class ConcurrentEventEngine:
         self._backpressure_active = False
         self._dropped_count = 0
         
-        logger.info(f"并发事件引擎初始化完成: {num_shards} 个分片, 每分片队列={max_queue_size_per_shard}")
+        logger.info(
+            f"并发事件引擎初始化完成: {num_shards} 个分片, 每分片队列={max_queue_size_per_shard}, "
+            f"分片模式={shard_mode}"
+        )
     
     def _get_shard_id(self, symbol: str) -> int:
         """
@@ -372,6 +603,16 @@ class ConcurrentEventEngine:
                 self.handlers[event_type] = []
             self.handlers[event_type].append(handler)
             logger.debug(f"注册事件处理器: {event_type}")
+            if self._running and self.shard_mode == "process":
+                logger.warning(f"进程分片模式下运行中注册的处理器需重启引擎后生效: {event_type}")
+
+    def register_result_handler(self, handler: Callable) -> None:
+        """
+        注册处理结果回调（进程模式）
+
+        回调在主进程的结果线程中执行，参数为 (event_type, symbol, result)
+        """
+        self._result_handlers.append(handler)
     
     def unregister(self, event_type: str, handler: Callable) -> bool:
         """注销事件处理器"""
@@ -484,10 +725,54 @@ class ConcurrentEventEngine:
         self._running = True
         
         # 启动所有分片
-        for shard in self.shards:
-            shard.start(self._process_event)
+        if self.shard_mode == "process":
+            self._start_process_shards()
+        else:
+            for shard in self.shards:
+                shard.start(self._process_event)
         
         logger.info(f"并发事件引擎已启动: {self.num_shards} 个分片")
+
+    def _start_process_shards(self) -> None:
+        """分配核心并启动分片进程和结果线程"""
+        if self.affinity_manager is not None:
+            cores = self.affinity_manager.get_optimal_cpus(self.num_shards)
+            for shard, core_id in zip(self.shards, cores):
+                shard.core_id = core_id
+
+        with self._handlers_lock:
+            handlers = {event_type: list(items) for event_type, items in self.handlers.items() if items}
+
+        self._result_queue = self._mp_context.Queue()
+        for shard in self.shards:
+            shard.start(handlers, self._result_queue)
+
+        self._result_thread = threading.Thread(
+            target=self._result_loop,
+            name="ConcurrentEngineResults",
+            daemon=True
+        )
+        self._result_thread.start()
+
+    def _result_loop(self) -> None:
+        """结果线程：接收分片进程回传的处理结果，收到 None 时退出"""
+        while True:
+            try:
+                item = self._result_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+
+            shard_id, event_type, symbol, result = item
+            self._results_received += 1
+            for handler in self._result_handlers:
+                try:
+                    handler(event_type, symbol, result)
+                except Exception as e:
+                    logger.error(f"结果回调执行失败: {event_type}, 分片: {shard_id}, 错误: {e}")
     
     def stop(self, timeout: float = 5.0) -> None:
         """停止事件引擎"""
@@ -500,18 +785,36 @@ class ConcurrentEventEngine:
         # 停止所有分片
         for shard in self.shards:
             shard.stop(timeout=timeout / self.num_shards)
+
+        if self._result_thread is not None:
+            # 分片进程已退出，结果都已进入队列，哨兵之前的结果会被处理完
+            self._result_queue.put(None)
+            self._result_thread.join(timeout=timeout)
+            self._result_thread = None
+            self._result_queue.close()
+            self._result_queue = None
         
         logger.info("并发事件引擎已停止")
         
         # 输出最终统计
-        stats = self.metrics.get_stats()
+        stats = self.get_stats()
         logger.info(f"最终统计: 接收={stats['events_received']}, "
                    f"处理={stats['events_processed']}, "
                    f"丢弃={stats['events_dropped']}")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取事件引擎统计信息"""
-        return self.metrics.get_stats()
+        stats = self.metrics.get_stats()
+        if self.shard_mode == "process":
+            # 处理计数由各分片进程写在共享内存头部
+            processed = sum(shard.events_processed for shard in self.shards)
+            busy_time = sum(shard.avg_processing_time * shard.events_processed for shard in self.shards)
+            stats["events_processed"] = processed
+            stats["total_processed"] = processed
+            stats["total_queued"] = stats["events_received"] - processed
+            stats["avg_processing_time_ms"] = busy_time / processed * 1000 if processed else 0.0
+            stats["results_received"] = self._results_received
+        return stats
 
     def get_metrics(self) -> Dict[str, Any]:
         """
@@ -520,7 +823,7 @@ class ConcurrentEventEngine:
         Returns:
             Dict[str, Any]: 包含事件处理统计、队列状态、错误计数等指标
         """
-        return self.metrics.get_stats()
+        return self.get_stats()
 
     def is_healthy(self) -> bool:
         """
@@ -529,7 +832,7 @@ class ConcurrentEventEngine:
         Returns:
             bool: 引擎是否健康（丢包率低于5%）
         """
-        stats = self.metrics.get_stats()
+        stats = self.get_stats()
         return stats['drop_rate'] < 0.05
 
     @property
@@ -569,13 +872,36 @@ class ConcurrentEventEngine:
             return {}
         
         shard = self.shards[shard_id]
-        return {
+        stats = {
             "shard_id": shard_id,
             "queue_size": shard.queue.qsize(),
             "symbols_count": len(shard.symbols),
             "events_processed": shard.events_processed,
             "events_dropped": shard.events_dropped
         }
+        if self.shard_mode == "process":
+            stats["core_id"] = shard.core_id
+        return stats
+
+    def get_symbol_cores(self) -> Dict[str, int]:
+        """
+        获取交易对所在分片进程绑定的核心（进程模式且已分配核心时有效）
+
+        Returns:
+            Dict[str, int]: 交易对到核心ID的映射
+        """
+        return {
+            symbol: self.shards[shard_id].core_id
+            for symbol, shard_id in self._symbol_to_shard.items()
+            if getattr(self.shards[shard_id], "core_id", None) is not None
+        }
+
+    def close(self) -> None:
+        """停止引擎并释放进程模式的共享内存队列"""
+        self.stop()
+        if self.shard_mode == "process":
+            for shard in self.shards:
+                shard.close()
     
     def rebalance_symbols(self, symbols: List[str]) -> Dict[str, int]:
         """
@@ -606,7 +932,8 @@ class ConcurrentEventEngine:
 def create_concurrent_engine(
     num_shards: int = 16,
     max_queue_size_per_shard: int = 10000,
-    enable_backpressure: bool = True
+    enable_backpressure: bool = True,
+    shard_mode: str = "thread"
 ) -> ConcurrentEventEngine:
     """
     创建并发事件引擎
@@ -615,6 +942,7 @@ def create_concurrent_engine(
         num_shards: 分片数量
         max_queue_size_per_shard: 每个分片的最大队列大小
         enable_backpressure: 是否启用背压
+        shard_mode: 分片模式，"thread" 或 "process"
         
     Returns:
         ConcurrentEventEngine: 并发事件引擎实例
@@ -622,5 +950,6 @@ def create_concurrent_engine(
     return ConcurrentEventEngine(
         num_shards=num_shards,
         max_queue_size_per_shard=max_queue_size_per_shard,
-        enable_backpressure=enable_backpressure
+        enable_backpressure=enable_backpressure,
+        shard_mode=shard_mode
     )
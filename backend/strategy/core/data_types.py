@@ -79,12 +79,13 @@ class InstrumentId:
         return cls(symbol=value, venue="")
 
 
-@dataclass
+@dataclass(slots=True)
 class Bar:
     """
     K线数据
     
     标准化的K线数据结构，与具体交易框架无关。
+    使用 __slots__，实盘适配器可从对象池复用实例。
     
     Attributes
     ----------
@@ -128,7 +129,7 @@ class Bar:
         return self.instrument_id.venue
 
 
-@dataclass
+@dataclass(slots=True)
 class QuoteTick:
     """
     报价数据
@@ -156,7 +157,7 @@ class QuoteTick:
     timestamp: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class TradeTick:
     """
     成交数据
@@ -7,10 +7,11 @@
 
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Callable
+from typing import Dict, Any, List, Callable, Union
 from dataclasses import dataclass, field
 from enum import Enum, auto
 from utils.logger import get_logger, LogType
+from .memory_pool import BarEvent, ObjectPool
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
@@ -35,7 +36,7 @@ class Event:
     data: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class BarData:
     """K线数据"""
     timestamp: pd.Timestamp
@@ -108,11 +109,24 @@ class EventDrivenBacktestEngine:
     2. 支持多种订单类型
     3. 实时更新持仓和账户
     4. 模拟真实交易环境
+
+    K线使用对象池中的 BarEvent，每根K线处理完成后归还，回测过程中不再逐根分配对象
     """
     
-    def __init__(self):
-        """初始化引擎"""
+    def __init__(self, pool_debug: bool = False):
+        """
+        初始化引擎
+
+        Args:
+            pool_debug: K线对象池调试模式，归还后仍被访问的K线会抛出 UseAfterReleaseError
+        """
         self.event_queue: Queue = Queue()
+        self._bar_pool: ObjectPool = ObjectPool(
+            factory=BarEvent,
+            initial_size=1,
+            max_size=16,
+            debug=pool_debug
+        )
         self.handlers: Dict[EventType, List[Callable]] = {}
         
         # 账户状态
@@ -181,36 +195,39 @@ class EventDrivenBacktestEngine:
         
         # 生成信号
         signals = signal_generator(data)
+
+        # 一次性取出各列，避免逐行 iloc 构造 Series
+        opens = data['Open'].to_numpy(dtype=np.float64).tolist()
+        highs = data['High'].to_numpy(dtype=np.float64).tolist()
+        lows = data['Low'].to_numpy(dtype=np.float64).tolist()
+        closes = data['Close'].to_numpy(dtype=np.float64).tolist()
+        volumes = data['Volume'].to_numpy(dtype=np.float64).tolist()
+        bar_pool = self._bar_pool
         
         # 遍历数据，生成事件
-        for i in range(len(data)):
-            row = data.iloc[i]
-            idx = data.index[i]
+        for i, idx in enumerate(data.index):
             timestamp = idx if isinstance(idx, pd.Timestamp) else pd.Timestamp(idx)
             
-            # 创建BAR事件
-            bar = BarData(
-                timestamp=timestamp,
-                open=row['Open'],
-                high=row['High'],
-                low=row['Low'],
-                close=row['Close'],
-                volume=row['Volume']
+            # 从对象池取出BAR事件
+            bar = bar_pool.acquire().set_data(
+                "", opens[i], highs[i], lows[i], closes[i], volumes[i], timestamp, ""
             )
-            
-            # 处理BAR事件
-            self._process_bar(bar, signals[i], target, fees, slippage)
-            
-            # 记录历史
-            equity = self._get_equity(bar.close)
-            self.equity_history.append(equity)
-            self.cash_history.append(self.cash)
-            self.position_history.append(self.position.size)
+            try:
+                # 处理BAR事件
+                self._process_bar(bar, signals[i], target, fees, slippage)
+
+                # 记录历史
+                equity = self._get_equity(bar.close)
+                self.equity_history.append(equity)
+                self.cash_history.append(self.cash)
+                self.position_history.append(self.position.size)
+            finally:
+                bar.release()
         
         # 计算结果
         return self._calculate_results(init_cash)
     
-    def _process_bar(self, bar: BarData, signal: int, target: float, fees: float, slippage: float):
+    def _process_bar(self, bar: Union[BarData, BarEvent], signal: int, target: float, fees: float, slippage: float):
         """处理K线数据"""
         # 使用开盘价执行交易
         exec_price = bar.open
@@ -9,15 +9,18 @@
 5. 优雅降级机制
 6. 异常隔离和熔断器
 7. 自动扩缩容
+8. 快速路径：写时复制的处理器表、普通优先级环形队列、采样指标
 """
 
 import threading
 import time
 import logging
-from typing import Dict, List, Callable, Any, Optional
+from collections import deque
+from typing import Dict, List, Callable, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from concurrent.futures import ThreadPoolExecutor
 import heapq
+import itertools
 
 # 导入弹性机制
 from strategy.core.resilience import (
@@ -74,6 +77,21 @@ class EventMetrics:
             if len(self.processing_times) > 1000:
                 self.processing_times = self.processing_times[-1000:]
     
+    def record_received_batch(self, count: int, priority: int = 2):
+        """批量记录接收事件"""
+        with self._lock:
+            self.events_received += count
+            self.events_by_priority[priority] = self.events_by_priority.get(priority, 0) + count
+
+    def record_processed_batch(self, count: int, processing_time: Optional[float] = None):
+        """批量记录处理完成事件，processing_time 为采样得到的单事件耗时"""
+        with self._lock:
+            self.events_processed += count
+            if processing_time is not None:
+                self.processing_times.append(processing_time)
+                if len(self.processing_times) > 1000:
+                    self.processing_times = self.processing_times[-1000:]
+
     def record_dropped(self):
         """记录丢弃事件"""
         with self._lock:
@@ -175,6 +193,11 @@ class BoundedPriorityQueue:
             self._not_full.notify()
             return event
     
+    def peek_priority(self) -> Optional[int]:
+        """查看队首事件的优先级，队列为空时返回 None"""
+        with self._lock:
+            return self._queue[0].priority if self._size else None
+
     def qsize(self) -> int:
         """获取队列大小"""
         with self._lock:
@@ -203,6 +226,12 @@ class OptimizedEventEngine:
     5. 优雅降级 - 队列满时自动降级
     6. 异常隔离 - 处理器故障隔离
     7. 自动扩缩容 - 动态调整资源
+
+    快速路径（fast_path=True）面向事件驱动回测：
+    - 单个消费线程，普通优先级事件进入无锁的 deque 环形队列并按入队顺序处理，
+      其它优先级事件仍使用优先级堆，紧急事件先于普通事件处理
+    - 处理器表写时复制，注册/注销时整体替换，处理事件时无需加锁
+    - 处理耗时、接收/处理计数和降级级别每 metrics_sample_rate 个事件采样一次
     """
     
     def __init__(
@@ -215,7 +244,9 @@ class OptimizedEventEngine:
         enable_exception_isolation: bool = True,
         enable_auto_scaling: bool = True,
         min_workers: int = 2,
-        max_workers_limit: int = 32
+        max_workers_limit: int = 32,
+        fast_path: bool = False,
+        metrics_sample_rate: int = 64
     ):
         """
         初始化优化的事件引擎
@@ -230,7 +261,13 @@ class OptimizedEventEngine:
             enable_auto_scaling: 是否启用自动扩缩容
             min_workers: 最小工作线程数
             max_workers_limit: 最大工作线程数限制
+            fast_path: 是否启用单消费者快速路径（忽略 num_workers 和自动扩缩容）
+            metrics_sample_rate: 快速路径下指标采样间隔（事件数）
         """
+        if fast_path:
+            num_workers = 1
+            enable_auto_scaling = False
+
         self.max_queue_size = max_queue_size
         self.num_workers = num_workers
         self.enable_backpressure = enable_backpressure
@@ -244,6 +281,8 @@ class OptimizedEventEngine:
         # 事件处理器
         self.handlers: Dict[str, List[Callable]] = {}
         self._handlers_lock = threading.RLock()
+        # 处理器表快照：注册/注销时在锁内重建并整体替换，读取时无需加锁
+        self._handler_table: Dict[str, Tuple[Callable, ...]] = {}
 
         # 原始处理器到包装处理器的映射（用于正确注销）
         self._handler_wrappers: Dict[str, Dict[Callable, Callable]] = {}
@@ -262,6 +301,20 @@ class OptimizedEventEngine:
         # 背压状态
         self._backpressure_active = False
         self._dropped_count = 0
+
+        # 快速路径
+        self.fast_path = fast_path
+        self.metrics_sample_rate = max(1, metrics_sample_rate)
+        self._normal_lane: deque = deque()
+        self._backpressure_limit = int(max_queue_size * backpressure_threshold)
+        self._wakeup = threading.Event()
+        self._consumer_idle = False
+        # 多个生产者线程并发入队：入队计数用 itertools.count（next() 为原子操作），
+        # 待汇总的接收数在 _received_lock 内增减
+        self._put_counter = itertools.count(1)
+        self._pending_received = 0
+        self._received_lock = threading.Lock()
+        self._accept_max_priority = int(EventPriority.BACKGROUND)
         
         # 弹性机制
         self._graceful_degradation: Optional[GracefulDegradation] = None
@@ -284,7 +337,9 @@ class OptimizedEventEngine:
                 scale_down_threshold=0.3
             )
         
-        logger.info(f"优化的事件引擎初始化完成: 队列大小={max_queue_size}, 工作线程={num_workers}")
+        logger.info(
+            f"优化的事件引擎初始化完成: 队列大小={max_queue_size}, 工作线程={num_workers}, 快速路径={fast_path}"
+        )
     
     def _on_degradation_level_change(self, old_level: DegradationLevel, new_level: DegradationLevel):
         """降级级别变化回调"""
@@ -321,6 +376,7 @@ class OptimizedEventEngine:
             self._handler_wrappers[event_type][original_handler] = handler
 
             self.handlers[event_type].append(handler)
+            self._publish_handler_table()
             logger.debug(f"注册事件处理器: {event_type}, 当前处理器数量: {len(self.handlers[event_type])}")
 
     def unregister(self, event_type: str, handler: Callable) -> bool:
@@ -349,8 +405,19 @@ class OptimizedEventEngine:
                 # 清理映射
                 if handler in self._handler_wrappers.get(event_type, {}):
                     del self._handler_wrappers[event_type][handler]
+                self._publish_handler_table()
                 return True
             return False
+
+    def _publish_handler_table(self) -> None:
+        """重建处理器表快照并整体替换（调用方持有 _handlers_lock）"""
+        self._handler_table = {
+            event_type: tuple(handlers) for event_type, handlers in self.handlers.items() if handlers
+        }
+
+    def _queue_size(self) -> int:
+        """优先级堆与普通优先级环形队列中的事件总数"""
+        return self.event_queue.qsize() + len(self._normal_lane)
     
     def put(
         self,
@@ -373,6 +440,9 @@ class OptimizedEventEngine:
         Returns:
             bool: 是否成功添加
         """
+        if self.fast_path:
+            return self._put_fast(event_type, data, priority, block, timeout)
+
         # 获取当前队列使用率
         queue_usage = self.event_queue.qsize() / self.max_queue_size
         
@@ -421,6 +491,88 @@ class OptimizedEventEngine:
         
         return success
     
+    def _put_fast(
+        self,
+        event_type: str,
+        data: Any,
+        priority: EventPriority,
+        block: bool,
+        timeout: Optional[float]
+    ) -> bool:
+        """快速路径入队：普通优先级进入环形队列，其它优先级进入优先级堆"""
+        if next(self._put_counter) % self.metrics_sample_rate == 0:
+            self._sample_load()
+
+        # 降级级别按采样结果缓存，只有可能被拒绝时才询问降级机制
+        if priority > self._accept_max_priority and self._graceful_degradation:
+            if not self._graceful_degradation.should_accept_event(priority):
+                return self._drop_fast()
+
+        if priority != EventPriority.NORMAL:
+            if self.enable_backpressure and priority > EventPriority.NORMAL:
+                if self._queue_size() >= self._backpressure_limit:
+                    return self._drop_fast()
+            event = PrioritizedEvent(
+                priority=priority.value,
+                timestamp=time.time(),
+                event_type=event_type,
+                data=data
+            )
+            if not self.event_queue.put(event, block=block, timeout=timeout):
+                return self._drop_fast()
+            self.metrics.record_received(priority.value)
+        else:
+            lane = self._normal_lane
+            size = len(lane) + self.event_queue._size
+            if self.enable_backpressure and size >= self._backpressure_limit:
+                self._backpressure_active = True
+                return self._drop_fast()
+            if size >= self.max_queue_size:
+                if not block or not self._wait_for_space(timeout):
+                    return self._drop_fast()
+            lane.append((event_type, data))
+            with self._received_lock:
+                self._pending_received += 1
+
+        if self._consumer_idle:
+            self._wakeup.set()
+        return True
+
+    def _wait_for_space(self, timeout: Optional[float]) -> bool:
+        """快速路径阻塞入队时等待队列腾出空间"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue_size() >= self.max_queue_size:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.0005)
+        return True
+
+    def _drop_fast(self) -> bool:
+        """快速路径丢弃事件"""
+        self.metrics.record_dropped()
+        self._dropped_count += 1
+        if self._dropped_count % 1000 == 1:
+            logger.warning(f"快速路径已丢弃 {self._dropped_count} 个事件")
+        return False
+
+    def _sample_load(self) -> None:
+        """采样队列负载：更新降级级别并汇总接收计数"""
+        queue_usage = self._queue_size() / self.max_queue_size
+        self._backpressure_active = queue_usage >= self.backpressure_threshold
+        if self._graceful_degradation:
+            self._graceful_degradation.update_level(queue_usage)
+            self._accept_max_priority = self._graceful_degradation.current_config.max_priority
+        self._flush_received()
+
+    def _flush_received(self) -> None:
+        """把快速路径累计的接收数写入指标"""
+        with self._received_lock:
+            pending = self._pending_received
+            self._pending_received = 0
+        if pending:
+            self.metrics.record_received_batch(pending, EventPriority.NORMAL.value)
+
     def _should_apply_backpressure(self, priority: EventPriority) -> bool:
         """
         检查是否应该应用背压
@@ -460,9 +612,10 @@ class OptimizedEventEngine:
         
         # 创建工作线程
         self._workers = []
+        target = self._fast_worker_loop if self.fast_path else self._worker_loop
         for i in range(initial_workers):
             worker = threading.Thread(
-                target=self._worker_loop,
+                target=target,
                 args=(i,),
                 name=f"EventWorker-{i}",
                 daemon=True
@@ -546,6 +699,7 @@ class OptimizedEventEngine:
         logger.info("正在停止事件引擎...")
         self.running = False
         self._stop_event.set()
+        self._wakeup.set()
         
         # 等待工作线程结束
         for worker in self._workers:
@@ -558,6 +712,7 @@ class OptimizedEventEngine:
         logger.info("事件引擎已停止")
         
         # 输出最终统计
+        self._flush_received()
         stats = self.metrics.get_stats()
         logger.info(f"最终统计: 接收={stats['events_received']}, "
                    f"处理={stats['events_processed']}, "
@@ -593,6 +748,64 @@ class OptimizedEventEngine:
         
         logger.debug(f"工作线程 {worker_id} 已停止")
     
+    def _fast_worker_loop(self, worker_id: int) -> None:
+        """
+        快速路径消费循环
+
+        优先处理堆中的紧急事件，其次按顺序处理环形队列中的普通事件，
+        最后处理堆中的低优先级事件；空闲时等待入队唤醒
+        """
+        logger.debug(f"快速路径工作线程 {worker_id} 已启动")
+        lane = self._normal_lane
+        heap = self.event_queue
+        normal = EventPriority.NORMAL.value
+        sample_rate = self.metrics_sample_rate
+        dispatch = self._dispatch
+        unflushed = 0
+
+        while self.running and not self._stop_event.is_set():
+            try:
+                use_heap = False
+                if heap._size:
+                    top = heap.peek_priority()
+                    use_heap = top is not None and (top < normal or not lane)
+                if use_heap:
+                    event = heap.get(block=False)
+                    if event is None:
+                        continue
+                    event_type, data = event.event_type, event.data
+                else:
+                    try:
+                        event_type, data = lane.popleft()
+                    except IndexError:
+                        # 空闲：汇总计数后等待唤醒
+                        if unflushed:
+                            self.metrics.record_processed_batch(unflushed)
+                            unflushed = 0
+                        self._consumer_idle = True
+                        self._wakeup.clear()
+                        if not lane and not heap._size:
+                            self._wakeup.wait(timeout=0.1)
+                        self._consumer_idle = False
+                        continue
+
+                unflushed += 1
+                if unflushed >= sample_rate:
+                    # 采样一次处理耗时
+                    start_time = time.perf_counter()
+                    dispatch(event_type, data)
+                    self.metrics.record_processed_batch(unflushed, time.perf_counter() - start_time)
+                    unflushed = 0
+                else:
+                    dispatch(event_type, data)
+
+            except Exception as e:
+                logger.error(f"快速路径工作线程 {worker_id} 处理事件时出错: {e}")
+
+        if unflushed:
+            self.metrics.record_processed_batch(unflushed)
+        logger.debug(f"快速路径工作线程 {worker_id} 已停止")
+
     def _process_event(self, event: PrioritizedEvent) -> None:
         """
         处理单个事件
@@ -600,26 +813,28 @@ class OptimizedEventEngine:
         Args:
             event: 优先级事件
         """
-        with self._handlers_lock:
-            handlers = self.handlers.get(event.event_type, [])
-        
+        self._dispatch(event.event_type, event.data)
+
+    def _dispatch(self, event_type: str, data: Any) -> None:
+        """按处理器表快照顺序执行处理器"""
+        handlers = self._handler_table.get(event_type)
         if not handlers:
-            logger.warning(f"未找到事件处理器: {event.event_type}")
+            logger.warning(f"未找到事件处理器: {event_type}")
             return
-        
+
         # 顺序执行所有处理器
         for handler in handlers:
             try:
-                handler(event.data)
+                handler(data)
             except Exception as e:
-                logger.error(f"事件处理器执行失败: {event.event_type}, 错误: {e}")
-    
+                logger.error(f"事件处理器执行失败: {event_type}, 错误: {e}")
+
     def _monitor_loop(self) -> None:
         """监控线程主循环 - 定期记录性能指标"""
         while self.running and not self._stop_event.is_set():
             try:
                 # 记录队列大小
-                self.metrics.record_queue_size(self.event_queue.qsize())
+                self.metrics.record_queue_size(self._queue_size())
                 
                 # 每10秒输出统计
                 if self.metrics.events_received % 10000 == 0 and self.metrics.events_received > 0:
@@ -630,7 +845,7 @@ class OptimizedEventEngine:
                 
                 # 检查背压状态
                 if self._backpressure_active:
-                    queue_usage = self.event_queue.qsize() / self.max_queue_size
+                    queue_usage = self._queue_size() / self.max_queue_size
                     logger.warning(f"背压状态: 队列使用率={queue_usage:.1%}")
                 
                 time.sleep(1.0)
@@ -640,6 +855,7 @@ class OptimizedEventEngine:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取事件引擎统计信息"""
+        self._flush_received()
         base_stats = self.metrics.get_stats()
         
         # 添加弹性机制统计
@@ -670,6 +886,7 @@ class OptimizedEventEngine:
     
     def is_healthy(self) -> bool:
         """检查引擎健康状态"""
+        self._flush_received()
         stats = self.metrics.get_stats()
         # 如果丢弃率超过5%，认为不健康
         if stats['drop_rate'] >= 0.05:
@@ -736,7 +953,8 @@ def create_optimized_engine(
     num_workers: int = 4,
     enable_backpressure: bool = True,
     backpressure_threshold: float = 0.8,
-    enable_graceful_degradation: bool = True
+    enable_graceful_degradation: bool = True,
+    fast_path: bool = False
 ) -> OptimizedEventEngine:
     """
     创建优化的事件引擎
@@ -747,6 +965,7 @@ def create_optimized_engine(
         enable_backpressure: 是否启用背压
         backpressure_threshold: 背压阈值
         enable_graceful_degradation: 是否启用优雅降级
+        fast_path: 是否启用单消费者快速路径
 
     Returns:
         OptimizedEventEngine: 优化的事件引擎实例
@@ -756,5 +975,6 @@ def create_optimized_engine(
         num_workers=num_workers,
         enable_backpressure=enable_backpressure,
         backpressure_threshold=backpressure_threshold,
-        enable_graceful_degradation=enable_graceful_degradation
+        enable_graceful_degradation=enable_graceful_degradation,
+        fast_path=fast_path
     )
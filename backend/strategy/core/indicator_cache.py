@@ -0,0 +1,424 @@
+# 指标缓存
+# 以K线数据内容指纹为键的指标计算结果缓存
+#
+# 指纹对索引和每一列的底层缓冲区做完整哈希（安装了 xxhash 时使用 xxh3_128，否则使用 blake2b），
+# 中间K线被修复后指纹随之变化，不会误命中；同一个 DataFrame 在结构版本不变时指纹只计算一次。
+# 缓存按内存预算做 LRU 淘汰，可选将大结果写入磁盘。
+
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+try:
+    import xxhash
+
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# 默认内存预算
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 默认写入磁盘的结果大小阈值
+DEFAULT_SPILL_THRESHOLD = 16 * 1024 * 1024
+
+
+def _new_hasher():
+    """创建哈希器，优先使用 xxh3_128"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def _update_array(hasher, values: np.ndarray):
+    """将数组内容写入哈希器，对象数组退化为 pickle"""
+    if values.dtype == object:
+        hasher.update(pickle.dumps(values.tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+        return
+    values = np.ascontiguousarray(values)
+    hasher.update(values.dtype.str.encode())
+    hasher.update(values.view(np.uint8).reshape(-1))
+
+
+def fingerprint_frame(data: pd.DataFrame) -> str:
+    """
+    计算 DataFrame 的内容指纹
+
+    覆盖形状、列名、各列 dtype、索引和全部数值，任意一根K线变化都会改变指纹。
+
+    参数：
+    - data: K线数据
+
+    返回：
+    - str: 十六进制指纹
+    """
+    hasher = _new_hasher()
+    header = (data.shape, [str(c) for c in data.columns], [str(t) for t in data.dtypes], str(data.index.dtype))
+    hasher.update(repr(header).encode())
+    index = data.index
+    if isinstance(index, (pd.DatetimeIndex, pd.TimedeltaIndex, pd.PeriodIndex)):
+        # 时区已包含在 dtype 中，直接哈希 int64 时间戳
+        _update_array(hasher, index.asi8)
+    else:
+        _update_array(hasher, np.asarray(index))
+    for i in range(data.shape[1]):
+        _update_array(hasher, data.iloc[:, i].to_numpy())
+    return hasher.hexdigest()
+
+
+def _buffer_address(values: np.ndarray) -> int:
+    return values.__array_interface__['data'][0] if values.dtype != object else id(values)
+
+
+def frame_version(data: pd.DataFrame) -> Tuple[Any, ...]:
+    """
+    DataFrame 的结构版本
+
+    由形状、列名、索引对象和各列底层缓冲区地址组成，不读取数值。替换列、重建索引
+    都会改变版本；原地修改单个值不改变版本，修复K线时应生成新的 DataFrame。
+
+    参数：
+    - data: K线数据
+
+    返回：
+    - tuple: 版本标识
+    """
+    columns = tuple(_buffer_address(data.iloc[:, i].to_numpy()) for i in range(data.shape[1]))
+    return (data.shape, tuple(str(c) for c in data.columns), id(data.index), columns)
+
+
+def _hash_parts(parts: Tuple[Any, ...]) -> str:
+    """对键的其余组成部分（参数等）做哈希"""
+    try:
+        payload = pickle.dumps(parts, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        payload = repr(parts).encode()
+    hasher = _new_hasher()
+    hasher.update(payload)
+    return hasher.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """估算指标结果占用的内存字节数"""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+@dataclass
+class IndicatorCacheStats:
+    """单个指标的缓存统计"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    spills: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total * 100 if total > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'spills': self.spills,
+            'hit_rate': self.hit_rate,
+        }
+
+
+@dataclass
+class _Entry:
+    """缓存条目，value 为 None 时结果保存在磁盘文件 path 中"""
+    name: str
+    size: int
+    value: Any = None
+    path: Optional[str] = None
+
+
+class IndicatorCache:
+    """
+    指标计算结果缓存
+
+    键由指标名、K线数据内容指纹和参数哈希组成。内存中的结果超过 max_bytes 时按
+    最近最少使用顺序淘汰；设置 spill_dir 后，不小于 spill_threshold 的结果写入磁盘，
+    命中时再读回，磁盘文件在 clear() 或缓存对象销毁时删除。线程安全。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        spill_dir: Optional[str] = None,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        """
+        初始化指标缓存
+
+        参数：
+        - max_bytes: 内存预算
+        - spill_dir: 大结果写入的目录，None 表示不写磁盘；传入 'auto' 使用临时目录
+        - spill_threshold: 写入磁盘的结果大小阈值
+        - max_disk_bytes: 磁盘预算，None 表示不限制
+        """
+        self.max_bytes = max_bytes
+        self.spill_threshold = spill_threshold
+        self.max_disk_bytes = max_disk_bytes
+        self._own_spill_dir = spill_dir == 'auto'
+        self.spill_dir = tempfile.mkdtemp(prefix='indicator_cache_') if self._own_spill_dir else spill_dir
+        if self.spill_dir and not self._own_spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._stats: Dict[str, IndicatorCacheStats] = {}
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        # 固定指纹的 DataFrame：id -> [DataFrame, 指纹, 嵌套层数]
+        self._pinned: Dict[int, list] = {}
+        # 已计算的指纹：id -> (DataFrame 弱引用, 结构版本, 指纹)，DataFrame 回收时删除
+        self._fingerprints: Dict[int, Tuple[weakref.ref, Tuple[Any, ...], str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __del__(self):
+        if getattr(self, '_own_spill_dir', False) and self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    @property
+    def memory_bytes(self) -> int:
+        """内存中结果的估算字节数"""
+        return self._memory_bytes
+
+    @property
+    def disk_bytes(self) -> int:
+        """磁盘中结果的估算字节数"""
+        return self._disk_bytes
+
+    # ==================== 指纹 ====================
+
+    @contextmanager
+    def pinned(self, data: pd.DataFrame) -> Iterator[str]:
+        """
+        在上下文内固定 data 的指纹
+
+        同一次运行中对同一个 DataFrame 的多次查找（如 calculate_indicators 内的多个自定义指标）
+        只计算一次指纹。上下文内不应原地修改 data。
+        """
+        key = id(data)
+        with self._lock:
+            pin = self._pinned.get(key)
+            if pin is None:
+                pin = self._pinned[key] = [data, self.fingerprint(data), 0]
+            pin[2] += 1
+        try:
+            yield pin[1]
+        finally:
+            with self._lock:
+                pin[2] -= 1
+                if pin[2] == 0:
+                    del self._pinned[key]
+
+    def fingerprint(self, data: pd.DataFrame) -> str:
+        """获取 data 的内容指纹，已固定或结构版本未变时直接返回上次的结果"""
+        key = id(data)
+        pin = self._pinned.get(key)
+        if pin is not None and pin[0] is data:
+            return pin[1]
+
+        version = frame_version(data)
+        memo = self._fingerprints.get(key)
+        if memo is not None and memo[0]() is data and memo[1] == version:
+            return memo[2]
+
+        fingerprint = fingerprint_frame(data)
+        with self._lock:
+            if key not in self._fingerprints:
+                weakref.finalize(data, self._fingerprints.pop, key, None)
+            self._fingerprints[key] = (weakref.ref(data), version, fingerprint)
+        return fingerprint
+
+    def make_key(self, name: str, data: pd.DataFrame, *parts: Any) -> str:
+        """
+        生成缓存键
+
+        参数：
+        - name: 指标名
+        - data: K线数据
+        - *parts: 影响结果的其它部分，如策略类名和参数
+
+        返回：
+        - str: 缓存键
+        """
+        return f"{name}:{self.fingerprint(data)}:{_hash_parts(parts)}"
+
+    # ==================== 读写 ====================
+
+    def _stat(self, name: str) -> IndicatorCacheStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = IndicatorCacheStats()
+        return stats
+
+    def get(self, key: str, name: str) -> Tuple[bool, Any]:
+        """
+        查找缓存
+
+        返回：
+        - tuple: (是否命中, 结果)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stat(name).misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            path = entry.path
+            value = entry.value
+
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"读取磁盘指标缓存失败 {path}: {e}")
+                with self._lock:
+                    self._remove(key)
+                    self._stat(name).misses += 1
+                return False, None
+
+        with self._lock:
+            self._stat(name).hits += 1
+        return True, value
+
+    def put(self, key: str, name: str, value: Any):
+        """写入缓存，超出预算时按 LRU 淘汰"""
+        size = estimate_size(value)
+        entry = _Entry(name=name, size=size, value=value)
+
+        if self.spill_dir and size >= self.spill_threshold:
+            path = os.path.join(self.spill_dir, f"{_hash_parts((key,))}.pkl")
+            try:
+                with open(path, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                entry = _Entry(name=name, size=size, path=path)
+            except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+                logger.warning(f"指标缓存写入磁盘失败，保留在内存中: {e}")
+
+        with self._lock:
+            self._remove(key)
+            if entry.path is None and size > self.max_bytes:
+                # 单个结果超出整个内存预算，不缓存
+                return
+            self._entries[key] = entry
+            if entry.path is None:
+                self._memory_bytes += size
+            else:
+                self._disk_bytes += size
+                self._stat(name).spills += 1
+            self._evict()
+
+    def get_or_compute(self, name: str, data: pd.DataFrame, compute: Callable[[], Any], *parts: Any) -> Tuple[Any, bool]:
+        """
+        命中时返回缓存结果，否则计算并写入缓存
+
+        返回：
+        - tuple: (结果, 是否命中)
+        """
+        key = self.make_key(name, data, *parts)
+        hit, value = self.get(key, name)
+        if hit:
+            return value, True
+        value = compute()
+        self.put(key, name, value)
+        return value, False
+
+    # ==================== 淘汰与清理 ====================
+
+    def _remove(self, key: str):
+        """删除条目（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.path is None:
+            self._memory_bytes -= entry.size
+        else:
+            self._disk_bytes -= entry.size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        """按最近最少使用顺序淘汰超出预算的条目（调用方持有锁）"""
+        over_memory = self._memory_bytes > self.max_bytes
+        over_disk = self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes
+        if not over_memory and not over_disk:
+            return
+        for key in list(self._entries):
+            entry = self._entries[key]
+            on_disk = entry.path is not None
+            if (on_disk and over_disk) or (not on_disk and over_memory):
+                self._remove(key)
+                self._stat(entry.name).evictions += 1
+                over_memory = self._memory_bytes > self.max_bytes
+                over_disk = self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes
+                if not over_memory and not over_disk:
+                    break
+
+    def invalidate(self, name: str):
+        """删除指定指标的全部缓存结果"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.name == name]:
+                self._remove(key)
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._stats.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        返回：
+        - dict: 条目数、内存/磁盘占用和每个指标的命中统计
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'max_bytes': self.max_bytes,
+                'indicators': {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
@@ -3,13 +3,20 @@
 
 基于设计文档中的第三阶段优化要求实现：
 1. 事件对象池 - 减少GC压力
-2. 共享内存市场数据 - 进程间数据共享
+2. 共享内存市场数据 - 按交易对的跨进程环形缓冲区，读者无锁
+   跨进程事件队列 - 单生产者/单消费者，BarEvent/TickEvent 紧凑布局
 3. 预分配缓冲区 - 避免运行时内存分配
 4. 零拷贝数据传输
 """
 
+import hashlib
+import pickle
+import secrets
+import struct
 import threading
 import logging
+import weakref
+from multiprocessing import shared_memory
 from typing import Dict, List, Any, Optional, TypeVar, Generic, Union
 from collections import deque
 import numpy as np
@@ -19,6 +26,38 @@ logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
 
+class UseAfterReleaseError(RuntimeError):
+    """调试模式下访问已归还对象池的对象"""
+
+
+# 原始类 -> 已释放标记类
+_released_classes: Dict[type, type] = {}
+
+
+def _released_getattribute(obj: Any, name: str) -> Any:
+    raise UseAfterReleaseError(
+        f"{type(obj).__bases__[0].__name__} 已归还对象池，不能再访问属性 {name}"
+    )
+
+
+def _released_class(cls: type) -> type:
+    """
+    获取 cls 的已释放标记类
+
+    标记类是 cls 的空 __slots__ 子类，内存布局相同，可以直接替换对象的 __class__；
+    任何属性读取都抛出 UseAfterReleaseError
+    """
+    released = _released_classes.get(cls)
+    if released is None:
+        released = type(f"Released{cls.__name__}", (cls,), {
+            "__slots__": (),
+            "__getattribute__": _released_getattribute,
+        })
+        _released_classes[cls] = released
+        _released_classes[released] = released
+    return released
+
+
 class PooledObject:
     """池化对象基类"""
     __slots__ = ['_in_use', '_pool']
@@ -60,7 +99,8 @@ class ObjectPool(Generic[T]):
         reset_func: Any = None,
         initial_size: int = 100,
         max_size: int = 10000,
-        auto_grow: bool = True
+        auto_grow: bool = True,
+        debug: bool = False
     ):
         """
         初始化对象池
@@ -71,6 +111,7 @@ class ObjectPool(Generic[T]):
             initial_size: 初始池大小
             max_size: 最大池大小
             auto_grow: 是否自动扩容
+            debug: 调试模式，释放后的对象被标记，再次访问或重复释放时抛出 UseAfterReleaseError
         """
         if factory is None:
             raise ValueError("必须提供 factory 参数")
@@ -79,6 +120,7 @@ class ObjectPool(Generic[T]):
         self.max_size = max_size
         self.auto_grow = auto_grow
         self.initial_size = initial_size
+        self.debug = debug
 
         # 可用对象队列
         self._available: deque = deque()
@@ -109,6 +151,9 @@ class ObjectPool(Generic[T]):
         with self._lock:
             if self._available:
                 obj = self._available.popleft()
+                if self.debug and _released_classes.get(type(obj)) is type(obj):
+                    # 恢复调试模式下被标记的对象
+                    obj.__class__ = type(obj).__bases__[0]
                 if isinstance(obj, PooledObject):
                     obj._in_use = True
                 return obj
@@ -137,6 +182,9 @@ class ObjectPool(Generic[T]):
             obj: 要释放的对象
         """
         with self._lock:
+            if self.debug and _released_classes.get(type(obj)) is type(obj):
+                raise UseAfterReleaseError(f"{type(obj).__bases__[0].__name__} 被重复释放")
+
             # 重置对象状态
             if self.reset_func:
                 self.reset_func(obj)
@@ -145,9 +193,19 @@ class ObjectPool(Generic[T]):
             
             # 如果池未满，放回队列
             if len(self._available) < self.max_size:
+                if self.debug:
+                    self._mark_released(obj)
                 self._available.append(obj)
             else:
                 self._size -= 1
+
+    @staticmethod
+    def _mark_released(obj: Any) -> None:
+        """把对象标记为已释放（内置类型等无法替换 __class__ 的对象跳过）"""
+        try:
+            obj.__class__ = _released_class(type(obj))
+        except TypeError:
+            pass
     
     def size(self) -> int:
         """获取池大小"""
@@ -282,10 +340,10 @@ class BarEvent(PooledObject):
     def reset(self) -> None:
         """重置对象状态"""
         self.symbol = ""
-        self.open = 0.0
-        self.high = 0.0
-        self.low = 0.0
-        self.close = 0.0
+        self.open = self.open_price = 0.0
+        self.high = self.high_price = 0.0
+        self.low = self.low_price = 0.0
+        self.close = self.close_price = 0.0
         self.volume = 0.0
         self.timestamp = 0.0
         self.interval = ""
@@ -304,10 +362,10 @@ class BarEvent(PooledObject):
     ) -> 'BarEvent':
         """设置K线数据"""
         self.symbol = symbol
-        self.open = open_price
-        self.high = high
-        self.low = low
-        self.close = close
+        self.open = self.open_price = open_price
+        self.high = self.high_price = high
+        self.low = self.low_price = low
+        self.close = self.close_price = close
         self.volume = volume
         self.timestamp = timestamp
         self.interval = interval
@@ -356,17 +414,19 @@ class EventObjectPools:
     集中管理所有事件类型的对象池
     """
     
-    def __init__(self):
+    def __init__(self, debug: bool = False):
         self.tick_pool = ObjectPool(
             factory=TickEvent,
             initial_size=1000,
-            max_size=100000
+            max_size=100000,
+            debug=debug
         )
         
         self.bar_pool = ObjectPool(
             factory=BarEvent,
             initial_size=500,
-            max_size=50000
+            max_size=50000,
+            debug=debug
         )
         
         logger.info("事件对象池管理器初始化完成")
@@ -387,256 +447,680 @@ class EventObjectPools:
         }
 
 
+class MarketRingBuffer:
+    """
+    单个交易对的共享内存环形缓冲区
+
+    内存布局：64 字节头部 (magic, capacity, write_seq) 之后按列存放
+    timestamp(int64) 与 open/high/low/close/volume(float64) 数组。
+
+    单写者：写者先写入槽位再递增 write_seq（版本化写索引）。
+    读者无锁：读取前后各取一次 write_seq，丢弃读取期间可能已被覆盖的记录，
+    因此读者永远不会阻塞写者，写者也不会等待读者。
+    下一次写入的槽位对读者不可见，可读取的记录最多为 capacity - 1 条。
+    """
+
+    MAGIC = 0x31474E4952544B4D  # b'MKTRING1'
+    HEADER_BYTES = 64
+    PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._lock = threading.Lock()
+        self._header = np.ndarray((self.HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != self.MAGIC:
+            raise ValueError(f"共享内存 {shm.name} 不是市场数据环形缓冲区")
+        self.capacity = int(self._header[1])
+        offset = self.HEADER_BYTES
+        self.timestamps = np.ndarray((self.capacity,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        self._columns: Dict[str, np.ndarray] = {}
+        for field in self.PRICE_FIELDS:
+            offset += self.capacity * 8
+            self._columns[field] = np.ndarray((self.capacity,), dtype=np.float64, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def segment_size(cls, capacity: int) -> int:
+        """容量为 capacity 的缓冲区所需字节数"""
+        return cls.HEADER_BYTES + capacity * 8 * (1 + len(cls.PRICE_FIELDS))
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> 'MarketRingBuffer':
+        """
+        创建新的共享内存缓冲区（写者）
+
+        新建的共享内存由系统清零，这里只写入头部，
+        大容量缓冲区在 tmpfs 上按页惰性分配
+        """
+        if capacity <= 0:
+            raise ValueError("capacity 必须为正整数")
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.segment_size(capacity))
+        header = np.ndarray((cls.HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        header[1] = capacity
+        header[2] = 0
+        header[0] = cls.MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'MarketRingBuffer':
+        """
+        附加到已有缓冲区（读者）
+
+        Raises:
+            FileNotFoundError: 缓冲区不存在
+        """
+        # 共享内存由创建方负责释放，附加方不登记到资源跟踪器（Python 3.13+）；
+        # 更早的版本中子进程与创建方共用同一个资源跟踪器，重复登记没有影响
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        try:
+            return cls(shm, owner=False)
+        except ValueError:
+            shm.close()
+            raise
+
+    @property
+    def name(self) -> str:
+        """共享内存名称"""
+        return self._shm.name
+
+    @property
+    def write_seq(self) -> int:
+        """已写入的记录总数，最新记录的序号"""
+        return int(self._header[2])
+
+    def write(
+        self,
+        timestamp: int,
+        open_price: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+    ) -> int:
+        """
+        写入一条记录
+
+        Returns:
+            int: 该记录的序号（从 1 开始）
+        """
+        if not self._owner:
+            raise RuntimeError("只读附加的环形缓冲区不能写入")
+        columns = self._columns
+        with self._lock:
+            seq = int(self._header[2])
+            slot = seq % self.capacity
+            self.timestamps[slot] = timestamp
+            columns['open'][slot] = open_price
+            columns['high'][slot] = high
+            columns['low'][slot] = low
+            columns['close'][slot] = close
+            columns['volume'][slot] = volume
+            # 槽位写完后再发布新的写索引
+            self._header[2] = seq + 1
+        return seq + 1
+
+    def read_seq(self, seq: int) -> Optional[Dict[str, Any]]:
+        """
+        按序号读取一条记录
+
+        Returns:
+            Dict or None: 记录尚未写入或已被覆盖时返回 None
+        """
+        write_seq = int(self._header[2])
+        if seq < 1 or seq > write_seq or seq <= write_seq - self.capacity:
+            return None
+
+        slot = (seq - 1) % self.capacity
+        record = {'seq': seq, 'timestamp': int(self.timestamps[slot])}
+        for field, column in self._columns.items():
+            record[field] = float(column[slot])
+
+        # 写者正在写第 write_seq+1 条记录，会覆盖序号 write_seq+1-capacity 的槽位
+        if seq <= int(self._header[2]) + 1 - self.capacity:
+            return None
+        return record
+
+    def read_latest(self) -> Optional[Dict[str, Any]]:
+        """读取最新一条记录"""
+        return self.read_seq(self.write_seq)
+
+    def read_range(self, count: int) -> Optional[Dict[str, Any]]:
+        """
+        读取最近 count 条记录
+
+        Returns:
+            Dict or None: 包含 seq（首条记录序号）、timestamps 及各价格列的数组副本
+        """
+        write_seq = int(self._header[2])
+        count = min(count, write_seq, self.capacity)
+        if count <= 0:
+            return None
+
+        start = write_seq - count
+        slots = np.arange(start, write_seq) % self.capacity
+        timestamps = self.timestamps[slots]
+        columns = {field: column[slots] for field, column in self._columns.items()}
+
+        # 丢弃读取期间可能被覆盖的记录
+        skip = max(0, int(self._header[2]) + 1 - self.capacity - start)
+        if skip >= count:
+            return None
+        result = {'seq': start + skip + 1, 'timestamps': timestamps[skip:]}
+        for field, values in columns.items():
+            result[field] = values[skip:]
+        return result
+
+    def reset(self) -> None:
+        """清空缓冲区（只重置写索引）"""
+        if not self._owner:
+            raise RuntimeError("只读附加的环形缓冲区不能清空")
+        with self._lock:
+            self._header[2] = 0
+
+    def close(self) -> None:
+        """关闭本进程的映射"""
+        if self._shm is None:
+            return
+        # 先释放指向共享内存的视图，否则无法关闭映射
+        self._header = None
+        self.timestamps = None
+        self._columns = {}
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def _ring_segment_name(namespace: str, symbol: str) -> str:
+    """由命名空间和交易对确定共享内存名称，读写双方据此按交易对名附加"""
+    digest = hashlib.blake2b(symbol.encode('utf-8'), digest_size=6).hexdigest()
+    return f"{namespace}_{digest}"
+
+
+def _release_rings(rings: Dict[str, MarketRingBuffer]) -> None:
+    """关闭全部环形缓冲区，创建方同时释放共享内存"""
+    for ring in rings.values():
+        try:
+            ring.close()
+        except Exception as e:
+            logger.warning(f"关闭共享内存 {ring.name} 失败: {e}")
+    rings.clear()
+
+
+
+class SharedEventQueue:
+    """
+    跨进程单生产者/单消费者事件队列
+
+    内存布局：64 字节头部 (magic, capacity, slot_size, write_idx, read_idx,
+    processed, processing_ns) 之后是 capacity 个定长槽位。每个槽位以
+    (kind, priority, payload_len, event_type, symbol, 6 个 float64) 开头，
+    BarEvent/TickEvent 按紧凑布局写入数值字段，周期/方向写入负载区，
+    其它数据以 pickle 写入负载区。
+
+    生产者只修改 write_idx，消费者只修改 read_idx/processed/processing_ns，
+    槽位先写入再推进索引，双方无需加锁。
+    """
+
+    MAGIC = 0x3151564553524853  # b'SHRSEVQ1'
+    HEADER_BYTES = 64
+    RECORD = struct.Struct('<BBH32s32s6d')
+    KIND_BAR = 1
+    KIND_TICK = 2
+    KIND_PICKLE = 3
+
+    # 头部字段下标
+    _CAPACITY, _SLOT_SIZE, _WRITE, _READ, _PROCESSED, _PROCESSING_NS = range(1, 7)
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((self.HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != self.MAGIC:
+            raise ValueError(f"共享内存 {shm.name} 不是事件队列")
+        self.capacity = int(self._header[self._CAPACITY])
+        self.slot_size = int(self._header[self._SLOT_SIZE])
+        self.max_payload = self.slot_size - self.RECORD.size
+        self._final_header: Optional[np.ndarray] = None
+
+    @classmethod
+    def create(cls, name: str, capacity: int, slot_size: int = 256) -> 'SharedEventQueue':
+        """创建新的事件队列（生产者）"""
+        if capacity <= 0:
+            raise ValueError("capacity 必须为正整数")
+        if slot_size <= cls.RECORD.size:
+            raise ValueError(f"slot_size 必须大于 {cls.RECORD.size}")
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.HEADER_BYTES + capacity * slot_size)
+        header = np.ndarray((cls.HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        header[cls._CAPACITY] = capacity
+        header[cls._SLOT_SIZE] = slot_size
+        header[0] = cls.MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedEventQueue':
+        """
+        附加到已有事件队列（消费者）
+
+        Raises:
+            FileNotFoundError: 队列不存在
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        try:
+            return cls(shm, owner=False)
+        except ValueError:
+            shm.close()
+            raise
+
+    @property
+    def name(self) -> str:
+        """共享内存名称"""
+        return self._shm.name
+
+    def _counter(self, index: int) -> int:
+        """读取头部计数，关闭后返回关闭时的快照"""
+        header = self._header if self._header is not None else self._final_header
+        return int(header[index])
+
+    def qsize(self) -> int:
+        """队列中待消费的事件数"""
+        return self._counter(self._WRITE) - self._counter(self._READ)
+
+    @property
+    def processed(self) -> int:
+        """消费者已处理完成的事件数"""
+        return self._counter(self._PROCESSED)
+
+    @property
+    def processing_ns(self) -> int:
+        """消费者累计处理耗时（纳秒）"""
+        return self._counter(self._PROCESSING_NS)
+
+    def _encode(self, data: Any):
+        """按数据类型选择紧凑布局，返回 (kind, 数值字段, 负载)"""
+        if isinstance(data, BarEvent):
+            return self.KIND_BAR, (
+                data.timestamp, data.open, data.high, data.low, data.close, data.volume
+            ), data.interval.encode('utf-8')
+        if isinstance(data, TickEvent):
+            return self.KIND_TICK, (
+                data.timestamp, data.price, data.volume, 0.0, 0.0, 0.0
+            ), data.side.encode('utf-8')
+        return self.KIND_PICKLE, (0.0,) * 6, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def put(self, event_type: str, symbol: str, data: Any, priority: int = 2) -> bool:
+        """
+        写入一个事件（只能由单个生产者调用）
+
+        Returns:
+            bool: 队列已满或事件超出槽位大小时返回 False
+        """
+        header = self._header
+        write_idx = int(header[self._WRITE])
+        if write_idx - int(header[self._READ]) >= self.capacity:
+            return False
+
+        kind, values, payload = self._encode(data)
+        event_type_bytes = event_type.encode('utf-8')
+        symbol_bytes = symbol.encode('utf-8')
+        if len(payload) > self.max_payload or len(event_type_bytes) > 32 or len(symbol_bytes) > 32:
+            logger.warning(f"事件超出槽位大小，无法写入共享内存队列: {event_type}, {symbol}")
+            return False
+
+        offset = self.HEADER_BYTES + (write_idx % self.capacity) * self.slot_size
+        buf = self._shm.buf
+        self.RECORD.pack_into(
+            buf, offset, kind, priority, len(payload), event_type_bytes, symbol_bytes, *values
+        )
+        start = offset + self.RECORD.size
+        buf[start:start + len(payload)] = payload
+        header[self._WRITE] = write_idx + 1
+        return True
+
+    def get(self):
+        """
+        读取一个事件（只能由单个消费者调用）
+
+        Returns:
+            Optional[tuple]: (event_type, symbol, data, priority)，队列为空时返回 None
+        """
+        header = self._header
+        read_idx = int(header[self._READ])
+        if read_idx >= int(header[self._WRITE]):
+            return None
+
+        offset = self.HEADER_BYTES + (read_idx % self.capacity) * self.slot_size
+        buf = self._shm.buf
+        kind, priority, length, event_type, symbol, *values = self.RECORD.unpack_from(buf, offset)
+        start = offset + self.RECORD.size
+        payload = bytes(buf[start:start + length])
+        # 槽位内容已复制，立即归还给生产者
+        header[self._READ] = read_idx + 1
+
+        event_type = event_type.rstrip(b'\0').decode('utf-8')
+        symbol = symbol.rstrip(b'\0').decode('utf-8')
+        if kind == self.KIND_BAR:
+            timestamp, open_price, high, low, close, volume = values
+            data = BarEvent(symbol, open_price, high, low, close, volume, timestamp, payload.decode('utf-8'))
+        elif kind == self.KIND_TICK:
+            data = TickEvent(symbol, values[1], values[2], values[0], payload.decode('utf-8'))
+        else:
+            data = pickle.loads(payload)
+        return event_type, symbol, data, priority
+
+    def task_done(self, processing_ns: int = 0) -> None:
+        """消费者记录一个事件处理完成"""
+        self._header[self._PROCESSED] += 1
+        self._header[self._PROCESSING_NS] += processing_ns
+
+    def close(self) -> None:
+        """关闭本进程的映射，创建方同时释放共享内存"""
+        if self._shm is None:
+            return
+        # 保留计数快照，关闭后仍可读取统计
+        self._final_header = self._header.copy()
+        self._header = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+
 class SharedMemoryMarketData:
     """
     共享内存市场数据
-    
-    使用共享内存实现进程间数据共享，避免数据拷贝
+
+    每个交易对一块 multiprocessing.shared_memory 环形缓冲区（MarketRingBuffer），
+    在首次写入时创建。共享内存名称由 namespace 和交易对确定，
+    其他进程通过 SharedMemoryMarketData.attach(namespace) 按交易对名无锁读取。
     """
-    
+
     def __init__(
         self,
         num_symbols: int = 400,
-        buffer_size: int = 1000
+        buffer_size: int = 1000,
+        namespace: Optional[str] = None,
+        create: bool = True
     ):
         """
         初始化共享内存市场数据
 
         Args:
             num_symbols: 支持的符号数量
-            buffer_size: 每个符号的缓冲区大小
+            buffer_size: 每个符号的缓冲区大小（记录条数）
+            namespace: 共享内存命名空间，默认随机生成
+            create: True 为创建方（写者），False 为附加方（只读）
         """
         self.num_symbols = num_symbols
         self.buffer_size = buffer_size
-        
-        # 创建共享内存
-        self._create_shared_memory()
-        
-        # 符号到ID的映射
+        self._namespace = namespace or f"mkt_{secrets.token_hex(4)}"
+        self._owner = create
+
+        # 符号到ID的映射与对应的环形缓冲区
         self._symbol_to_id: Dict[str, int] = {}
-        self._id_to_symbol: Dict[int, str] = {}
+        self._rings: Dict[str, MarketRingBuffer] = {}
         self._symbol_lock = threading.Lock()
         self._next_symbol_id = 0
-        
-        logger.info(f"共享内存市场数据初始化完成: {num_symbols} 符号, 缓冲区={buffer_size}")
-    
-    def _create_shared_memory(self) -> None:
-        """创建共享内存缓冲区"""
-        # 价格缓冲区 (float32)
-        self.price_buffer = np.zeros((self.num_symbols, self.buffer_size), dtype=np.float32)
-        
-        # 成交量缓冲区 (float32)
-        self.volume_buffer = np.zeros((self.num_symbols, self.buffer_size), dtype=np.float32)
-        
-        # 时间戳缓冲区 (int64)
-        self.timestamp_buffer = np.zeros((self.num_symbols, self.buffer_size), dtype=np.int64)
-        
-        # 写入索引 (每个符号一个)
-        self.write_indices = np.zeros(self.num_symbols, dtype=np.int32)
-        
-        # 读取索引 (每个符号一个)
-        self.read_indices = np.zeros(self.num_symbols, dtype=np.int32)
-        
-        # 锁数组（每个符号一个锁）
-        self._locks = [threading.Lock() for _ in range(self.num_symbols)]
-    
+
+        # 实例被回收或进程退出时关闭映射，创建方同时释放共享内存
+        self._finalizer = weakref.finalize(self, _release_rings, self._rings)
+
+        logger.info(
+            f"共享内存市场数据初始化完成: namespace={self._namespace}, "
+            f"{num_symbols} 符号, 缓冲区={buffer_size}, 创建方={create}"
+        )
+
+    @classmethod
+    def attach(cls, namespace: str, num_symbols: int = 400) -> 'SharedMemoryMarketData':
+        """
+        以只读方式附加到其他进程创建的市场数据
+
+        Args:
+            namespace: 创建方的 namespace
+            num_symbols: 最多附加的符号数量
+        """
+        return cls(num_symbols=num_symbols, buffer_size=0, namespace=namespace, create=False)
+
+    @property
+    def namespace(self) -> str:
+        """共享内存命名空间"""
+        return self._namespace
+
+    @property
+    def is_owner(self) -> bool:
+        """是否为创建方"""
+        return self._owner
+
+    def _require_owner(self) -> None:
+        if not self._owner:
+            raise RuntimeError("只读附加的共享内存市场数据不能写入")
+
     def register_symbol(self, symbol: str) -> int:
         """
         注册符号
-        
+
+        创建方为该符号创建环形缓冲区，附加方附加到已有缓冲区
+
         Args:
             symbol: 符号名称
-            
+
         Returns:
             int: 符号ID
         """
         with self._symbol_lock:
             if symbol in self._symbol_to_id:
                 return self._symbol_to_id[symbol]
-            
+
             if self._next_symbol_id >= self.num_symbols:
                 raise RuntimeError(f"符号数量超过最大值 {self.num_symbols}")
-            
+
+            name = _ring_segment_name(self._namespace, symbol)
+            if self._owner:
+                # 多分配一个槽位，保证可读取的记录数为 buffer_size
+                ring = MarketRingBuffer.create(name, self.buffer_size + 1)
+            else:
+                ring = MarketRingBuffer.attach(name)
+
             symbol_id = self._next_symbol_id
             self._symbol_to_id[symbol] = symbol_id
-            self._id_to_symbol[symbol_id] = symbol
+            self._rings[symbol] = ring
             self._next_symbol_id += 1
-            
-            logger.debug(f"注册符号: {symbol} -> ID {symbol_id}")
+
+            logger.debug(f"注册符号: {symbol} -> ID {symbol_id}, 共享内存 {name}")
             return symbol_id
-    
-    def write_tick(self, tick: Union[TickEvent, str], price: float = None, volume: float = None, timestamp: float = None) -> None:
+
+    def _get_ring(self, symbol: str) -> Optional[MarketRingBuffer]:
+        """获取符号的环形缓冲区，附加方按需附加"""
+        ring = self._rings.get(symbol)
+        if ring is not None or self._owner:
+            return ring
+        try:
+            self.register_symbol(symbol)
+        except FileNotFoundError:
+            return None
+        return self._rings.get(symbol)
+
+    def _get_or_create_ring(self, symbol: str) -> MarketRingBuffer:
+        self._require_owner()
+        ring = self._rings.get(symbol)
+        if ring is None:
+            self.register_symbol(symbol)
+            ring = self._rings[symbol]
+        return ring
+
+    def write(
+        self,
+        symbol: str,
+        timestamp: int,
+        open_price: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float
+    ) -> int:
+        """
+        写入一条K线记录
+
+        Returns:
+            int: 记录序号，可随通知消息发送给读者
+        """
+        ring = self._get_or_create_ring(symbol)
+        return ring.write(timestamp, open_price, high, low, close, volume)
+
+    def write_tick(self, tick: Union[TickEvent, str], price: float = None, volume: float = None, timestamp: float = None) -> int:
         """
         写入Tick数据
-        
+
         Args:
             tick: TickEvent 对象或符号名称
             price: 价格（当 tick 为符号名称时）
             volume: 成交量（当 tick 为符号名称时）
             timestamp: 时间戳（当 tick 为符号名称时）
+
+        Returns:
+            int: 记录序号
         """
         if isinstance(tick, TickEvent):
             symbol = tick.symbol
             price = tick.price
             volume = tick.volume
-            timestamp = int(tick.timestamp)
+            timestamp = tick.timestamp
         else:
             symbol = tick
-        
-        symbol_id = self._get_symbol_id(symbol)
-        if symbol_id is None:
-            symbol_id = self.register_symbol(symbol)
-        
-        with self._locks[symbol_id]:
-            idx = self.write_indices[symbol_id] % self.buffer_size
-            self.price_buffer[symbol_id, idx] = price
-            self.volume_buffer[symbol_id, idx] = volume
-            self.timestamp_buffer[symbol_id, idx] = timestamp
-            self.write_indices[symbol_id] += 1
-    
+
+        return self.write(symbol, int(timestamp), price, price, price, price, volume)
+
     def read_tick(self, symbol: str) -> Optional[TickEvent]:
         """
         读取最新Tick数据
-        
+
         Args:
             symbol: 符号名称
-            
+
         Returns:
             TickEvent or None: Tick事件
         """
         data = self.read_latest(symbol)
         if data is None:
             return None
-        
+
         return TickEvent(
             symbol=data["symbol"],
             price=data["price"],
             volume=data["volume"],
             timestamp=data["timestamp"]
         )
-    
-    def write_bar(self, bar: BarEvent) -> None:
+
+    def write_bar(self, bar: BarEvent) -> int:
         """
         写入Bar数据
-        
+
         Args:
             bar: BarEvent 对象
+
+        Returns:
+            int: 记录序号
         """
-        symbol_id = self._get_symbol_id(bar.symbol)
-        if symbol_id is None:
-            symbol_id = self.register_symbol(bar.symbol)
-        
-        with self._locks[symbol_id]:
-            idx = self.write_indices[symbol_id] % self.buffer_size
-            self.price_buffer[symbol_id, idx] = bar.close  # 使用收盘价
-            self.volume_buffer[symbol_id, idx] = bar.volume
-            self.timestamp_buffer[symbol_id, idx] = int(bar.timestamp)
-            self.write_indices[symbol_id] += 1
-    
+        return self.write(
+            bar.symbol, int(bar.timestamp), bar.open, bar.high, bar.low, bar.close, bar.volume
+        )
+
     def read_bar(self, symbol: str) -> Optional[BarEvent]:
         """
         读取最新Bar数据
-        
+
         Args:
             symbol: 符号名称
-            
+
         Returns:
             BarEvent or None: Bar事件
         """
         data = self.read_latest(symbol)
         if data is None:
             return None
-        
+
         return BarEvent(
             symbol=data["symbol"],
-            open_price=data["price"],
-            high_price=data["price"],
-            low_price=data["price"],
-            close_price=data["price"],
+            open_price=data["open"],
+            high_price=data["high"],
+            low_price=data["low"],
+            close_price=data["close"],
             volume=data["volume"],
             timestamp=data["timestamp"]
         )
-    
+
+    def read_seq(self, symbol: str, seq: int) -> Optional[Dict[str, Any]]:
+        """
+        按序号读取记录
+
+        Args:
+            symbol: 符号名称
+            seq: write/write_tick/write_bar 返回的记录序号
+
+        Returns:
+            Dict or None: 记录不存在或已被覆盖时返回 None
+        """
+        ring = self._get_ring(symbol)
+        if ring is None:
+            return None
+        record = ring.read_seq(seq)
+        if record is not None:
+            record["symbol"] = symbol
+            record["price"] = record["close"]
+        return record
+
     def read_latest(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         读取最新数据
-        
+
         Args:
             symbol: 符号名称
-            
+
         Returns:
-            Dict or None: 最新数据
+            Dict or None: 最新数据，price 为收盘价
         """
-        symbol_id = self._get_symbol_id(symbol)
-        if symbol_id is None:
+        ring = self._get_ring(symbol)
+        if ring is None:
             return None
-        
-        with self._locks[symbol_id]:
-            if self.write_indices[symbol_id] == 0:
-                return None
-            
-            idx = (self.write_indices[symbol_id] - 1) % self.buffer_size
-            
-            return {
-                "symbol": symbol,
-                "price": float(self.price_buffer[symbol_id, idx]),
-                "volume": float(self.volume_buffer[symbol_id, idx]),
-                "timestamp": int(self.timestamp_buffer[symbol_id, idx])
-            }
-    
+        return self.read_seq(symbol, ring.write_seq)
+
     def read_range(self, symbol: str, count: int) -> Optional[Dict[str, np.ndarray]]:
         """
         读取最近N条数据
-        
+
         Args:
             symbol: 符号名称
             count: 数据条数
-            
+
         Returns:
-            Dict or None: 数据数组
+            Dict or None: 数据数组，prices 为收盘价
         """
-        symbol_id = self._get_symbol_id(symbol)
-        if symbol_id is None:
+        ring = self._get_ring(symbol)
+        if ring is None:
             return None
-        
-        with self._locks[symbol_id]:
-            write_idx = self.write_indices[symbol_id]
-            if write_idx == 0:
-                return None
-            
-            # 计算读取范围
-            count = min(count, write_idx, self.buffer_size)
-            start_idx = (write_idx - count) % self.buffer_size
-            
-            # 读取数据
-            if start_idx + count <= self.buffer_size:
-                # 连续数据
-                prices = self.price_buffer[symbol_id, start_idx:start_idx + count].copy()
-                volumes = self.volume_buffer[symbol_id, start_idx:start_idx + count].copy()
-                timestamps = self.timestamp_buffer[symbol_id, start_idx:start_idx + count].copy()
-            else:
-                # 环形缓冲区环绕
-                end_count = self.buffer_size - start_idx
-                prices = np.concatenate([
-                    self.price_buffer[symbol_id, start_idx:].copy(),
-                    self.price_buffer[symbol_id, :count - end_count].copy()
-                ])
-                volumes = np.concatenate([
-                    self.volume_buffer[symbol_id, start_idx:].copy(),
-                    self.volume_buffer[symbol_id, :count - end_count].copy()
-                ])
-                timestamps = np.concatenate([
-                    self.timestamp_buffer[symbol_id, start_idx:].copy(),
-                    self.timestamp_buffer[symbol_id, :count - end_count].copy()
-                ])
-            
-            return {
-                "symbol": symbol,
-                "prices": prices,
-                "volumes": volumes,
-                "timestamps": timestamps
-            }
-    
+        data = ring.read_range(count)
+        if data is None:
+            return None
+
+        return {
+            "symbol": symbol,
+            "seq": data["seq"],
+            "prices": data["close"],
+            "volumes": data["volume"],
+            "timestamps": data["timestamps"],
+            "opens": data["open"],
+            "highs": data["high"],
+            "lows": data["low"]
+        }
+
     def _get_symbol_id(self, symbol: str) -> Optional[int]:
         """获取符号ID"""
         with self._symbol_lock:
@@ -649,41 +1133,38 @@ class SharedMemoryMarketData:
 
     def clear_symbol(self, symbol: str) -> None:
         """清除特定交易对的数据"""
-        symbol_id = self._get_symbol_id(symbol)
-        if symbol_id is None:
-            return
-
-        with self._locks[symbol_id]:
-            # 重置写入索引
-            self.write_indices[symbol_id] = 0
-            self.read_indices[symbol_id] = 0
-            # 清空缓冲区
-            self.price_buffer[symbol_id, :] = 0
-            self.volume_buffer[symbol_id, :] = 0
-            self.timestamp_buffer[symbol_id, :] = 0
+        self._require_owner()
+        ring = self._rings.get(symbol)
+        if ring is not None:
+            ring.reset()
 
     def clear_all(self) -> None:
-        """清除所有数据"""
+        """清除所有数据并释放全部共享内存"""
         with self._symbol_lock:
-            # 清除所有已注册符号的数据
-            for symbol_id in range(self._next_symbol_id):
-                with self._locks[symbol_id]:
-                    self.write_indices[symbol_id] = 0
-                    self.read_indices[symbol_id] = 0
-                    self.price_buffer[symbol_id, :] = 0
-                    self.volume_buffer[symbol_id, :] = 0
-                    self.timestamp_buffer[symbol_id, :] = 0
-            # 清除符号注册信息
+            _release_rings(self._rings)
             self._symbol_to_id.clear()
-            self._id_to_symbol.clear()
             self._next_symbol_id = 0
 
+    def close(self) -> None:
+        """关闭共享内存，创建方同时释放共享内存"""
+        with self._symbol_lock:
+            self._finalizer()
+            self._symbol_to_id.clear()
+            self._next_symbol_id = 0
+
+    def __enter__(self) -> 'SharedMemoryMarketData':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
         with self._symbol_lock:
-            total_writes = sum(self.write_indices)
-            
+            total_writes = sum(ring.write_seq for ring in self._rings.values())
+
             return {
+                "namespace": self._namespace,
                 "num_symbols": self.num_symbols,
                 "registered_symbols": len(self._symbol_to_id),
                 "buffer_size": self.buffer_size,
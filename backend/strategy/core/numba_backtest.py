@@ -292,7 +292,218 @@ def calculate_trade_statistics_numba(
     }
 
 
-@njit(cache=True, fastmath=True, parallel=True)
+@njit(cache=True)
+def _backtest_metrics_numba(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    initial_capital: float,
+    commission: float,
+    slippage: float,
+    annual_factor: float
+) -> Tuple[float, float, float, int]:
+    """
+    单次回测的流式指标计算
+
+    与 simulate_trades_numba + calculate_drawdown_numba + calculate_sharpe_numba
+    的结果一致，但不分配权益曲线和交易记录数组：回撤按运行峰值更新，
+    夏普比率用 Welford 算法在线累计非零收益率的均值和方差。
+    价格为NaN或非正数的时间步不撮合，权益按最近一个有效价格计算。
+
+    Args:
+        prices: 价格数组
+        signals: 信号数组 (1=买入, -1=卖出, 0=持有)
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        annual_factor: 夏普比率年化系数
+
+    Returns:
+        (最终权益, 最大回撤, 夏普比率, 交易次数)
+    """
+    n = len(prices)
+    capital = initial_capital
+    position = 0.0
+    last_price = 0.0
+    trade_count = 0
+
+    equity = initial_capital
+    prev_equity = 0.0
+    peak = 0.0
+    max_drawdown = 0.0
+
+    n_returns = 0
+    mean_return = 0.0
+    m2 = 0.0
+
+    for i in range(n):
+        price = prices[i]
+        valid = price > 0.0
+        if valid:
+            last_price = price
+
+        equity = capital + position * last_price
+
+        if i == 0:
+            peak = equity
+        else:
+            # 收益率与回撤
+            if prev_equity != 0.0:
+                ret = (equity - prev_equity) / prev_equity
+                if ret != 0.0:
+                    n_returns += 1
+                    delta = ret - mean_return
+                    mean_return += delta / n_returns
+                    m2 += delta * (ret - mean_return)
+            if equity > peak:
+                peak = equity
+            drawdown = (equity - peak) / peak
+            if drawdown < max_drawdown:
+                max_drawdown = drawdown
+        prev_equity = equity
+
+        if not valid:
+            continue
+
+        signal = signals[i]
+        if signal == 1 and position == 0.0:
+            entry_price = price * (1 + slippage)
+            position = capital / entry_price * (1 - commission)
+            capital = 0.0
+        elif signal == -1 and position > 0.0:
+            exit_price = price * (1 - slippage)
+            capital = position * exit_price * (1 - commission)
+            position = 0.0
+            trade_count += 1
+
+    sharpe = 0.0
+    if n_returns >= 2:
+        std_return = np.sqrt(m2 / n_returns)
+        if std_return > 0.0:
+            sharpe = mean_return / std_return * annual_factor
+
+    return equity, max_drawdown, sharpe, trade_count
+
+
+@njit(cache=True, parallel=True)
+def batch_backtest_numba(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    initial_capital: float,
+    commission: float,
+    slippage: float,
+    annual_factor: float = np.sqrt(252.0)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    并行批量回测内核
+
+    signals 为 (参数组 × 交易对 × 时间) 的三维张量；prices 为
+    (参数组 × 交易对 × 时间) 或第一维为1的三维张量，后者在所有参数组间共享。
+    每个 (参数组, 交易对) 是一次独立回测，用 prange 在扁平化的任务索引上并行，
+    结果直接写入预分配的 (参数组 × 交易对) 数组，循环内不分配内存。
+
+    没有使用 fastmath，以保证NaN价格判断有效。
+
+    Args:
+        prices: 三维价格张量
+        signals: 三维信号张量 (1=买入, -1=卖出, 0=持有)
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        annual_factor: 夏普比率年化系数
+
+    Returns:
+        (最终权益, 最大回撤, 夏普比率, 交易次数)，形状均为 (参数组, 交易对)
+    """
+    n_params = signals.shape[0]
+    n_symbols = signals.shape[1]
+    shared_prices = prices.shape[0] == 1
+
+    final_equity = np.empty((n_params, n_symbols))
+    max_drawdown = np.empty((n_params, n_symbols))
+    sharpe = np.empty((n_params, n_symbols))
+    trade_count = np.empty((n_params, n_symbols), dtype=np.int64)
+
+    for job in prange(n_params * n_symbols):
+        p = job // n_symbols
+        s = job % n_symbols
+        price_row = prices[0, s] if shared_prices else prices[p, s]
+        equity, drawdown, ratio, trades = _backtest_metrics_numba(
+            price_row, signals[p, s], initial_capital, commission, slippage, annual_factor
+        )
+        final_equity[p, s] = equity
+        max_drawdown[p, s] = drawdown
+        sharpe[p, s] = ratio
+        trade_count[p, s] = trades
+
+    return final_equity, max_drawdown, sharpe, trade_count
+
+
+def batch_backtest(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    initial_capital: float = 10000.0,
+    commission: float = 0.001,
+    slippage: float = 0.0,
+    annual_factor: float = np.sqrt(252.0)
+) -> Dict[str, np.ndarray]:
+    """
+    批量回测入口，用于参数扫描和全市场扫描
+
+    prices 支持以下形状：
+        - (时间,)：单个交易对，所有参数组共享
+        - (交易对, 时间)：所有参数组共享同一组价格
+        - (参数组, 交易对, 时间)：每个参数组各自的价格
+    signals 支持 (时间,)、(交易对, 时间) 或 (参数组, 交易对, 时间)。
+
+    Args:
+        prices: 价格张量
+        signals: 信号张量 (1=买入, -1=卖出, 0=持有)
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        annual_factor: 夏普比率年化系数
+
+    Returns:
+        包含 final_equity、max_drawdown、sharpe_ratio、trade_count 的字典，
+        每个值的形状为 (参数组, 交易对)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    signals = np.asarray(signals)
+    if not np.issubdtype(signals.dtype, np.integer):
+        signals = signals.astype(np.int8)
+
+    if signals.ndim == 1:
+        signals = signals.reshape(1, 1, -1)
+    elif signals.ndim == 2:
+        signals = signals.reshape(1, *signals.shape)
+    if prices.ndim == 1:
+        prices = prices.reshape(1, 1, -1)
+    elif prices.ndim == 2:
+        prices = prices.reshape(1, *prices.shape)
+
+    if signals.ndim != 3 or prices.ndim != 3:
+        raise ValueError("价格和信号张量最多为三维 (参数组 × 交易对 × 时间)")
+    if prices.shape[1:] != signals.shape[1:]:
+        raise ValueError(f"价格形状 {prices.shape} 与信号形状 {signals.shape} 的交易对/时间维度不一致")
+    if prices.shape[0] not in (1, signals.shape[0]):
+        raise ValueError(f"价格的参数组维度必须为1或 {signals.shape[0]}，实际为 {prices.shape[0]}")
+
+    final_equity, max_drawdown, sharpe, trade_count = batch_backtest_numba(
+        np.ascontiguousarray(prices),
+        np.ascontiguousarray(signals),
+        float(initial_capital),
+        float(commission),
+        float(slippage),
+        float(annual_factor),
+    )
+    return {
+        'final_equity': final_equity,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe,
+        'trade_count': trade_count,
+    }
+
+
 def batch_simulate_trades_numba(
     prices_list: list,
     signals_list: list,
@@ -301,29 +512,23 @@ def batch_simulate_trades_numba(
     slippage: float
 ) -> list:
     """
-    并行批量回测模拟
-    
+    逐个回测模拟（返回完整曲线）
+
+    原实现在 parallel 内核中对Python列表使用 prange 并追加结果，无法编译。
+    需要完整权益曲线时在这里逐个调用 simulate_trades_numba；
+    只需要汇总指标的参数扫描请使用 batch_backtest / batch_backtest_numba。
+
     Args:
         prices_list: 价格数组列表
         signals_list: 信号数组列表
         initial_capital: 初始资金
         commission: 手续费率
         slippage: 滑点率
-        
+
     Returns:
         回测结果列表
     """
-    n = len(prices_list)
-    results = []
-    
-    for i in prange(n):
-        result = simulate_trades_numba(
-            prices_list[i],
-            signals_list[i],
-            initial_capital,
-            commission,
-            slippage
-        )
-        results.append(result)
-    
-    return results
+    return [
+        simulate_trades_numba(prices, signals, initial_capital, commission, slippage)
+        for prices, signals in zip(prices_list, signals_list)
+    ]
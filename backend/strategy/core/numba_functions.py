@@ -4,8 +4,82 @@ import numpy as np
 from numba import njit
 from typing import Tuple
 
+from .trade_records import TRADE_RECORD_DTYPE
 
-@njit(cache=True, fastmath=True)
+
+@njit(cache=True)
+def simulate_orders_multi(price: np.ndarray,
+                          size: np.ndarray,
+                          fees: np.ndarray,
+                          slippage: np.ndarray,
+                          init_cash: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Numba JIT 编译的多资产订单模拟函数
+
+    单次遍历 (时间 × 资产)，每个资产独立维护持仓和平均成本，共享同一个现金池。
+    同一时间步内按资产列顺序撮合。价格为NaN或非正数时跳过该资产的订单
+    （未上市/停牌）。未使用fastmath，以保证NaN判断有效。
+
+    参数：
+    - price: 价格数组 (时间 × 资产)
+    - size: 订单大小数组 (时间 × 资产)，>0 买入，<0 卖出
+    - fees: 每个资产的手续费率 (资产,)
+    - slippage: 每个资产的滑点 (资产,)
+    - init_cash: 初始资金
+
+    返回：
+    - tuple: (cash_history, positions_history, avg_cost_history)
+    """
+    n_steps = price.shape[0]
+    n_assets = price.shape[1]
+
+    # 单一现金池，每个资产独立的持仓和平均成本
+    cash = init_cash
+    position = np.zeros(n_assets, dtype=np.float64)
+    avg_cost = np.zeros(n_assets, dtype=np.float64)
+
+    cash_history = np.zeros(n_steps, dtype=np.float64)
+    positions_history = np.zeros((n_steps, n_assets), dtype=np.float64)
+    avg_cost_history = np.zeros((n_steps, n_assets), dtype=np.float64)
+
+    for i in range(n_steps):
+        for j in range(n_assets):
+            current_price = price[i, j]
+            order_size = size[i, j]
+
+            if order_size != 0.0 and current_price > 0.0:
+                if order_size > 0.0:  # 买入信号
+                    # 避免重复买入：该资产已有持仓时不再买入
+                    if position[j] <= 0.0:
+                        exec_price = current_price * (1.0 + slippage[j])
+                        trade_value = order_size * exec_price
+                        total_cost = trade_value + trade_value * fees[j]
+
+                        # 检查是否有足够资金
+                        if cash >= total_cost:
+                            cash -= total_cost
+                            avg_cost[j] = exec_price
+                            position[j] = order_size
+                elif position[j] > 0.0:  # 卖出信号，且该资产有持仓
+                    exec_price = current_price * (1.0 - slippage[j])
+                    sell_size = min(-order_size, position[j])  # 卖出数量不能超过持仓
+                    trade_value = sell_size * exec_price
+
+                    cash += trade_value - trade_value * fees[j]
+                    position[j] -= sell_size
+                    if position[j] <= 0.0:
+                        position[j] = 0.0
+                        avg_cost[j] = 0.0
+
+            positions_history[i, j] = position[j]
+            avg_cost_history[i, j] = avg_cost[j]
+
+        cash_history[i] = cash
+
+    return cash_history, positions_history, avg_cost_history
+
+
+@njit(cache=True)
 def simulate_orders(price: np.ndarray,
                        size: np.ndarray,
                        direction: np.ndarray,
@@ -14,76 +88,252 @@ def simulate_orders(price: np.ndarray,
                        init_cash: float) -> Tuple[np.ndarray, np.ndarray]:
     """
     Numba JIT 编译的订单模拟函数
-    
-    修复问题：
-    1. 现金应该是单一值，不是每个资产都有独立现金
-    2. 持仓需要正确传递
-    3. 卖出时应该释放资金
-    
+
+    所有资产使用相同手续费率和滑点的 simulate_orders_multi 简化接口，
+    每个资产独立维护持仓，共享单一现金池。
+
     参数：
     - price: 价格数组 (时间 × 资产)
     - size: 订单大小数组
-    - direction: 订单方向数组 (0=short, 1=long)
+    - direction: 订单方向数组 (0=short, 1=long)，保留用于接口兼容
     - fees: 手续费率
     - slippage: 滑点
     - init_cash: 初始资金
-    
+
     返回：
     - tuple: (cash_history, positions_history)
     """
-    n_steps = price.shape[0]
     n_assets = price.shape[1]
-    
-    # 初始化状态 - 单一现金池
+    cash_history, positions_history, _ = simulate_orders_multi(
+        price,
+        size,
+        np.full(n_assets, fees, dtype=np.float64),
+        np.full(n_assets, slippage, dtype=np.float64),
+        init_cash,
+    )
+    return cash_history, positions_history
+
+
+@njit(cache=True)
+def extract_trades(price: np.ndarray,
+                   positions: np.ndarray,
+                   fees: np.ndarray) -> np.ndarray:
+    """
+    Numba JIT 编译的交易记录提取函数
+
+    按 (时间, 资产) 顺序扫描持仓变化：持仓增加记为一个入场批次，压入该资产的
+    FIFO 队列；持仓减少时从队首依次匹配入场批次，每匹配一个批次生成一条完整交易
+    （买入+卖出）。每个资产的 FIFO 是预分配的环形缓冲区，容量为该资产的最大
+    入场次数，初始持仓视为0，因此第一个时间步的买入同样计入。
+
+    参数：
+    - price: 价格数组 (时间 × 资产)
+    - positions: 持仓历史数组 (时间 × 资产)
+    - fees: 每个资产的手续费率 (资产,)
+
+    返回：
+    - np.ndarray: TRADE_RECORD_DTYPE 结构化数组，按出场时间步再按资产排序
+    """
+    n_steps = positions.shape[0]
+    n_assets = positions.shape[1]
+
+    # 第一遍：统计入场/出场次数，确定环形缓冲区容量和交易记录上限
+    n_entries = np.zeros(n_assets, dtype=np.int64)
+    n_exits = 0
+    for i in range(n_steps):
+        for j in range(n_assets):
+            prev_pos = positions[i - 1, j] if i > 0 else 0.0
+            if positions[i, j] > prev_pos:
+                n_entries[j] += 1
+            elif positions[i, j] < prev_pos:
+                n_exits += 1
+
+    capacity = 1
+    total_entries = 0
+    for j in range(n_assets):
+        total_entries += n_entries[j]
+        if n_entries[j] > capacity:
+            capacity = n_entries[j]
+
+    lot_price = np.zeros((n_assets, capacity), dtype=np.float64)
+    lot_size = np.zeros((n_assets, capacity), dtype=np.float64)
+    lot_idx = np.zeros((n_assets, capacity), dtype=np.int64)
+    head = np.zeros(n_assets, dtype=np.int64)
+    count = np.zeros(n_assets, dtype=np.int64)
+
+    # 每次匹配要么耗尽一个入场批次，要么耗尽一次卖出，记录数不超过两者之和
+    trades = np.empty(total_entries + n_exits, dtype=TRADE_RECORD_DTYPE)
+    n_trades = 0
+
+    for i in range(n_steps):
+        for j in range(n_assets):
+            prev_pos = positions[i - 1, j] if i > 0 else 0.0
+            trade_size = positions[i, j] - prev_pos  # 正数=买入，负数=卖出
+            if trade_size == 0.0:
+                continue
+
+            trade_price = price[i, j]
+            if trade_size > 0.0:
+                # 买入 - 入场批次压入队尾
+                tail = (head[j] + count[j]) % capacity
+                lot_price[j, tail] = trade_price
+                lot_size[j, tail] = trade_size
+                lot_idx[j, tail] = i
+                count[j] += 1
+                continue
+
+            # 卖出 - 从队首（最早的入场批次）开始匹配
+            remaining = -trade_size
+            while remaining > 0.0 and count[j] > 0:
+                slot = head[j]
+                entry_price = lot_price[j, slot]
+                matched = min(remaining, lot_size[j, slot])
+
+                exit_value = matched * trade_price
+                total_fees = (exit_value + matched * entry_price) * fees[j]
+
+                record = trades[n_trades]
+                record['asset'] = j
+                record['entry_idx'] = lot_idx[j, slot]
+                record['exit_idx'] = i
+                record['entry_price'] = entry_price
+                record['exit_price'] = trade_price
+                record['size'] = matched
+                record['fees'] = total_fees
+                record['pnl'] = (trade_price - entry_price) * matched - total_fees
+                record['value'] = exit_value
+                n_trades += 1
+
+                remaining -= matched
+                lot_size[j, slot] -= matched
+                if lot_size[j, slot] <= 0.0:
+                    head[j] = (slot + 1) % capacity
+                    count[j] -= 1
+
+    return trades[:n_trades].copy()
+
+
+@njit(cache=True)
+def simulate_portfolio(close: np.ndarray,
+                       valid: np.ndarray,
+                       entries: np.ndarray,
+                       exits: np.ndarray,
+                       init_cash: float,
+                       fees: float,
+                       position_size_pct: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Numba JIT 编译的共享资金池组合模拟函数
+
+    所有交易对对齐为稠密的 (时间 × 交易对) 收盘价矩阵，单次遍历撮合。
+    每个时间步先按各交易对最近一个有效价格记录组合权益和现金，再按列顺序处理信号：
+    无持仓时的入场信号使用当前现金的 position_size_pct（最多95%）买入，
+    有持仓时的出场信号全部卖出。无效时间步（该交易对缺少K线）不撮合。
+    回测结束时按最近有效价格强制平仓，强制平仓记录追加在末尾。
+
+    参数：
+    - close: 收盘价矩阵 (时间 × 交易对)
+    - valid: 有效性掩码 (时间 × 交易对)
+    - entries: 入场信号 (时间 × 交易对)
+    - exits: 出场信号 (时间 × 交易对)
+    - init_cash: 初始总资金
+    - fees: 手续费率
+    - position_size_pct: 单笔交易资金使用比例
+
+    返回：
+    - tuple: (equity_history, cash_history, trades, n_closed)，trades 为
+      TRADE_RECORD_DTYPE 结构化数组，trades[n_closed:] 为强制平仓记录
+    """
+    n_steps = close.shape[0]
+    n_assets = close.shape[1]
+
+    # 每次入场至多产生一条交易记录
+    max_trades = 0
+    for i in range(n_steps):
+        for j in range(n_assets):
+            if entries[i, j] and valid[i, j]:
+                max_trades += 1
+    trades = np.empty(max_trades, dtype=TRADE_RECORD_DTYPE)
+    n_trades = 0
+
+    equity_history = np.empty(n_steps, dtype=np.float64)
+    cash_history = np.empty(n_steps, dtype=np.float64)
+
     cash = init_cash
-    current_position = 0.0
-    
-    # 记录每个时间步的现金和持仓
-    cash_history = np.zeros(n_steps, dtype=np.float64)
-    positions_history = np.zeros((n_steps, n_assets), dtype=np.float64)
-    
-    # 遍历每个时间步
+    position = np.zeros(n_assets, dtype=np.float64)
+    entry_price = np.zeros(n_assets, dtype=np.float64)
+    entry_idx = np.zeros(n_assets, dtype=np.int64)
+    mark = np.zeros(n_assets, dtype=np.float64)
+
     for i in range(n_steps):
+        position_value = 0.0
         for j in range(n_assets):
-            # 获取当前价格
-            current_price = price[i, j]
-            
-            # 检查是否有订单（size > 0 表示买入，size < 0 表示卖出）
-            if size[i, j] > 0:  # 买入信号
-                # 避免重复买入：如果已经有持仓，不再买入
-                if current_position <= 0:
-                    exec_price = current_price * (1.0 + slippage)
-                    trade_value = size[i, j] * exec_price
-                    trade_fees = trade_value * fees
-                    total_cost = trade_value + trade_fees
-                    
-                    # 检查是否有足够资金
-                    if cash >= total_cost:
-                        # 执行买入
-                        cash -= total_cost
-                        current_position += size[i, j]
-            elif size[i, j] < 0:  # 卖出信号
-                # 避免重复卖出：如果没有持仓，不再卖出
-                if current_position > 0:
-                    exec_price = current_price * (1.0 - slippage)
-                    sell_size = min(abs(size[i, j]), current_position)  # 卖出数量不能超过持仓
-                    
-                    if sell_size > 0:
-                        trade_value = sell_size * exec_price
-                        trade_fees = trade_value * fees
-                        net_proceeds = trade_value - trade_fees
-                        
-                        # 执行卖出
-                        cash += net_proceeds
-                        current_position -= sell_size
-            
-            # 记录当前持仓
-            positions_history[i, j] = current_position
-        
-        # 记录当前现金
+            if valid[i, j]:
+                mark[j] = close[i, j]
+            position_value += position[j] * mark[j]
+        equity_history[i] = cash + position_value
         cash_history[i] = cash
-    
-    return cash_history, positions_history
+
+        for j in range(n_assets):
+            if not valid[i, j]:
+                continue
+            price = close[i, j]
+
+            if entries[i, j] and position[j] == 0.0:
+                trade_cash = min(cash * position_size_pct, cash * 0.95)
+                if trade_cash > 0.0:
+                    size = trade_cash / price
+                    cost = size * price * (1 + fees)
+                    if cash >= cost:
+                        cash -= cost
+                        position[j] = size
+                        entry_price[j] = price
+                        entry_idx[j] = i
+
+            elif exits[i, j] and position[j] > 0.0:
+                size = position[j]
+                value = size * price
+                total_fees = (value + size * entry_price[j]) * fees
+                cash += value * (1 - fees)
+
+                record = trades[n_trades]
+                record['asset'] = j
+                record['entry_idx'] = entry_idx[j]
+                record['exit_idx'] = i
+                record['entry_price'] = entry_price[j]
+                record['exit_price'] = price
+                record['size'] = size
+                record['fees'] = total_fees
+                record['pnl'] = (price - entry_price[j]) * size - total_fees
+                record['value'] = value
+                n_trades += 1
+
+                position[j] = 0.0
+
+    # 回测结束，按最近有效价格强制平仓
+    n_closed = n_trades
+    for j in range(n_assets):
+        if position[j] > 0.0 and mark[j] > 0.0:
+            size = position[j]
+            price = mark[j]
+            value = size * price
+            total_fees = (value + size * entry_price[j]) * fees
+            cash += value * (1 - fees)
+
+            record = trades[n_trades]
+            record['asset'] = j
+            record['entry_idx'] = entry_idx[j]
+            record['exit_idx'] = n_steps - 1
+            record['entry_price'] = entry_price[j]
+            record['exit_price'] = price
+            record['size'] = size
+            record['fees'] = total_fees
+            record['pnl'] = (price - entry_price[j]) * size - total_fees
+            record['value'] = value
+            n_trades += 1
+
+            position[j] = 0.0
+
+    return equity_history, cash_history, trades[:n_trades].copy(), n_closed
 
 
 @njit(cache=True, fastmath=True)
@@ -0,0 +1,732 @@
+# 参数优化引擎
+# 网格搜索、随机搜索与逐次减半搜索，使用进程池并行评估参数组合
+#
+# K线数据只写入一次共享内存，各工作进程以只读视图访问，不再为每个参数组合复制数据；
+# 工作进程内缓存指标计算结果，只有信号参数不同的参数组合复用同一份指标。
+
+import itertools
+import math
+import os
+import pickle
+import random
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+
+# 每个工作进程最多缓存的指标结果数
+INDICATOR_CACHE_SIZE = 128
+
+# 每个工作进程分到的任务块数，块越多负载越均衡，块越少调度开销越小
+CHUNKS_PER_WORKER = 4
+
+
+class SharedKlineData:
+    """
+    共享内存中的多交易对K线数据
+
+    数值列按交易对依次写入同一块共享内存，DatetimeIndex 以 int64 纳秒时间戳保存。
+    工作进程通过 spec 附加到同一块内存，得到零拷贝的只读 DataFrame。
+    """
+
+    def __init__(self, data: Dict[str, pd.DataFrame]):
+        """
+        将K线数据写入共享内存
+
+        参数：
+        - data: 多交易对数据字典 {symbol: DataFrame}
+        """
+        layout = []
+        offset = 0
+        for symbol, df in data.items():
+            numeric = df.select_dtypes(include=[np.number])
+            n_rows, n_cols = numeric.shape
+            entry = {
+                'symbol': symbol,
+                'columns': list(numeric.columns),
+                'rows': n_rows,
+                'values_offset': offset,
+                'index_offset': None,
+                'tz': None,
+            }
+            offset += n_rows * n_cols * 8
+            if isinstance(df.index, pd.DatetimeIndex):
+                entry['index_offset'] = offset
+                entry['tz'] = str(df.index.tz) if df.index.tz is not None else None
+                offset += n_rows * 8
+            layout.append(entry)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for entry, df in zip(layout, data.values()):
+            values = self._values_view(self._shm, entry)
+            values[:] = df[entry['columns']].to_numpy(dtype=np.float64)
+            if entry['index_offset'] is not None:
+                self._index_view(self._shm, entry)[:] = df.index.as_unit('ns').asi8
+
+        self.spec = {'name': self._shm.name, 'layout': layout}
+        self.nbytes = offset
+
+    @staticmethod
+    def _values_view(shm: shared_memory.SharedMemory, entry: Dict[str, Any]) -> np.ndarray:
+        return np.ndarray(
+            (entry['rows'], len(entry['columns'])), dtype=np.float64,
+            buffer=shm.buf, offset=entry['values_offset']
+        )
+
+    @staticmethod
+    def _index_view(shm: shared_memory.SharedMemory, entry: Dict[str, Any]) -> np.ndarray:
+        return np.ndarray((entry['rows'],), dtype=np.int64, buffer=shm.buf, offset=entry['index_offset'])
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, pd.DataFrame]]:
+        """
+        附加到已有共享内存并构造只读 DataFrame
+
+        参数：
+        - spec: SharedKlineData.spec
+
+        返回：
+        - tuple: (共享内存句柄, {symbol: DataFrame})，句柄须在数据使用完毕后关闭
+        """
+        # 共享内存由创建方负责释放，附加方不登记到资源跟踪器（Python 3.13+）；
+        # 更早的版本中子进程与创建方共用同一个资源跟踪器，重复登记没有影响
+        try:
+            shm = shared_memory.SharedMemory(name=spec['name'], track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=spec['name'])
+
+        data = {}
+        for entry in spec['layout']:
+            values = cls._values_view(shm, entry)
+            values.flags.writeable = False
+            if entry['index_offset'] is not None:
+                index = pd.DatetimeIndex(cls._index_view(shm, entry).view('datetime64[ns]'))
+                if entry['tz']:
+                    index = index.tz_localize('UTC').tz_convert(entry['tz'])
+            else:
+                index = pd.RangeIndex(entry['rows'])
+            data[entry['symbol']] = pd.DataFrame(values, index=index, columns=entry['columns'], copy=False)
+        return shm, data
+
+    def close(self):
+        """
+        释放共享内存
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> 'SharedKlineData':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SweepEvaluator:
+    """
+    参数组合评估器基类
+
+    评估器会被序列化发送到工作进程，子类必须可以 pickle。
+    """
+
+    def group_key(self, params: Dict[str, Any]) -> Hashable:
+        """
+        参数组合的指标分组键，分组键相同的组合会被调度到同一批次以复用指标
+        """
+        return None
+
+    def evaluate(self, params: Dict[str, Any],
+                 data: Dict[str, pd.DataFrame],
+                 cache: 'OrderedDict[Hashable, Any]') -> Dict[str, float]:
+        """
+        评估一个参数组合
+
+        参数：
+        - params: 参数组合
+        - data: 多交易对数据字典（可能只包含前一部分K线，见逐次减半搜索）
+        - cache: 工作进程内的指标缓存
+
+        返回：
+        - dict: 绩效指标
+        """
+        raise NotImplementedError
+
+
+def backtest_metrics(engine_result: Dict[str, Any], price: np.ndarray, init_cash: float) -> Dict[str, float]:
+    """
+    从 VectorEngine 结果计算优化用的绩效指标
+
+    在引擎指标基础上按期末持仓市值计算总收益率和最大回撤。
+
+    参数：
+    - engine_result: VectorEngine.run_backtest 返回值
+    - price: 价格数组 (时间 × 资产)
+    - init_cash: 初始资金
+
+    返回：
+    - dict: 绩效指标
+    """
+    metrics = dict(engine_result['metrics'])
+    equity = engine_result['cash'] + np.sum(engine_result['positions'] * np.nan_to_num(price), axis=1)
+    if len(equity) > 0 and init_cash > 0:
+        peak = np.maximum.accumulate(np.maximum(equity, init_cash))
+        metrics['total_return'] = float(equity[-1] / init_cash - 1)
+        metrics['max_drawdown'] = float(np.max((peak - equity) / peak))
+    else:
+        metrics['total_return'] = 0.0
+        metrics['max_drawdown'] = 0.0
+    return metrics
+
+
+def _mean_metrics(per_symbol: List[Dict[str, float]]) -> Dict[str, float]:
+    """多交易对指标取平均"""
+    if len(per_symbol) == 1:
+        return per_symbol[0]
+    keys = per_symbol[0].keys()
+    return {key: float(np.mean([m[key] for m in per_symbol])) for key in keys}
+
+
+class StrategyCoreEvaluator(SweepEvaluator):
+    """
+    StrategyCore 向量化策略评估器
+
+    每个参数组合实例化一次策略，信号通过 VectorEngine 回测。
+    策略类声明了 indicator_params 时，指标按这些参数缓存并在组合之间复用。
+    """
+
+    def __init__(self, strategy_cls: type,
+                 base_params: Optional[Dict[str, Any]] = None,
+                 init_cash: float = 10000.0,
+                 fees: float = 0.001,
+                 slippage: float = 0.0001,
+                 price_type: str = 'close'):
+        """
+        初始化评估器
+
+        参数：
+        - strategy_cls: StrategyCore 子类，须定义在可导入的模块中
+        - base_params: 固定参数，与每个参数组合合并
+        - init_cash: 初始资金
+        - fees: 手续费率
+        - slippage: 滑点
+        - price_type: 价格类型 ('close' 或 'open')
+        """
+        self.strategy_cls = strategy_cls
+        self.base_params = dict(base_params or {})
+        self.init_cash = init_cash
+        self.fees = fees
+        self.slippage = slippage
+        self.price_type = price_type
+        self._adapter = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_adapter'] = None
+        return state
+
+    def group_key(self, params: Dict[str, Any]) -> Hashable:
+        indicator_params = getattr(self.strategy_cls, 'indicator_params', None)
+        merged = {**self.base_params, **params}
+        if indicator_params is None:
+            return tuple(sorted((k, repr(v)) for k, v in merged.items()))
+        return tuple((name, repr(merged.get(name))) for name in indicator_params)
+
+    def evaluate(self, params: Dict[str, Any],
+                 data: Dict[str, pd.DataFrame],
+                 cache: 'OrderedDict[Hashable, Any]') -> Dict[str, float]:
+        strategy = self.strategy_cls({**self.base_params, **params})
+        adapter = self._get_adapter(strategy)
+        group = self.group_key(params)
+
+        per_symbol = []
+        for symbol, df in data.items():
+            df = strategy.preprocess_data(df)
+
+            key = (symbol, len(df), group)
+            indicators = cache.get(key)
+            if indicators is None:
+                indicators = strategy.calculate_indicators(df)
+                cache[key] = indicators
+                if len(cache) > INDICATOR_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(key)
+
+            signals = strategy.run_with_indicators(df, indicators)['signals']
+            price, entries, exits = adapter._build_engine_inputs(df, signals, self.price_type)
+            engine_result = adapter.engine.run_backtest(
+                price=price,
+                entries=entries,
+                exits=exits,
+                init_cash=self.init_cash,
+                fees=self.fees,
+                slippage=self.slippage
+            )
+            per_symbol.append(backtest_metrics(engine_result, price, self.init_cash))
+
+        return _mean_metrics(per_symbol)
+
+    def _get_adapter(self, strategy):
+        """每个进程复用一个适配器及其 VectorEngine"""
+        if self._adapter is None:
+            from .strategy_core import NativeVectorAdapter
+            self._adapter = NativeVectorAdapter(strategy, price_type=self.price_type)
+        self._adapter.strategy_core = strategy
+        return self._adapter
+
+
+@dataclass
+class SweepResult:
+    """单个参数组合的评估结果"""
+    params: Dict[str, Any]
+    score: float
+    metrics: Dict[str, float] = field(default_factory=dict)
+    budget: float = 1.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'params': self.params,
+            'score': self.score,
+            'metrics': self.metrics,
+            'budget': self.budget,
+            'error': self.error,
+        }
+
+
+# ---------------------------------------------------------------- 工作进程
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(spec: Dict[str, Any], evaluator_bytes: bytes):
+    """工作进程初始化：附加共享内存并反序列化评估器"""
+    shm, data = SharedKlineData.attach(spec)
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update({
+        'shm': shm,
+        'data': data,
+        'evaluator': pickle.loads(evaluator_bytes),
+        'cache': OrderedDict(),
+        'views': {},
+    })
+
+
+def _budget_view(state: Dict[str, Any], budget: float) -> Dict[str, pd.DataFrame]:
+    """取每个交易对前 budget 比例的K线（零拷贝切片）"""
+    if budget >= 1.0:
+        return state['data']
+    views = state['views']
+    if budget not in views:
+        views[budget] = {
+            symbol: df.iloc[:max(1, int(math.ceil(len(df) * budget)))]
+            for symbol, df in state['data'].items()
+        }
+    return views[budget]
+
+
+def _evaluate_chunk(state: Dict[str, Any],
+                    chunk: Sequence[Dict[str, Any]],
+                    budget: float) -> List[Tuple[Dict[str, Any], Optional[Dict[str, float]], Optional[str]]]:
+    data = _budget_view(state, budget)
+    evaluator = state['evaluator']
+    results = []
+    for params in chunk:
+        try:
+            results.append((params, evaluator.evaluate(params, data, state['cache']), None))
+        except Exception as e:
+            results.append((params, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _run_chunk(chunk: Sequence[Dict[str, Any]], budget: float):
+    """工作进程任务：评估一批参数组合"""
+    return _evaluate_chunk(_WORKER_STATE, chunk, budget)
+
+
+# ---------------------------------------------------------------- 参数空间
+
+def expand_grid(param_grid: Dict[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+    """
+    展开网格参数空间
+
+    参数：
+    - param_grid: {参数名: 取值列表}
+
+    返回：
+    - list: 全部参数组合
+    """
+    names = list(param_grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(list(v) for v in param_grid.values()))]
+
+
+def sample_params(param_space: Dict[str, Any], n_iter: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    从参数空间随机采样
+
+    参数：
+    - param_space: {参数名: 取值列表 或 (下界, 上界)}；两端均为整数时按整数均匀采样，
+      否则按浮点均匀采样
+    - n_iter: 采样数量，离散空间不足时返回全部不重复组合
+    - seed: 随机种子
+
+    返回：
+    - list: 不重复的参数组合
+    """
+    rng = random.Random(seed)
+    discrete = all(isinstance(v, (list, range)) for v in param_space.values())
+    if discrete:
+        total = math.prod(len(v) for v in param_space.values())
+        if total <= n_iter:
+            return expand_grid(param_space)
+
+    samples: Dict[Tuple, Dict[str, Any]] = {}
+    attempts = 0
+    while len(samples) < n_iter and attempts < n_iter * 20:
+        attempts += 1
+        params = {}
+        for name, space in param_space.items():
+            if isinstance(space, tuple) and len(space) == 2:
+                low, high = space
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(list(space))
+        samples.setdefault(tuple(repr(params[n]) for n in param_space), params)
+    return list(samples.values())
+
+
+def expand_ranges(param_ranges: Dict[str, Sequence[Any]]) -> Dict[str, List[Any]]:
+    """
+    将 {参数名: [最小值, 最大值, 步长]} 格式的范围展开为取值列表
+
+    不是三元数值范围的取值原样作为候选值列表。
+    """
+    grid = {}
+    for name, spec in param_ranges.items():
+        values = list(spec)
+        if len(values) == 3 and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values) \
+                and values[2] > 0 and values[1] >= values[0]:
+            low, high, step = values
+            count = int(math.floor((high - low) / step + 1e-9)) + 1
+            if all(isinstance(v, int) for v in values):
+                grid[name] = [low + i * step for i in range(count)]
+            else:
+                grid[name] = [round(low + i * step, 10) for i in range(count)]
+        else:
+            grid[name] = values
+    return grid
+
+
+# ---------------------------------------------------------------- 优化器
+
+class ParameterOptimizer:
+    """
+    参数优化器
+
+    支持网格搜索、随机搜索和逐次减半（successive halving）搜索。
+    n_jobs > 1 时K线数据写入共享内存，参数组合按指标分组切块后提交到进程池，
+    结果按完成顺序逐条回调，可设置早停。
+
+    使用示例:
+        >>> optimizer = ParameterOptimizer(StrategyCoreEvaluator(SmaCross), {'BTCUSDT': df})
+        >>> result = optimizer.grid_search({'fast': [5, 10], 'slow': [20, 50]})
+        >>> result['best_params']
+    """
+
+    def __init__(self, evaluator: SweepEvaluator,
+                 data: Dict[str, pd.DataFrame],
+                 metric: str = 'sharpe_ratio',
+                 maximize: bool = True,
+                 n_jobs: Optional[int] = None,
+                 progress: Optional[Any] = None,
+                 on_result: Optional[Callable[[SweepResult], None]] = None):
+        """
+        初始化参数优化器
+
+        参数：
+        - evaluator: 参数组合评估器
+        - data: 多交易对数据字典 {symbol: DataFrame}
+        - metric: 优化指标
+        - maximize: True 表示指标越大越好
+        - n_jobs: 工作进程数，None 为CPU核数，1 为在当前进程中串行评估
+        - progress: 进度追踪器，需提供 increment(n, message) 方法（如 backtest.progress.ProgressTracker）
+        - on_result: 每个参数组合评估完成后的回调
+        """
+        self.evaluator = evaluator
+        self.data = data
+        self.metric = metric
+        self.maximize = maximize
+        self.n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        self.progress = progress
+        self.on_result = on_result
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shared: Optional[SharedKlineData] = None
+        self._local_state: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------ 搜索方法
+
+    def grid_search(self, param_grid: Dict[str, Iterable[Any]],
+                    patience: Optional[int] = None) -> Dict[str, Any]:
+        """
+        网格搜索
+
+        参数：
+        - param_grid: {参数名: 取值列表}
+        - patience: 连续评估这么多个参数组合没有改进时提前停止，None 表示不早停
+
+        返回：
+        - dict: 优化结果
+        """
+        candidates = expand_grid(param_grid)
+        with self._session():
+            results, stopped = self._evaluate(candidates, 1.0, patience)
+        return self._summary('grid', results, stopped)
+
+    def random_search(self, param_space: Dict[str, Any],
+                      n_iter: int = 100,
+                      seed: Optional[int] = None,
+                      patience: Optional[int] = None) -> Dict[str, Any]:
+        """
+        随机搜索
+
+        参数：
+        - param_space: {参数名: 取值列表 或 (下界, 上界)}
+        - n_iter: 采样数量
+        - seed: 随机种子
+        - patience: 早停耐心值
+
+        返回：
+        - dict: 优化结果
+        """
+        candidates = sample_params(param_space, n_iter, seed)
+        with self._session():
+            results, stopped = self._evaluate(candidates, 1.0, patience)
+        return self._summary('random', results, stopped)
+
+    def successive_halving(self, param_grid: Optional[Dict[str, Iterable[Any]]] = None,
+                           candidates: Optional[List[Dict[str, Any]]] = None,
+                           min_budget: Optional[float] = None,
+                           eta: int = 3) -> Dict[str, Any]:
+        """
+        逐次减半搜索
+
+        第一轮用前 min_budget 比例的K线评估全部候选，每轮保留前 1/eta 的候选，
+        并把K线比例放大 eta 倍，最后一轮在全部K线上评估。
+
+        参数：
+        - param_grid: {参数名: 取值列表}，与 candidates 二选一
+        - candidates: 候选参数组合列表
+        - min_budget: 第一轮的K线比例，默认使最后一轮恰好剩下约 eta 个候选
+        - eta: 每轮淘汰比例
+
+        返回：
+        - dict: 优化结果，results 为最后一轮的结果
+        """
+        if candidates is None:
+            if param_grid is None:
+                raise ValueError("param_grid 和 candidates 不能同时为空")
+            candidates = expand_grid(param_grid)
+        if eta < 2:
+            raise ValueError("eta 必须不小于2")
+
+        n_rounds = max(1, int(math.floor(math.log(max(len(candidates), 1), eta))))
+        budget = min_budget if min_budget is not None else float(eta) ** -(n_rounds - 1)
+        budget = min(max(budget, 1e-6), 1.0)
+
+        rounds = []
+        results: List[SweepResult] = []
+        with self._session():
+            while True:
+                results, _ = self._evaluate(candidates, budget, None)
+                ranked = self._rank(results)
+                rounds.append({'budget': budget, 'evaluated': len(candidates)})
+                logger.info(
+                    f"逐次减半: 比例={budget:.4f}, 候选={len(candidates)}, "
+                    f"当前最优={ranked[0].score if ranked else None}"
+                )
+                if budget >= 1.0 or len(candidates) <= 1:
+                    break
+                keep = max(1, int(math.ceil(len(candidates) / eta)))
+                candidates = [r.params for r in ranked[:keep]]
+                budget = min(1.0, budget * eta)
+
+        summary = self._summary('successive_halving', results, False)
+        summary['rounds'] = rounds
+        return summary
+
+    # ------------------------------------------------------------ 执行
+
+    @contextmanager
+    def _session(self):
+        """一次搜索期间保持进程池和共享内存，逐次减半的各轮复用同一个进程池"""
+        self._open()
+        try:
+            yield
+        finally:
+            self._close()
+
+    def _open(self):
+        """准备执行环境：多进程时写入共享内存并启动进程池"""
+        if self.n_jobs > 1:
+            try:
+                evaluator_bytes = pickle.dumps(self.evaluator)
+            except Exception as e:
+                logger.warning(f"评估器无法序列化，改为串行评估: {e}")
+                evaluator_bytes = None
+
+            if evaluator_bytes is not None:
+                self._shared = SharedKlineData(self.data)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.n_jobs,
+                    initializer=_init_worker,
+                    initargs=(self._shared.spec, evaluator_bytes),
+                )
+                logger.info(
+                    f"参数优化进程池已启动: workers={self.n_jobs}, "
+                    f"共享K线数据={self._shared.nbytes / 1024 / 1024:.1f}MB"
+                )
+                return
+
+        self._local_state = {
+            'data': self.data,
+            'evaluator': self.evaluator,
+            'cache': OrderedDict(),
+            'views': {},
+        }
+
+    def _close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+        self._local_state = None
+
+    def _evaluate(self, candidates: List[Dict[str, Any]],
+                  budget: float,
+                  patience: Optional[int]) -> Tuple[List[SweepResult], bool]:
+        """
+        评估一组参数组合
+
+        返回：
+        - tuple: (评估结果列表, 是否早停)
+        """
+        # 指标分组相同的组合相邻，切块后落在同一个工作进程中复用指标
+        ordered = sorted(candidates, key=lambda p: repr(self.evaluator.group_key(p)))
+        tracker = _BestTracker(self, patience)
+
+        if self._pool is None:
+            for params in ordered:
+                for item in _evaluate_chunk(self._local_state, [params], budget):
+                    tracker.add(self._make_result(item, budget))
+                if tracker.stopped:
+                    break
+            return tracker.results, tracker.stopped
+
+        chunk_size = max(1, int(math.ceil(len(ordered) / (self.n_jobs * CHUNKS_PER_WORKER))))
+        pending = {
+            self._pool.submit(_run_chunk, ordered[i:i + chunk_size], budget)
+            for i in range(0, len(ordered), chunk_size)
+        }
+        try:
+            while pending and not tracker.stopped:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for item in future.result():
+                        tracker.add(self._make_result(item, budget))
+        finally:
+            for future in pending:
+                future.cancel()
+        return tracker.results, tracker.stopped
+
+    def _make_result(self, item, budget: float) -> SweepResult:
+        params, metrics, error = item
+        if metrics is None:
+            return SweepResult(params=params, score=self._worst(), budget=budget, error=error)
+        score = metrics.get(self.metric)
+        if score is None or not np.isfinite(score):
+            score = self._worst()
+        return SweepResult(params=params, score=float(score), metrics=metrics, budget=budget)
+
+    def _worst(self) -> float:
+        return -math.inf if self.maximize else math.inf
+
+    def _better(self, a: float, b: float) -> bool:
+        return a > b if self.maximize else a < b
+
+    def _rank(self, results: List[SweepResult]) -> List[SweepResult]:
+        return sorted(results, key=lambda r: r.score, reverse=self.maximize)
+
+    def _summary(self, method: str, results: List[SweepResult], stopped: bool) -> Dict[str, Any]:
+        ranked = self._rank(results)
+        best = ranked[0] if ranked and ranked[0].error is None else None
+        errors = sum(1 for r in results if r.error is not None)
+        if errors:
+            logger.warning(f"参数优化中有 {errors} 个参数组合评估失败")
+        logger.info(
+            f"参数优化完成: 方法={method}, 评估={len(results)}, 早停={stopped}, "
+            f"最优参数={best.params if best else None}, 最优分数={best.score if best else None}"
+        )
+        return {
+            'method': method,
+            'optimization_metric': self.metric,
+            'best_params': best.params if best else {},
+            'best_score': best.score if best else self._worst(),
+            'best_metrics': best.metrics if best else {},
+            'results': [r.to_dict() for r in ranked],
+            'evaluated': len(results),
+            'stopped_early': stopped,
+        }
+
+
+class _BestTracker:
+    """跟踪最优结果、推送进度并判断早停"""
+
+    def __init__(self, optimizer: ParameterOptimizer, patience: Optional[int]):
+        self.optimizer = optimizer
+        self.patience = patience
+        self.results: List[SweepResult] = []
+        self.best: Optional[SweepResult] = None
+        self.since_best = 0
+        self.stopped = False
+
+    def add(self, result: SweepResult):
+        optimizer = self.optimizer
+        self.results.append(result)
+
+        if result.error is None and (self.best is None or optimizer._better(result.score, self.best.score)):
+            self.best = result
+            self.since_best = 0
+        else:
+            self.since_best += 1
+
+        if optimizer.on_result is not None:
+            try:
+                optimizer.on_result(result)
+            except Exception as e:
+                logger.error(f"参数优化结果回调执行失败: {e}")
+
+        if optimizer.progress is not None:
+            best_score = self.best.score if self.best else None
+            optimizer.progress.increment(1, message=f"{optimizer.metric} 当前最优: {best_score}")
+
+        if self.patience is not None and self.since_best >= self.patience:
+            logger.info(f"连续 {self.since_best} 个参数组合没有改进，提前停止")
+            self.stopped = True
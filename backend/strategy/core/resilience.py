@@ -527,7 +527,8 @@ class ExceptionIsolation:
                 "total_failures": 0,
                 "total_exceptions": 0,
                 "avg_execution_time_ms": 0.0,
-                "execution_times": deque(maxlen=100)
+                "execution_times": deque(maxlen=100),
+                "execution_time_total": 0.0
             }
         
         def wrapped_handler(data: Any) -> bool:
@@ -592,10 +593,14 @@ class ExceptionIsolation:
             finally:
                 # 记录执行时间
                 execution_time = time.time() - start_time
-                stats["execution_times"].append(execution_time)
-                stats["avg_execution_time_ms"] = (
-                    sum(stats["execution_times"]) / len(stats["execution_times"]) * 1000
-                )
+                times = stats["execution_times"]
+                # 增量维护窗口内总耗时，避免每次调用都对整个窗口求和
+                total = stats["execution_time_total"] + execution_time
+                if len(times) == times.maxlen:
+                    total -= times[0]
+                times.append(execution_time)
+                stats["execution_time_total"] = total
+                stats["avg_execution_time_ms"] = total / len(times) * 1000
         
         # 保存原始处理器引用
         wrapped_handler._original_handler = handler
@@ -6,10 +6,10 @@ import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List, Callable, Tuple
-import hashlib
-import pickle
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from .indicator_cache import IndicatorCache
+
 
 class StrategyCore(ABC):
     """
@@ -17,6 +17,10 @@ class StrategyCore(ABC):
     与回测引擎无关，仅包含策略的计算和信号生成逻辑
     """
 
+    # calculate_indicators 依赖的参数名，None 表示依赖全部参数；
+    # 指标缓存和参数优化据此在只有信号参数不同的参数组合之间复用指标
+    indicator_params: Optional[Tuple[str, ...]] = None
+
     def __init__(self, params: Dict[str, Any]):
         """
         初始化策略核心
@@ -27,7 +31,7 @@ class StrategyCore(ABC):
         self.params = params
         self.indicators = {}
         self.custom_indicators = {}
-        self._indicator_cache = {}  # 指标计算结果缓存
+        self._indicator_cache = IndicatorCache()  # 指标计算结果缓存，按K线内容指纹寻址
         self._cache_enabled = True  # 缓存开关
         self._cache_hits = 0  # 缓存命中次数
         self._cache_misses = 0  # 缓存未命中次数
@@ -41,6 +45,8 @@ class StrategyCore(ABC):
             indicator_func: 指标计算函数，接受数据和参数，返回计算结果
         """
         self.custom_indicators[name] = indicator_func
+        # 同名指标重新注册后旧结果失效
+        self._indicator_cache.invalidate(f"custom:{name}")
 
     def calculate_custom_indicator(self, name: str, data: pd.DataFrame, **kwargs) -> Any:
         """
@@ -54,39 +60,48 @@ class StrategyCore(ABC):
         Returns:
             Any: 指标计算结果
         """
-        if name in self.custom_indicators:
-            return self.custom_indicators[name](data, **kwargs)
-        raise ValueError(f"Custom indicator '{name}' not registered")
+        if name not in self.custom_indicators:
+            raise ValueError(f"Custom indicator '{name}' not registered")
 
-    def _generate_cache_key(self, data: pd.DataFrame, method_name: str, **kwargs) -> str:
-        """
-        生成缓存键
+        indicator_func = self.custom_indicators[name]
+        # 指纹只支持 DataFrame，其它输入（ndarray、Series 等）不经过缓存
+        if not self._cache_enabled or not isinstance(data, pd.DataFrame):
+            return indicator_func(data, **kwargs)
+        return self._cached(
+            f"custom:{name}", data, lambda: indicator_func(data, **kwargs),
+            getattr(indicator_func, '__qualname__', repr(indicator_func)), kwargs
+        )
 
-        Args:
-            data: K线数据
-            method_name: 方法名称
-            **kwargs: 额外参数
+    def _cache_key_parts(self) -> Tuple[Any, ...]:
+        """缓存键中与策略相关的部分：策略类和影响指标的参数"""
+        if self.indicator_params is None:
+            params = self.params
+        else:
+            params = {name: self.params.get(name) for name in self.indicator_params}
+        return (f"{type(self).__module__}.{type(self).__qualname__}", params)
 
-        Returns:
-            str: 缓存键
-        """
-        # 提取数据的关键信息用于生成缓存键
-        data_hash = hashlib.md5(pickle.dumps((
-            data.index.values,
-            data.columns.tolist(),
-            data.shape,
-            data.iloc[0].values,
-            data.iloc[-1].values
-        ))).hexdigest()
+    def _cached(self, name: str, data: pd.DataFrame, compute: Callable[[], Any], *parts: Any) -> Any:
+        """查找缓存，未命中时计算并写入，同时更新命中统计"""
+        key = self._indicator_cache.make_key(name, data, *self._cache_key_parts(), *parts)
+        hit, value = self._indicator_cache.get(key, name)
+        if hit:
+            self._cache_hits += 1
+            return value
+        self._cache_misses += 1
+        value = compute()
+        self._indicator_cache.put(key, name, value)
+        return value
 
-        # 生成参数哈希
-        params_hash = hashlib.md5(pickle.dumps((self.params, kwargs))).hexdigest()
+    def set_indicator_cache(self, cache: IndicatorCache):
+        """
+        替换指标缓存
 
-        # 生成方法名哈希
-        method_hash = hashlib.md5(method_name.encode()).hexdigest()
+        多个策略实例共享同一个缓存时，相同数据和参数的指标只计算一次。
 
-        # 组合成最终的缓存键
-        return f"{method_hash}:{data_hash}:{params_hash}"
+        Args:
+            cache: 指标缓存
+        """
+        self._indicator_cache = cache
 
     def enable_cache(self, enable: bool = True):
         """
@@ -110,13 +125,17 @@ class StrategyCore(ABC):
         获取缓存统计信息
 
         Returns:
-            Dict[str, int]: 缓存统计信息
+            Dict[str, int]: 缓存统计信息，indicators 为每个指标的命中统计
         """
+        cache_stats = self._indicator_cache.get_stats()
         return {
             'hits': self._cache_hits,
             'misses': self._cache_misses,
             'total': self._cache_hits + self._cache_misses,
-            'hit_rate': (self._cache_hits / (self._cache_hits + self._cache_misses) * 100) if (self._cache_hits + self._cache_misses) > 0 else 0
+            'hit_rate': (self._cache_hits / (self._cache_hits + self._cache_misses) * 100) if (self._cache_hits + self._cache_misses) > 0 else 0,
+            'entries': cache_stats['entries'],
+            'memory_bytes': cache_stats['memory_bytes'],
+            'indicators': cache_stats['indicators'],
         }
 
     def run(self, data: pd.DataFrame) -> Dict[str, Any]:
@@ -132,19 +151,30 @@ class StrategyCore(ABC):
         # 数据预处理
         data = self.preprocess_data(data)
 
-        # 计算指标（使用缓存）
-        if self._cache_enabled:
-            cache_key = self._generate_cache_key(data, 'calculate_indicators')
-            if cache_key in self._indicator_cache:
-                indicators = self._indicator_cache[cache_key]
-                self._cache_hits += 1
-            else:
-                indicators = self.calculate_indicators(data)
-                self._indicator_cache[cache_key] = indicators
-                self._cache_misses += 1
+        # 计算指标（使用缓存）；运行期间固定数据指纹，自定义指标查找不再重复哈希
+        if self._cache_enabled and isinstance(data, pd.DataFrame):
+            with self._indicator_cache.pinned(data):
+                indicators = self._cached(
+                    'calculate_indicators', data, lambda: self.calculate_indicators(data), {}
+                )
         else:
             indicators = self.calculate_indicators(data)
 
+        return self.run_with_indicators(data, indicators)
+
+    def run_with_indicators(self, data: pd.DataFrame, indicators: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        使用已计算好的指标生成信号，跳过指标计算
+
+        参数优化时，仅信号参数不同的参数组合可以复用同一份指标。
+
+        Args:
+            data: 预处理后的K线数据
+            indicators: 指标字典
+
+        Returns:
+            Dict[str, Any]: 与 run 相同格式的结果
+        """
         self.indicators = indicators
 
         # 生成交易信号 - 支持多头和空头
@@ -516,6 +546,46 @@ class NativeVectorAdapter(StrategyAdapter):
         signals = result['signals']
         indicators = result['indicators']
 
+        price, entries, exits = self._build_engine_inputs(data, signals, price_type)
+
+        # 运行向量化回测
+        init_cash = kwargs.get('cash', kwargs.get('init_cash', 10000.0))
+        fees = kwargs.get('commission', kwargs.get('fees', 0.001))
+        slippage = kwargs.get('slippage', 0.0001)
+        position_size = kwargs.get('position_size', 1.0)
+
+        engine_result = self.engine.run_backtest(
+            price=price,
+            entries=entries,
+            exits=exits,
+            init_cash=init_cash,
+            fees=fees,
+            slippage=slippage,
+            position_size=position_size
+        )
+
+        # 转换结果格式
+        backtest_result = self._convert_result_format(
+            engine_result, data, indicators, signals
+        )
+
+        self.results = backtest_result
+        return backtest_result
+
+    def _build_engine_inputs(self, data: pd.DataFrame,
+                             signals: Dict[str, pd.Series],
+                             price_type: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        从K线数据和策略信号构造引擎输入
+
+        Args:
+            data: K线数据
+            signals: 策略信号字典
+            price_type: 价格类型 ('close' 或 'open')
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (价格, 入场信号, 出场信号)，均为 (时间 × 1)
+        """
         # 获取策略使用的价格列（用于指标计算）
         strategy_price_col = getattr(self.strategy_core, 'params', {}).get('price_col', 'Close')
         
@@ -539,8 +609,14 @@ class NativeVectorAdapter(StrategyAdapter):
         # 记录使用的列名，用于后续计算
         self._price_column = price_column
 
-        # 准备信号
-        has_long_short = 'long_entries' in signals and 'short_entries' in signals
+        # 准备信号：StrategyCore.run 总会填充默认（全False）的多空信号，
+        # 只有策略重写了多空信号方法时才使用多空信号，否则使用 entries/exits
+        strategy_cls = type(self.strategy_core)
+        overrides_long_short = (
+            strategy_cls.generate_long_signals is not StrategyCore.generate_long_signals
+            or strategy_cls.generate_short_signals is not StrategyCore.generate_short_signals
+        )
+        has_long_short = overrides_long_short and 'long_entries' in signals and 'short_entries' in signals
 
         if has_long_short:
             # 合并多头出场信号（包括止盈止损）
@@ -560,7 +636,6 @@ class NativeVectorAdapter(StrategyAdapter):
             # 使用多头信号作为主要信号（简化处理）
             entries = signals['long_entries'].values.astype(np.bool_).reshape(-1, 1)
             exits = long_exits.astype(np.bool_).reshape(-1, 1)
-            size = signals.get('long_sizes', pd.Series([1.0] * len(data))).values
         else:
             # 兼容旧接口
             entries = signals.get('entries', pd.Series([False] * len(data))).values.astype(np.bool_).reshape(-1, 1)
@@ -570,31 +645,8 @@ class NativeVectorAdapter(StrategyAdapter):
             if 'stop_loss' in signals:
                 exits_combined = exits_combined | signals['stop_loss'].values
             exits = exits_combined.astype(np.bool_).reshape(-1, 1)
-            size = signals.get('position_sizes', pd.Series([1.0] * len(data))).values
 
-        # 运行向量化回测
-        init_cash = kwargs.get('cash', kwargs.get('init_cash', 10000.0))
-        fees = kwargs.get('commission', kwargs.get('fees', 0.001))
-        slippage = kwargs.get('slippage', 0.0001)
-        position_size = kwargs.get('position_size', 1.0)
-
-        engine_result = self.engine.run_backtest(
-            price=price,
-            entries=entries,
-            exits=exits,
-            init_cash=init_cash,
-            fees=fees,
-            slippage=slippage,
-            position_size=position_size
-        )
-
-        # 转换结果格式
-        backtest_result = self._convert_result_format(
-            engine_result, data, indicators, signals
-        )
-
-        self.results = backtest_result
-        return backtest_result
+        return price, entries, exits
 
     def _convert_result_format(self, engine_result: Dict[str, Any],
                                data: pd.DataFrame,
@@ -730,7 +782,7 @@ class NativeVectorAdapter(StrategyAdapter):
         计算交易统计
 
         Args:
-            trades: 交易记录
+            trades: TRADE_RECORD_DTYPE 结构化交易记录数组
             data: K线数据
 
         Returns:
@@ -747,23 +799,14 @@ class NativeVectorAdapter(StrategyAdapter):
                 'expectancy': 0
             }
 
-        # 提取盈亏
-        pnls = []
-        for trade in trades:
-            if isinstance(trade, dict):
-                pnls.append(trade.get('pnl', 0))
-
-        if not pnls:
-            pnls = [0]
-
-        pnls = np.array(pnls)
+        pnls = trades['pnl']
         winning_trades = pnls[pnls > 0]
         losing_trades = pnls[pnls < 0]
 
         # 计算统计
-        best_trade = np.max(pnls) if len(pnls) > 0 else 0
-        worst_trade = np.min(pnls) if len(pnls) > 0 else 0
-        avg_trade = np.mean(pnls) if len(pnls) > 0 else 0
+        best_trade = np.max(pnls)
+        worst_trade = np.min(pnls)
+        avg_trade = np.mean(pnls)
 
         # 盈亏因子
         gross_profit = np.sum(winning_trades) if len(winning_trades) > 0 else 0
@@ -771,17 +814,24 @@ class NativeVectorAdapter(StrategyAdapter):
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
 
         # 期望值
-        win_rate = len(winning_trades) / len(pnls) if len(pnls) > 0 else 0
+        win_rate = len(winning_trades) / len(pnls)
         avg_win = np.mean(winning_trades) if len(winning_trades) > 0 else 0
         avg_loss = abs(np.mean(losing_trades)) if len(losing_trades) > 0 else 0
         expectancy = (win_rate * avg_win) - ((1 - win_rate) * avg_loss)
 
+        # 持仓时长：出场与入场K线的时间差
+        if isinstance(data.index, pd.DatetimeIndex):
+            durations = data.index[trades['exit_idx']] - data.index[trades['entry_idx']]
+            max_duration, avg_duration = durations.max(), durations.mean()
+        else:
+            max_duration = avg_duration = pd.Timedelta(0)
+
         return {
             'best_trade': best_trade,
             'worst_trade': worst_trade,
             'avg_trade': avg_trade,
-            'max_duration': pd.Timedelta(hours=24),  # 简化估算
-            'avg_duration': pd.Timedelta(hours=12),  # 简化估算
+            'max_duration': max_duration,
+            'avg_duration': avg_duration,
             'profit_factor': profit_factor,
             'expectancy': expectancy
         }
@@ -791,7 +841,7 @@ class NativeVectorAdapter(StrategyAdapter):
         格式化交易记录为 DataFrame
 
         Args:
-            trades: 交易记录数组
+            trades: TRADE_RECORD_DTYPE 结构化交易记录数组
             data: K线数据
 
         Returns:
@@ -800,26 +850,21 @@ class NativeVectorAdapter(StrategyAdapter):
         if len(trades) == 0:
             return pd.DataFrame()
 
-        formatted_trades = []
-        for i, trade in enumerate(trades):
-            if isinstance(trade, dict):
-                # 使用修复后的字段名
-                entry_price = trade.get('entry_price', trade.get('price', 0))
-                exit_price = trade.get('exit_price', trade.get('price', 0))
-                step = trade.get('step', 0)
-                
-                formatted_trades.append({
-                    'Entry Time': data.index[step] if 'step' in trade and step < len(data) else None,
-                    'Exit Time': data.index[step] if 'step' in trade and step < len(data) else None,
-                    'Entry Price': entry_price,
-                    'Exit Price': exit_price,
-                    'Size': trade.get('size', 0),
-                    'P/L': trade.get('pnl', 0),
-                    'Return %': ((exit_price - entry_price) / entry_price * 100) if entry_price > 0 else 0,
-                    'Direction': trade.get('direction', 'long')
-                })
-
-        return pd.DataFrame(formatted_trades)
+        entry_price = trades['entry_price']
+        exit_price = trades['exit_price']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return_pct = np.where(entry_price > 0, (exit_price - entry_price) / entry_price * 100, 0.0)
+
+        return pd.DataFrame({
+            'Entry Time': data.index[trades['entry_idx']],
+            'Exit Time': data.index[trades['exit_idx']],
+            'Entry Price': entry_price,
+            'Exit Price': exit_price,
+            'Size': trades['size'],
+            'P/L': trades['pnl'],
+            'Return %': return_pct,
+            'Direction': 'long'
+        })
 
 
 class StrategyRunner:
@@ -0,0 +1,18 @@
+# 交易记录类型
+# 向量引擎与 Numba 函数共用的结构化数组定义，不依赖 numba
+
+import numpy as np
+
+# 交易记录结构化数组的字段：资产列、入场/出场时间步、入场/出场价格、
+# 成交数量、双边手续费、净盈亏、出场成交额
+TRADE_RECORD_DTYPE = np.dtype([
+    ('asset', np.int64),
+    ('entry_idx', np.int64),
+    ('exit_idx', np.int64),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('size', np.float64),
+    ('fees', np.float64),
+    ('pnl', np.float64),
+    ('value', np.float64),
+])
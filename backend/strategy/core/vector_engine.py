@@ -2,11 +2,15 @@
 # 用于回测模式的高性能向量化计算
 
 import numpy as np
-from typing import Dict, Any
+from typing import Any, Dict, Union
 from utils.logger import get_logger, LogType
 
+from .trade_records import TRADE_RECORD_DTYPE
+
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
+
+
 class VectorEngine:
     """
     向量引擎
@@ -32,6 +36,9 @@ class VectorEngine:
         try:
             from .numba_functions import (
                 simulate_orders,
+                simulate_orders_multi,
+                simulate_portfolio,
+                extract_trades,
                 signals_to_orders,
                 calculate_metrics,
                 calculate_funding_rate,
@@ -43,6 +50,9 @@ class VectorEngine:
             )
             
             self.simulate_orders = simulate_orders
+            self.simulate_orders_multi = simulate_orders_multi
+            self.simulate_portfolio = simulate_portfolio
+            self.extract_trades = extract_trades
             self.signals_to_orders = signals_to_orders
             self.calculate_metrics = calculate_metrics
             self.calculate_funding_rate = calculate_funding_rate
@@ -55,6 +65,9 @@ class VectorEngine:
         except ImportError as e:
             # 如果 Numba 未安装，使用 Python 实现
             self.simulate_orders = self._simulate_orders_python
+            self.simulate_orders_multi = self._simulate_orders_multi_python
+            self.simulate_portfolio = self._simulate_portfolio_python
+            self.extract_trades = self._extract_trades_python
             self.signals_to_orders = self._signals_to_orders_python
             self.calculate_metrics = self._calculate_metrics_python
             self.calculate_funding_rate = self._calculate_funding_rate_python
@@ -69,58 +82,60 @@ class VectorEngine:
                    entries: np.ndarray,
                    exits: np.ndarray,
                    init_cash: float = 100000.0,
-                   fees: float = 0.001,
-                   slippage: float = 0.0001,
-                   position_size: float = 1.0) -> Dict[str, Any]:
+                   fees: Union[float, np.ndarray] = 0.001,
+                   slippage: Union[float, np.ndarray] = 0.0001,
+                   position_size: Union[float, np.ndarray] = 1.0) -> Dict[str, Any]:
         """
         运行向量回测
 
+        多个资产列在一次调用中共享同一个现金池，每个资产独立维护持仓和平均成本。
+
         参数：
         - price: 价格数组 (时间 × 资产)
         - entries: 入场信号数组
         - exits: 出场信号数组
         - init_cash: 初始资金
-        - fees: 手续费率
-        - slippage: 滑点
-        - position_size: 仓位大小（默认1.0）
+        - fees: 手续费率，标量或每个资产一个值
+        - slippage: 滑点，标量或每个资产一个值
+        - position_size: 仓位大小（默认1.0），标量或每个资产一个值
 
         返回：
         - dict: 回测结果
         """
-        # 从信号生成订单
+        price = np.ascontiguousarray(price, dtype=np.float64)
+        if price.ndim == 1:
+            price = price.reshape(-1, 1)
+        n_assets = price.shape[1]
+
+        fees_arr = self._per_asset(fees, n_assets)
+        slippage_arr = self._per_asset(slippage, n_assets)
+        size_vec = self._per_asset(position_size, n_assets)
+
+        # 从信号生成订单，按资产缩放仓位大小
         size_arr, direction_arr = self.signals_to_orders(
-            entries=entries,
-            exits=exits,
-            size=position_size
+            entries=np.asarray(entries, dtype=np.bool_).reshape(price.shape),
+            exits=np.asarray(exits, dtype=np.bool_).reshape(price.shape),
+            size=1.0
         )
-        
-        # 运行订单模拟
-        cash, positions = self.simulate_orders(
-            price=price,
-            size=size_arr,
-            direction=direction_arr,
-            fees=fees,
-            slippage=slippage,
-            init_cash=init_cash
+        size_arr = size_arr * size_vec
+        
+        # 运行多资产订单模拟
+        cash, positions, avg_cost = self.simulate_orders_multi(
+            price,
+            size_arr,
+            fees_arr,
+            slippage_arr,
+            float(init_cash)
         )
         
         # 计算交易记录
-        trades = self._calculate_trades(price, positions, fees)
+        trades = self._calculate_trades(price, positions, fees_arr)
         
         # 计算绩效指标
-        if len(trades) > 0:
-            trades_pnl = np.array([t['pnl'] for t in trades], dtype=np.float64)
-            trades_fees = np.array([t['fees'] for t in trades], dtype=np.float64)
-            trades_value = np.array([t['value'] for t in trades], dtype=np.float64)
-        else:
-            trades_pnl = np.array([])
-            trades_fees = np.array([])
-            trades_value = np.array([])
-        
         metrics_arr = self.calculate_metrics(
-            trades_pnl=trades_pnl,
-            trades_fees=trades_fees,
-            trades_value=trades_value,
+            trades_pnl=trades['pnl'],
+            trades_fees=trades['fees'],
+            trades_value=trades['value'],
             cash=cash
         )
         
@@ -136,91 +151,91 @@ class VectorEngine:
         return {
             'cash': cash,
             'positions': positions,
+            'avg_cost': avg_cost,
             'orders': [],
             'trades': trades,
             'metrics': metrics
         }
+
+    @staticmethod
+    def _per_asset(value: Union[float, np.ndarray], n_assets: int) -> np.ndarray:
+        """
+        将标量或每资产参数广播为长度为资产数的float64数组
+        """
+        arr = np.asarray(value, dtype=np.float64)
+        if arr.ndim == 0:
+            return np.full(n_assets, float(arr), dtype=np.float64)
+        if arr.shape != (n_assets,):
+            raise ValueError(f"参数长度 {arr.shape} 与资产数 {n_assets} 不一致")
+        return np.ascontiguousarray(arr)
     
     def _calculate_trades(self, price: np.ndarray,
                          positions: np.ndarray,
-                         fees: float) -> np.ndarray:
+                         fees: Union[float, np.ndarray]) -> np.ndarray:
         """
-        计算交易记录 - 修复版
-        
-        正确统计完整交易（买入+卖出算一笔完整交易）
-        并计算真实的盈亏（买入价 vs 卖出价）
-        
+        计算交易记录
+
+        按 FIFO 将卖出与最早的入场批次配对，一笔完整交易（买入+卖出）一条记录，
+        盈亏为 (卖出价 - 买入价) * 数量 - 双边手续费
+
         参数：
         - price: 价格数组
         - positions: 持仓数组
-        - fees: 手续费率
-        
+        - fees: 手续费率，标量或每个资产一个值
+
         返回：
-        - np.ndarray: 交易记录数组
+        - np.ndarray: TRADE_RECORD_DTYPE 结构化交易记录数组
         """
-        n_steps = price.shape[0]
-        n_assets = price.shape[1]
-        
+        return self.extract_trades(
+            np.ascontiguousarray(price, dtype=np.float64),
+            np.ascontiguousarray(positions, dtype=np.float64),
+            self._per_asset(fees, price.shape[1])
+        )
+
+    def _extract_trades_python(self, price: np.ndarray,
+                               positions: np.ndarray,
+                               fees: np.ndarray) -> np.ndarray:
+        """
+        Python 版本的交易记录提取（备用），逻辑与 extract_trades 一致
+        """
+        from collections import deque
+
+        # 追踪每个资产的入场批次 - [entry_idx, entry_price, entry_size]
+        entry_records = [deque() for _ in range(positions.shape[1])]
         trades_list = []
-        
-        # 追踪每个资产的入场信息 - 使用资产索引作为key
-        entry_records = {}  # asset -> [(entry_price, entry_size), ...]
-        
-        for i in range(1, n_steps):
-            for j in range(n_assets):
-                prev_pos = positions[i-1, j]
-                curr_pos = positions[i, j]
-                
-                if curr_pos != prev_pos:
-                    # 持仓发生变化
-                    trade_size = curr_pos - prev_pos  # 正数=买入，负数=卖出
-                    trade_price = price[i, j]
-                    
-                    if trade_size > 0:
-                        # 买入 - 记录入场价格和数量
-                        if j not in entry_records:
-                            entry_records[j] = []
-                        entry_records[j].append((trade_price, trade_size))
-                        
-                    elif trade_size < 0:
-                        # 卖出 - 计算盈亏
-                        sell_size = abs(trade_size)
-                        
-                        if j in entry_records and entry_records[j]:
-                            # 获取最早的入场记录（FIFO）
-                            entry_price, entry_size = entry_records[j].pop(0)
-                            
-                            # 计算实际卖出数量
-                            actual_sell_size = min(sell_size, entry_size)
-                            
-                            # 计算交易价值和费用
-                            trade_value = actual_sell_size * trade_price
-                            trade_fees = trade_value * fees
-                            entry_fees = actual_sell_size * entry_price * fees
-                            total_fees = trade_fees + entry_fees
-                            
-                            # 计算真实盈亏: (卖出价 - 买入价) * 数量 - 总费用
-                            pnl = (trade_price - entry_price) * actual_sell_size - total_fees
-                            
-                            trades_list.append({
-                                'step': i,
-                                'asset': j,
-                                'direction': 'long',
-                                'size': actual_sell_size,
-                                'entry_price': entry_price,
-                                'exit_price': trade_price,
-                                'value': trade_value,
-                                'fees': total_fees,
-                                'pnl': pnl
-                            })
-                            
-                            # 如果还有剩余持仓，保留记录
-                            if entry_size > actual_sell_size:
-                                remaining = entry_size - actual_sell_size
-                                entry_records[j].insert(0, (entry_price, remaining))
-        
-        return np.array(trades_list, dtype=object)
-    
+
+        # 只遍历持仓发生变化的 (时间, 资产)，按时间再按资产的顺序；
+        # 初始持仓为0，第一个时间步的买入同样计入
+        prev_positions = np.vstack([np.zeros((1, positions.shape[1])), positions[:-1]])
+        for i, j in np.argwhere(positions != prev_positions).tolist():
+            trade_size = positions[i, j] - prev_positions[i, j]  # 正数=买入，负数=卖出
+            trade_price = price[i, j]
+
+            if trade_size > 0:
+                entry_records[j].append([i, trade_price, trade_size])
+                continue
+
+            remaining = -trade_size
+            lots = entry_records[j]
+            while remaining > 0 and lots:
+                lot = lots[0]
+                entry_idx, entry_price, entry_size = lot
+                matched = min(remaining, entry_size)
+
+                exit_value = matched * trade_price
+                total_fees = (exit_value + matched * entry_price) * fees[j]
+                pnl = (trade_price - entry_price) * matched - total_fees
+                trades_list.append((
+                    j, entry_idx, i, entry_price, trade_price, matched, total_fees, pnl, exit_value
+                ))
+
+                remaining -= matched
+                lot[2] -= matched
+                if lot[2] <= 0:
+                    lots.popleft()
+
+        return np.array(trades_list, dtype=TRADE_RECORD_DTYPE)
+
     def _signals_to_orders_python(self, entries: np.ndarray,
                                  exits: np.ndarray,
                                  size: float = 1.0) -> tuple:
@@ -256,69 +271,139 @@ class VectorEngine:
         """
         Python 版本的订单模拟（备用）
         
-        修复问题：
-        1. 现金应该是单一值，不是每个资产都有独立现金
-        2. 持仓需要正确传递
-        3. 卖出时应该释放资金
+        所有资产使用相同手续费率和滑点，每个资产独立维护持仓，共享单一现金池
+        """
+        n_assets = price.shape[1]
+        cash_history, positions_history, _ = self._simulate_orders_multi_python(
+            price,
+            size,
+            np.full(n_assets, fees, dtype=np.float64),
+            np.full(n_assets, slippage, dtype=np.float64),
+            init_cash
+        )
+        return cash_history, positions_history
+    
+    def _simulate_orders_multi_python(self, price: np.ndarray,
+                                      size: np.ndarray,
+                                      fees: np.ndarray,
+                                      slippage: np.ndarray,
+                                      init_cash: float) -> tuple:
+        """
+        Python 版本的多资产订单模拟（备用），逻辑与 simulate_orders_multi 一致
         """
         n_steps, n_assets = price.shape
         
-        # 初始化状态 - 单一现金池
+        # 单一现金池，每个资产独立的持仓和平均成本
         cash = init_cash
-        current_position = 0.0  # 当前持仓量
+        position = np.zeros(n_assets, dtype=np.float64)
+        avg_cost = np.zeros(n_assets, dtype=np.float64)
         
-        # 记录每个时间步的现金和持仓
+        # 记录每个时间步的现金、持仓和平均成本
         cash_history = np.zeros(n_steps, dtype=np.float64)
         positions_history = np.zeros((n_steps, n_assets), dtype=np.float64)
+        avg_cost_history = np.zeros((n_steps, n_assets), dtype=np.float64)
         
-        # 遍历每个时间步
         for i in range(n_steps):
             for j in range(n_assets):
-                # 获取当前价格
                 current_price = price[i, j]
+                order_size = size[i, j]
                 
-                # 检查是否有订单（size > 0 表示买入，size < 0 表示卖出）
-                if size[i, j] > 0:  # 买入信号
-                    # 避免重复买入：如果已经有持仓，不再买入
-                    if current_position <= 0:
-                        exec_price = current_price * (1 + slippage)
-                        trade_value = size[i, j] * exec_price
-                        trade_fees = trade_value * fees
-                        total_cost = trade_value + trade_fees
-                        
-                        # 检查是否有足够资金
-                        if cash >= total_cost:
-                            cash -= total_cost
-                            current_position += size[i, j]
-                            logger.debug(f"买入: 价格={exec_price:.2f}, 数量={size[i, j]}, 成本={total_cost:.2f}, 剩余现金={cash:.2f}")
-                        else:
-                            logger.warning(f"资金不足，无法买入: 需要={total_cost:.2f}, 可用={cash:.2f}")
-                
-                elif size[i, j] < 0:  # 卖出信号
-                    # 避免重复卖出：如果没有持仓，不再卖出
-                    if current_position > 0:
-                        exec_price = current_price * (1 - slippage)
-                        sell_size = min(abs(size[i, j]), current_position)  # 卖出数量不能超过持仓
-                        
-                        if sell_size > 0:
-                            trade_value = sell_size * exec_price
-                            trade_fees = trade_value * fees
-                            net_proceeds = trade_value - trade_fees
+                if order_size != 0 and current_price > 0:
+                    if order_size > 0:  # 买入信号
+                        # 避免重复买入：该资产已有持仓时不再买入
+                        if position[j] <= 0:
+                            exec_price = current_price * (1 + slippage[j])
+                            trade_value = order_size * exec_price
+                            total_cost = trade_value + trade_value * fees[j]
                             
-                            cash += net_proceeds
-                            current_position -= sell_size
-                            logger.debug(f"卖出: 价格={exec_price:.2f}, 数量={sell_size}, 收入={net_proceeds:.2f}, 剩余现金={cash:.2f}")
-                        else:
-                            logger.warning(f"持仓不足，无法卖出: 需要={sell_size}, 可用={current_position}")
+                            # 检查是否有足够资金
+                            if cash >= total_cost:
+                                cash -= total_cost
+                                avg_cost[j] = exec_price
+                                position[j] = order_size
+                                logger.debug(f"买入: 资产={j}, 价格={exec_price:.2f}, 数量={order_size}, 成本={total_cost:.2f}, 剩余现金={cash:.2f}")
+                            else:
+                                logger.warning(f"资金不足，无法买入: 资产={j}, 需要={total_cost:.2f}, 可用={cash:.2f}")
+                    elif position[j] > 0:  # 卖出信号，且该资产有持仓
+                        exec_price = current_price * (1 - slippage[j])
+                        sell_size = min(-order_size, position[j])  # 卖出数量不能超过持仓
+                        trade_value = sell_size * exec_price
+                        
+                        cash += trade_value - trade_value * fees[j]
+                        position[j] -= sell_size
+                        if position[j] <= 0:
+                            position[j] = 0.0
+                            avg_cost[j] = 0.0
+                        logger.debug(f"卖出: 资产={j}, 价格={exec_price:.2f}, 数量={sell_size}, 剩余现金={cash:.2f}")
                 
-                # 记录当前持仓
-                positions_history[i, j] = current_position
+                positions_history[i, j] = position[j]
+                avg_cost_history[i, j] = avg_cost[j]
             
-            # 记录当前现金
             cash_history[i] = cash
         
-        return cash_history, positions_history
+        return cash_history, positions_history, avg_cost_history
     
+    def _simulate_portfolio_python(self, close: np.ndarray,
+                                   valid: np.ndarray,
+                                   entries: np.ndarray,
+                                   exits: np.ndarray,
+                                   init_cash: float,
+                                   fees: float,
+                                   position_size_pct: float) -> tuple:
+        """
+        Python 版本的共享资金池组合模拟（备用），逻辑与 simulate_portfolio 一致
+        """
+        n_steps, n_assets = close.shape
+
+        cash = init_cash
+        position = np.zeros(n_assets, dtype=np.float64)
+        entry_price = np.zeros(n_assets, dtype=np.float64)
+        entry_idx = np.zeros(n_assets, dtype=np.int64)
+        mark = np.zeros(n_assets, dtype=np.float64)
+
+        equity_history = np.zeros(n_steps, dtype=np.float64)
+        cash_history = np.zeros(n_steps, dtype=np.float64)
+        trades_list = []
+
+        def close_position(j, exit_idx, price):
+            size = position[j]
+            value = size * price
+            total_fees = (value + size * entry_price[j]) * fees
+            pnl = (price - entry_price[j]) * size - total_fees
+            trades_list.append((
+                j, entry_idx[j], exit_idx, entry_price[j], price, size, total_fees, pnl, value
+            ))
+            position[j] = 0.0
+            return value * (1 - fees)
+
+        for i in range(n_steps):
+            mark = np.where(valid[i], close[i], mark)
+            equity_history[i] = cash + float(np.dot(position, mark))
+            cash_history[i] = cash
+
+            for j in np.flatnonzero(valid[i] & (entries[i] | exits[i])):
+                price = close[i, j]
+                if entries[i, j] and position[j] == 0:
+                    trade_cash = min(cash * position_size_pct, cash * 0.95)
+                    if trade_cash > 0:
+                        size = trade_cash / price
+                        cost = size * price * (1 + fees)
+                        if cash >= cost:
+                            cash -= cost
+                            position[j] = size
+                            entry_price[j] = price
+                            entry_idx[j] = i
+                elif exits[i, j] and position[j] > 0:
+                    cash += close_position(j, i, price)
+
+        # 回测结束，按最近有效价格强制平仓
+        n_closed = len(trades_list)
+        for j in range(n_assets):
+            if position[j] > 0 and mark[j] > 0:
+                cash += close_position(j, n_steps - 1, mark[j])
+
+        return equity_history, cash_history, np.array(trades_list, dtype=TRADE_RECORD_DTYPE), n_closed
+
     def _calculate_metrics_python(self, trades_pnl: np.ndarray,
                                trades_fees: np.ndarray,
                                trades_value: np.ndarray,
@@ -6,12 +6,16 @@
 - 延迟测试
 - 内存使用测试
 - 并发性能测试
+- 批量回测内核测试
+- IPC消息编解码测试
 """
 
 from .base import BenchmarkBase, BenchmarkResult
 from .engine_benchmark import EngineBenchmark
 from .throughput_test import ThroughputTest
 from .latency_test import LatencyTest
+from .batch_backtest_benchmark import BatchBacktestBenchmark
+from .ipc_codec_benchmark import IpcCodecBenchmark
 
 __all__ = [
     "BenchmarkBase",
@@ -19,4 +23,6 @@ __all__ = [
     "EngineBenchmark",
     "ThroughputTest",
     "LatencyTest",
+    "BatchBacktestBenchmark",
+    "IpcCodecBenchmark",
 ]
@@ -0,0 +1,153 @@
+"""
+批量回测基准测试
+
+对比 Numba 批量回测内核与逐次回测循环在参数扫描场景下的性能。
+"""
+
+import time
+import numpy as np
+from typing import Dict, Any
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+from .base import BenchmarkBase, BenchmarkResult
+from strategy.core.numba_backtest import (
+    batch_backtest,
+    calculate_drawdown_numba,
+    calculate_returns_numba,
+    calculate_sharpe_numba,
+    simulate_trades_numba,
+)
+
+
+class BatchBacktestBenchmark(BenchmarkBase):
+    """
+    批量回测基准测试
+
+    对比以下两种方式计算 (参数组 × 交易对) 回测指标的耗时：
+    1. 逐次回测循环 (simulate_trades_numba + 回撤/夏普计算)
+    2. 批量并行内核 (batch_backtest_numba)
+    """
+
+    def __init__(
+        self,
+        num_params: int = 100,
+        num_symbols: int = 20,
+        num_bars: int = 5000,
+        seed: int = 42,
+    ):
+        super().__init__("BatchBacktestBenchmark")
+        self.num_params = num_params
+        self.num_symbols = num_symbols
+        self.num_bars = num_bars
+        self.seed = seed
+        self.results: Dict[str, BenchmarkResult] = {}
+
+    def _generate_data(self):
+        """生成随机游走价格和随机信号"""
+        rng = np.random.default_rng(self.seed)
+        returns = rng.normal(0, 0.01, (self.num_symbols, self.num_bars))
+        prices = 100 * np.exp(np.cumsum(returns, axis=1))
+        signals = rng.choice(
+            np.array([-1, 0, 0, 0, 1], dtype=np.int8),
+            size=(self.num_params, self.num_symbols, self.num_bars),
+        )
+        return prices, signals
+
+    def _make_result(self, name: str, duration_ms: float) -> BenchmarkResult:
+        """按回测次数构造测试结果"""
+        runs = self.num_params * self.num_symbols
+        return BenchmarkResult(
+            name=name,
+            duration_ms=duration_ms,
+            iterations=runs,
+            throughput=runs / (duration_ms / 1000) if duration_ms > 0 else 0,
+            avg_latency_ms=duration_ms / runs,
+            min_latency_ms=0,
+            max_latency_ms=0,
+            memory_mb=0,
+            cpu_percent=0,
+            metadata={"bars": self.num_bars},
+        )
+
+    def _benchmark_loop(self, prices: np.ndarray, signals: np.ndarray) -> BenchmarkResult:
+        """测试逐次回测循环"""
+        logger.info("测试逐次回测循环...")
+
+        start_time = time.perf_counter()
+        for p in range(self.num_params):
+            for s in range(self.num_symbols):
+                equity, _, _, _, _ = simulate_trades_numba(prices[s], signals[p, s], 10000.0, 0.001, 0.0)
+                calculate_drawdown_numba(equity)
+                calculate_sharpe_numba(calculate_returns_numba(equity))
+        duration_ms = (time.perf_counter() - start_time) * 1000
+
+        return self._make_result("PerRunLoop", duration_ms)
+
+    def _benchmark_batch(self, prices: np.ndarray, signals: np.ndarray) -> BenchmarkResult:
+        """测试批量并行内核"""
+        logger.info("测试批量并行内核...")
+
+        start_time = time.perf_counter()
+        batch_backtest(prices, signals, 10000.0, 0.001, 0.0)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+
+        return self._make_result("BatchKernel", duration_ms)
+
+    def execute(self) -> Dict[str, BenchmarkResult]:
+        """
+        执行批量回测基准测试
+
+        Returns:
+            Dict[str, BenchmarkResult]: 两种方式的测试结果
+        """
+        logger.info(
+            f"开始批量回测基准测试: {self.num_params} 组参数 × "
+            f"{self.num_symbols} 个交易对 × {self.num_bars} 根K线"
+        )
+        prices, signals = self._generate_data()
+
+        # 预热，排除JIT编译时间
+        small = signals[:1, :1, :100]
+        batch_backtest(prices[:1, :100], small)
+        simulate_trades_numba(prices[0, :100], small[0, 0], 10000.0, 0.001, 0.0)
+
+        self.results["loop"] = self._benchmark_loop(prices, signals)
+        self.results["batch"] = self._benchmark_batch(prices, signals)
+
+        self._print_results()
+        return self.results
+
+    def _print_results(self):
+        """打印测试结果"""
+        logger.info("\n" + "=" * 60)
+        logger.info("批量回测基准测试结果")
+        logger.info("=" * 60)
+
+        for name, result in self.results.items():
+            logger.info(
+                f"{name}: {result.duration_ms:.1f}ms, "
+                f"{result.throughput:,.0f} runs/s"
+            )
+
+        speedup = self.get_speedup()
+        if speedup:
+            logger.info(f"加速比: {speedup:.1f}x")
+        logger.info("=" * 60)
+
+    def get_speedup(self) -> float:
+        """批量内核相对逐次循环的加速比"""
+        loop = self.results.get("loop")
+        batch = self.results.get("batch")
+        if not loop or not batch or batch.duration_ms <= 0:
+            return 0.0
+        return loop.duration_ms / batch.duration_ms
+
+    def get_summary(self) -> Dict[str, Any]:
+        """获取测试摘要"""
+        return {
+            "name": self.name,
+            "speedup": self.get_speedup(),
+            "results": {name: r.to_dict() for name, r in self.results.items()},
+        }
@@ -0,0 +1,124 @@
+"""
+IPC 消息编解码基准测试
+
+对比 JSON 编码与二进制编码在K线市场数据消息上的编码+解码吞吐量和消息大小。
+"""
+
+import time
+from typing import Dict, Any, List
+from utils.logger import get_logger, LogType
+
+# 获取模块日志器
+logger = get_logger(__name__, LogType.APPLICATION)
+from .base import BenchmarkBase, BenchmarkResult
+from worker.ipc.protocol import Message, get_codec
+
+
+class IpcCodecBenchmark(BenchmarkBase):
+    """
+    IPC 消息编解码基准测试
+
+    每条消息模拟主进程发布一根K线：编码一次，Worker 端解码一次
+    """
+
+    def __init__(self, num_messages: int = 100000, num_symbols: int = 100):
+        super().__init__("IpcCodecBenchmark")
+        self.num_messages = num_messages
+        self.num_symbols = num_symbols
+        self.results: Dict[str, BenchmarkResult] = {}
+
+    def _generate_messages(self) -> List[Message]:
+        """生成K线市场数据消息"""
+        messages = []
+        for i in range(self.num_messages):
+            price = 100.0 + (i % 500) * 0.01
+            messages.append(Message.create_market_data(
+                f"SYM{i % self.num_symbols}USDT",
+                "kline",
+                {
+                    "timestamp": 1700000000000 + i * 60000,
+                    "open": price,
+                    "high": price + 0.5,
+                    "low": price - 0.5,
+                    "close": price + 0.1,
+                    "volume": 10.0 + i % 7,
+                },
+                "binance",
+            ))
+        return messages
+
+    def _benchmark_codec(self, codec_name: str, messages: List[Message]) -> BenchmarkResult:
+        """测试单个编码的编码+解码耗时"""
+        logger.info(f"测试 {codec_name} 编码...")
+        codec = get_codec(codec_name)
+
+        total_bytes = 0
+        start_time = time.perf_counter()
+        for message in messages:
+            data = codec.encode(message)
+            codec.decode(data)
+            total_bytes += len(data)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+
+        count = len(messages)
+        return BenchmarkResult(
+            name=codec_name,
+            duration_ms=duration_ms,
+            iterations=count,
+            throughput=count / (duration_ms / 1000) if duration_ms > 0 else 0,
+            avg_latency_ms=duration_ms / count,
+            min_latency_ms=0,
+            max_latency_ms=0,
+            memory_mb=0,
+            cpu_percent=0,
+            metadata={"avg_bytes": total_bytes / count},
+        )
+
+    def execute(self) -> Dict[str, BenchmarkResult]:
+        """
+        执行编解码基准测试
+
+        Returns:
+            Dict[str, BenchmarkResult]: 各编码的测试结果
+        """
+        logger.info(f"开始IPC编解码基准测试: {self.num_messages} 条K线消息")
+        messages = self._generate_messages()
+
+        for codec_name in ("json", "binary"):
+            self.results[codec_name] = self._benchmark_codec(codec_name, messages)
+
+        self._print_results()
+        return self.results
+
+    def _print_results(self):
+        """打印测试结果"""
+        logger.info("\n" + "=" * 60)
+        logger.info("IPC编解码基准测试结果")
+        logger.info("=" * 60)
+
+        for name, result in self.results.items():
+            logger.info(
+                f"{name}: {result.throughput:,.0f} msg/s, "
+                f"{result.metadata['avg_bytes']:.0f} 字节/条"
+            )
+
+        speedup = self.get_speedup()
+        if speedup:
+            logger.info(f"加速比: {speedup:.1f}x")
+        logger.info("=" * 60)
+
+    def get_speedup(self) -> float:
+        """二进制编码相对 JSON 编码的加速比"""
+        json_result = self.results.get("json")
+        binary_result = self.results.get("binary")
+        if not json_result or not binary_result or binary_result.duration_ms <= 0:
+            return 0.0
+        return json_result.duration_ms / binary_result.duration_ms
+
+    def get_summary(self) -> Dict[str, Any]:
+        """获取测试摘要"""
+        return {
+            "name": self.name,
+            "speedup": self.get_speedup(),
+            "results": {name: r.to_dict() for name, r in self.results.items()},
+        }
@@ -206,30 +206,63 @@ class BacktestExecutionEngine(ExecutionEngine):
         """
         logger.info(f"回测执行引擎清理完成，执行ID: {self.execution_id}")
     
-    def optimize_parameters(self, param_ranges: Dict[str, List[Any]], optimization_metric: str = "sharpe_ratio") -> Dict[str, Any]:
+    def optimize_parameters(self, param_ranges: Dict[str, List[Any]], optimization_metric: str = "sharpe_ratio",
+                            method: str = "grid", n_jobs: Optional[int] = None, n_iter: int = 100,
+                            patience: Optional[int] = None, progress: Optional[Any] = None) -> Dict[str, Any]:
         """
         优化策略参数
         
-        :param param_ranges: 参数范围，格式为 {"param_name": [min, max, step]}
+        参数组合在进程池中并行评估，回测数据通过共享内存在工作进程间共享。
+        策略须为 StrategyCore 子类的实例，其当前参数作为固定参数。
+        
+        :param param_ranges: 参数范围，格式为 {"param_name": [min, max, step]} 或 {"param_name": [候选值, ...]}
         :param optimization_metric: 优化指标，如 sharpe_ratio, total_return 等
+        :param method: 搜索方法，grid / random / halving
+        :param n_jobs: 工作进程数，None 为CPU核数
+        :param n_iter: 随机搜索的采样数量
+        :param patience: 连续多少个参数组合没有改进时提前停止
+        :param progress: 进度追踪器，需提供 increment(n, message) 方法
         :return: 最优参数组合
         """
+        from .core.optimizer import ParameterOptimizer, StrategyCoreEvaluator, expand_ranges
+        from .core.strategy_core import StrategyCore
+        
+        if self.backtest_data is None:
+            raise ValueError("回测数据未设置")
+        if not isinstance(self.strategy, StrategyCore):
+            raise ValueError("参数优化需要向量化策略（StrategyCore 子类实例）")
+        
         logger.info(f"开始参数优化，执行ID: {self.execution_id}")
         
-        # TODO: 实现参数优化逻辑
-        # 支持网格搜索、遗传算法等优化方法
+        evaluator = StrategyCoreEvaluator(
+            type(self.strategy),
+            base_params=self.strategy.params,
+            init_cash=self.initial_capital,
+            fees=self.commission,
+            slippage=self.slippage
+        )
+        optimizer = ParameterOptimizer(
+            evaluator,
+            {"backtest": self.backtest_data},
+            metric=optimization_metric,
+            maximize=optimization_metric != "max_drawdown",
+            n_jobs=n_jobs,
+            progress=progress
+        )
         
-        # 模拟优化结果
-        best_params = {}
-        best_score = -float("inf")
+        grid = expand_ranges(param_ranges)
+        if method == "grid":
+            result = optimizer.grid_search(grid, patience=patience)
+        elif method == "random":
+            result = optimizer.random_search(grid, n_iter=n_iter, patience=patience)
+        elif method == "halving":
+            result = optimizer.successive_halving(grid)
+        else:
+            raise ValueError(f"不支持的优化方法: {method}")
         
         logger.info(f"参数优化完成，执行ID: {self.execution_id}")
         
-        return {
-            "best_params": best_params,
-            "best_score": best_score,
-            "optimization_metric": optimization_metric
-        }
+        return result
 
 
 class LiveExecutionEngine(ExecutionEngine):
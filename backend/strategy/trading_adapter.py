@@ -19,8 +19,9 @@ import inspect
 import sys
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 # 使用项目日志系统
 from utils.logger import get_logger, LogType
@@ -73,6 +74,7 @@ from strategy.core.data_types import (
 )
 from strategy.core.strategy import StrategyConfig as QCStrategyConfig
 from strategy.core.strategy import StrategyBase as QCStrategyBase
+from strategy.core.memory_pool import ObjectPool
 
 
 # =============================================================================
@@ -119,6 +121,10 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
     ticks_processed : int
         已处理的 Tick 数量
 
+    启用对象池（use_object_pool=True）时，传给策略的 K 线和 Tick 在 on_bar/on_tick
+    返回后归还对象池复用，策略需要保留数据时应自行拷贝所需字段；
+    pool_debug=True 时访问已归还的 K 线会抛出 UseAfterReleaseError。
+
     Examples
     --------
     >>> from strategy.core.strategy import StrategyConfig
@@ -134,6 +140,8 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
         self,
         qc_strategy: QCStrategyBase,
         config: Any,
+        use_object_pool: bool = False,
+        pool_debug: bool = False,
     ) -> None:
         """
         初始化适配器
@@ -144,6 +152,10 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
             QuantCell 策略实例
         config : StrategyConfig
             实盘交易框架策略配置
+        use_object_pool : bool
+            是否从对象池复用传给策略的 K 线和 Tick
+        pool_debug : bool
+            对象池调试模式，检测归还后的访问和重复归还
 
         Raises
         ------
@@ -171,6 +183,17 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
         self._ticks_processed = 0
         self._start_time: Optional[datetime] = None
 
+        # K 线/Tick 对象池，对象在策略处理函数返回后归还
+        self._bar_pool: Optional[ObjectPool] = None
+        self._tick_pool: Optional[ObjectPool] = None
+        if use_object_pool:
+            self._bar_pool = ObjectPool(
+                factory=_new_pooled_bar, initial_size=1, max_size=64, debug=pool_debug
+            )
+            self._tick_pool = ObjectPool(
+                factory=dict, reset_func=dict.clear, initial_size=1, max_size=64, debug=pool_debug
+            )
+
         logger.info(
             f"实盘交易策略适配器已初始化: "
             f"策略类={type(qc_strategy).__name__}"
@@ -264,25 +287,29 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
         if self._is_paused:
             return
 
+        pooled = self._bar_pool.acquire() if self._bar_pool is not None else None
         try:
             # 转换数据格式
-            qc_bar = convert_bar_to_qc(bar)
+            qc_bar = convert_bar_to_qc(bar, pooled)
 
             # 更新统计
             self._bars_processed += 1
 
-            # 调用 QuantCell 策略的 on_bar
-            self.qc_strategy.on_bar(qc_bar)
-
             logger.debug(
                 f"处理 K 线: {qc_bar.instrument_id}, "
                 f"时间={qc_bar.timestamp.isoformat()}, "
                 f"收盘价={qc_bar.close}"
             )
 
+            # 调用 QuantCell 策略的 on_bar
+            self.qc_strategy.on_bar(qc_bar)
+
         except Exception as e:
             logger.error(f"处理 K 线数据失败: {e}")
             raise DataConversionError(f"K 线数据处理失败: {e}") from e
+        finally:
+            if pooled is not None:
+                self._bar_pool.release(pooled)
 
     def on_tick(self, tick: Any) -> None:
         """
@@ -304,25 +331,29 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
         if self._is_paused:
             return
 
+        pooled = self._tick_pool.acquire() if self._tick_pool is not None else None
         try:
             # 转换数据格式
-            qc_tick = convert_tick_to_qc(tick)
+            qc_tick = convert_tick_to_qc(tick, pooled)
 
             # 更新统计
             self._ticks_processed += 1
 
-            # 调用 QuantCell 策略的 on_tick（如果存在）
-            if hasattr(self.qc_strategy, 'on_tick'):
-                self.qc_strategy.on_tick(qc_tick)
-
             logger.debug(
                 f"处理 Tick: {qc_tick['instrument_id']}, "
                 f"时间={qc_tick['timestamp']}"
             )
 
+            # 调用 QuantCell 策略的 on_tick（如果存在）
+            if hasattr(self.qc_strategy, 'on_tick'):
+                self.qc_strategy.on_tick(qc_tick)
+
         except Exception as e:
             logger.error(f"处理 Tick 数据失败: {e}")
             raise DataConversionError(f"Tick 数据处理失败: {e}") from e
+        finally:
+            if pooled is not None:
+                self._tick_pool.release(pooled)
 
     def pause(self) -> None:
         """
@@ -429,7 +460,38 @@ class TradingStrategyAdapter(Strategy if NAUTILUS_AVAILABLE else object):
 # 数据转换函数
 # =============================================================================
 
-def convert_bar_to_qc(bar: Any) -> QCBar:
+def _new_pooled_bar() -> QCBar:
+    """对象池使用的空白 K 线"""
+    return QCBar(
+        instrument_id=None,
+        bar_type="",
+        open=0.0,
+        high=0.0,
+        low=0.0,
+        close=0.0,
+        volume=0.0,
+        timestamp=None,
+    )
+
+
+@lru_cache(maxsize=4096)
+def _qc_instrument_id(symbol: str, venue: str) -> QCInstrumentId:
+    """按品种代码和交易所复用 InstrumentId（不可变对象）"""
+    return QCInstrumentId(symbol=symbol, venue=venue)
+
+
+@lru_cache(maxsize=4096)
+def _nautilus_bar_type_info(bar_type: Any) -> Tuple[QCInstrumentId, str]:
+    """按 Nautilus BarType 复用品种标识和 K 线类型字符串"""
+    nautilus_instrument_id = bar_type.instrument_id
+    bar_spec = bar_type.spec
+    return (
+        _qc_instrument_id(str(nautilus_instrument_id.symbol), str(nautilus_instrument_id.venue)),
+        f"{bar_spec.step}-{bar_spec.aggregation.name}",
+    )
+
+
+def convert_bar_to_qc(bar: Any, out: Optional[QCBar] = None) -> QCBar:
     """
     将实盘交易框架 Bar 转换为 QuantCell K线格式
 
@@ -437,6 +499,8 @@ def convert_bar_to_qc(bar: Any) -> QCBar:
     ----------
     bar : Bar
         实盘交易框架 K线数据对象
+    out : QCBar, optional
+        写入结果的 K 线对象（通常来自对象池），为 None 时新建
 
     Returns
     -------
@@ -459,56 +523,60 @@ def convert_bar_to_qc(bar: Any) -> QCBar:
         # 提取品种信息
         if NAUTILUS_AVAILABLE and hasattr(bar, 'bar_type'):
             # Nautilus Bar 格式
-            nautilus_instrument_id = bar.bar_type.instrument_id
-            qc_instrument_id = QCInstrumentId(
-                symbol=str(nautilus_instrument_id.symbol),
-                venue=str(nautilus_instrument_id.venue),
-            )
-
-            # 提取 K 线类型
-            bar_spec = bar.bar_type.spec
-            bar_type_str = f"{bar_spec.step}-{bar_spec.aggregation.name}"
+            qc_instrument_id, bar_type_str = _nautilus_bar_type_info(bar.bar_type)
 
             # 转换时间戳
             timestamp = datetime.fromtimestamp(bar.ts_event / 1e9)
+            open_, high, low, close = float(bar.open), float(bar.high), float(bar.low), float(bar.close)
+            volume = float(bar.volume) if hasattr(bar, 'volume') else 0.0
+            ts_event = bar.ts_event
+        else:
+            # 通用格式
+            qc_instrument_id = _qc_instrument_id(
+                str(getattr(bar, 'symbol', 'UNKNOWN')),
+                str(getattr(bar, 'venue', 'BINANCE')),
+            )
+            bar_type_str = getattr(bar, 'bar_type', '1-HOUR')
+            open_ = float(getattr(bar, 'open', 0))
+            high = float(getattr(bar, 'high', 0))
+            low = float(getattr(bar, 'low', 0))
+            close = float(getattr(bar, 'close', 0))
+            volume = float(getattr(bar, 'volume', 0))
+            timestamp = datetime.utcnow()
+            ts_event = 0
 
+        if out is None:
             # 创建 QuantCell Bar
-            qc_bar = QCBar(
+            return QCBar(
                 instrument_id=qc_instrument_id,
                 bar_type=bar_type_str,
-                open=float(bar.open),
-                high=float(bar.high),
-                low=float(bar.low),
-                close=float(bar.close),
-                volume=float(bar.volume) if hasattr(bar, 'volume') else 0.0,
+                open=open_,
+                high=high,
+                low=low,
+                close=close,
+                volume=volume,
                 timestamp=timestamp,
-                ts_event=bar.ts_event,
-            )
-        else:
-            # 通用格式
-            qc_bar = QCBar(
-                instrument_id=QCInstrumentId(
-                    symbol=str(getattr(bar, 'symbol', 'UNKNOWN')),
-                    venue=str(getattr(bar, 'venue', 'BINANCE')),
-                ),
-                bar_type=getattr(bar, 'bar_type', '1-HOUR'),
-                open=float(getattr(bar, 'open', 0)),
-                high=float(getattr(bar, 'high', 0)),
-                low=float(getattr(bar, 'low', 0)),
-                close=float(getattr(bar, 'close', 0)),
-                volume=float(getattr(bar, 'volume', 0)),
-                timestamp=datetime.utcnow(),
-                ts_event=0,
+                ts_event=ts_event,
             )
 
-        return qc_bar
+        # 写入对象池中的 Bar
+        out.instrument_id = qc_instrument_id
+        out.bar_type = bar_type_str
+        out.open = open_
+        out.high = high
+        out.low = low
+        out.close = close
+        out.volume = volume
+        out.timestamp = timestamp
+        out.ts_event = ts_event
+        return out
 
     except Exception as e:
         logger.error(f"Bar 转换失败: {e}")
         raise DataConversionError(f"无法将 Bar 转换为 QCBar: {e}") from e
 
 
-def convert_tick_to_qc(tick: Any) -> Dict[str, Any]:
+def convert_tick_to_qc(tick: Any, out: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     将实盘交易框架 Tick 转换为 QuantCell Tick 格式
 
@@ -516,6 +584,8 @@ def convert_tick_to_qc(tick: Any) -> Dict[str, Any]:
     ----------
     tick : Tick
         实盘交易框架 Tick 数据对象
+    out : Dict[str, Any], optional
+        写入结果的字典（通常来自对象池），为 None 时新建
 
     Returns
     -------
@@ -546,58 +616,47 @@ def convert_tick_to_qc(tick: Any) -> Dict[str, Any]:
         # 提取品种信息
         if hasattr(tick, 'instrument_id'):
             nautilus_instrument_id = tick.instrument_id
-            qc_instrument_id = QCInstrumentId(
-                symbol=str(nautilus_instrument_id.symbol),
-                venue=str(nautilus_instrument_id.venue),
+            qc_instrument_id = _qc_instrument_id(
+                str(nautilus_instrument_id.symbol),
+                str(nautilus_instrument_id.venue),
             )
         else:
-            qc_instrument_id = QCInstrumentId(
-                symbol=str(getattr(tick, 'symbol', 'UNKNOWN')),
-                venue=str(getattr(tick, 'venue', 'BINANCE')),
+            qc_instrument_id = _qc_instrument_id(
+                str(getattr(tick, 'symbol', 'UNKNOWN')),
+                str(getattr(tick, 'venue', 'BINANCE')),
             )
 
+        # 逐个字段写入，使用对象池中的字典时不再分配新字典
+        qc_tick = out if out is not None else {}
+        qc_tick["instrument_id"] = qc_instrument_id
+        qc_tick["symbol"] = qc_instrument_id.symbol
+        qc_tick["venue"] = qc_instrument_id.venue
+
         # 根据 Tick 类型转换
         if NAUTILUS_AVAILABLE and hasattr(tick, 'bid_price'):
             # QuoteTick 转换
-            return {
-                "type": "quote",
-                "instrument_id": qc_instrument_id,
-                "symbol": str(qc_instrument_id.symbol),
-                "venue": str(qc_instrument_id.venue),
-                "bid_price": float(tick.bid_price),
-                "bid_size": float(tick.bid_size),
-                "ask_price": float(tick.ask_price),
-                "ask_size": float(tick.ask_size),
-                "timestamp": timestamp.isoformat(),
-                "ts_event": ts_event,
-            }
+            qc_tick["type"] = "quote"
+            qc_tick["bid_price"] = float(tick.bid_price)
+            qc_tick["bid_size"] = float(tick.bid_size)
+            qc_tick["ask_price"] = float(tick.ask_price)
+            qc_tick["ask_size"] = float(tick.ask_size)
         elif NAUTILUS_AVAILABLE and hasattr(tick, 'price'):
             # TradeTick 转换
             aggressor_side = OrderSide.BUY if tick.aggressor_side == NautilusOrderSide.BUY else OrderSide.SELL
 
-            return {
-                "type": "trade",
-                "instrument_id": qc_instrument_id,
-                "symbol": str(qc_instrument_id.symbol),
-                "venue": str(qc_instrument_id.venue),
-                "price": float(tick.price),
-                "size": float(tick.size),
-                "aggressor_side": aggressor_side.value,
-                "timestamp": timestamp.isoformat(),
-                "ts_event": ts_event,
-            }
+            qc_tick["type"] = "trade"
+            qc_tick["price"] = float(tick.price)
+            qc_tick["size"] = float(tick.size)
+            qc_tick["aggressor_side"] = aggressor_side.value
         else:
             # 通用格式
-            return {
-                "type": "tick",
-                "instrument_id": qc_instrument_id,
-                "symbol": str(qc_instrument_id.symbol),
-                "venue": str(qc_instrument_id.venue),
-                "price": float(getattr(tick, 'price', 0)),
-                "size": float(getattr(tick, 'size', 0)),
-                "timestamp": timestamp.isoformat(),
-                "ts_event": ts_event,
-            }
+            qc_tick["type"] = "tick"
+            qc_tick["price"] = float(getattr(tick, 'price', 0))
+            qc_tick["size"] = float(getattr(tick, 'size', 0))
+
+        qc_tick["timestamp"] = timestamp.isoformat()
+        qc_tick["ts_event"] = ts_event
+        return qc_tick
 
     except Exception as e:
         logger.error(f"Tick 转换失败: {e}")
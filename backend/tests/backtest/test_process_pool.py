@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+回测进程池测试
+
+验证K线经共享内存交给常驻工作进程、策略在工作进程内缓存、结果逐个回调，
+以及工作进程数和在途数据受内存预算限制、并发回测共享进程池、超时任务不阻塞关闭
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.process_pool import BacktestProcessPool
+
+
+class FakeBacktestService:
+    """替代 BacktestService：主进程准备合成K线，工作进程返回K线摘要"""
+
+    def load_strategy_from_file(self, strategy_name):
+        return {"name": strategy_name, "loaded_in": os.getpid()}
+
+    def _prepare_backtest_frames(self, backtest_config, task_id, symbol_index=0, total_symbols=1):
+        symbol = backtest_config["symbol"]
+        if symbol == "MISSING":
+            return {"symbol": symbol, "task_id": task_id, "status": "failed", "message": "no data"}, {}
+        index = pd.date_range("2024-01-01", periods=240, freq="h")
+        close = np.arange(240, dtype=np.float64) + symbol_index
+        candles = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                                "Volume": np.ones(240)}, index=index)
+        return candles, {"1d": candles.resample("1D").last()}
+
+    def _execute_single_backtest(self, strategy_class, candles, local_data_manager, strategy_config,
+                                 backtest_config, task_id, db=None):
+        symbol = backtest_config["symbol"]
+        if symbol == "HANG":
+            time.sleep(60)
+        candles["Close"] += 0  # 工作进程拿到的是可写的本地副本
+        return {
+            "symbol": symbol,
+            "task_id": task_id,
+            "status": "success",
+            "close_sum": float(candles["Close"].sum()),
+            "first_time": candles.index[0].isoformat(),
+            "daily_rows": len(local_data_manager.get_data(symbol, "1d")),
+            "strategy": strategy_class,
+            "pid": os.getpid(),
+        }
+
+
+@pytest.fixture
+def pool():
+    pool = BacktestProcessPool(max_workers=2, memory_budget_mb=4096, worker_memory_mb=256,
+                               service_factory=FakeBacktestService)
+    yield pool
+    pool.shutdown()
+
+
+def test_results_streamed_from_worker_processes(pool):
+    """每个货币对在工作进程中执行并逐个回调，数据准备失败的货币对直接回调失败结果"""
+    service = FakeBacktestService()
+    configs = [{"symbol": s, "interval": "1h"} for s in ("BTCUSDT", "ETHUSDT", "MISSING", "SOLUSDT")]
+    results = {}
+
+    pool.run(service, {"strategy_name": "demo"}, configs, "task-1", results.__setitem__)
+
+    assert set(results) == {"BTCUSDT", "ETHUSDT", "MISSING", "SOLUSDT"}
+    assert results["MISSING"]["status"] == "failed"
+    for index, symbol in ((0, "BTCUSDT"), (1, "ETHUSDT"), (3, "SOLUSDT")):
+        result = results[symbol]
+        assert result["close_sum"] == pytest.approx(np.arange(240).sum() + 240 * index)
+        assert result["first_time"] == "2024-01-01T00:00:00"
+        assert result["daily_rows"] == 10
+        assert result["pid"] != os.getpid()
+        # 策略在工作进程初始化时加载
+        assert result["strategy"]["loaded_in"] == result["pid"]
+
+
+def test_pool_is_reused_across_runs(pool):
+    """同一进程池在多次回测之间复用"""
+    service = FakeBacktestService()
+    first, second = {}, {}
+    pool.run(service, {"strategy_name": "demo"}, [{"symbol": "BTCUSDT"}], "task-1", first.__setitem__)
+    executor = pool._pool
+    pool.run(service, {"strategy_name": "demo"}, [{"symbol": "ETHUSDT"}], "task-2", second.__setitem__)
+
+    assert pool._pool is executor
+    assert second["ETHUSDT"]["status"] == "success"
+
+
+def test_memory_budget_limits_workers():
+    """工作进程数受内存预算限制，在途数据预算至少保留一个工作进程的份额"""
+    pool = BacktestProcessPool(max_workers=8, memory_budget_mb=1024, worker_memory_mb=512)
+
+    assert pool.resolve_workers(100) == 2
+    assert pool.resolve_workers(1) == 1
+    assert pool.data_budget_bytes(2) == 512 * 1024 * 1024
+
+
+def test_concurrent_runs_share_pool(pool):
+    """并发的回测共享同一个进程池，互不影响"""
+    service = FakeBacktestService()
+    results = [{}, {}]
+    threads = [
+        threading.Thread(target=pool.run, args=(service, {"strategy_name": "demo"},
+                                                [{"symbol": s} for s in symbols], f"task-{i}", results[i].__setitem__))
+        for i, symbols in enumerate((("BTCUSDT", "ETHUSDT"), ("SOLUSDT", "BNBUSDT")))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [sorted(r) for r in results] == [["BTCUSDT", "ETHUSDT"], ["BNBUSDT", "SOLUSDT"]]
+    assert all(r["status"] == "success" for result in results for r in result.values())
+    assert all(count == 0 for count in pool._users.values())
+
+
+def test_timeout_terminates_hung_worker(pool):
+    """超时任务的工作进程被终止，不阻塞回测返回，后续回测使用新的进程池"""
+    service = FakeBacktestService()
+    results = {}
+    started = time.monotonic()
+    pool.run(service, {"strategy_name": "demo"}, [{"symbol": "HANG"}], "task-1", results.__setitem__, timeout=1)
+
+    assert time.monotonic() - started < 20
+    assert results["HANG"]["message"] == "回测超时"
+    assert pool._pool is None and pool._users == {}
+
+    pool.run(service, {"strategy_name": "demo"}, [{"symbol": "BTCUSDT"}], "task-2", results.__setitem__)
+    assert results["BTCUSDT"]["status"] == "success"
@@ -8,6 +8,8 @@ import sys
 import os
 from pathlib import Path
 
+import pytest
+
 # 将backend目录添加到Python路径（必须排在tests之前）
 backend_dir = Path(__file__).parent.parent
 if str(backend_dir) not in sys.path:
@@ -23,3 +25,11 @@ if str(tests_dir) not in sys.path:
 print(f"Python path added: {backend_dir}")
 print(f"Tests path added: {tests_dir}")
 print(f"Current sys.path: {sys.path[:5]}")  # 打印前5个
+
+
+@pytest.fixture(autouse=True)
+def _isolate_kline_cache(monkeypatch):
+    """每个测试使用新的进程级K线缓存，避免不同测试的临时数据库/数据湖互相命中"""
+    kline_cache = sys.modules.get("collector.db.kline_cache")
+    if kline_cache is not None:
+        monkeypatch.setattr(kline_cache, "_kline_cache", None)
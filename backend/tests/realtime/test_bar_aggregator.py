@@ -0,0 +1,163 @@
+"""
+流式多周期K线聚合测试
+
+验证由1m K线或成交流聚合出的各周期K线与直接重采样结果一致，
+以及未完结K线节流推送、完整性标记和订阅管理器推送
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from realtime.bar_aggregator import StreamingBarAggregator, bucket_bounds
+from realtime.data_distributor import DataDistributor
+from realtime.data_processor import DataProcessor
+
+# 2024-01-01 00:00 UTC（星期一）
+BASE_MS = 1704067200000
+
+
+def _kline(i, o, h, l, c, v, final=True, symbol="BTCUSDT"):
+    start = BASE_MS + i * 60000
+    return {
+        "exchange": "binance", "symbol": symbol, "data_type": "kline", "E": start + 59000,
+        "k": {"t": start, "T": start + 59999, "s": symbol, "i": "1m",
+              "o": str(o), "h": str(h), "l": str(l), "c": str(c), "v": str(v), "q": str(v * c), "n": 1, "x": final},
+    }
+
+
+def _random_minutes(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    high = np.maximum(open_, close) + rng.random(n)
+    low = np.minimum(open_, close) - rng.random(n)
+    volume = rng.random(n) * 10
+    return open_, high, low, close, volume
+
+
+def test_bucket_bounds():
+    """固定周期、周线（星期一开始）和月线的对齐"""
+    assert bucket_bounds("5m", BASE_MS + 7 * 60000) == (BASE_MS + 5 * 60000, BASE_MS + 10 * 60000)
+    week_start, _ = bucket_bounds("1w", BASE_MS + 3 * 86400000)
+    assert week_start == BASE_MS
+    assert bucket_bounds("1M", BASE_MS + 40 * 86400000) == (1706745600000, 1709251200000)
+
+
+def test_kline_source_matches_resample():
+    """1m K线逐根推入（含未完结更新），各周期完结K线与直接重采样一致"""
+    aggregator = StreamingBarAggregator(intervals=["5m", "15m", "1h"], partial_throttle_ms=0)
+    closed = []
+    aggregator.register_consumer(closed.append)
+    o, h, l, c, v = _random_minutes(120)
+    for i in range(120):
+        aggregator.on_kline(_kline(i, o[i], h[i] - 0.5, l[i] + 0.5, o[i], v[i] / 2, final=False))
+        aggregator.on_kline(_kline(i, o[i], h[i], l[i], c[i], v[i]))
+
+    for interval, size in (("5m", 5), ("15m", 15), ("1h", 60)):
+        bars = aggregator.get_bars("BTCUSDT", interval)
+        assert len(bars["open_time"]) == 120 // size
+        assert bars["open_time"][1] - bars["open_time"][0] == size * 60000
+        assert np.allclose(bars["open"], o[::size])
+        assert np.allclose(bars["high"], h.reshape(-1, size).max(axis=1))
+        assert np.allclose(bars["low"], l.reshape(-1, size).min(axis=1))
+        assert np.allclose(bars["close"], c[size - 1::size])
+        assert np.allclose(bars["volume"], v.reshape(-1, size).sum(axis=1))
+
+    # 周期内最后一根1m完结时立即收线，不等下一根K线
+    assert sum(1 for m in closed if m["interval"] == "1h") == 2
+    assert all(m["complete"] and m["k"]["x"] for m in closed)
+    assert aggregator.get_current_bar("BTCUSDT", "5m") is None
+
+
+def test_trade_source_and_missed_final():
+    """成交流聚合；未收到完结消息的1m K线按最后一次推送计入，缺失分钟的K线标记为不完整"""
+    aggregator = StreamingBarAggregator(intervals=["5m"], partial_throttle_ms=0)
+    every = []
+    aggregator.register_consumer(every.append, closed_only=False, complete_only=False)
+    processor = DataProcessor()
+    for i, price in enumerate([10.0, 12.0, 9.0, 11.0]):
+        raw = {"e": "trade", "E": BASE_MS, "s": "ETHUSDT", "t": i,
+               "p": str(price), "q": "2", "T": BASE_MS + i * 1000, "m": False}
+        assert DataProcessor.normalize_message(raw)
+        aggregator.on_trade(processor.process_message(raw))
+    current = aggregator.get_current_bar("ETHUSDT", "5m")
+    assert (current["open"], current["high"], current["low"], current["close"], current["volume"]) == (10.0, 12.0, 9.0, 11.0, 8.0)
+    assert current["trades"] == 4 and not current["is_final"]
+
+    # K线源：第0分钟只有未完结推送，第1、2、4分钟完结，第3分钟缺失
+    aggregator.on_kline(_kline(0, 1, 2, 1, 2, 1, final=False))
+    for i in (1, 2, 4):
+        aggregator.on_kline(_kline(i, 2, 3, 1, 2, 1))
+    bar = every[-1]
+    assert bar["is_final"] and bar["volume"] == 4.0
+    assert not bar["complete"]
+
+
+def test_missing_kline_in_contiguous_bucket():
+    """与上一根相邻的K线缺少源K线时同样标记为不完整"""
+    aggregator = StreamingBarAggregator(intervals=["5m"])
+    closed = []
+    aggregator.register_consumer(closed.append, complete_only=False)
+    for i in (0, 1, 2, 3, 4, 5, 6, 7, 9):
+        aggregator.on_kline(_kline(i, 2, 3, 1, 2, 1))
+    assert [bar["complete"] for bar in closed] == [True, False]
+    assert closed[1]["volume"] == 4.0
+
+
+def test_single_source_per_symbol():
+    """同一交易对同时收到K线和成交时只使用最先到达的源，成交量不重复计入"""
+    aggregator = StreamingBarAggregator(intervals=["5m"])
+    closed = []
+    aggregator.register_consumer(closed.append)
+    for i in range(5):
+        aggregator.on_kline(_kline(i, 2, 3, 1, 2, 1))
+        for data_type in ("trade", "aggTrade"):
+            aggregator.on_trade({"symbol": "BTCUSDT", "data_type": data_type,
+                                 "timestamp": BASE_MS + i * 60_000 + 1, "price": 2.0, "quantity": 5.0})
+    assert len(closed) == 1 and closed[0]["volume"] == 5.0
+    assert aggregator.stats["source_ignored"] == 10
+
+    # 指定源后忽略其他源，即使其他源先到达
+    aggregator = StreamingBarAggregator(intervals=["5m"], source="aggTrade")
+    aggregator.on_kline(_kline(0, 2, 3, 1, 2, 1))
+    aggregator.on_trade({"symbol": "BTCUSDT", "data_type": "aggTrade",
+                         "timestamp": BASE_MS + 1, "price": 2.0, "quantity": 5.0})
+    assert aggregator.get_current_bar("BTCUSDT", "5m")["volume"] == 5.0
+
+
+def test_partial_throttle_and_push_kline():
+    """未完结K线按事件时间节流，订阅了的周期通过 push_kline 推送"""
+
+    class FakeSubscriptionManager:
+        def __init__(self):
+            self.pushed = []
+
+        def get_subscribed_clients(self, symbol, interval):
+            return {"client"} if interval == "15m" else set()
+
+        async def push_kline(self, symbol, interval, kline_data):
+            self.pushed.append((symbol, interval, kline_data["is_final"]))
+
+    async def run():
+        manager = FakeSubscriptionManager()
+        aggregator = StreamingBarAggregator(intervals=["5m", "15m"], subscription_manager=manager,
+                                            partial_throttle_ms=120000)
+        distributor = DataDistributor()
+        distributor.register_consumer("kline", aggregator.on_kline)
+        for i in range(15):
+            distributor.distribute(_kline(i, 1, 1, 1, 1, 1))
+        await asyncio.sleep(0)
+        return manager.pushed, aggregator.stats
+
+    pushed, stats = asyncio.run(run())
+    # 15根1m：每2分钟最多推送一次未完结，15m在最后一根完结时收线
+    assert [p for p in pushed if p[2]] == [("BTCUSDT", "15m", True)]
+    assert len([p for p in pushed if not p[2]]) == 7
+    assert stats["closed_emitted"] == 4
+
+
+def test_rejects_unaligned_interval():
+    with pytest.raises(ValueError):
+        StreamingBarAggregator(intervals=["5m"], source_interval="3m")
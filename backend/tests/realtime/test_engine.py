@@ -263,12 +263,14 @@ class TestRealtimeEngineEdgeCases:
 
         consumer1 = Mock()
         consumer2 = Mock()
+        # 引擎自带多周期K线聚合器作为 kline 消费者
+        builtin = engine.data_distributor.get_consumer_count('kline')
 
         engine.register_consumer('kline', consumer1)
         engine.register_consumer('kline', consumer2)
 
         # 验证两个消费者都已注册
-        assert engine.data_distributor.get_consumer_count('kline') == 2
+        assert engine.data_distributor.get_consumer_count('kline') == builtin + 2
 
     def test_status_with_running_engine(self):
         """测试运行中引擎的状态"""
@@ -0,0 +1,187 @@
+"""
+行情接入流水线测试
+
+验证组合流订阅、原始消息入队、批量解析和分发，以及大量订阅时事件循环保持响应
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from exchange.binance.websocket_client import BinanceWebSocketClient
+from realtime.data_distributor import DataDistributor
+from realtime.data_processor import DataProcessor
+from realtime.ingest_pipeline import IngestPipeline
+
+SYMBOLS = [f"SYM{i}USDT" for i in range(300)]
+
+
+def _kline_event(symbol, i):
+    return {
+        "e": "kline", "E": 1700000000000 + i, "s": symbol,
+        "k": {
+            "t": 1700000000000 + i * 60000, "T": 1700000059999 + i * 60000, "s": symbol, "i": "1m",
+            "o": "1.0", "h": "1.0", "l": "1.0", "c": str(float(i)), "v": "1.0", "x": True,
+        },
+    }
+
+
+def _depth_event(symbol, i):
+    return {
+        "e": "depthUpdate", "E": 1700000000000 + i, "s": symbol, "U": i * 10 + 1, "u": i * 10 + 10,
+        "b": [["100.0", "1.5"], ["99.9", "2.0"]], "a": [["100.1", "0.5"]],
+    }
+
+
+class FakeSocket:
+    """模拟 python-binance 组合流socket"""
+
+    def __init__(self, streams):
+        self.streams = streams
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    async def connect(self):
+        return self
+
+    async def recv(self):
+        return await self.queue.get()
+
+    async def close(self):
+        self.closed = True
+
+    def feed(self, stream, data):
+        self.queue.put_nowait({"stream": stream, "data": data})
+
+
+class FakeSocketManager:
+    def __init__(self):
+        self.sockets = []
+
+    def multiplex_socket(self, streams):
+        socket = FakeSocket(streams)
+        self.sockets.append(socket)
+        return socket
+
+
+@pytest.fixture
+async def binance_client():
+    client = BinanceWebSocketClient(max_streams_per_connection=200)
+    client._socket_manager = FakeSocketManager()
+    client._client = object()
+    client._connected = True
+    yield client
+    client._client = None
+    await client.disconnect()
+
+
+async def test_channels_multiplexed_onto_combined_streams(binance_client):
+    """300个交易对的K线+深度按每连接200个流分组，消息拆包后带原频道名"""
+    channels = [f"{s}@{t}" for s in SYMBOLS for t in ("kline_1m", "depth")]
+    received = []
+    binance_client.add_message_callback(received.append)
+
+    assert await binance_client.subscribe(channels + ["BAD"])
+
+    sockets = binance_client._socket_manager.sockets
+    assert [len(s.streams) for s in sockets] == [200, 200, 200]
+    assert sockets[0].streams[:2] == ["sym0usdt@kline_1m", "sym0usdt@depth"]
+    assert binance_client.subscribed_channels == set(channels)
+
+    sockets[1].feed("sym150usdt@depth", _depth_event("SYM150USDT", 1))
+    await asyncio.sleep(0.01)
+    assert received[0]["channel"] == "SYM150USDT@depth"
+    assert received[0]["s"] == "SYM150USDT"
+
+
+async def test_unsubscribe_rebuilds_connection(binance_client):
+    """取消订阅时以剩余频道重建受影响的连接"""
+    await binance_client.subscribe(["BTCUSDT@kline_1m", "ETHUSDT@kline_1m"])
+    old_socket = binance_client._socket_manager.sockets[0]
+
+    assert await binance_client.unsubscribe(["BTCUSDT@kline_1m"])
+
+    assert old_socket.closed
+    assert binance_client._socket_manager.sockets[-1].streams == ["ethusdt@kline_1m"]
+    assert binance_client.subscribed_channels == {"ETHUSDT@kline_1m"}
+    assert binance_client.get_connection_status()["active_sockets"] == 1
+
+
+async def test_pipeline_keeps_order_and_loop_responsive():
+    """大量K线+深度消息经流水线解析分发，同一交易对顺序不变，事件循环不被长时间阻塞"""
+    distributor = DataDistributor()
+    klines, depths = {}, []
+    distributor.register_consumer("kline", lambda d: klines.setdefault(d["symbol"], []).append(d["close"]))
+    distributor.register_consumer("depth", depths.append)
+    pipeline = IngestPipeline(DataProcessor(), distributor, num_parsers=2, batch_size=128)
+    await pipeline.start()
+
+    max_gap = 0.0
+
+    async def heartbeat():
+        nonlocal max_gap
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            max_gap = max(max_gap, now - last)
+            last = now
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.02)
+    rounds = 10
+    for i in range(rounds):
+        for symbol in SYMBOLS:
+            pipeline.submit(_kline_event(symbol, i))
+            pipeline.submit(_depth_event(symbol, i))
+        await asyncio.sleep(0)
+    await asyncio.wait_for(pipeline.join(), timeout=20)
+    beat.cancel()
+    await pipeline.stop()
+
+    stats = pipeline.get_stats()
+    assert stats["processed"] == rounds * len(SYMBOLS) * 2
+    assert stats["dropped"] == 0
+    assert all(closes == [str(float(i)) for i in range(rounds)] for closes in klines.values())
+    assert len(klines) == len(SYMBOLS)
+    assert depths[0]["bids"] == [[100.0, 1.5], [99.9, 2.0]]
+    assert depths[0]["first_update_id"] == 1
+    assert max_gap < 0.5
+
+
+async def test_pipeline_drops_oldest_when_full():
+    """队列满时丢弃最旧的消息，无法识别的消息不入队"""
+    distributor = DataDistributor()
+    closes = []
+    distributor.register_consumer("kline", lambda d: closes.append(d["close"]))
+    pipeline = IngestPipeline(DataProcessor(), distributor, num_parsers=1, queue_size=3)
+    await pipeline.start()
+
+    for i in range(5):
+        pipeline.submit(_kline_event("BTCUSDT", i))
+    assert not pipeline.submit({"foo": "bar"})
+    await pipeline.join()
+    await pipeline.stop()
+
+    assert closes == ["2.0", "3.0", "4.0"]
+    assert pipeline.get_stats()["dropped"] == 2
+    assert pipeline.get_stats()["invalid"] == 1
+
+
+async def test_depth_parsed_in_worker_process():
+    """深度消息交给解析进程，其他类型仍在线程中解析"""
+    distributor = DataDistributor()
+    received = []
+    distributor.register_consumer("*", received.append)
+    pipeline = IngestPipeline(DataProcessor(), distributor, process_data_types=["depth"], process_workers=1)
+    await pipeline.start()
+
+    pipeline.submit(_depth_event("BTCUSDT", 1))
+    pipeline.submit(_kline_event("BTCUSDT", 1))
+    await asyncio.wait_for(pipeline.join(), timeout=20)
+    lanes = pipeline.get_stats()["lanes"]
+    await pipeline.stop()
+
+    assert sorted(d["data_type"] for d in received) == ["depth", "kline"]
+    assert lanes["process-0"]["max_queue_size"] == 1
@@ -0,0 +1,221 @@
+"""
+本地订单簿测试
+
+验证增量深度应用、更新ID缺口检测与快照重新同步、盘口查询，以及录制文件重放
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from exchange.binance.config import OrderSide, OrderType, OrderStatus
+from exchange.binance.paper_trading import PaperTradingAccount
+from realtime.data_distributor import DataDistributor
+from realtime.order_book import LocalOrderBook, OrderBookManager
+
+RECORDED_DEPTH = Path(__file__).parent.parent / "fixtures" / "recorded" / "binance_depth_btcusdt.jsonl"
+
+
+def _update(first, last, bids=(), asks=(), symbol="BTCUSDT"):
+    return {
+        "symbol": symbol, "data_type": "depth", "timestamp": last,
+        "first_update_id": first, "last_update_id": last, "prev_update_id": None,
+        "bids": [list(level) for level in bids], "asks": [list(level) for level in asks],
+    }
+
+
+@pytest.fixture
+def book():
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_snapshot(100, [[99.0, 1.0], [98.0, 2.0], [97.0, 3.0]], [[101.0, 1.0], [102.0, 2.0], [103.0, 3.0]])
+    return book
+
+
+def test_queries(book):
+    """最优价、档位查询、价差和吃单均价"""
+    assert book.best_bid() == (99.0, 1.0)
+    assert book.best_ask() == (101.0, 1.0)
+    assert book.spread() == 2.0 and book.mid_price() == 100.0
+    assert book.get_level("bid", 98.0) == 2.0
+    assert book.get_level("ask", 98.0) == 0.0
+    assert book.vwap("buy", 2.0) == (101.5, 2.0)
+    assert book.vwap("sell", 10.0) == pytest.approx(((99 + 196 + 291) / 6.0, 6.0))
+
+    snapshot = book.snapshot(depth=2)
+    assert snapshot.bid_prices.tolist() == [99.0, 98.0]
+    assert snapshot.ask_prices.tolist() == [101.0, 102.0]
+    assert not snapshot.ask_sizes.flags.writeable
+
+
+def test_updates_insert_replace_and_delete(book):
+    """增量新增、修改和删除档位"""
+    assert book.apply_update(_update(101, 102, bids=[(99.5, 4.0), (99.0, 0.0)], asks=[(101.0, 5.0)]))
+
+    assert book.best_bid() == (99.5, 4.0)
+    assert book.get_level("bid", 99.0) == 0.0
+    assert book.best_ask() == (101.0, 5.0)
+    assert book.last_update_id == 102
+    # 过期增量被忽略
+    assert not book.apply_update(_update(90, 95, bids=[(200.0, 1.0)]))
+    assert book.best_bid() == (99.5, 4.0)
+
+
+def test_gap_triggers_resync(book):
+    """更新ID出现缺口时失步，新快照到达后重放缓存的增量"""
+    assert not book.apply_update(_update(105, 106, asks=[(100.5, 1.0)]))
+    assert book.needs_snapshot and book.gaps == 1
+    assert book.best_bid() is None
+
+    book.apply_update(_update(107, 108, asks=[(100.6, 2.0)]))
+    assert book.apply_snapshot(105, [[99.0, 1.0]], [[101.0, 1.0]])
+
+    assert book.synced
+    assert book.last_update_id == 108
+    assert book.best_ask() == (100.5, 1.0)
+
+
+def test_snapshot_ahead_of_buffer():
+    """快照晚于缓存的全部增量时，跨越快照的第一条实时增量按覆盖规则应用，之后按连续规则校验"""
+    book = LocalOrderBook("BTCUSDT")
+    book.apply_update(_update(90, 95, bids=[(99.0, 5.0)]))
+    assert book.apply_snapshot(100, [[99.0, 1.0]], [[101.0, 1.0]])
+
+    assert not book.apply_update(_update(96, 100, bids=[(99.0, 7.0)]))
+    assert book.apply_update(_update(98, 103, bids=[(99.5, 2.0)]))
+    assert book.apply_update(_update(104, 105, asks=[(100.5, 1.0)]))
+
+    assert book.synced and book.gaps == 0
+    assert book.last_update_id == 105
+    assert book.best_bid() == (99.5, 2.0)
+    assert not book.apply_update(_update(107, 108))
+    assert book.gaps == 1
+
+
+def test_manager_fetches_snapshot_and_notifies():
+    """管理器作为 depth 消费者：首条增量触发快照拉取，同步后推送快照视图"""
+    fetched = []
+
+    def fetcher(symbol):
+        fetched.append(symbol)
+        return {"last_update_id": 10, "bids": [[50.0, 1.0]], "asks": [[51.0, 1.0]]}
+
+    manager = OrderBookManager(snapshot_fetcher=fetcher, snapshot_depth=5)
+    snapshots = []
+    manager.subscribe("btcusdt", snapshots.append)
+    distributor = DataDistributor()
+    distributor.register_consumer("depth", manager.on_depth)
+
+    distributor.distribute(_update(9, 11, bids=[(50.5, 2.0)]))
+    distributor.distribute(_update(12, 12, asks=[(51.0, 0.0), (52.0, 3.0)]))
+
+    assert fetched == ["BTCUSDT"]
+    book = manager.get_book("BTCUSDT")
+    assert book.best_bid() == (50.5, 2.0)
+    assert book.best_ask() == (52.0, 3.0)
+    assert [s.last_update_id for s in snapshots] == [11, 12]
+
+
+def test_snapshot_failures_back_off(monkeypatch):
+    """快照拉取失败后按指数退避重试，退避期内的增量不再触发请求，成功后清除失败记录"""
+    now = [1000.0]
+    monkeypatch.setattr("realtime.order_book.time.monotonic", lambda: now[0])
+    calls = []
+
+    def fetcher(symbol):
+        calls.append(now[0])
+        if len(calls) <= 2:
+            raise ConnectionError("rate limited")
+        return {"last_update_id": 10, "bids": [[50.0, 1.0]], "asks": [[51.0, 1.0]]}
+
+    manager = OrderBookManager(snapshot_fetcher=fetcher, snapshot_retry_base=1.0)
+    manager.on_depth(_update(9, 11))
+    manager.on_depth(_update(12, 12))
+    assert calls == [1000.0]
+
+    now[0] += 1.0
+    manager.on_depth(_update(13, 13))
+    now[0] += 1.0
+    manager.on_depth(_update(14, 14))
+    assert calls == [1000.0, 1001.0]
+
+    now[0] += 1.0
+    manager.on_depth(_update(15, 15))
+    assert calls == [1000.0, 1001.0, 1003.0]
+    assert manager.get_book("BTCUSDT").synced
+    assert manager._snapshot_failures == {}
+
+
+def test_stale_snapshot_backs_off(monkeypatch):
+    """快照早于缓存的增量时按退避间隔重新拉取，而不是立即重试"""
+    now = [1000.0]
+    monkeypatch.setattr("realtime.order_book.time.monotonic", lambda: now[0])
+    calls = []
+
+    def fetcher(symbol):
+        calls.append(now[0])
+        return {"last_update_id": 5 if len(calls) == 1 else 20, "bids": [[50.0, 1.0]], "asks": [[51.0, 1.0]]}
+
+    manager = OrderBookManager(snapshot_fetcher=fetcher, snapshot_retry_base=2.0)
+    manager.on_depth(_update(9, 11))
+    manager.on_depth(_update(12, 12))
+    assert calls == [1000.0]
+
+    now[0] += 2.0
+    manager.on_depth(_update(21, 21))
+    assert calls == [1000.0, 1002.0]
+    assert manager.get_book("BTCUSDT").synced
+    assert manager._snapshot_failures == {}
+
+
+def _reference_book(path):
+    """独立实现：最后一个快照加上其后的增量（字典版），用于校验重放结果"""
+    records = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    last_snapshot = max(i for i, r in enumerate(records) if "lastUpdateId" in r)
+    snapshot = records[last_snapshot]
+    bids = {float(p): float(q) for p, q in snapshot["bids"]}
+    asks = {float(p): float(q) for p, q in snapshot["asks"]}
+    last_id = snapshot["lastUpdateId"]
+    for record in records:
+        data = record.get("data")
+        if not data or data["u"] <= last_id:
+            continue
+        for side, levels in ((bids, data["b"]), (asks, data["a"])):
+            for p, q in levels:
+                if float(q) == 0:
+                    side.pop(float(p), None)
+                else:
+                    side[float(p)] = float(q)
+        last_id = data["u"]
+    return sorted(bids.items(), reverse=True), sorted(asks.items()), last_id
+
+
+def test_replay_recorded_file():
+    """重放录制的深度流：缓存、丢弃过期增量、检测丢包并由第二个快照恢复"""
+    manager = OrderBookManager()
+
+    count = manager.replay(RECORDED_DEPTH)
+
+    book = manager.get_book("BTCUSDT")
+    bids, asks, last_id = _reference_book(RECORDED_DEPTH)
+    snapshot = book.snapshot(depth=0)
+    assert count == 67
+    assert book.synced and book.gaps == 1
+    assert book.last_update_id == last_id == 1187
+    assert list(zip(snapshot.bid_prices.tolist(), snapshot.bid_sizes.tolist())) == bids
+    assert list(zip(snapshot.ask_prices.tolist(), snapshot.ask_sizes.tolist())) == asks
+
+
+def test_paper_trading_fills_against_book(book):
+    """模拟盘市价单按盘口吃单均价成交，限价单与对手方最优价比较"""
+    manager = OrderBookManager()
+    manager.books["BTCUSDT"] = book
+    account = PaperTradingAccount({"USDT": 10000.0, "BTC": 5.0}, order_books=manager)
+
+    market = account.create_order("BTCUSDT", OrderSide.BUY, OrderType.MARKET, 2.0, price=None)
+    resting = account.create_order("BTCUSDT", OrderSide.SELL, OrderType.LIMIT, 1.0, price=99.5)
+    crossing = account.create_order("BTCUSDT", OrderSide.SELL, OrderType.LIMIT, 1.0, price=98.5)
+
+    assert market.status == OrderStatus.FILLED and market.avg_price == 101.5
+    assert resting.status == OrderStatus.NEW
+    assert crossing.status == OrderStatus.FILLED and crossing.avg_price == 98.5
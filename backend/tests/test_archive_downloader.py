@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+K线归档并发下载引擎测试
+
+以本地HTTP服务代替 data.binance.vision 与 OKX 行情接口，验证月度归档优先与日度回退、
+失败重试、断点续传，以及OKX分页并发下载
+"""
+
+import asyncio
+import io
+import zipfile
+from datetime import date
+
+import pandas as pd
+import pytest
+from aiohttp import web
+
+from exchange.archive_downloader import ArchiveDownloader, plan_archive_tasks
+from exchange.binance.downloader import BinanceDownloader
+from exchange.okx.downloader import OKXDownloader
+
+
+MINUTE_MS = 60_000
+DAY_MS = 1440 * MINUTE_MS
+
+
+def _day_ms(day):
+    return int(pd.Timestamp(day).timestamp() * 1000)
+
+
+def _zip_csv(days, header=False):
+    """生成包含指定日期小时K线的归档"""
+    lines = ["open_time,open,high,low,close,volume,close_time,quote_volume,count,"
+             "taker_buy_volume,taker_buy_quote_volume,ignore"] if header else []
+    for day in days:
+        for hour in range(24):
+            ts = _day_ms(day) + hour * 60 * MINUTE_MS
+            lines.append(f"{ts},1.0,2.0,0.5,1.5,10.0,{ts + 60 * MINUTE_MS - 1},15.0,3,5.0,7.5,0")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("klines.csv", "\n".join(lines) + "\n")
+    return buffer.getvalue()
+
+
+class _ArchiveServer:
+    """按路径返回预置内容的本地HTTP服务，可为指定路径注入失败"""
+
+    def __init__(self):
+        self.files = {}
+        self.failures = {}
+        self.hits = {}
+        self.url = None
+
+    async def handle(self, request):
+        path = request.path
+        self.hits[path] = self.hits.get(path, 0) + 1
+        if self.failures.get(path, 0) > 0:
+            self.failures[path] -= 1
+            return web.Response(status=500)
+        if path not in self.files:
+            return web.Response(status=404)
+        return web.Response(body=self.files[path])
+
+
+@pytest.fixture
+async def archive_server():
+    server = _ArchiveServer()
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    server.url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    yield server
+    await runner.cleanup()
+
+
+def _path(period, label):
+    return f"/data/spot/{period}/klines/BTCUSDT/1h/BTCUSDT-1h-{label}.zip"
+
+
+def test_plan_prefers_monthly_archives():
+    """整月且已结束的月份使用月度归档，其余日期使用日度归档"""
+    dates = [d.strftime("%Y-%m-%d") for d in pd.date_range("2024-01-15", "2024-03-02")]
+    tasks = plan_archive_tasks(dates, lambda d: f"d/{d}", lambda m: f"m/{m}", today=date(2024, 3, 5))
+
+    assert [t.label for t in tasks][:18] == [f"2024-01-{d}" for d in range(15, 32)] + ["2024-02"]
+    assert tasks[17].url == "m/2024-02" and len(tasks[17].fallback) == 29
+    # 当月的归档尚未发布
+    assert [t.label for t in tasks][18:] == ["2024-03-01", "2024-03-02"]
+
+
+async def test_monthly_with_daily_fallback_and_retry(archive_server, tmp_path):
+    """月度归档不存在时回退到日度归档，服务端错误时重试"""
+    archive_server.files[_path("monthly", "2024-01")] = _zip_csv(
+        [d.strftime("%Y-%m-%d") for d in pd.date_range("2024-01-01", "2024-01-31")], header=True
+    )
+    for day in pd.date_range("2024-02-01", "2024-02-29"):
+        label = day.strftime("%Y-%m-%d")
+        archive_server.files[_path("daily", label)] = _zip_csv([label])
+    archive_server.failures[_path("daily", "2024-02-10")] = 1
+
+    downloader = BinanceDownloader(
+        save_dir=tmp_path, symbols=[], archive_base_url=archive_server.url, download_concurrency=4
+    )
+    progress = []
+    df = await downloader.download_daily_klines(
+        "BTCUSDT", "1h", "2024-01-01", "2024-02-29",
+        progress_callback=lambda symbol, current, total, status: progress.append((current, total)),
+    )
+
+    assert len(df) == 60 * 24
+    assert df["open_time"].is_monotonic_increasing
+    assert df["open_time"].iloc[0] == _day_ms("2024-01-01")
+    assert archive_server.hits[_path("monthly", "2024-02")] == 1
+    assert archive_server.hits[_path("daily", "2024-02-10")] == 2
+    assert _path("daily", "2024-01-15") not in archive_server.hits
+    assert progress[-1] == (60, 60)
+
+
+async def test_resume_skips_completed_archives(archive_server, tmp_path):
+    """中断后重新运行只下载未完成的归档，确认缺失的月度归档不再请求"""
+    days = [d.strftime("%Y-%m-%d") for d in pd.date_range("2024-02-01", "2024-02-29")]
+    for label in days:
+        archive_server.files[_path("daily", label)] = _zip_csv([label])
+    archive_server.failures[_path("daily", "2024-02-20")] = 100
+
+    downloader = BinanceDownloader(save_dir=tmp_path, symbols=[], archive_base_url=archive_server.url)
+    tasks = downloader.plan_archive_tasks("BTCUSDT", "1h", days)
+    state_path = tmp_path / "state.json"
+
+    async with ArchiveDownloader(max_retry=2, backoff=0.01, state_path=state_path) as engine:
+        stats = await engine.download(tasks, downloader.parse_kline_csv)
+    assert stats == {"downloaded": 28, "skipped": 0, "missing": 0, "failed": 1}
+
+    archive_server.failures.clear()
+    archive_server.hits.clear()
+    received = []
+    async with ArchiveDownloader(state_path=state_path) as engine:
+        stats = await engine.download(tasks, downloader.parse_kline_csv, on_result=lambda t, df: received.append(t.label))
+
+    assert stats == {"downloaded": 1, "skipped": 28, "missing": 0, "failed": 0}
+    assert received == ["2024-02-20"]
+    assert list(archive_server.hits) == [_path("daily", "2024-02-20")]
+
+
+async def test_failed_persist_is_not_marked_done(archive_server, tmp_path):
+    """on_result 持久化失败的归档计为失败，重新运行时再次下载"""
+    days = ["2024-02-01", "2024-02-02"]
+    for label in days:
+        archive_server.files[_path("daily", label)] = _zip_csv([label])
+
+    downloader = BinanceDownloader(save_dir=tmp_path, symbols=[], archive_base_url=archive_server.url)
+    tasks = downloader.plan_archive_tasks("BTCUSDT", "1h", days)
+    state_path = tmp_path / "state.json"
+
+    async def save(task, df):
+        if task.label == "2024-02-02":
+            raise RuntimeError("写入失败")
+
+    async with ArchiveDownloader(state_path=state_path) as engine:
+        stats = await engine.download(tasks, downloader.parse_kline_csv, on_result=save)
+    assert stats == {"downloaded": 1, "skipped": 0, "missing": 0, "failed": 1}
+
+    received = []
+    async with ArchiveDownloader(state_path=state_path) as engine:
+        stats = await engine.download(tasks, downloader.parse_kline_csv, on_result=lambda t, df: received.append(t.label))
+    assert stats == {"downloaded": 1, "skipped": 1, "missing": 0, "failed": 0}
+    assert received == ["2024-02-02"]
+
+
+async def test_okx_pages_are_fetched_concurrently(tmp_path):
+    """OKX按单页条数切分时间范围，分页结果合并为连续K线"""
+    hour_ms = 60 * MINUTE_MS
+    requests = []
+
+    async def candles(request):
+        requests.append(dict(request.query))
+        after, before = int(request.query["after"]), int(request.query["before"])
+        first = (before // hour_ms + 1) * hour_ms
+        rows = [[str(ts), "1", "2", "0.5", "1.5", "10", "15", "15", "1"] for ts in range(first, after, hour_ms)]
+        return web.json_response({"code": "0", "msg": "", "data": rows[::-1][:100]})
+
+    app = web.Application()
+    app.router.add_get("/api/v5/market/history-candles", candles)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        downloader = OKXDownloader(
+            save_dir=tmp_path, symbols=["BTC-USDT"],
+            base_url=f"http://127.0.0.1:{runner.addresses[0][1]}/api/v5/market",
+        )
+        df = await downloader.download_async("BTC-USDT", "1h", "2024-01-01", "2024-01-11")
+    finally:
+        await runner.cleanup()
+
+    assert len(requests) == 3
+    assert {r["bar"] for r in requests} == {"1H"}
+    assert len(df) == 10 * 24 + 1
+    assert df["open_time"].diff().dropna().eq(hour_ms * 1_000_000).all()
+    assert df["open_time"].iloc[0] == _day_ms("2024-01-01") * 1_000_000
+
+
+async def test_okx_failed_page_keeps_other_pages(tmp_path):
+    """单页下载失败时保留其余分页，并在结果中报告失败的时间范围"""
+    hour_ms = 60 * MINUTE_MS
+    # 第二页：从第100根K线开始的100根
+    failing_before = _day_ms("2024-01-01") + 100 * hour_ms - 1
+    hits = []
+
+    async def candles(request):
+        after, before = int(request.query["after"]), int(request.query["before"])
+        hits.append(before)
+        if before == failing_before:
+            return web.Response(status=400)
+        first = (before // hour_ms + 1) * hour_ms
+        rows = [[str(ts), "1", "2", "0.5", "1.5", "10", "15", "15", "1"] for ts in range(first, after, hour_ms)]
+        return web.json_response({"code": "0", "msg": "", "data": rows[::-1][:100]})
+
+    app = web.Application()
+    app.router.add_get("/api/v5/market/history-candles", candles)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        downloader = OKXDownloader(
+            save_dir=tmp_path, symbols=["BTC-USDT"], request_rate=1000,
+            base_url=f"http://127.0.0.1:{runner.addresses[0][1]}/api/v5/market",
+        )
+        df = await downloader.download_async("BTC-USDT", "1h", "2024-01-01", "2024-01-11")
+    finally:
+        await runner.cleanup()
+
+    page_start = failing_before + 1
+    assert df.attrs["failed_ranges"] == [(page_start, page_start + 100 * hour_ms - 1)]
+    assert len(df) == 10 * 24 + 1 - 100
+    # 失败的分页在其余分页完成后再请求一轮
+    assert hits.count(failing_before) == 2
+
+
+async def test_rate_limit_spaces_requests(archive_server):
+    """按 rate_limit 均匀分配请求的发出时间"""
+    import time
+
+    archive_server.files["/x"] = b"{}"
+    async with ArchiveDownloader(concurrency=8, rate_limit=20) as engine:
+        started = time.monotonic()
+        await asyncio.gather(*(engine.fetch_json(f"{archive_server.url}/x") for _ in range(5)))
+        elapsed = time.monotonic() - started
+    assert elapsed >= 0.19
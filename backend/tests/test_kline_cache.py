@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+进程级K线缓存测试
+
+验证子区间切片命中、只加载缺口并合并相邻段、未收线K线不缓存、
+按字节预算LRU淘汰，以及写入数据库/数据湖后缓存失效
+"""
+
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from collector.db import kline_cache
+from collector.db.kline_cache import KlineCache, get_kline_cache, read_cached_klines
+from collector.db.kline_lake import KlineLake
+from collector.db.kline_reader import KlineArrays
+from collector.db.kline_writer import upsert_klines
+from collector.db.models import CryptoSpotKline
+
+
+BASE_TS = 1_700_000_000_000_000_000
+HOUR_NS = 3_600_000_000_000
+
+
+class _Source:
+    """按小时生成K线并记录加载的时间范围"""
+
+    def __init__(self, count=1000):
+        self.count = count
+        self.calls = []
+
+    def __call__(self, start_ns, end_ns):
+        self.calls.append((start_ns, end_ns))
+        ts = BASE_TS + np.arange(self.count, dtype=np.int64) * HOUR_NS
+        ts = ts[(ts >= start_ns) & (ts <= end_ns)]
+        close = ((ts - BASE_TS) // HOUR_NS).astype(np.float64)
+        return KlineArrays(ts=ts, open=close, high=close + 1, low=close - 1, close=close, volume=np.ones(len(ts)))
+
+
+def _hour(i):
+    return BASE_TS + i * HOUR_NS
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """替换进程级单例，测试之间互不影响"""
+    cache = KlineCache(max_bytes=64 * 1024 * 1024)
+    monkeypatch.setattr(kline_cache, "_kline_cache", cache)
+    return cache
+
+
+class TestKlineCache:
+    """KlineCache 测试类"""
+
+    def test_sub_range_is_sliced_from_cache(self, cache):
+        """已覆盖范围内的子区间直接切片，不再调用加载函数"""
+        source = _Source()
+        full = cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(499), source)
+        assert len(full) == 500 and len(source.calls) == 1
+
+        part = cache.get("binance", "spot", "BTC/USDT", "1h", _hour(100), _hour(199), source)
+        assert len(source.calls) == 1
+        assert part.ts[0] == _hour(100) and part.ts[-1] == _hour(199)
+        assert np.array_equal(part.close, np.arange(100, 200, dtype=np.float64))
+        # 切片为只读视图
+        assert not part.close.flags.writeable
+        assert cache.stats()["hits"] == 1
+
+    def test_only_gaps_are_loaded_and_segments_merge(self, cache):
+        """只加载缺口，相邻/重叠的段合并为一段"""
+        source = _Source()
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(99), source)
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(200), _hour(299), source)
+        assert cache.stats()["segments"] == 2
+
+        arrays = cache.get("binance", "spot", "BTCUSDT", "1h", _hour(50), _hour(349), source)
+        assert source.calls[2:] == [(_hour(99) + 1, _hour(200) - 1), (_hour(299) + 1, _hour(349))]
+        assert np.array_equal(arrays.close, np.arange(50, 350, dtype=np.float64))
+        assert cache.stats()["segments"] == 1
+
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(349), source)
+        assert len(source.calls) == 4
+
+    def test_unsettled_and_empty_ranges_are_not_cached(self, cache):
+        """最近一个周期内的K线和空结果不计入覆盖范围，下次重新加载"""
+        source = _Source()
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(-100), _hour(-1), source)
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(-100), _hour(-1), source)
+        assert len(source.calls) == 2
+
+        # 截止到当前时间的请求只缓存到一个周期之前
+        cache.get("binance", "spot", "BTCUSDT", "1m", _hour(0), None, source)
+        segment = cache._entries[("binance", "spot", "BTCUSDT", "1m")].segments[0]
+        assert segment.end <= time.time_ns() - 60_000_000_000
+
+    def test_lru_eviction_by_bytes(self, cache):
+        """超出字节预算时淘汰最久未使用的键"""
+        source = _Source()
+        one_key = cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(99), source).nbytes
+        cache.max_bytes = one_key * 2
+        cache.get("binance", "spot", "ETHUSDT", "1h", _hour(0), _hour(99), source)
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(9), source)
+        cache.get("binance", "spot", "SOLUSDT", "1h", _hour(0), _hour(99), source)
+
+        keys = {key[2] for key in cache._entries}
+        assert keys == {"BTCUSDT", "SOLUSDT"}
+        assert cache.nbytes <= cache.max_bytes
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_matches_range(self, cache):
+        """失效只丢弃与时间范围相交的段"""
+        source = _Source()
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(0), _hour(99), source)
+        cache.get("binance", "spot", "BTCUSDT", "1h", _hour(200), _hour(299), source)
+
+        assert cache.invalidate(market="spot", symbol="BTC/USDT", interval="1h",
+                                start_ns=_hour(250), end_ns=_hour(250)) == 1
+        assert cache.invalidate(market="futures") == 0
+        assert [s.start for s in cache._entries[("binance", "spot", "BTCUSDT", "1h")].segments] == [_hour(0)]
+
+
+def test_db_write_invalidates_cache(cache, tmp_path):
+    """upsert_klines 写入后缓存失效，再次读取得到新数据"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    CryptoSpotKline.__table__.create(engine)
+    table = CryptoSpotKline.__tablename__
+    rows = [("BTCUSDT", "1h", _hour(i), 1.0, 1.0, 1.0, float(i), 1.0) for i in range(10)]
+
+    with sessionmaker(bind=engine)() as session:
+        upsert_klines(session, table, rows)
+        session.commit()
+        assert len(read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(9), conn=session)) == 10
+
+        upsert_klines(session, table, [("BTCUSDT", "1h", _hour(5), 1.0, 1.0, 1.0, 50.0, 1.0)])
+        session.commit()
+        arrays = read_cached_klines("BTC/USDT", "1h", _hour(0), _hour(9), conn=session)
+        assert arrays.close[5] == 50.0
+    engine.dispose()
+    assert get_kline_cache() is cache
+
+
+def test_db_write_invalidates_after_commit(cache, tmp_path):
+    """缓存在写入方提交后失效，提交前读入的旧数据不会留在缓存中；回滚不失效"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    CryptoSpotKline.__table__.create(engine)
+    table = CryptoSpotKline.__tablename__
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        upsert_klines(session, table, [("BTCUSDT", "1h", _hour(i), 1.0, 1.0, 1.0, float(i), 1.0) for i in range(10)])
+        session.commit()
+
+    with Session() as writer, Session() as reader:
+        upsert_klines(writer, table, [("BTCUSDT", "1h", _hour(5), 1.0, 1.0, 1.0, 50.0, 1.0)])
+        assert read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(9), conn=reader).close[5] == 5.0
+        writer.commit()
+        assert read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(9), conn=reader).close[5] == 50.0
+
+        upsert_klines(writer, table, [("BTCUSDT", "1h", _hour(5), 1.0, 1.0, 1.0, 70.0, 1.0)])
+        writer.rollback()
+        loads = cache.stats()["loads"]
+        assert read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(9), conn=reader).close[5] == 50.0
+        assert cache.stats()["loads"] == loads
+    engine.dispose()
+
+
+def test_lake_write_invalidates_cache(cache, tmp_path):
+    """数据湖写入后缓存失效"""
+    lake = KlineLake(tmp_path / "lake")
+    lake.write(_Source(10)(_hour(0), _hour(9)), "binance", "spot", "BTCUSDT", "1h")
+    assert len(read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(19), kline_lake=lake)) == 10
+
+    lake.write(_Source(20)(_hour(10), _hour(19)), "binance", "spot", "BTCUSDT", "1h")
+    assert len(read_cached_klines("BTCUSDT", "1h", _hour(0), _hour(19), kline_lake=lake)) == 20
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+K线覆盖索引测试
+
+验证区间运算、写入时维护索引、缺口核实时补录索引、删除后丢弃索引，
+以及健康检查由相邻时间戳之差计算缺口
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from collector.db.database import fix_duckdb_serial_type
+from collector.db.kline_coverage import (
+    COVERAGE_TABLE,
+    drop_coverage,
+    find_missing_ranges,
+    load_coverage,
+    merge_ranges,
+    missing_from_timestamps,
+    missing_ranges,
+    runs_from_timestamps,
+    update_coverage,
+)
+from collector.db.kline_writer import upsert_klines
+from collector.db.models import CryptoSpotKline
+
+
+# 对齐到整点，缺口端点落在UTC周期网格上
+BASE_TS = 1_699_999_200_000_000_000
+HOUR_NS = 3_600_000_000_000
+TABLE = CryptoSpotKline.__tablename__
+
+
+def _hour(i):
+    return BASE_TS + i * HOUR_NS
+
+
+def _rows(hours, symbol="BTCUSDT"):
+    return [(symbol, "1h", _hour(i), 100.0, 110.0, 90.0, 105.0, 1.0) for i in hours]
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def session_factory(request, tmp_path):
+    """创建空K线表并返回会话工厂"""
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb_engine")
+        engine = create_engine(f"duckdb:///{tmp_path / 'klines.duckdb'}")
+        event.listen(engine, "before_cursor_execute", fix_duckdb_serial_type, retval=True)
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    CryptoSpotKline.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+class TestRangeMath:
+    """区间运算测试类"""
+
+    def test_runs_and_merge(self):
+        """时间戳拆分为连续段，相接的区间合并"""
+        ts = np.array([_hour(i) for i in (0, 1, 2, 5, 6, 9)], dtype=np.int64)
+        runs = runs_from_timestamps(ts, HOUR_NS)
+        assert runs == [(_hour(0), _hour(2)), (_hour(5), _hour(6)), (_hour(9), _hour(9))]
+        assert merge_ranges(runs + [(_hour(3), _hour(4))], HOUR_NS) == [(_hour(0), _hour(6)), (_hour(9), _hour(9))]
+
+    def test_missing_ranges_are_grid_aligned(self):
+        """缺口端点对齐到周期网格"""
+        covered = [(_hour(2), _hour(4)), (_hour(7), _hour(7))]
+        gaps = missing_ranges(covered, _hour(0) - 1, _hour(9) + 1, HOUR_NS)
+        assert gaps == [(_hour(0), _hour(1)), (_hour(5), _hour(6)), (_hour(8), _hour(9))]
+        assert missing_ranges([(_hour(0), _hour(9))], _hour(0), _hour(9), HOUR_NS) == []
+
+
+    def test_missing_from_timestamps(self):
+        """由已读出的K线计算缺口，尚未收线的K线不算缺失"""
+        ts = np.array([_hour(i) for i in (1, 2, 5)], dtype=np.int64)
+        assert missing_from_timestamps(ts, "1h", _hour(0), _hour(6)) == [
+            (_hour(0), _hour(0)), (_hour(3), _hour(4)), (_hour(6), _hour(6))
+        ]
+        assert missing_from_timestamps(ts[:2], "1h") == []
+        gaps = missing_from_timestamps(ts[:2], "1h", _hour(1), 2**62)
+        assert gaps[0][0] == _hour(3) and gaps[0][1] <= time.time_ns() - HOUR_NS
+        assert missing_from_timestamps(ts[:0], "1h", _hour(0), _hour(6)) == [(_hour(0), _hour(6))]
+
+
+class TestCoverageIndex:
+    """覆盖索引读写测试类"""
+
+    def test_upsert_maintains_index(self, session_factory):
+        """upsert_klines 在同一事务内把写入的K线并入索引"""
+        with session_factory() as session:
+            upsert_klines(session, TABLE, _rows(range(0, 5)))
+            upsert_klines(session, TABLE, _rows(range(8, 10)))
+            session.commit()
+            assert load_coverage(session, TABLE, "BTCUSDT", "1h") == [(_hour(0), _hour(4)), (_hour(8), _hour(9))]
+
+            # 填平缺口后两段合并为一段，起点不变的行只更新终点
+            upsert_klines(session, TABLE, _rows(range(5, 8)))
+            session.commit()
+            assert load_coverage(session, TABLE, "BTCUSDT", "1h") == [(_hour(0), _hour(9))]
+            assert find_missing_ranges(session, TABLE, "BTCUSDT", "1h", _hour(0), _hour(9)) == []
+
+    def test_rollback_discards_index(self, session_factory):
+        """索引跟随调用方事务，回滚后不保留"""
+        with session_factory() as session:
+            upsert_klines(session, TABLE, _rows(range(3)))
+            session.rollback()
+            assert load_coverage(session, TABLE, "BTCUSDT", "1h") == []
+
+    def test_unindexed_writes_are_verified(self, session_factory):
+        """未维护索引的写入路径写入的K线，在核实缺口时补录索引"""
+        with session_factory() as session:
+            update_coverage(session, TABLE, "BTCUSDT", "1h", [_hour(i) for i in range(3)])
+            # 绕过索引直接写入
+            for i in (3, 4, 7):
+                session.execute(text(
+                    f'INSERT INTO {TABLE} (id, symbol, "interval", "timestamp", open, high, low, close, volume, '
+                    f"unique_kline, data_source) VALUES (:id, 'BTCUSDT', '1h', :ts, 1, 1, 1, 1, 1, :key, 'test')"
+                ), {"id": i + 1, "ts": _hour(i), "key": f"BTCUSDT_1h_{_hour(i)}"})
+            session.commit()
+
+            gaps = find_missing_ranges(session, TABLE, "BTCUSDT", "1h", _hour(0), _hour(9))
+            session.commit()
+
+            assert gaps == [(_hour(5), _hour(6)), (_hour(8), _hour(9))]
+            assert load_coverage(session, TABLE, "BTCUSDT", "1h") == [(_hour(0), _hour(4)), (_hour(7), _hour(7))]
+
+    def test_grid_follows_existing_klines(self, session_factory):
+        """不在UTC整点开盘的K线，缺口按已有K线的网格计算"""
+        shift = 30 * 60 * 1_000_000_000
+        with session_factory() as session:
+            update_coverage(session, TABLE, "BTCUSDT", "1h", [_hour(i) + shift for i in (0, 1, 4)])
+
+            gaps = find_missing_ranges(session, TABLE, "BTCUSDT", "1h", _hour(0), _hour(6))
+            assert gaps == [(_hour(2) + shift, _hour(3) + shift), (_hour(5) + shift, _hour(5) + shift)]
+
+    def test_drop_coverage(self, session_factory):
+        """删除K线后丢弃索引，只影响指定的周期"""
+        with session_factory() as session:
+            update_coverage(session, TABLE, "BTCUSDT", "1h", [_hour(0)])
+            update_coverage(session, TABLE, "BTCUSDT", "4h", [_hour(0)])
+            drop_coverage(session, TABLE, "BTCUSDT", "1h")
+            session.commit()
+
+            rows = session.execute(text(f'SELECT "interval" FROM {COVERAGE_TABLE}')).fetchall()
+            assert [row[0] for row in rows] == ["4h"]
+
+
+class TestHealthContinuity:
+    """健康检查连续性测试类"""
+
+    def test_gaps_from_timestamp_diffs(self):
+        """缺失的K线由相邻时间戳之差得出"""
+        from collector.services.kline_health_service import KlineHealthChecker
+
+        # 连续性检查不访问数据库
+        checker = KlineHealthChecker.__new__(KlineHealthChecker)
+        df = pd.DataFrame({"timestamp": [_hour(i) for i in (0, 1, 2, 5, 6, 9)]})
+        result = checker.check_continuity(df, "1h")
+
+        assert result["status"] == "fail"
+        assert result["expected_records"] == 10
+        assert result["missing_records"] == 4
+        assert result["missing_periods"] == [str(pd.Timestamp(_hour(i))) for i in (3, 4, 7, 8)]
+        assert [r["count"] for r in result["missing_time_ranges"]] == [2, 2]
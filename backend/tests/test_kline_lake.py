@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+K线数据湖测试
+
+验证分区写入、清单、合并去重以及按时间范围的文件/行组裁剪读取
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from collector.db.kline_lake import KlineLake, get_default_kline_lake
+from collector.db.kline_reader import KlineArrays
+
+
+MINUTE_NS = 60_000_000_000
+# 2024-01-31 23:00:00 UTC，写入跨越1月与2月两个分区
+BASE_TS = int(pd.Timestamp("2024-01-31 23:00:00").value)
+
+
+def _arrays(n, start=BASE_TS, close_offset=0.0):
+    ts = start + np.arange(n, dtype=np.int64) * MINUTE_NS
+    close = np.arange(n, dtype=np.float64) + close_offset
+    return KlineArrays(ts=ts, open=close, high=close + 1, low=close - 1, close=close, volume=np.ones(n))
+
+
+@pytest.fixture
+def lake(tmp_path):
+    """创建行组较小的数据湖，便于验证行组裁剪"""
+    return KlineLake(tmp_path / "lake", row_group_size=16)
+
+
+class TestKlineLake:
+    """KlineLake 测试类"""
+
+    def test_write_partitions_by_month(self, lake):
+        """按年月分区写入，清单记录每个文件的时间范围"""
+        assert lake.write(_arrays(120), "binance", "spot", "BTC/USDT", "1m") == 120
+
+        files = lake.manifest("binance", "spot", "BTCUSDT", "1m")
+        assert [(f.year, f.month) for f in files] == [(2024, 1), (2024, 2)]
+        assert files[0].rows == 60 and files[1].rows == 60
+        assert files[0].max_ts == BASE_TS + 59 * MINUTE_NS
+        assert files[1].min_ts == BASE_TS + 60 * MINUTE_NS
+
+        dataset_dir = lake.dataset_dir("binance", "spot", "BTCUSDT", "1m")
+        assert (dataset_dir / "year=2024" / "month=02" / "part.parquet").exists()
+        manifest = json.loads((dataset_dir / "_manifest.json").read_text(encoding="utf-8"))
+        assert len(manifest["files"]) == 2
+
+    def test_read_range_is_inclusive_and_sorted(self, lake):
+        """范围读取为闭区间，跨分区结果按时间升序拼接"""
+        lake.write(_arrays(120), "binance", "spot", "BTCUSDT", "1m")
+
+        arrays = lake.read(
+            "binance", "spot", "BTCUSDT", "1m",
+            start_ns=BASE_TS + 50 * MINUTE_NS, end_ns=BASE_TS + 70 * MINUTE_NS,
+        )
+
+        assert len(arrays) == 21
+        np.testing.assert_array_equal(arrays.close, np.arange(50, 71, dtype=np.float64))
+        assert lake.read("binance", "spot", "BTCUSDT", "1m").ts.size == 120
+
+    def test_manifest_prunes_files(self, lake):
+        """不相交的分区文件不会被读取"""
+        lake.write(_arrays(120), "binance", "spot", "BTCUSDT", "1m")
+
+        files = lake.files("binance", "spot", "BTCUSDT", "1m", start_ns=BASE_TS + 100 * MINUTE_NS)
+
+        assert [(f.year, f.month) for f in files] == [(2024, 2)]
+
+    def test_row_groups_carry_statistics(self, lake):
+        """分区文件按行组写入并带有时间戳统计信息"""
+        lake.write(_arrays(120), "binance", "spot", "BTCUSDT", "1m")
+        path = lake.dataset_dir("binance", "spot", "BTCUSDT", "1m") / "year=2024/month=02/part.parquet"
+
+        metadata = pq.ParquetFile(path).metadata
+        assert metadata.num_row_groups == 4
+        stats = metadata.row_group(1).column(0).statistics
+        assert stats.min == BASE_TS + 76 * MINUTE_NS
+
+    def test_rewrite_merges_and_overrides(self, lake):
+        """重复写入同一分区时合并去重，新数据覆盖旧数据"""
+        lake.write(_arrays(30), "binance", "spot", "BTCUSDT", "1m")
+        lake.write(_arrays(10, start=BASE_TS + 25 * MINUTE_NS, close_offset=1000), "binance", "spot", "BTCUSDT", "1m")
+
+        arrays = lake.read("binance", "spot", "BTCUSDT", "1m")
+
+        assert len(arrays) == 35
+        assert np.all(np.diff(arrays.ts) == MINUTE_NS)
+        assert arrays.close[24] == 24.0
+        assert arrays.close[25] == 1000.0
+
+    def test_write_dataframe_with_millisecond_timestamps(self, lake):
+        """DataFrame中的毫秒级时间戳统一转换为纳秒级"""
+        df = pd.DataFrame({
+            "open_time": [BASE_TS // 1_000_000, BASE_TS // 1_000_000 + 60_000],
+            "open": ["1", "2"], "high": [1, 2], "low": [1, 2], "close": [1, 2], "volume": [5, 6],
+        })
+        lake.write(df, "binance", "futures", "ETHUSDT", "1m")
+
+        frame = lake.read_dataframe("binance", "perpetual", "ETHUSDT", "1m")
+        assert frame.index[0].value == BASE_TS
+        assert list(frame["Open"]) == [1.0, 2.0]
+
+    def test_missing_dataset(self, lake):
+        """不存在的数据集返回空结果"""
+        assert len(lake.read("binance", "spot", "DOGEUSDT", "1m")) == 0
+        assert lake.coverage("binance", "spot", "DOGEUSDT", "1m") is None
+
+
+def test_default_lake_follows_kline_source(monkeypatch, tmp_path):
+    """仅当 KLINE_SOURCE=lake 时启用默认数据湖"""
+    monkeypatch.delenv("KLINE_SOURCE", raising=False)
+    assert get_default_kline_lake() is None
+
+    monkeypatch.setenv("KLINE_SOURCE", "lake")
+    monkeypatch.setenv("KLINE_LAKE_DIR", str(tmp_path))
+    assert get_default_kline_lake().root == tmp_path
+
+
+def test_data_manager_preloads_from_lake(lake):
+    """DataManager 配置数据湖后直接从数据湖预加载，不访问数据服务"""
+    from backtest.data_manager import DataManager
+
+    lake.write(_arrays(120), "binance", "spot", "BTCUSDT", "1h")
+
+    class _NoDataService:
+        def get_kline_data(self, **kwargs):
+            raise AssertionError("不应访问数据库")
+
+    manager = DataManager(_NoDataService(), kline_lake=lake)
+    manager.preload_data(
+        "BTCUSDT", "1h",
+        pd.Timestamp(BASE_TS).to_pydatetime(), pd.Timestamp(BASE_TS + 119 * MINUTE_NS).to_pydatetime(),
+        preload_intervals=["1h"],
+    )
+
+    df = manager.get_data("BTCUSDT", "1h")
+    assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+    assert df.index.name == "datetime"
+
+
+def test_concurrent_writers_share_manifest(tmp_path):
+    """每次新建实例的并发写入串行化，清单保留所有分区"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def write(month):
+        start = int(pd.Timestamp(f"2024-{month:02d}-01").value)
+        KlineLake(tmp_path / "lake").write(_arrays(10, start=start), "binance", "spot", "BTCUSDT", "1m")
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(write, range(1, 13)))
+
+    files = KlineLake(tmp_path / "lake").manifest("binance", "spot", "BTCUSDT", "1m")
+    assert [entry.month for entry in files] == list(range(1, 13))
+
+
+def test_data_manager_falls_back_when_lake_is_partial(lake, monkeypatch):
+    """数据湖只覆盖部分时间范围时回退到数据库加载，不截断数据"""
+    from backtest.data_manager import DataManager
+    from collector.db.kline_cache import get_kline_cache
+
+    get_kline_cache().clear()
+    hour_ns = 60 * MINUTE_NS
+    start = int(pd.Timestamp("2024-03-01").value)
+    ts = start + np.arange(10, dtype=np.int64) * hour_ns
+    ones = np.ones(10)
+    lake.write(KlineArrays(ts=ts, open=ones, high=ones, low=ones, close=ones, volume=ones),
+               "binance", "futures", "BTCUSDT", "1h")
+
+    loaded = []
+    monkeypatch.setattr(
+        DataManager, "_load_from_db",
+        lambda self, symbol, interval, start_time, end_time: loaded.append((interval, self.crypto_type)) or pd.DataFrame({"close": [1.0]}),
+    )
+    manager = DataManager(None, kline_lake=lake, crypto_type="future")
+    start_time = pd.Timestamp(start).to_pydatetime()
+
+    # 数据湖完整覆盖前10小时
+    manager.preload_data("BTCUSDT", "1h", start_time, pd.Timestamp(int(ts[-1])).to_pydatetime(),
+                         preload_intervals=["1h"], ensure_integrity=False)
+    assert len(manager.get_data("BTCUSDT", "1h")) == 10 and loaded == []
+
+    manager.data_cache.clear()
+    manager.preload_data("BTCUSDT", "1h", start_time, pd.Timestamp(start + 19 * hour_ns).to_pydatetime(),
+                         preload_intervals=["1h"], ensure_integrity=False)
+    assert loaded == [("1h", "future")]
+    get_kline_cache().clear()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+K线列式读取层测试
+
+验证 read_kline_arrays 在SQLite与DuckDB上的过滤、排序、最新N条和格式转换
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from collector.db.database import fix_duckdb_serial_type
+from collector.db.kline_reader import KlineArrays, get_kline_table, read_kline_arrays
+from collector.db.models import CryptoFutureKline, CryptoSpotKline
+
+
+BASE_TS = 1_700_000_000_000_000_000
+HOUR_NS = 3_600_000_000_000
+
+
+def _make_session(url):
+    engine = create_engine(url)
+    if url.startswith("duckdb"):
+        event.listen(engine, "before_cursor_execute", fix_duckdb_serial_type, retval=True)
+    CryptoSpotKline.__table__.create(engine)
+    CryptoFutureKline.__table__.create(engine)
+
+    session = sessionmaker(bind=engine)()
+    # 乱序插入，验证读取结果按时间升序
+    for i in (3, 0, 4, 1, 2):
+        ts = BASE_TS + i * HOUR_NS
+        session.add(CryptoSpotKline(
+            id=i + 1, symbol="BTCUSDT", interval="1h", timestamp=ts,
+            open=100.0 + i, high=110.0 + i, low=90.0 + i, close=105.0 + i, volume=10.0 * i,
+            unique_kline=f"BTCUSDT_1h_{ts}", data_source="test",
+        ))
+    session.add(CryptoSpotKline(
+        id=100, symbol="ETHUSDT", interval="1h", timestamp=BASE_TS,
+        open=1.0, high=1.0, low=1.0, close=1.0, volume=1.0,
+        unique_kline=f"ETHUSDT_1h_{BASE_TS}", data_source="test",
+    ))
+    session.add(CryptoFutureKline(
+        id=1, symbol="BTCUSDT", interval="1h", timestamp=BASE_TS,
+        open=200.0, high=200.0, low=200.0, close=200.0, volume=1.0,
+        unique_kline=f"BTCUSDT_1h_{BASE_TS}", data_source="test",
+    ))
+    session.commit()
+    return engine, session
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def kline_session(request, tmp_path):
+    """创建包含测试K线数据的数据库会话"""
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb_engine")
+        url = f"duckdb:///{tmp_path / 'klines.duckdb'}"
+    else:
+        url = f"sqlite:///{tmp_path / 'klines.db'}"
+    engine, session = _make_session(url)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestReadKlineArrays:
+    """read_kline_arrays 测试类"""
+
+    def test_reads_sorted_typed_columns(self, kline_session):
+        """返回按时间升序的int64/float64列"""
+        arrays = read_kline_arrays(kline_session, "BTCUSDT", "1h")
+
+        assert len(arrays) == 5
+        assert arrays.ts.dtype == np.int64
+        assert arrays.close.dtype == np.float64
+        np.testing.assert_array_equal(arrays.ts, BASE_TS + np.arange(5) * HOUR_NS)
+        np.testing.assert_array_equal(arrays.close, 105.0 + np.arange(5))
+
+    def test_time_range_and_symbol_variants(self, kline_session):
+        """时间范围为闭区间，支持多个symbol写法"""
+        arrays = read_kline_arrays(
+            kline_session, ["BTC/USDT", "BTCUSDT"], "1h",
+            start_ns=BASE_TS + HOUR_NS, end_ns=BASE_TS + 3 * HOUR_NS,
+        )
+
+        np.testing.assert_array_equal(arrays.open, [101.0, 102.0, 103.0])
+
+    def test_latest_limit(self, kline_session):
+        """latest=True时返回最新的limit条，仍按时间升序"""
+        arrays = read_kline_arrays(kline_session, "BTCUSDT", "1h", limit=2, latest=True)
+
+        np.testing.assert_array_equal(arrays.ts, [BASE_TS + 3 * HOUR_NS, BASE_TS + 4 * HOUR_NS])
+
+    def test_market_table_selection(self, kline_session):
+        """按crypto_type或表名选择期货表"""
+        by_type = read_kline_arrays(kline_session, "BTCUSDT", "1h", crypto_type="future")
+        by_table = read_kline_arrays(kline_session, "BTCUSDT", "1h", table="crypto_future_klines")
+
+        assert by_type.close.tolist() == by_table.close.tolist() == [200.0]
+
+    def test_empty_result(self, kline_session):
+        """无数据时返回空数组"""
+        arrays = read_kline_arrays(kline_session, "DOGEUSDT", "1h")
+
+        assert len(arrays) == 0
+        assert arrays.to_dataframe().empty
+        assert arrays.to_records() == []
+
+    def test_conversions(self, kline_session):
+        """DataFrame以时间为索引，字典列表使用毫秒时间戳"""
+        arrays = read_kline_arrays(kline_session, "BTCUSDT", "1h", limit=1, latest=True)
+
+        df = arrays.to_dataframe()
+        assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+        assert df.index[0].value == BASE_TS + 4 * HOUR_NS
+
+        record = arrays.to_records()[0]
+        assert record["timestamp"] == (BASE_TS + 4 * HOUR_NS) // 1_000_000
+        assert record["close"] == 109.0
+
+
+def test_unknown_table_rejected():
+    """不支持的市场类型或表名抛出ValueError"""
+    assert get_kline_table("crypto", "future") == "crypto_future_klines"
+    with pytest.raises(ValueError):
+        get_kline_table("forex", None)
+    with pytest.raises(ValueError):
+        read_kline_arrays(object(), "BTCUSDT", "1h", table="users")
+
+
+def test_empty_arrays():
+    """空K线数组的长度与内存占用为0"""
+    empty = KlineArrays.empty()
+    assert len(empty) == 0
+    assert empty.nbytes == 0
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+K线重采样测试
+
+验证向量化聚合与 pandas resample 结果一致、周线/月线边界、
+重采样结果的缓存与失效，以及 DataManager 只加载最细周期
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from collector.db import kline_cache
+from collector.db.kline_cache import KlineCache, read_resampled_klines
+from collector.db.kline_lake import KlineLake
+from collector.db.kline_reader import KlineArrays
+from collector.db.kline_resample import bucket_bounds, can_resample, resample_kline_arrays
+
+
+MINUTE_NS = 60_000_000_000
+# 2024-01-31 22:17 UTC（星期三），跨越日、周与月边界
+BASE_TS = int(pd.Timestamp("2024-01-31 22:17:00").value)
+
+
+def _arrays(n, start=BASE_TS, step=MINUTE_NS):
+    rng = np.random.default_rng(7)
+    ts = start + np.arange(n, dtype=np.int64) * step
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return KlineArrays(
+        ts=ts, open=close - 0.5, high=close + rng.uniform(0, 2, n), low=close - rng.uniform(0, 2, n),
+        close=close, volume=rng.uniform(1, 10, n),
+    )
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """替换进程级单例，测试之间互不影响"""
+    cache = KlineCache(max_bytes=64 * 1024 * 1024)
+    monkeypatch.setattr(kline_cache, "_kline_cache", cache)
+    return cache
+
+
+@pytest.mark.parametrize("interval, rule", [("5m", "5min"), ("1h", "1h"), ("4h", "4h"), ("1d", "1D")])
+def test_resample_matches_pandas(interval, rule):
+    """聚合结果与 pandas resample 一致"""
+    arrays = _arrays(3000)
+    # 去掉一段K线，缺口所在周期只由现有K线聚合
+    keep = np.ones(len(arrays), dtype=bool)
+    keep[500:700] = False
+    arrays = KlineArrays(**{name: getattr(arrays, name)[keep] for name in ("ts", "open", "high", "low", "close", "volume")})
+
+    expected = arrays.to_dataframe().resample(rule).agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    ).dropna()
+    result = resample_kline_arrays(arrays, interval).to_dataframe()
+
+    assert np.array_equal(result.index.values, expected.index.values)
+    assert np.allclose(result.values, expected.values)
+
+
+def test_week_and_month_bounds():
+    """周线从星期一开始，月线按自然月"""
+    week_start, week_end = bucket_bounds(BASE_TS, "1w")
+    assert pd.Timestamp(week_start) == pd.Timestamp("2024-01-29")
+    assert week_end - week_start == 7 * 1440 * MINUTE_NS
+
+    month_start, month_end = bucket_bounds(BASE_TS, "1M")
+    assert (pd.Timestamp(month_start), pd.Timestamp(month_end)) == (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01"))
+
+    days = resample_kline_arrays(_arrays(40, step=1440 * MINUTE_NS), "1M")
+    assert [str(pd.Timestamp(ts).date()) for ts in days.ts] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+
+
+def test_can_resample():
+    """目标周期必须由完整的基础周期组成"""
+    assert can_resample("1m", "1h") and can_resample("1h", "1w") and can_resample("1d", "1M")
+    assert not can_resample("1h", "1m")
+    assert not can_resample("1h", "1h")
+    assert not can_resample("3d", "1w")
+    assert not can_resample("1m", "bad")
+
+
+def test_resampled_klines_are_cached_and_invalidated(cache, tmp_path):
+    """重采样结果按段缓存，基础周期写入后一并失效"""
+    lake = KlineLake(tmp_path / "lake")
+    lake.write(_arrays(600), "binance", "spot", "BTCUSDT", "1m")
+    start, end = BASE_TS, BASE_TS + 599 * MINUTE_NS
+
+    hourly = read_resampled_klines("BTCUSDT", "1h", "1m", start, end, kline_lake=lake)
+    # 首根K线开盘时间早于开始时间，不在结果中
+    assert pd.Timestamp(hourly.ts[0]) == pd.Timestamp("2024-01-31 23:00")
+    assert ("binance", "spot", "BTCUSDT", "1h@1m") in cache._entries
+
+    loads = cache.stats()["loads"]
+    read_resampled_klines("BTCUSDT", "1h", "1m", start, end, kline_lake=lake)
+    assert cache.stats()["loads"] == loads
+
+    lake.write(_arrays(1, start=BASE_TS + 103 * MINUTE_NS), "binance", "spot", "BTCUSDT", "1m")
+    assert ("binance", "spot", "BTCUSDT", "1h@1m") not in cache._entries
+
+
+def test_base_write_invalidates_enclosing_bucket(cache, tmp_path):
+    """基础周期写入点晚于缓存段的最后一根聚合K线开盘时间时，所在周期的聚合K线同样失效"""
+    lake = KlineLake(tmp_path / "lake")
+    lake.write(_arrays(600), "binance", "spot", "BTCUSDT", "1m")
+    hour = int(pd.Timestamp("2024-02-01 01:00").value)
+
+    before = read_resampled_klines("BTCUSDT", "1h", "1m", hour, hour, kline_lake=lake)
+    assert before.ts.tolist() == [hour]
+
+    rewrite = _arrays(1, start=hour + 30 * MINUTE_NS)
+    rewrite.volume[:] = 1000.0
+    lake.write(rewrite, "binance", "spot", "BTCUSDT", "1m")
+
+    after = read_resampled_klines("BTCUSDT", "1h", "1m", hour, hour, kline_lake=lake)
+    assert after.volume[0] > before.volume[0] + 900
+
+
+def test_data_manager_resamples_from_finest_interval(cache, tmp_path):
+    """DataManager 只加载最细周期，其余周期由重采样得到"""
+    from backtest.data_manager import DataManager
+
+    lake = KlineLake(tmp_path / "lake")
+    lake.write(_arrays(600), "binance", "spot", "BTCUSDT", "1m")
+
+    class _NoDataService:
+        def get_kline_data(self, **kwargs):
+            raise AssertionError("不应访问数据库")
+
+    manager = DataManager(_NoDataService(), kline_lake=lake)
+    manager.preload_data(
+        "BTCUSDT", "1h", pd.Timestamp(BASE_TS).to_pydatetime(),
+        pd.Timestamp(BASE_TS + 599 * MINUTE_NS).to_pydatetime(), preload_intervals=["1m", "15m", "1h"],
+    )
+
+    assert set(manager.data_cache["BTCUSDT"]) == {"1m", "15m", "1h"}
+    assert {key[3] for key in cache._entries} == {"1m", "15m@1m", "1h@1m"}
+    hourly = manager.get_data("BTCUSDT", "1h")
+    assert list(hourly.columns) == ["open", "high", "low", "close", "volume"]
+    minutes = manager.get_data("BTCUSDT", "1m").loc["2024-01-31 23:00":"2024-01-31 23:59"]
+    assert hourly.index[0] == pd.Timestamp("2024-01-31 23:00")
+    assert hourly["volume"].iloc[0] == pytest.approx(minutes["volume"].sum())
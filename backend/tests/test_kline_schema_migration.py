@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+K线表数值类型迁移测试
+
+验证String列K线表迁移为BIGINT/DOUBLE列后的数据回填、去重和索引
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from collector.db.migrations import update_kline_column_types
+from collector.db.models import CryptoSpotKline
+
+
+LEGACY_DDL = """
+    CREATE TABLE crypto_spot_klines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol VARCHAR NOT NULL,
+        interval VARCHAR NOT NULL,
+        timestamp VARCHAR NOT NULL,
+        open VARCHAR NOT NULL,
+        high VARCHAR NOT NULL,
+        low VARCHAR NOT NULL,
+        close VARCHAR NOT NULL,
+        volume VARCHAR NOT NULL,
+        unique_kline VARCHAR NOT NULL,
+        data_source VARCHAR(50) NOT NULL DEFAULT 'unknown',
+        created_at DATETIME,
+        updated_at DATETIME
+    )
+"""
+
+
+@pytest.fixture
+def legacy_session(tmp_path):
+    """创建包含旧版String列K线表的SQLite会话"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_DDL))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX ix_crypto_spot_klines_unique_kline ON crypto_spot_klines(unique_kline)"
+        ))
+        rows = [
+            # 毫秒级旧数据，与下一条纳秒数据指向同一根K线
+            ('1700000000000', '1.5', 'BTCUSDT_1h_1700000000000'),
+            ('1700000000000000000', '1.6', 'BTCUSDT_1h_1700000000000000000'),
+            # 微秒级旧数据
+            ('1700003600000000', '1.7', 'BTCUSDT_1h_1700003600000000'),
+        ]
+        for ts, price, unique_kline in rows:
+            conn.execute(text(
+                "INSERT INTO crypto_spot_klines "
+                "(symbol, interval, timestamp, open, high, low, close, volume, unique_kline) "
+                "VALUES ('BTCUSDT', '1h', :ts, :p, :p, :p, :p, '10', :uk)"
+            ), {'ts': ts, 'p': price, 'uk': unique_kline})
+
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestKlineColumnTypeMigration:
+    """K线表列类型迁移测试类"""
+
+    def test_backfill_normalizes_and_deduplicates(self, legacy_session):
+        """回填后时间戳统一为纳秒整数，价格为浮点数，重复K线只保留最新一条"""
+        update_kline_column_types(legacy_session, "sqlite")
+        legacy_session.commit()
+
+        rows = legacy_session.execute(text(
+            "SELECT timestamp, open, unique_kline, typeof(timestamp), typeof(open) "
+            "FROM crypto_spot_klines ORDER BY timestamp"
+        )).fetchall()
+
+        assert [r[0] for r in rows] == [1700000000000000000, 1700003600000000000]
+        assert [r[1] for r in rows] == [1.6, 1.7]
+        assert rows[1][2] == 'BTCUSDT_1h_1700003600000000000'
+        assert all(r[3] == 'integer' and r[4] == 'real' for r in rows)
+
+    def test_composite_index_created(self, legacy_session):
+        """迁移后存在(symbol, interval, timestamp)联合唯一索引"""
+        update_kline_column_types(legacy_session, "sqlite")
+        legacy_session.commit()
+
+        indexes = {
+            idx['name']: idx
+            for idx in inspect(legacy_session.get_bind()).get_indexes('crypto_spot_klines')
+        }
+        composite = indexes['ix_crypto_spot_klines_symbol_interval_timestamp']
+        assert composite['column_names'] == ['symbol', 'interval', 'timestamp']
+        assert composite['unique']
+
+    def test_typed_range_query(self, legacy_session):
+        """迁移后ORM可按整数范围查询并直接得到数值类型"""
+        update_kline_column_types(legacy_session, "sqlite")
+        legacy_session.commit()
+
+        records = legacy_session.query(CryptoSpotKline).filter(
+            CryptoSpotKline.symbol == 'BTCUSDT',
+            CryptoSpotKline.interval == '1h',
+            CryptoSpotKline.timestamp >= 1700000000000000001,
+        ).all()
+
+        assert len(records) == 1
+        assert records[0].timestamp == 1700003600000000000
+        assert isinstance(records[0].close, float)
+
+    def test_migration_is_idempotent(self, legacy_session):
+        """已迁移的表再次执行迁移时保持不变"""
+        update_kline_column_types(legacy_session, "sqlite")
+        legacy_session.commit()
+        update_kline_column_types(legacy_session, "sqlite")
+        legacy_session.commit()
+
+        count = legacy_session.execute(text("SELECT COUNT(*) FROM crypto_spot_klines")).scalar()
+        assert count == 2
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+K线批量写入层测试
+
+验证 upsert_klines 在SQLite与DuckDB上的去重、插入与更新，以及 KlineBulkWriter 的缓冲写入
+"""
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from collector.db.database import fix_duckdb_serial_type
+from collector.db.kline_writer import KlineBulkWriter, dedupe_kline_rows, upsert_klines
+from collector.db.models import CryptoSpotKline
+
+
+BASE_TS = 1_700_000_000_000_000_000
+HOUR_NS = 3_600_000_000_000
+TABLE = CryptoSpotKline.__tablename__
+
+
+def _row(i, close, symbol="BTCUSDT"):
+    return (symbol, "1h", BASE_TS + i * HOUR_NS, 100.0, 110.0, 90.0, close, 1.0)
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def session_factory(request, tmp_path):
+    """创建空K线表并返回会话工厂"""
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb_engine")
+        engine = create_engine(f"duckdb:///{tmp_path / 'klines.duckdb'}")
+        event.listen(engine, "before_cursor_execute", fix_duckdb_serial_type, retval=True)
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    CryptoSpotKline.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _fetch(session):
+    return session.execute(text(
+        f"SELECT timestamp, close, unique_kline, data_source FROM {TABLE} ORDER BY timestamp"
+    )).fetchall()
+
+
+class TestUpsertKlines:
+    """upsert_klines 测试类"""
+
+    def test_insert_and_update(self, session_factory):
+        """新K线插入，已存在的K线更新价格与数据来源"""
+        with session_factory() as session:
+            assert upsert_klines(session, TABLE, [_row(0, 1.0), _row(1, 2.0)], "archive") == 2
+            session.commit()
+            assert upsert_klines(session, TABLE, [_row(1, 20.0), _row(2, 3.0)], "ccxt") == 2
+            session.commit()
+
+            rows = _fetch(session)
+            assert [r[1] for r in rows] == [1.0, 20.0, 3.0]
+            assert [r[3] for r in rows] == ["archive", "ccxt", "ccxt"]
+            assert rows[2][2] == f"BTCUSDT_1h_{BASE_TS + 2 * HOUR_NS}"
+
+    def test_batch_is_deduplicated(self, session_factory):
+        """同一批次中的重复K线只写入最后一条"""
+        with session_factory() as session:
+            written = upsert_klines(session, TABLE, [_row(0, 1.0), _row(0, 5.0), _row(0, 7.0)])
+            session.commit()
+
+            assert written == 1
+            assert [r[1] for r in _fetch(session)] == [7.0]
+
+    def test_rollback_discards_batch(self, session_factory):
+        """写入跟随调用方事务，回滚后不落库"""
+        with session_factory() as session:
+            upsert_klines(session, TABLE, [_row(0, 1.0)])
+            session.rollback()
+
+            assert _fetch(session) == []
+
+
+class TestKlineBulkWriter:
+    """KlineBulkWriter 测试类"""
+
+    def test_flushes_on_batch_size(self, session_factory):
+        """缓冲达到batch_size时自动写入"""
+        writer = KlineBulkWriter(TABLE, "ws", batch_size=3, flush_interval=60,
+                                 session_factory=session_factory)
+        writer.add(_row(0, 1.0))
+        writer.add(_row(1, 2.0))
+        assert writer.pending() == 2
+
+        writer.add(_row(2, 3.0))
+        assert writer.pending() == 0
+        writer.close()
+
+        with session_factory() as session:
+            assert len(_fetch(session)) == 3
+
+    def test_close_flushes_remaining(self, session_factory):
+        """关闭时写出缓冲区中剩余的K线"""
+        writer = KlineBulkWriter(TABLE, "ws", batch_size=100, flush_interval=60,
+                                 session_factory=session_factory)
+        writer.add(_row(0, 1.0))
+        writer.close()
+
+        assert writer.pending() == 0
+        with session_factory() as session:
+            assert [r[3] for r in _fetch(session)] == ["ws"]
+
+
+    def test_future_reports_commit(self, session_factory):
+        """add 返回的 Future 在所在批次提交后得到写入结果"""
+        writer = KlineBulkWriter(TABLE, "ws", batch_size=2, flush_interval=60,
+                                 session_factory=session_factory)
+        first = writer.add(_row(0, 1.0))
+        assert not first.done()
+
+        second = writer.add(_row(1, 2.0))
+        assert first.result(timeout=1) and second.result(timeout=1)
+        writer.close()
+
+    def test_add_after_close_writes_immediately(self, session_factory):
+        """关闭后加入的K线立即写入，不会滞留在缓冲区"""
+        writer = KlineBulkWriter(TABLE, "ws", batch_size=100, flush_interval=60,
+                                 session_factory=session_factory)
+        writer.close()
+
+        assert writer.add(_row(0, 1.0)).result(timeout=1)
+        assert writer.pending() == 0
+        with session_factory() as session:
+            assert len(_fetch(session)) == 1
+
+    def test_failed_write_after_close_is_reported(self):
+        """关闭后写入失败时 Future 结果为False，缓冲区不保留无人写出的数据"""
+        class _FailingSession:
+            def execute(self, *args, **kwargs):
+                raise RuntimeError("database is gone")
+
+            def rollback(self):
+                pass
+
+            def close(self):
+                pass
+
+        writer = KlineBulkWriter(TABLE, "ws", batch_size=100, flush_interval=60,
+                                 session_factory=_FailingSession)
+        pending = writer.add(_row(0, 1.0))
+        writer.close()
+
+        assert pending.result(timeout=1) is False
+        assert writer.add(_row(1, 1.0)).result(timeout=1) is False
+        assert writer.pending() == 0
+
+
+def test_dedupe_sorts_and_normalizes():
+    """去重结果按时间升序并统一数值类型"""
+    rows = dedupe_kline_rows([_row(1, "2"), _row(0, 1), _row(1, "3")])
+
+    assert [r[2] for r in rows] == [BASE_TS, BASE_TS + HOUR_NS]
+    assert rows[1][6] == 3.0
+
+
+def test_unknown_table_rejected():
+    """不支持的表名抛出ValueError"""
+    with pytest.raises(ValueError):
+        upsert_klines(object(), "users", [_row(0, 1.0)])
@@ -12,6 +12,7 @@
 import pytest
 import time
 import threading
+from datetime import datetime, timezone
 import numpy as np
 from unittest.mock import Mock, patch, MagicMock
 
@@ -20,7 +21,10 @@ from strategy.core.batching_engine import (
     EventBatch,
     BatchStrategy,
     VectorizedBatchProcessor,
-    BatchMetrics
+    BatchMetrics,
+    ColumnarBatch,
+    SymbolBatchBuffer,
+    columnar_handler
 )
 
 
@@ -551,6 +555,135 @@ class TestVectorizedBatchProcessor:
         assert returns[2] == pytest.approx(0.00990099, abs=1e-5)
 
 
+# =============================================================================
+# 列式批次测试
+# =============================================================================
+
+class TestColumnarBatching:
+    """列式批次测试类"""
+
+    def test_columnar_handler_receives_column_views(self):
+        """列式处理器收到数组视图，缓冲区不创建事件对象"""
+        received = []
+
+        @columnar_handler
+        def handler(batch):
+            received.append((batch.symbol, batch.timestamps.tolist(), batch.prices.tolist(), batch.volumes.tolist()))
+
+        engine = BatchingEngine(max_batch_size=3, max_wait_time_ms=5000)
+        engine.register("TICK", handler)
+        engine.start()
+
+        try:
+            engine.put("TICK", {"timestamp": 1.0, "price": 100.0, "volume": 2.0}, symbol="BTCUSDT")
+            engine.put("TICK", {"timestamp": 2.0, "close": 101.0}, symbol="BTCUSDT")
+            assert engine.buffers["BTCUSDT"].batch.size() == 0
+            engine.put("TICK", 102.0, symbol="BTCUSDT")
+            time.sleep(0.1)
+        finally:
+            engine.stop()
+
+        assert len(received) == 1
+        symbol, timestamps, prices, volumes = received[0]
+        assert symbol == "BTCUSDT"
+        assert timestamps[:2] == [1.0, 2.0]
+        assert prices == [100.0, 101.0, 102.0]
+        assert volumes == [2.0, 0.0, 0.0]
+        assert engine.get_stats()["events_processed"] == 3
+
+    def test_column_blocks_reused_after_release(self):
+        """批次释放后列缓冲块被下一批复用"""
+        buffer = SymbolBatchBuffer("BTCUSDT", max_batch_size=2, max_batch_age_ms=5000)
+
+        buffer.add_columns("TICK", 1.0, 100.0)
+        first = buffer.add_columns("TICK", 2.0, 101.0).columns["TICK"]
+        block = first._block
+        with pytest.raises(ValueError):
+            first.prices[0] = 0.0
+        first.release()
+
+        buffer.add_columns("TICK", 3.0, 102.0)
+        second = buffer.add_columns("TICK", 4.0, 103.0).columns["TICK"]
+
+        assert second._block is block
+        assert second.prices.tolist() == [102.0, 103.0]
+
+    def test_mixed_handlers_keep_object_path(self):
+        """同一事件类型存在普通处理器时走对象路径，列式处理器仍收到列式批次"""
+        columnar_batches = []
+        record_batches = []
+
+        engine = BatchingEngine(max_batch_size=2, max_wait_time_ms=5000)
+        engine.register("TICK", columnar_handler(lambda batch: columnar_batches.append(batch.prices.tolist())))
+        engine.register("TICK", record_batches.append)
+        engine.start()
+
+        try:
+            engine.put("TICK", {"price": 1.0}, symbol="ETHUSDT")
+            engine.put("TICK", {"price": 2.0}, symbol="ETHUSDT")
+            time.sleep(0.1)
+        finally:
+            engine.stop()
+
+        assert columnar_batches == [[1.0, 2.0]]
+        assert [item["data"]["price"] for item in record_batches[0]] == [1.0, 2.0]
+
+    def test_columnar_path_coerces_or_falls_back(self):
+        """datetime 时间戳转换为纪元秒，无法转换为数值的事件走对象路径而不抛出异常"""
+        columnar_batches = []
+
+        engine = BatchingEngine(max_batch_size=2, max_wait_time_ms=5000)
+        engine.register("TICK", columnar_handler(
+            lambda batch: columnar_batches.append((batch.timestamps.tolist(), batch.prices.tolist()))
+        ))
+        engine.start()
+
+        moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        try:
+            assert engine.put("TICK", {"price": 1.0, "timestamp": moment}, symbol="ETHUSDT")
+            assert engine.put("TICK", {"price": 2.0, "timestamp": np.datetime64("2024-01-01T00:00:01")}, symbol="ETHUSDT")
+            assert engine.put("TICK", {"price": "n/a", "timestamp": moment}, symbol="ETHUSDT")
+            assert engine.put("TICK", {"price": 3.0, "timestamp": moment}, symbol="ETHUSDT")
+            time.sleep(0.1)
+        finally:
+            engine.stop()
+
+        assert columnar_batches[0] == ([moment.timestamp(), moment.timestamp() + 1], [1.0, 2.0])
+        # 对象路径上的批次构建列式批次时跳过无法转换的事件
+        assert [price for _, prices in columnar_batches[1:] for price in prices] == [3.0]
+
+    def test_columnar_handler_without_vectorization(self):
+        """未启用向量化时列式处理器仍收到 ColumnarBatch"""
+        received = []
+
+        engine = BatchingEngine(max_batch_size=2, max_wait_time_ms=5000, enable_vectorization=False)
+        engine.register("TICK", columnar_handler(lambda batch: received.append(batch)))
+        engine.start()
+
+        try:
+            engine.put("TICK", {"price": 1.0, "timestamp": 1.0}, symbol="ETHUSDT")
+            engine.put("TICK", {"price": 2.0, "timestamp": 2.0}, symbol="ETHUSDT")
+            time.sleep(0.1)
+        finally:
+            engine.stop()
+
+        assert len(received) == 1
+        assert isinstance(received[0], ColumnarBatch)
+        assert received[0].prices.tolist() == [1.0, 2.0]
+
+    def test_process_prices_accepts_columnar_batch(self, vectorized_processor):
+        """向量化处理器直接使用列式批次的价格列"""
+        buffer = SymbolBatchBuffer("BTCUSDT", max_batch_size=3)
+        for i, price in enumerate([100.0, 110.0, 121.0]):
+            batch = buffer.add_columns("TICK", float(i), price)
+
+        result = vectorized_processor.process_prices(batch.columns["TICK"])
+
+        assert result["count"] == 3
+        assert result["max"] == 121.0
+        assert result["change"] == pytest.approx(0.21)
+
+
 # =============================================================================
 # BatchMetrics 测试
 # =============================================================================
@@ -10,16 +10,19 @@
 """
 
 import pytest
+import sys
 import time
 import threading
 from unittest.mock import Mock, patch
 
 from strategy.core.concurrent_event_engine import (
     ConcurrentEventEngine,
+    ProcessSymbolShard,
     SymbolShard,
     SymbolEvent,
     ShardRouter
 )
+from strategy.core.memory_pool import BarEvent, SharedEventQueue
 
 
 # =============================================================================
@@ -350,6 +353,69 @@ class TestConcurrentEventEngine:
             engine.stop()
 
 
+def _bar_signal(bar):
+    """分片进程中执行的处理器，返回收盘价和时间戳"""
+    return bar.close, bar.timestamp
+
+
+def _fail_on_negative(bar):
+    """分片进程中执行的处理器，收盘价为负时抛出异常"""
+    if bar.close < 0:
+        raise ValueError("negative close")
+
+
+class TestProcessShardMode:
+    """进程分片模式测试类"""
+
+    def test_results_aggregated_in_symbol_order(self):
+        """分片进程处理K线，结果按交易对顺序回传主进程"""
+        engine = ConcurrentEventEngine(num_shards=2, max_queue_size_per_shard=1000, shard_mode="process")
+        results = {}
+        engine.register("BAR", _bar_signal)
+        engine.register("BAR", _fail_on_negative)
+        engine.register_result_handler(
+            lambda event_type, symbol, result: results.setdefault(symbol, []).append(result)
+        )
+        engine.start()
+
+        try:
+            for i in range(50):
+                for symbol in ("BTCUSDT", "ETHUSDT", "BNBUSDT"):
+                    bar = BarEvent(symbol, 1.0, 2.0, 0.5, float(i), 10.0, 1000 + i, "1m")
+                    assert engine.put("BAR", bar, symbol=symbol)
+            assert engine.put("BAR", BarEvent("BTCUSDT", 1.0, 1.0, 1.0, -1.0, 1.0, 2000, "1m"), symbol="BTCUSDT")
+        finally:
+            engine.close()
+
+        stats = engine.get_stats()
+        assert stats["events_processed"] == 151
+        assert stats["results_received"] == 151
+        for symbol in ("BTCUSDT", "ETHUSDT", "BNBUSDT"):
+            assert results[symbol][:50] == [(float(i), 1000 + i) for i in range(50)]
+
+    def test_affinity_manager_assigns_shard_cores(self):
+        """亲和性管理器给出的核心分配记录到分片和交易对"""
+        affinity_manager = Mock()
+        affinity_manager.get_optimal_cpus.return_value = [0, 0]
+        engine = ConcurrentEventEngine(
+            num_shards=2, max_queue_size_per_shard=100, shard_mode="process", affinity_manager=affinity_manager
+        )
+        engine.rebalance_symbols(["BTCUSDT", "ETHUSDT"])
+        engine.start()
+
+        try:
+            affinity_manager.get_optimal_cpus.assert_called_once_with(2)
+            assert engine.get_shard_stats(0)["core_id"] == 0
+            assert engine.get_symbol_cores() == {"BTCUSDT": 0, "ETHUSDT": 0}
+        finally:
+            engine.close()
+
+    def test_invalid_shard_mode(self):
+        """不支持的分片模式报错"""
+        with pytest.raises(ValueError):
+            ConcurrentEventEngine(num_shards=2, shard_mode="coroutine")
+
+
 # =============================================================================
 # SymbolShard 测试
 # =============================================================================
@@ -404,6 +470,41 @@ class TestSymbolShard:
         assert symbol_shard.qsize() == 1
 
 
+class TestProcessSymbolShard:
+    """进程分片测试类"""
+
+    def test_concurrent_producers(self):
+        """多个线程同时写入同一进程分片，共享内存队列中的事件不丢失、不损坏"""
+        shard = ProcessSymbolShard(shard_id=0, max_queue_size=4096)
+        consumer = SharedEventQueue.attach(shard.queue.name)
+        # 缩短线程切换间隔，放大写入交错
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            def produce(worker):
+                for i in range(500):
+                    assert shard.put(SymbolEvent("tick", f"SYM{worker}", {"i": i}))
+
+            threads = [threading.Thread(target=produce, args=(w,)) for w in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            received = {}
+            while (item := consumer.get()) is not None:
+                _, symbol, data, _ = item
+                received.setdefault(symbol, []).append(data["i"])
+            assert {symbol: sorted(values) for symbol, values in received.items()} == {
+                f"SYM{w}": list(range(500)) for w in range(8)
+            }
+            assert shard.events_dropped == 0
+        finally:
+            sys.setswitchinterval(switch_interval)
+            consumer.close()
+            shard.close()
+
+
 # =============================================================================
 # ShardRouter 测试
 # =============================================================================
@@ -0,0 +1,64 @@
+"""
+事件驱动回测引擎单元测试
+
+测试范围:
+- 池化K线下的回测结果
+- 对象池调试模式
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy.core.event_driven_backtest_engine import EventDrivenBacktestEngine
+from strategy.core.memory_pool import UseAfterReleaseError
+
+
+@pytest.fixture
+def ohlcv():
+    """带分钟时间索引的K线数据"""
+    close = np.array([100.0, 101.0, 103.0, 102.0, 99.0, 98.0, 100.0, 104.0])
+    return pd.DataFrame(
+        {
+            "Open": close - 0.5,
+            "High": close + 1.0,
+            "Low": close - 1.0,
+            "Close": close,
+            "Volume": np.full(len(close), 10.0),
+        },
+        index=pd.date_range("2024-01-01", periods=len(close), freq="1min"),
+    )
+
+
+def _signals(data):
+    return np.array([1, 0, 0, -1, 0, 0, 1, 0])
+
+
+def test_pooled_bars_produce_trades(ohlcv):
+    """K线从对象池取出，成交价格和时间与逐根数据一致"""
+    engine = EventDrivenBacktestEngine(pool_debug=True)
+
+    results = engine.run_backtest(ohlcv, _signals, init_cash=10000.0, target=0.5)
+
+    assert results["# Trades"] == 5
+    assert [t.price for t in results["_trades"]] == [99.5, 101.5, 101.5, 99.5, 99.5]
+    assert results["_trades"][0].timestamp == pd.Timestamp("2024-01-01 00:00")
+    assert len(results["_equity_history"]) == len(ohlcv)
+    assert engine._bar_pool.size() == 1
+
+
+def test_retained_bar_detected_in_debug_mode(ohlcv):
+    """调试模式下处理完成后仍被访问的K线抛出异常"""
+    engine = EventDrivenBacktestEngine(pool_debug=True)
+    retained = []
+    original = engine._process_bar
+
+    def process_bar(bar, *args):
+        retained.append(bar)
+        original(bar, *args)
+
+    engine._process_bar = process_bar
+    engine.run_backtest(ohlcv.iloc[:1], lambda data: np.array([0]))
+
+    with pytest.raises(UseAfterReleaseError):
+        retained[0].close
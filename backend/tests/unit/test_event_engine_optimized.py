@@ -463,6 +463,107 @@ class TestOptimizedEventEngine:
             engine.stop()
 
 
+class TestFastPath:
+    """单消费者快速路径单元测试"""
+
+    def test_fifo_order_and_stats(self):
+        """测试普通优先级事件按入队顺序处理且计数准确"""
+        engine = create_optimized_engine(fast_path=True, max_queue_size=10000)
+        received = []
+        engine.register("TEST", received.append)
+        engine.start()
+
+        try:
+            for i in range(1000):
+                assert engine.put("TEST", i)
+            deadline = time.time() + 2.0
+            while len(received) < 1000 and time.time() < deadline:
+                time.sleep(0.01)
+
+            assert received == list(range(1000))
+            stats = engine.get_stats()
+            assert stats["events_received"] == 1000
+        finally:
+            engine.stop()
+        assert engine.metrics.events_processed == 1000
+
+    def test_concurrent_producers_stats(self):
+        """测试多个生产者线程并发入队时接收计数不丢失"""
+        engine = create_optimized_engine(fast_path=True, max_queue_size=100000)
+        received = []
+        engine.register("TEST", received.append)
+        engine.start()
+
+        def produce():
+            for i in range(5000):
+                engine.put("TEST", i)
+
+        try:
+            producers = [threading.Thread(target=produce) for _ in range(4)]
+            for t in producers:
+                t.start()
+            for t in producers:
+                t.join()
+            deadline = time.time() + 5.0
+            while len(received) < 20000 and time.time() < deadline:
+                time.sleep(0.01)
+
+            assert len(received) == 20000
+            assert engine.get_stats()["events_received"] == 20000
+        finally:
+            engine.stop()
+
+    def test_critical_event_before_queued_normal(self):
+        """测试紧急事件先于已排队的普通事件处理"""
+        engine = create_optimized_engine(fast_path=True)
+        received = []
+        gate = threading.Event()
+
+        def handler(data):
+            if data == "block":
+                gate.wait(timeout=1.0)
+            received.append(data)
+
+        engine.register("TEST", handler)
+        engine.start()
+
+        try:
+            engine.put("TEST", "block")
+            time.sleep(0.05)
+            for i in range(3):
+                engine.put("TEST", f"normal_{i}")
+            engine.put("TEST", "critical", priority=EventPriority.CRITICAL)
+            engine.put("TEST", "low", priority=EventPriority.LOW)
+            gate.set()
+            time.sleep(0.2)
+
+            assert received == ["block", "critical", "normal_0", "normal_1", "normal_2", "low"]
+        finally:
+            engine.stop()
+
+    def test_unregister_takes_effect(self):
+        """测试注销后处理器表快照立即更新"""
+        engine = create_optimized_engine(fast_path=True)
+        received = []
+
+        def handler(data):
+            received.append(data)
+
+        engine.register("TEST", handler)
+        engine.start()
+
+        try:
+            engine.put("TEST", "first")
+            time.sleep(0.1)
+            assert engine.unregister("TEST", handler)
+            engine.put("TEST", "second")
+            time.sleep(0.1)
+
+            assert received == ["first"]
+        finally:
+            engine.stop()
+
+
 class TestBoundedPriorityQueue:
     """有界优先级队列单元测试"""
     
@@ -0,0 +1,210 @@
+"""
+指标缓存单元测试
+验证内容指纹、LRU内存预算、每指标命中统计、磁盘溢出以及 StrategyCore 的缓存接入
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from strategy.core import indicator_cache
+from strategy.core.indicator_cache import IndicatorCache, fingerprint_frame
+from strategy.core.strategy_core import StrategyCore
+
+
+def _kline(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = 100 + rng.normal(0, 1, n).cumsum()
+    return pd.DataFrame({
+        'Open': prices, 'High': prices + 1, 'Low': prices - 1, 'Close': prices, 'Volume': 1.0,
+    }, index=pd.date_range('2024-01-01', periods=n, freq='h'))
+
+
+class CountingStrategy(StrategyCore):
+    """统计指标计算次数的均线策略，指标只依赖 n"""
+
+    indicator_params = ('n',)
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.calls = 0
+
+    def calculate_indicators(self, data):
+        self.calls += 1
+        return {'sma': data['Close'].rolling(self.params['n']).mean()}
+
+    def generate_signals(self, indicators):
+        sma = indicators['sma']
+        return {'entries': sma > sma.shift(1), 'exits': sma < sma.shift(1)}
+
+
+class TestFingerprint:
+    """内容指纹测试类"""
+
+    def test_equal_content_equal_fingerprint(self):
+        """内容相同的不同对象指纹相同"""
+        assert fingerprint_frame(_kline()) == fingerprint_frame(_kline())
+
+    def test_middle_bar_change_changes_fingerprint(self):
+        """只修改中间一根K线也会改变指纹"""
+        data = _kline()
+        repaired = data.copy()
+        repaired.iloc[100, 3] += 0.01
+
+        assert fingerprint_frame(data) != fingerprint_frame(repaired)
+
+    def test_index_and_timezone_are_covered(self):
+        """索引和时区参与指纹"""
+        data = _kline()
+        shifted = data.set_axis(data.index + pd.Timedelta(hours=1))
+
+        assert fingerprint_frame(data) != fingerprint_frame(shifted)
+        assert fingerprint_frame(data) != fingerprint_frame(data.tz_localize('UTC'))
+
+
+class TestIndicatorCache:
+    """IndicatorCache 测试类"""
+
+    def test_fingerprint_memoized_per_frame_version(self, monkeypatch):
+        """同一个 DataFrame 只计算一次指纹，替换列后重新计算"""
+        calls = []
+        original = indicator_cache.fingerprint_frame
+        monkeypatch.setattr(indicator_cache, 'fingerprint_frame', lambda df: calls.append(1) or original(df))
+        cache = IndicatorCache()
+        data = _kline()
+
+        first = cache.fingerprint(data)
+        assert cache.fingerprint(data) == first and len(calls) == 1
+
+        data['Close'] = data['Close'] + 1.0
+        assert cache.fingerprint(data) != first and len(calls) == 2
+
+    def test_lru_eviction_within_budget(self):
+        """超出内存预算时淘汰最久未使用的结果"""
+        cache = IndicatorCache(max_bytes=2500)
+        data = _kline()
+        for n in range(3):
+            cache.put(cache.make_key('sma', data, n), 'sma', np.zeros(100))
+        # 访问 n=1 使其成为最近使用
+        cache.get(cache.make_key('sma', data, 1), 'sma')
+        cache.put(cache.make_key('sma', data, 3), 'sma', np.zeros(100))
+
+        assert cache.memory_bytes <= 2500
+        assert cache.make_key('sma', data, 1) in cache
+        assert cache.make_key('sma', data, 0) not in cache
+        assert cache.get_stats()['indicators']['sma']['evictions'] >= 1
+
+    def test_per_indicator_stats(self):
+        """命中和未命中按指标分别统计"""
+        cache = IndicatorCache()
+        data = _kline()
+
+        cache.get_or_compute('sma', data, lambda: 1)
+        cache.get_or_compute('sma', data, lambda: 1)
+        cache.get_or_compute('rsi', data, lambda: 2)
+
+        stats = cache.get_stats()['indicators']
+        assert (stats['sma']['hits'], stats['sma']['misses']) == (1, 1)
+        assert (stats['rsi']['hits'], stats['rsi']['misses']) == (0, 1)
+
+    def test_large_results_spill_to_disk(self, tmp_path):
+        """大结果写入磁盘，命中时读回，清空时删除文件"""
+        cache = IndicatorCache(spill_dir=str(tmp_path), spill_threshold=1000)
+        data = _kline()
+        big = pd.Series(np.arange(500, dtype=np.float64))
+
+        cache.get_or_compute('big', data, lambda: big)
+        value, hit = cache.get_or_compute('big', data, lambda: None)
+
+        assert hit
+        pd.testing.assert_series_equal(value, big)
+        assert cache.memory_bytes == 0 and cache.disk_bytes > 0
+        assert len(os.listdir(tmp_path)) == 1
+
+        cache.clear()
+        assert os.listdir(tmp_path) == []
+
+
+class TestStrategyCoreCache:
+    """StrategyCore 缓存接入测试类"""
+
+    def test_repeated_run_skips_recomputation(self):
+        """同一份数据重复运行只计算一次指标，副本同样命中"""
+        strategy = CountingStrategy({'n': 5})
+        data = _kline()
+
+        strategy.run(data)
+        strategy.run(data.copy())
+
+        assert strategy.calls == 1
+        assert strategy.get_cache_stats()['indicators']['calculate_indicators']['hits'] == 1
+
+    def test_repaired_data_is_recomputed(self):
+        """修复中间K线后不会命中旧结果"""
+        strategy = CountingStrategy({'n': 5})
+        data = _kline()
+        repaired = data.copy()
+        repaired.iloc[100, 3] = 1000.0
+
+        first = strategy.run(data)['indicators']['sma']
+        second = strategy.run(repaired)['indicators']['sma']
+
+        assert strategy.calls == 2
+        assert not first.equals(second)
+
+    def test_signal_params_share_indicators(self):
+        """只有 indicator_params 之外的参数不同时复用指标"""
+        strategy = CountingStrategy({'n': 5, 'threshold': 0.1})
+        data = _kline()
+
+        strategy.run(data)
+        strategy.params['threshold'] = 0.2
+        strategy.run(data)
+        strategy.params['n'] = 10
+        strategy.run(data)
+
+        assert strategy.calls == 2
+
+    def test_shared_cache_across_instances(self):
+        """多个策略实例共享缓存，run_multiple 同样使用缓存"""
+        cache = IndicatorCache()
+        first, second = CountingStrategy({'n': 5}), CountingStrategy({'n': 5})
+        first.set_indicator_cache(cache)
+        second.set_indicator_cache(cache)
+        data = {'BTCUSDT': _kline(seed=1), 'ETHUSDT': _kline(seed=2)}
+
+        first.run_multiple(data)
+        second.run_multiple(data)
+
+        assert (first.calls, second.calls) == (2, 0)
+
+    def test_custom_indicator_cached_and_invalidated(self):
+        """自定义指标按参数缓存，重新注册后失效"""
+        strategy = CountingStrategy({'n': 5})
+        data = _kline()
+        calls = []
+
+        def momentum(df, period):
+            calls.append(period)
+            return df['Close'].diff(period)
+
+        strategy.register_indicator('momentum', momentum)
+        strategy.calculate_custom_indicator('momentum', data, period=3)
+        strategy.calculate_custom_indicator('momentum', data, period=3)
+        strategy.calculate_custom_indicator('momentum', data, period=5)
+        assert calls == [3, 5]
+
+        strategy.register_indicator('momentum', momentum)
+        strategy.calculate_custom_indicator('momentum', data, period=3)
+        assert calls == [3, 5, 3]
+
+    def test_custom_indicator_bypasses_cache_for_arrays(self):
+        """ndarray、Series 输入不计算指纹，直接调用指标函数"""
+        strategy = CountingStrategy({'n': 5})
+        strategy.register_indicator('double', lambda values: values * 2)
+        close = _kline()['Close']
+
+        np.testing.assert_array_equal(strategy.calculate_custom_indicator('double', close.to_numpy()), close.to_numpy() * 2)
+        pd.testing.assert_series_equal(strategy.calculate_custom_indicator('double', close), close * 2)
+        assert strategy.get_cache_stats()['total'] == 0
@@ -4,11 +4,12 @@
 测试范围:
 - ObjectPool 对象池功能
 - TickEvent/BarEvent 事件对象
-- SharedMemoryMarketData 共享内存
+- MarketRingBuffer/SharedMemoryMarketData 共享内存环形缓冲区
 - PreallocatedBuffers 预分配缓冲区
 - 内存使用优化
 """
 
+import multiprocessing
 import pytest
 import time
 import threading
@@ -19,9 +20,12 @@ from strategy.core.memory_pool import (
     ObjectPool,
     TickEvent,
     BarEvent,
+    MarketRingBuffer,
+    SharedEventQueue,
     SharedMemoryMarketData,
     PreallocatedBuffers,
-    PooledObject
+    PooledObject,
+    UseAfterReleaseError
 )
 
 
@@ -223,6 +227,39 @@ class TestObjectPool:
 # TickEvent 测试
 # =============================================================================
 
+class TestObjectPoolDebugMode:
+    """对象池调试模式测试类"""
+
+    def test_access_after_release_raises(self):
+        """归还后访问属性或重复归还抛出异常，重新取出后恢复正常"""
+        pool = ObjectPool(factory=BarEvent, initial_size=1, max_size=4, debug=True)
+        bar = pool.acquire().set_data("BTCUSDT", 1.0, 2.0, 0.5, 1.5, 10.0, 1000, "1m")
+        assert bar.close_price == 1.5
+
+        bar.release()
+
+        with pytest.raises(UseAfterReleaseError):
+            bar.close
+        with pytest.raises(UseAfterReleaseError):
+            pool.release(bar)
+
+        again = pool.acquire()
+        assert again is bar
+        assert type(again) is BarEvent
+        assert again.close == 0.0
+
+    def test_builtin_objects_are_pooled_without_marking(self):
+        """无法标记的内置类型照常复用"""
+        pool = ObjectPool(factory=dict, reset_func=dict.clear, initial_size=1, max_size=4, debug=True)
+        obj = pool.acquire()
+        obj["price"] = 1.0
+
+        pool.release(obj)
+
+        assert pool.acquire() is obj
+        assert obj == {}
+
+
 class TestTickEvent:
     """Tick事件测试类"""
 
@@ -456,6 +493,133 @@ class TestSharedMemoryMarketData:
         assert len(shared_memory.get_all_symbols()) == 0
 
 
+def _read_in_child(namespace, symbol, queue):
+    """子进程按交易对名附加并读取最新K线和最近数据"""
+    with SharedMemoryMarketData.attach(namespace) as reader:
+        bar = reader.read_bar(symbol)
+        data = reader.read_range(symbol, 3)
+        queue.put((bar.to_dict(), data["prices"].tolist(), reader.read_latest("MISSING")))
+
+
+class TestMarketRingBuffer:
+    """共享内存环形缓冲区测试类"""
+
+    def test_read_range_wraps_and_keeps_order(self):
+        """写满后环绕，读取结果按写入顺序排列，下一次写入的槽位不返回"""
+        ring = MarketRingBuffer.create(f"test_ring_{time.time_ns()}", 4)
+        try:
+            for i in range(6):
+                ring.write(i, i, i, i, float(i), 1.0)
+
+            data = ring.read_range(10)
+
+            assert ring.write_seq == 6
+            assert data["seq"] == 4
+            np.testing.assert_array_equal(data["timestamps"], [3, 4, 5])
+            np.testing.assert_array_equal(data["close"], [3.0, 4.0, 5.0])
+        finally:
+            ring.close()
+
+    def test_read_seq_rejects_overwritten_records(self):
+        """已被覆盖或尚未写入的序号返回 None"""
+        ring = MarketRingBuffer.create(f"test_ring_{time.time_ns()}", 4)
+        try:
+            for i in range(6):
+                ring.write(i, i, i, i, float(i), 1.0)
+
+            assert ring.read_seq(6)["close"] == 5.0
+            # 序号 3 的槽位正是下一次写入的位置，读者不能信任
+            assert ring.read_seq(3) is None
+            assert ring.read_seq(4)["timestamp"] == 3
+            assert ring.read_seq(7) is None
+        finally:
+            ring.close()
+
+    def test_attached_reader_is_read_only(self):
+        """附加方读取同一块共享内存且不能写入"""
+        with SharedMemoryMarketData(num_symbols=4, buffer_size=8) as writer:
+            writer.write("BTCUSDT", 1000, 1.0, 2.0, 0.5, 1.5, 10.0)
+            with SharedMemoryMarketData.attach(writer.namespace) as reader:
+                assert reader.read_latest("BTCUSDT")["close"] == 1.5
+
+                writer.write("BTCUSDT", 2000, 1.5, 2.5, 1.0, 2.0, 20.0)
+                assert reader.read_latest("BTCUSDT")["timestamp"] == 2000
+                assert reader.read_latest("ETHUSDT") is None
+                with pytest.raises(RuntimeError):
+                    reader.write("BTCUSDT", 3000, 1.0, 1.0, 1.0, 1.0, 1.0)
+
+    def test_close_releases_segments(self):
+        """创建方关闭后共享内存被释放"""
+        writer = SharedMemoryMarketData(num_symbols=4, buffer_size=8)
+        writer.write_tick("BTCUSDT", 50000.0, 1.0, 1000)
+        namespace = writer.namespace
+
+        writer.close()
+
+        with SharedMemoryMarketData.attach(namespace) as reader:
+            assert reader.read_tick("BTCUSDT") is None
+
+    def test_cross_process_attach_by_symbol(self):
+        """其他进程按命名空间和交易对名读取，不经过消息传递"""
+        with SharedMemoryMarketData(num_symbols=4, buffer_size=8) as writer:
+            for i in range(8):
+                writer.write_bar(BarEvent("ETHUSDT", 100.0 + i, 110.0 + i, 90.0 + i, 105.0 + i, 5.0, 1000 + i))
+
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_read_in_child, args=(writer.namespace, "ETHUSDT", queue))
+            process.start()
+            bar, prices, missing = queue.get(timeout=30)
+            process.join(timeout=30)
+
+        assert process.exitcode == 0
+        assert bar["open"] == 107.0 and bar["high"] == 117.0 and bar["close"] == 112.0
+        assert bar["timestamp"] == 1007
+        assert prices == [110.0, 111.0, 112.0]
+        assert missing is None
+
+
+
+class TestSharedEventQueue:
+    """跨进程事件队列测试类"""
+
+    def test_compact_layout_roundtrip(self):
+        """BarEvent/TickEvent 按紧凑布局还原，其它数据经 pickle 还原"""
+        producer = SharedEventQueue.create(f"test_evq_{time.time_ns()}", 8)
+        consumer = SharedEventQueue.attach(producer.name)
+        try:
+            bar = BarEvent("BTCUSDT", 1.0, 2.0, 0.5, 1.5, 10.0, 1000, "1m")
+            tick = TickEvent("BTCUSDT", 3.0, 0.5, 1001, "buy")
+            assert producer.put("bar", "BTCUSDT", bar)
+            assert producer.put("tick", "BTCUSDT", tick, priority=1)
+            assert producer.put("signal", "ETHUSDT", {"side": "long"})
+
+            event_type, symbol, data, _ = consumer.get()
+            assert (event_type, symbol) == ("bar", "BTCUSDT")
+            assert data.to_dict() == bar.to_dict()
+            assert consumer.get() == ("tick", "BTCUSDT", tick, 1)
+            assert consumer.get() == ("signal", "ETHUSDT", {"side": "long"}, 2)
+            assert consumer.get() is None
+        finally:
+            consumer.close()
+            producer.close()
+
+    def test_full_queue_and_oversized_events_rejected(self):
+        """队列已满或事件超出槽位大小时写入失败"""
+        queue = SharedEventQueue.create(f"test_evq_{time.time_ns()}", 2, slot_size=160)
+        try:
+            assert queue.put("e", "S", 1) and queue.put("e", "S", 2)
+            assert not queue.put("e", "S", 3)
+
+            queue.get()
+            queue.task_done(1000)
+            assert not queue.put("e", "S", "x" * 100)
+            assert queue.put("e", "S", 3)
+            assert queue.qsize() == 2
+            assert queue.processed == 1
+        finally:
+            queue.close()
+
+
 # =============================================================================
 # PreallocatedBuffers 测试
 # =============================================================================
@@ -0,0 +1,107 @@
+"""
+Numba 批量回测内核单元测试
+验证批量内核与逐次 simulate_trades_numba 循环的结果一致，以及张量形状广播
+"""
+
+import numpy as np
+import pytest
+
+from strategy.core.numba_backtest import (
+    batch_backtest,
+    batch_simulate_trades_numba,
+    calculate_drawdown_numba,
+    calculate_returns_numba,
+    calculate_sharpe_numba,
+    simulate_trades_numba,
+)
+
+
+@pytest.fixture
+def tensors():
+    """3组参数 × 4个交易对 × 300个时间步的价格和信号"""
+    rng = np.random.default_rng(11)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (4, 300)), axis=1))
+    signals = rng.choice([-1, 0, 0, 0, 1], size=(3, 4, 300)).astype(np.int8)
+    return prices, signals
+
+
+def _loop_metrics(prices, signals):
+    """逐次回测得到的参照结果"""
+    n_params, n_symbols = signals.shape[:2]
+    expected = {key: np.zeros((n_params, n_symbols)) for key in
+                ('final_equity', 'max_drawdown', 'sharpe_ratio', 'trade_count')}
+    for p in range(n_params):
+        for s in range(n_symbols):
+            price = prices[p, s] if prices.ndim == 3 else prices[s]
+            equity, _, _, _, exits = simulate_trades_numba(price, signals[p, s], 10000.0, 0.001, 0.0005)
+            expected['final_equity'][p, s] = equity[-1]
+            expected['max_drawdown'][p, s] = calculate_drawdown_numba(equity)[1]
+            expected['sharpe_ratio'][p, s] = calculate_sharpe_numba(calculate_returns_numba(equity))
+            expected['trade_count'][p, s] = len(exits)
+    return expected
+
+
+class TestBatchBacktest:
+    """batch_backtest 测试类"""
+
+    def test_matches_per_run_loop(self, tensors):
+        """共享价格时每个 (参数组, 交易对) 的指标与逐次回测一致"""
+        prices, signals = tensors
+
+        result = batch_backtest(prices, signals, 10000.0, 0.001, 0.0005)
+        expected = _loop_metrics(prices, signals)
+
+        for key, values in expected.items():
+            assert result[key].shape == (3, 4)
+            np.testing.assert_allclose(result[key], values, rtol=1e-9, atol=1e-12, err_msg=key)
+        assert result['trade_count'].dtype == np.int64
+
+    def test_per_param_prices(self, tensors):
+        """三维价格张量按参数组分别使用"""
+        prices, signals = tensors
+        stacked = np.stack([prices * (1 + 0.1 * p) for p in range(3)])
+
+        result = batch_backtest(stacked, signals, 10000.0, 0.001, 0.0005)
+        expected = _loop_metrics(stacked, signals)
+
+        np.testing.assert_allclose(result['final_equity'], expected['final_equity'], rtol=1e-9)
+
+    def test_one_dimensional_input(self):
+        """单个交易对的一维输入返回 (1, 1) 结果"""
+        prices = np.array([10.0, 11.0, 12.0, 11.0, 13.0])
+        signals = np.array([1, 0, -1, 1, 0])
+
+        result = batch_backtest(prices, signals, 100.0, 0.0, 0.0)
+
+        assert result['final_equity'].shape == (1, 1)
+        assert result['final_equity'][0, 0] == pytest.approx(120.0 / 11.0 * 13.0)
+        assert result['trade_count'][0, 0] == 1
+
+    def test_nan_prices_are_skipped(self):
+        """价格为NaN的时间步不撮合，权益沿用最近有效价格"""
+        prices = np.array([np.nan, 10.0, np.nan, 20.0])
+        signals = np.array([1, 1, -1, -1])
+
+        result = batch_backtest(prices, signals, 100.0, 0.0, 0.0)
+
+        assert result['final_equity'][0, 0] == pytest.approx(200.0)
+        assert result['trade_count'][0, 0] == 1
+
+    def test_shape_mismatch_raises(self, tensors):
+        """交易对或时间维度不一致时报错"""
+        prices, signals = tensors
+        with pytest.raises(ValueError):
+            batch_backtest(prices[:, :100], signals)
+        with pytest.raises(ValueError):
+            batch_backtest(np.stack([prices, prices]), signals)
+
+
+def test_batch_simulate_trades_returns_full_curves(tensors):
+    """逐个回测接口返回与 simulate_trades_numba 相同的完整曲线"""
+    prices, signals = tensors
+
+    results = batch_simulate_trades_numba(list(prices), list(signals[0]), 10000.0, 0.001, 0.0)
+
+    assert len(results) == 4
+    expected = simulate_trades_numba(prices[1], signals[0, 1], 10000.0, 0.001, 0.0)
+    np.testing.assert_array_equal(results[1][0], expected[0])
@@ -0,0 +1,257 @@
+"""
+参数优化引擎单元测试
+验证参数空间展开、共享内存K线数据、串行/并行评估一致性、指标复用、早停和逐次减半
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy.core import StrategyCore
+from strategy.core.optimizer import (
+    ParameterOptimizer,
+    SharedKlineData,
+    StrategyCoreEvaluator,
+    expand_grid,
+    expand_ranges,
+    sample_params,
+)
+
+
+class SMACrossStrategy(StrategyCore):
+    """均线交叉策略，指标只依赖均线周期，threshold 仅影响信号"""
+
+    indicator_params = ('fast', 'slow')
+    indicator_calls = 0
+
+    def calculate_indicators(self, data: pd.DataFrame) -> dict:
+        SMACrossStrategy.indicator_calls += 1
+        close = data['Close']
+        return {
+            'fast': close.rolling(self.params['fast']).mean(),
+            'slow': close.rolling(self.params['slow']).mean(),
+        }
+
+    def generate_signals(self, indicators: dict) -> dict:
+        spread = indicators['fast'] - indicators['slow']
+        threshold = self.params.get('threshold', 0.0)
+        return {
+            'entries': (spread > threshold) & (spread.shift(1) <= threshold),
+            'exits': (spread < -threshold) & (spread.shift(1) >= -threshold),
+        }
+
+
+@pytest.fixture
+def kline_data():
+    """两个交易对的测试K线"""
+    rng = np.random.default_rng(7)
+    data = {}
+    for symbol in ('BTCUSDT', 'ETHUSDT'):
+        dates = pd.date_range('2024-01-01', periods=400, freq='h')
+        prices = rng.normal(0, 1, 400).cumsum() + 100
+        data[symbol] = pd.DataFrame({
+            'Open': prices, 'High': prices + 1, 'Low': prices - 1, 'Close': prices, 'Volume': 1.0,
+        }, index=dates)
+    return data
+
+
+GRID = {'fast': [3, 5, 8], 'slow': [20, 30], 'threshold': [0.0, 0.5]}
+
+
+def test_expand_grid_and_ranges():
+    """网格展开与 [最小值, 最大值, 步长] 范围展开"""
+    assert len(expand_grid(GRID)) == 12
+    assert expand_ranges({'fast': [5, 15, 5], 'mode': ['a', 'b']}) == {'fast': [5, 10, 15], 'mode': ['a', 'b']}
+    assert expand_ranges({'k': [0.1, 0.3, 0.1]}) == {'k': [0.1, 0.2, 0.3]}
+
+
+def test_sample_params_is_unique_and_bounded():
+    """随机采样不重复，区间采样落在边界内"""
+    samples = sample_params({'fast': (2, 50), 'k': (0.0, 1.0)}, n_iter=30, seed=1)
+    assert len(samples) == 30
+    assert all(2 <= s['fast'] <= 50 and 0.0 <= s['k'] <= 1.0 for s in samples)
+    # 离散空间小于采样数时返回全部组合
+    assert len(sample_params({'a': [1, 2], 'b': [3]}, n_iter=10)) == 2
+
+
+def test_shared_kline_data_roundtrip(kline_data):
+    """共享内存中的K线与原数据一致且只读"""
+    kline_data['BTCUSDT'].index = kline_data['BTCUSDT'].index.tz_localize('UTC')
+    with SharedKlineData(kline_data) as shared:
+        shm, data = SharedKlineData.attach(shared.spec)
+        try:
+            for symbol, df in kline_data.items():
+                np.testing.assert_array_equal(data[symbol].to_numpy(), df.to_numpy())
+                assert list(data[symbol].columns) == list(df.columns)
+                assert (data[symbol].index == df.index).all()
+            assert str(data['BTCUSDT'].index.tz) == 'UTC'
+            with pytest.raises(ValueError):
+                data['ETHUSDT'].to_numpy()[0, 0] = 0.0
+        finally:
+            del data
+            shm.close()
+
+
+class TestParameterOptimizer:
+    """ParameterOptimizer 测试类"""
+
+    def test_grid_search_serial_matches_parallel(self, kline_data):
+        """进程池并行评估与串行评估结果一致"""
+        evaluator = StrategyCoreEvaluator(SMACrossStrategy)
+
+        serial = ParameterOptimizer(evaluator, kline_data, n_jobs=1).grid_search(GRID)
+        parallel = ParameterOptimizer(evaluator, kline_data, n_jobs=2).grid_search(GRID)
+
+        assert serial['evaluated'] == parallel['evaluated'] == 12
+        assert serial['best_params'] == parallel['best_params']
+        assert serial['best_score'] == pytest.approx(parallel['best_score'])
+        scores = {repr(r['params']): r['score'] for r in serial['results']}
+        for r in parallel['results']:
+            assert r['score'] == pytest.approx(scores[repr(r['params'])])
+
+    def test_indicators_reused_across_signal_params(self, kline_data):
+        """只有 threshold 不同的组合复用同一份指标"""
+        SMACrossStrategy.indicator_calls = 0
+
+        ParameterOptimizer(StrategyCoreEvaluator(SMACrossStrategy), kline_data, n_jobs=1).grid_search(GRID)
+
+        # 6 组均线周期 × 2 个交易对
+        assert SMACrossStrategy.indicator_calls == 12
+
+    def test_progress_and_callback_stream_results(self, kline_data):
+        """每个组合完成后推送进度并回调"""
+        from backtest.progress import ProgressTracker
+
+        tracker = ProgressTracker(total=12, desc="参数优化")
+        received = []
+        optimizer = ParameterOptimizer(
+            StrategyCoreEvaluator(SMACrossStrategy), kline_data, n_jobs=1,
+            progress=tracker, on_result=received.append,
+        )
+
+        optimizer.grid_search(GRID)
+
+        assert tracker.info.current == 12
+        assert len(received) == 12
+
+    def test_patience_stops_early(self, kline_data):
+        """连续没有改进时提前停止"""
+        result = ParameterOptimizer(
+            StrategyCoreEvaluator(SMACrossStrategy), kline_data, n_jobs=1
+        ).grid_search(GRID, patience=1)
+
+        assert result['stopped_early']
+        assert result['evaluated'] < 12
+
+    def test_successive_halving_shrinks_candidates(self, kline_data):
+        """逐次减半每轮保留前 1/eta 的候选，最后一轮使用全部K线"""
+        result = ParameterOptimizer(
+            StrategyCoreEvaluator(SMACrossStrategy), kline_data, n_jobs=1
+        ).successive_halving(GRID, eta=2)
+
+        rounds = result['rounds']
+        assert [r['evaluated'] for r in rounds] == [12, 6, 3]
+        assert rounds[-1]['budget'] == 1.0
+        assert result['best_params']
+        assert all(r['budget'] == 1.0 for r in result['results'])
+
+    def test_failed_evaluations_are_reported(self, kline_data):
+        """评估失败的组合记录错误，不影响其它组合"""
+        result = ParameterOptimizer(
+            StrategyCoreEvaluator(SMACrossStrategy), kline_data, n_jobs=1
+        ).grid_search({'fast': [5, -1], 'slow': [20]})
+
+        errors = [r for r in result['results'] if r['error']]
+        assert len(errors) == 1
+        assert result['best_params'] == {'fast': 5, 'slow': 20}
+
+
+def test_execution_engine_optimize_parameters(kline_data):
+    """BacktestExecutionEngine 使用 [最小值, 最大值, 步长] 范围进行网格搜索"""
+    from strategy.execution_engine import BacktestExecutionEngine
+
+    engine = BacktestExecutionEngine()
+    engine.set_strategy(SMACrossStrategy({'fast': 5, 'slow': 20}))
+    engine.set_backtest_data(kline_data['BTCUSDT'])
+
+    result = engine.optimize_parameters({'fast': [3, 9, 3], 'slow': [20, 30, 10]}, n_jobs=1)
+
+    assert result['evaluated'] == 6
+    assert set(result['best_params']) == {'fast', 'slow'}
+    assert result['optimization_metric'] == 'sharpe_ratio'
+
+
+class ThresholdBarStrategy:
+    """逐K线策略：收盘价上穿 upper 买入，下穿 lower 卖出"""
+
+    def __init__(self):
+        self.params = {'upper': 101.0, 'lower': 99.0}
+        self.orders, self.indicators, self.trades = {}, {}, []
+        self.stop_loss = self.take_profit = self.max_position_size = self.max_open_positions = None
+        self.cooldown_period = self.max_drawdown = self.leverage_enabled = self.default_leverage = None
+
+    def on_init(self):
+        self._prev = None
+
+    def on_bar(self, bar):
+        close = bar['close']
+        if self._prev is not None:
+            if self._prev <= self.params['upper'] < close:
+                self.last_order = {'direction': 'buy'}
+            elif self._prev >= self.params['lower'] > close:
+                self.last_order = {'direction': 'sell'}
+        self._prev = close
+
+    def on_stop(self, bar):
+        pass
+
+
+def test_vector_adapter_optimize_parameters_in_process_pool(kline_data):
+    """VectorBacktestAdapter 在进程池中评估策略副本，结束后写回最优参数"""
+    from strategy.adapters.vector_adapter import VectorBacktestAdapter
+
+    strategy = ThresholdBarStrategy()
+    adapter = VectorBacktestAdapter(strategy)
+
+    result = adapter.optimize_parameters(
+        kline_data, {'upper': [100.0, 102.0], 'lower': [98.0, 99.5]}, n_jobs=2
+    )
+
+    assert result['optimization']['evaluated'] == 4
+    assert strategy.params == result['params']
+    assert set(result['results']) == set(kline_data)
+
+
+class CachedThresholdStrategy(ThresholdBarStrategy):
+    """记录复制次数和接入的指标缓存"""
+
+    copies = 0
+    caches = []
+
+    def set_indicator_cache(self, cache):
+        CachedThresholdStrategy.caches.append(cache)
+
+    def __deepcopy__(self, memo):
+        CachedThresholdStrategy.copies += 1
+        clone = CachedThresholdStrategy()
+        clone.params = dict(self.params)
+        return clone
+
+
+def test_vector_adapter_sweep_reuses_strategy_and_indicator_cache(kline_data):
+    """串行评估时只复制一次策略，每个参数组合都接入同一个工作进程指标缓存"""
+    from strategy.adapters.vector_adapter import VectorBacktestAdapter
+
+    CachedThresholdStrategy.copies = 0
+    CachedThresholdStrategy.caches = []
+    strategy = CachedThresholdStrategy()
+    adapter = VectorBacktestAdapter(strategy)
+
+    result = adapter.optimize_parameters(
+        kline_data, {'upper': [100.0, 102.0], 'lower': [98.0, 99.5]}, n_jobs=1
+    )
+
+    assert result['optimization']['evaluated'] == 4
+    assert CachedThresholdStrategy.copies == 1
+    assert len(CachedThresholdStrategy.caches) == 4
+    assert len({id(cache) for cache in CachedThresholdStrategy.caches}) == 1
@@ -0,0 +1,161 @@
+"""
+PortfolioBacktestAdapter 组合回测单元测试
+验证组合模拟内核与 Python 备用实现一致、共享资金池分配、缺失K线处理以及结果格式
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy.adapters import PortfolioBacktestAdapter
+from strategy.core import StrategyCore
+from strategy.core.numba_functions import simulate_portfolio
+from strategy.core.vector_engine import TRADE_RECORD_DTYPE, VectorEngine
+
+
+class ThresholdStrategy:
+    """逐K线策略：收盘价上穿 upper 买入，下穿 lower 卖出"""
+
+    def __init__(self, params):
+        self.params = params
+
+    def on_init(self):
+        self._prev = None
+        self.last_order = None
+
+    def on_bar(self, bar):
+        close = bar['close']
+        self.last_order = None
+        if self._prev is not None:
+            if self._prev <= self.params['upper'] < close:
+                self.last_order = {'direction': 'buy'}
+            elif self._prev >= self.params['lower'] > close:
+                self.last_order = {'direction': 'sell'}
+        self._prev = close
+
+    def on_stop(self, bar):
+        pass
+
+
+class MomentumCore(StrategyCore):
+    """向量化策略：收盘价高于前一根时持有"""
+
+    def calculate_indicators(self, data):
+        return {'diff': data['Close'].diff()}
+
+    def generate_signals(self, indicators):
+        diff = indicators['diff']
+        return {'entries': diff > 0, 'exits': diff < 0}
+
+
+def _kline(prices, start='2024-01-01', freq='h'):
+    index = pd.date_range(start, periods=len(prices), freq=freq)
+    prices = np.asarray(prices, dtype=np.float64)
+    return pd.DataFrame({
+        'Open': prices, 'High': prices + 1, 'Low': prices - 1, 'Close': prices, 'Volume': 1.0,
+    }, index=index)
+
+
+@pytest.fixture
+def random_matrices():
+    """含缺失K线的随机价格和信号矩阵"""
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (500, 6)), axis=0))
+    valid = rng.random((500, 6)) > 0.05
+    close[~valid] = np.nan
+    entries = rng.random((500, 6)) > 0.9
+    exits = rng.random((500, 6)) > 0.9
+    return close, valid, entries, exits
+
+
+def test_kernel_matches_python_fallback(random_matrices):
+    """Numba 内核与 Python 备用实现结果一致"""
+    args = (*random_matrices, 100000.0, 0.001, 0.2)
+
+    equity, cash, trades, n_closed = simulate_portfolio(*args)
+    equity_py, cash_py, trades_py, n_closed_py = VectorEngine()._simulate_portfolio_python(*args)
+
+    np.testing.assert_allclose(equity, equity_py)
+    np.testing.assert_allclose(cash, cash_py)
+    assert trades.dtype == TRADE_RECORD_DTYPE
+    assert n_closed == n_closed_py
+    for field in TRADE_RECORD_DTYPE.names:
+        np.testing.assert_allclose(trades[field], trades_py[field], err_msg=field)
+
+
+def test_kernel_shared_cash_and_forced_exit():
+    """入场使用当前现金的固定比例，结束时按最近有效价格强制平仓"""
+    close = np.array([[10.0, 20.0], [10.0, 20.0], [12.0, np.nan]])
+    valid = ~np.isnan(close)
+    entries = np.array([[True, True], [False, False], [False, False]])
+    exits = np.zeros_like(entries)
+
+    equity, cash, trades, n_closed = simulate_portfolio(close, valid, entries, exits, 1000.0, 0.0, 0.5)
+
+    # 资产0使用 1000*0.5，资产1使用剩余 500*0.5
+    np.testing.assert_allclose(cash, [1000.0, 250.0, 250.0])
+    # 资产1在最后一步缺少K线，按最近有效价格计值而不是归零
+    np.testing.assert_allclose(equity, [1000.0, 1000.0, 1100.0])
+    assert n_closed == 0
+    np.testing.assert_array_equal(trades['exit_idx'], [2, 2])
+    np.testing.assert_allclose(trades['exit_price'], [12.0, 20.0])
+
+
+class TestPortfolioBacktestAdapter:
+    """PortfolioBacktestAdapter.run_backtest 测试类"""
+
+    @pytest.fixture
+    def data(self):
+        rng = np.random.default_rng(5)
+        return {
+            symbol: _kline(100 + rng.normal(0, 1, 300).cumsum())
+            for symbol in ('BTCUSDT_1h', 'ETHUSDT_1h', 'SOLUSDT_1h')
+        }
+
+    def test_results_are_consistent(self, data):
+        """成交按时间排序，净盈亏之和等于权益变化"""
+        adapter = PortfolioBacktestAdapter(ThresholdStrategy({'upper': 100.5, 'lower': 99.5}))
+
+        results = adapter.run_backtest(data, init_cash=10000.0, fees=0.001, position_size_pct=0.3)
+
+        portfolio = results['portfolio']
+        trades = portfolio['trades']
+        assert len(portfolio['equity_curve']) == 300
+        assert trades and [t['timestamp'] for t in trades] == sorted(t['timestamp'] for t in trades)
+        assert sum(t['direction'] == 'buy' for t in trades) == len(portfolio['trade_records'])
+        assert portfolio['final_equity'] == pytest.approx(10000.0 + portfolio['metrics']['total_pnl'])
+        assert portfolio['metrics']['total_fees'] == pytest.approx(portfolio['trade_records']['fees'].sum())
+        for symbol in data:
+            assert all(t['symbol'] == symbol for t in results[symbol]['trades'])
+
+    def test_every_position_is_closed(self, data):
+        """每笔买入都有对应卖出，未平仓的持仓在最后强制平仓"""
+        adapter = PortfolioBacktestAdapter(ThresholdStrategy({'upper': 100.5, 'lower': 50.0}))
+
+        results = adapter.run_backtest(data, init_cash=10000.0)
+
+        trades = results['portfolio']['trades']
+        buys = [t for t in trades if t['direction'] == 'buy']
+        forced = [t for t in trades if t.get('forced_exit')]
+        assert len(forced) == len(buys) > 0
+        assert all(t['timestamp'] == data['BTCUSDT_1h'].index[-1] for t in forced)
+        assert adapter.portfolio.total_equity == adapter.portfolio.cash
+
+    def test_strategy_core_signals(self, data):
+        """StrategyCore 策略使用向量化信号"""
+        adapter = PortfolioBacktestAdapter(MomentumCore({}))
+
+        results = adapter.run_backtest(data, init_cash=10000.0)
+
+        assert results['portfolio']['metrics']['total_trades'] > 0
+
+    def test_missing_bars_are_masked(self):
+        """其它交易对缺少的时间步不撮合"""
+        btc = _kline([100.0, 102.0, 104.0, 106.0])
+        eth = _kline([100.0, 102.0, 104.0, 106.0]).drop(btc.index[1])
+        adapter = PortfolioBacktestAdapter(ThresholdStrategy({'upper': 101.0, 'lower': 0.0}))
+
+        results = adapter.run_backtest({'BTCUSDT_1h': btc, 'ETHUSDT_1h': eth}, init_cash=1000.0, fees=0.0)
+
+        buys = {t['symbol']: t['timestamp'] for t in results['portfolio']['trades'] if t['direction'] == 'buy'}
+        assert buys == {'BTCUSDT_1h': btc.index[1], 'ETHUSDT_1h': btc.index[2]}
@@ -0,0 +1,187 @@
+"""
+VectorEngine 多资产订单模拟单元测试
+验证每个资产独立持仓、共享现金池、每资产手续费/滑点以及交易记录提取
+"""
+
+import numpy as np
+import pytest
+
+from strategy.core.numba_functions import extract_trades, simulate_orders, simulate_orders_multi
+from strategy.core.vector_engine import TRADE_RECORD_DTYPE, VectorEngine
+
+
+def _two_asset_orders():
+    """两个资产交错买卖的价格和订单"""
+    price = np.array([
+        [10.0, 100.0],
+        [11.0, 110.0],
+        [12.0, 120.0],
+        [13.0, 130.0],
+    ])
+    size = np.array([
+        [1.0, 0.0],
+        [0.0, 2.0],
+        [-1.0, 0.0],
+        [0.0, -2.0],
+    ])
+    return price, size
+
+
+@pytest.fixture(params=["numba", "python"])
+def simulate_multi(request):
+    """Numba 内核与 Python 备用实现"""
+    if request.param == "numba":
+        return simulate_orders_multi
+    return VectorEngine()._simulate_orders_multi_python
+
+
+class TestSimulateOrdersMulti:
+    """多资产订单模拟测试类"""
+
+    def test_positions_are_tracked_per_asset(self, simulate_multi):
+        """每个资产独立持仓，一个资产的持仓不会阻止另一个资产买入"""
+        price, size = _two_asset_orders()
+        zeros = np.zeros(2)
+
+        cash, positions, avg_cost = simulate_multi(price, size, zeros, zeros, 1000.0)
+
+        np.testing.assert_array_equal(positions[:, 0], [1.0, 1.0, 0.0, 0.0])
+        np.testing.assert_array_equal(positions[:, 1], [0.0, 2.0, 2.0, 0.0])
+        np.testing.assert_array_equal(cash, [990.0, 770.0, 782.0, 1042.0])
+        assert avg_cost[1, 1] == 110.0
+        assert avg_cost[3, 1] == 0.0
+
+    def test_per_asset_fees_and_slippage(self, simulate_multi):
+        """手续费率和滑点按资产分别生效"""
+        price, size = _two_asset_orders()
+        fees = np.array([0.0, 0.01])
+        slippage = np.array([0.1, 0.0])
+
+        cash, _, avg_cost = simulate_multi(price, size, fees, slippage, 1000.0)
+
+        # 资产0：买入价 10*1.1=11，卖出价 12*0.9=10.8，无手续费
+        # 资产1：买入 2*110=220 加手续费2.2，卖出 2*130=260 扣手续费2.6
+        assert avg_cost[0, 0] == pytest.approx(11.0)
+        assert cash[-1] == pytest.approx(1000.0 - 11.0 + 10.8 - 222.2 + 257.4)
+
+    def test_shared_cash_pool_limits_buys(self, simulate_multi):
+        """现金池在资产间共享，资金不足时后续资产无法买入"""
+        price = np.array([[100.0, 100.0]])
+        size = np.array([[1.0, 1.0]])
+
+        cash, positions, _ = simulate_multi(price, size, np.zeros(2), np.zeros(2), 150.0)
+
+        np.testing.assert_array_equal(positions[0], [1.0, 0.0])
+        assert cash[0] == 50.0
+
+    def test_nan_price_skips_orders(self, simulate_multi):
+        """价格为NaN（未上市）时不撮合该资产"""
+        price = np.array([[np.nan, 10.0], [5.0, 10.0]])
+        size = np.array([[1.0, 1.0], [1.0, 0.0]])
+
+        cash, positions, _ = simulate_multi(price, size, np.zeros(2), np.zeros(2), 100.0)
+
+        np.testing.assert_array_equal(positions, [[0.0, 1.0], [1.0, 1.0]])
+        assert cash[-1] == 85.0
+
+
+def test_simulate_orders_matches_multi_kernel():
+    """标量手续费接口与多资产内核结果一致"""
+    price, size = _two_asset_orders()
+
+    cash, positions = simulate_orders(price, size, np.zeros_like(size, dtype=np.int32), 0.001, 0.0005, 1000.0)
+    cash_m, positions_m, _ = simulate_orders_multi(price, size, np.full(2, 0.001), np.full(2, 0.0005), 1000.0)
+
+    np.testing.assert_array_equal(cash, cash_m)
+    np.testing.assert_array_equal(positions, positions_m)
+
+
+@pytest.fixture(params=["numba", "python"])
+def extract(request):
+    """交易记录提取的 Numba 内核与 Python 备用实现"""
+    if request.param == "numba":
+        return extract_trades
+    return VectorEngine()._extract_trades_python
+
+
+class TestExtractTrades:
+    """交易记录提取测试类"""
+
+    def test_records_pair_entry_and_exit(self, extract):
+        """每条记录包含入场/出场时间步、价格、双边手续费和盈亏"""
+        price, _ = _two_asset_orders()
+        positions = np.array([[1.0, 0.0], [1.0, 2.0], [0.0, 2.0], [0.0, 0.0]])
+
+        trades = extract(price, positions, np.array([0.0, 0.01]))
+
+        assert trades.dtype == TRADE_RECORD_DTYPE
+        np.testing.assert_array_equal(trades['asset'], [0, 1])
+        np.testing.assert_array_equal(trades['entry_idx'], [0, 1])
+        np.testing.assert_array_equal(trades['exit_idx'], [2, 3])
+        assert trades['pnl'][0] == pytest.approx(2.0)
+        assert trades['fees'][1] == pytest.approx((260.0 + 220.0) * 0.01)
+        assert trades['pnl'][1] == pytest.approx(40.0 - 4.8)
+        assert trades['value'][1] == pytest.approx(260.0)
+
+    def test_fifo_across_lots(self, extract):
+        """分批入场后一次卖出，按先进先出逐批配对"""
+        price = np.array([10.0, 20.0, 30.0, 40.0]).reshape(-1, 1)
+        positions = np.array([1.0, 3.0, 0.5, 0.0]).reshape(-1, 1)
+
+        trades = extract(price, positions, np.zeros(1))
+
+        np.testing.assert_array_equal(trades['entry_idx'], [0, 1, 1])
+        np.testing.assert_array_equal(trades['exit_idx'], [2, 2, 3])
+        np.testing.assert_allclose(trades['size'], [1.0, 1.5, 0.5])
+        np.testing.assert_allclose(trades['pnl'], [20.0, 15.0, 10.0])
+
+    def test_no_trades(self, extract):
+        """没有平仓时返回空记录数组"""
+        positions = np.array([[0.0], [1.0]])
+
+        trades = extract(np.ones((2, 1)), positions, np.zeros(1))
+
+        assert len(trades) == 0
+        assert trades.dtype == TRADE_RECORD_DTYPE
+
+
+class TestVectorEngineMultiAsset:
+    """VectorEngine.run_backtest 多资产测试类"""
+
+    def test_run_backtest_multi_asset(self):
+        """多资产一次调用，交易记录按资产区分"""
+        price, size = _two_asset_orders()
+        engine = VectorEngine()
+
+        result = engine.run_backtest(
+            price=price,
+            entries=size > 0,
+            exits=size < 0,
+            init_cash=1000.0,
+            fees=np.array([0.0, 0.01]),
+            slippage=0.0,
+            position_size=np.array([1.0, 2.0]),
+        )
+
+        assert result['positions'].shape == (4, 2)
+        assert result['avg_cost'].shape == (4, 2)
+        assert [t['asset'] for t in result['trades']] == [0, 1]
+        assert result['trades'][1]['fees'] == pytest.approx(2 * 130.0 * 0.01 + 2 * 110.0 * 0.01)
+        assert result['metrics']['trade_count'] == 2
+
+    def test_single_column_matches_previous_behaviour(self):
+        """单资产时的结果与原有单资产接口一致"""
+        price = np.array([10.0, 11.0, 12.0, 11.0, 13.0]).reshape(-1, 1)
+        entries = np.array([True, False, False, True, False]).reshape(-1, 1)
+        exits = np.array([False, False, True, False, True]).reshape(-1, 1)
+
+        result = VectorEngine().run_backtest(price, entries, exits, init_cash=100.0, fees=0.0, slippage=0.0)
+
+        assert result['metrics']['final_equity'] == pytest.approx(100.0 + 2.0 + 2.0)
+        assert result['metrics']['trade_count'] == 2
+
+    def test_per_asset_parameter_length_checked(self):
+        """每资产参数长度必须与资产数一致"""
+        price, size = _two_asset_orders()
+        with pytest.raises(ValueError):
+            VectorEngine().run_backtest(price, size > 0, size < 0, fees=np.array([0.001, 0.001, 0.001]))
@@ -0,0 +1,100 @@
+"""
+CommManager 批量发布测试
+
+通过本机 ZeroMQ 连接验证合并窗口、批量多帧发送、Worker 端拆包和丢弃统计
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from worker.ipc.comm_manager import CommManager
+from worker.ipc.data_broker import DataBroker
+from worker.ipc.protocol import Message
+from worker.ipc.worker_client import WorkerCommClient
+
+
+def _kline(symbol, i):
+    return Message.create_market_data(symbol, "kline", {
+        "timestamp": 1700000000000 + i, "open": 1.0, "high": 1.0, "low": 1.0, "close": float(i), "volume": 1.0,
+    })
+
+
+@pytest.fixture
+async def connected_pair():
+    """已连接的主进程通信管理器和 Worker 客户端"""
+    base = random.randint(20000, 40000)
+    created = []
+
+    async def factory(**kwargs):
+        manager = CommManager(data_port=base, control_port=base + 1, status_port=base + 2, **kwargs)
+        assert await manager.start()
+        client = WorkerCommClient(
+            "worker-batch", data_port=manager.data_port,
+            control_port=manager.control_port, status_port=manager.status_port,
+        )
+        assert await client.connect()
+        received = []
+        client.register_data_handler(lambda topic, message: received.append((topic, message)))
+        client.subscribe_symbols(["BTCUSDT", "ETHUSDT"])
+        # 等待订阅生效
+        await asyncio.sleep(0.3)
+        created.append((manager, client))
+        return manager, received
+
+    yield factory
+
+    for manager, client in created:
+        await client.disconnect()
+        await manager.stop()
+
+
+async def _wait_for(received, count, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while len(received) < count and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def test_window_coalesces_per_topic(connected_pair):
+    """合并窗口内同一主题的消息作为一个批量帧发送，Worker 按顺序逐条收到"""
+    manager, received = await connected_pair(batch_window_ms=50)
+
+    for i in range(10):
+        for symbol in ("BTCUSDT", "ETHUSDT"):
+            assert await manager.publish_data(f"market.{symbol}.kline", _kline(symbol, i))
+    await _wait_for(received, 20)
+
+    assert len(received) == 20
+    btc = [m.payload["data"]["close"] for t, m in received if t == "market.BTCUSDT.kline"]
+    assert btc == [float(i) for i in range(10)]
+    stats = manager.get_stats()
+    assert stats["messages_published"] == 20
+    assert stats["batches_published"] == 2
+
+
+async def test_broker_publish_batch_groups_topics(connected_pair):
+    """DataBroker.publish_batch 按主题分组发送"""
+    manager, received = await connected_pair()
+    broker = DataBroker(manager)
+
+    messages = [_kline(symbol, i) for i in range(5) for symbol in ("BTCUSDT", "ETHUSDT")]
+    assert await broker.publish_batch(messages) == 10
+    await _wait_for(received, 10)
+
+    assert len(received) == 10
+    assert manager.get_stats()["batches_published"] == 2
+
+
+async def test_pending_overflow_drops_oldest(connected_pair):
+    """合并缓存超过上限时丢弃最旧的消息并计数"""
+    manager, received = await connected_pair(batch_window_ms=10000, max_pending=3)
+
+    for i in range(5):
+        await manager.publish_data("market.BTCUSDT.kline", _kline("BTCUSDT", i))
+    assert manager.get_stats()["messages_dropped"] == 2
+
+    assert await manager.flush() == 3
+    await _wait_for(received, 3)
+
+    assert [m.payload["data"]["close"] for _, m in received] == [2.0, 3.0, 4.0]
@@ -0,0 +1,86 @@
+"""
+DataBroker 共享内存分发测试
+
+验证行情写入共享内存环形缓冲区后只发送通知，Worker 按通知还原完整数据
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from strategy.core.memory_pool import SharedMemoryMarketData
+from worker.ipc.data_broker import DataBroker
+from worker.state import WorkerState
+from worker.worker_process import WorkerProcess
+
+KLINE = {
+    "timestamp": 1700000000000,
+    "open": 100.0,
+    "high": 110.0,
+    "low": 95.0,
+    "close": 105.0,
+    "volume": 12.5,
+    "interval": "1m",
+}
+
+
+@pytest.fixture
+def shared_market_data():
+    """创建方共享内存市场数据"""
+    with SharedMemoryMarketData(num_symbols=8, buffer_size=16) as shared:
+        yield shared
+
+
+def _make_broker(shared=None):
+    comm_manager = MagicMock()
+    comm_manager.publish_data = AsyncMock(return_value=True)
+    return DataBroker(comm_manager, shared), comm_manager
+
+
+def _published_data(comm_manager):
+    _, message = comm_manager.publish_data.call_args.args
+    return message.payload["data"]
+
+
+async def test_kline_published_as_notification(shared_market_data):
+    """K线写入共享内存，消息只携带命名空间、序号和非数值字段"""
+    broker, comm_manager = _make_broker(shared_market_data)
+
+    assert await broker.publish("BTCUSDT", "kline", KLINE)
+
+    data = _published_data(comm_manager)
+    assert data == {"interval": "1m", "shm": shared_market_data.namespace, "shm_seq": 1}
+    assert broker.get_stats()["shm_writes"] == 1
+
+
+async def test_unsupported_payload_falls_back_to_full_data(shared_market_data):
+    """浮点时间戳或未配置共享内存时发送完整数据"""
+    broker, comm_manager = _make_broker(shared_market_data)
+    await broker.publish("BTCUSDT", "kline", dict(KLINE, timestamp=1.5))
+    assert _published_data(comm_manager)["timestamp"] == 1.5
+
+    broker, comm_manager = _make_broker()
+    await broker.publish("BTCUSDT", "kline", KLINE)
+    assert _published_data(comm_manager) == KLINE
+
+
+async def test_worker_restores_data_from_shared_memory(shared_market_data):
+    """Worker 按交易对名附加共享内存，策略收到与原数据一致的K线和Tick"""
+    broker, comm_manager = _make_broker(shared_market_data)
+    worker = WorkerProcess("worker-shm", "strategy.py", {"symbols": ["BTCUSDT"]})
+    worker.status.update_state(WorkerState.RUNNING)
+    worker.strategy = MagicMock()
+
+    await broker.publish("BTCUSDT", "kline", KLINE)
+    _, message = comm_manager.publish_data.call_args.args
+    await worker._handle_data("market.BTCUSDT.kline", message)
+
+    await broker.publish("BTCUSDT", "tick", {"timestamp": 1700000000001, "price": 106.0, "volume": 0.5})
+    _, message = comm_manager.publish_data.call_args.args
+    await worker._handle_data("market.BTCUSDT.tick", message)
+
+    worker.strategy.on_bar.assert_called_once_with(KLINE)
+    worker.strategy.on_tick.assert_called_once_with(
+        {"timestamp": 1700000000001, "price": 106.0, "volume": 0.5}
+    )
+    await worker._cleanup()
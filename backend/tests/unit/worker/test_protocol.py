@@ -0,0 +1,116 @@
+"""
+IPC 消息编解码测试
+
+验证二进制编码与 JSON 编码的往返一致性、自动识别、按 Worker 协商编码和批量帧
+"""
+
+import pytest
+
+from worker.ipc.comm_manager import CommManager
+from worker.ipc.protocol import (
+    BINARY_MAGIC,
+    PAYLOAD_KLINE,
+    PAYLOAD_TICK,
+    Message,
+    MessageType,
+    deserialize_message,
+    get_codec,
+    pack_batch,
+    serialize_message,
+    unpack_batch,
+)
+
+KLINE = {
+    "timestamp": 1700000000000,
+    "open": 100.0,
+    "high": 110.0,
+    "low": 95.0,
+    "close": 105.0,
+    "volume": 12.5,
+}
+
+
+def _roundtrip(message, codec="binary"):
+    return deserialize_message(serialize_message(message, codec))
+
+
+@pytest.mark.parametrize("data_type,data,kind", [
+    ("kline", KLINE, PAYLOAD_KLINE),
+    ("kline", dict(KLINE, interval="1m", is_closed=True), PAYLOAD_KLINE),
+    ("tick", {"timestamp": 1700000000001, "price": 106.0, "volume": 0.5}, PAYLOAD_TICK),
+])
+def test_market_data_uses_fixed_layout(data_type, data, kind):
+    """K线/Tick 使用定长布局，解码结果与原消息一致"""
+    message = Message.create_market_data("BTCUSDT", data_type, data, None)
+
+    encoded = serialize_message(message, "binary")
+    decoded = deserialize_message(encoded)
+
+    assert encoded[0] == BINARY_MAGIC
+    assert encoded[3] == kind
+    assert decoded.payload == message.payload
+    assert decoded.msg_id == message.msg_id
+    assert decoded.timestamp == message.timestamp
+    assert len(encoded) < len(serialize_message(message, "json"))
+
+
+def test_non_layout_types_fall_back_and_keep_types():
+    """数值类型与定长布局不一致时走通用负载，类型保持不变"""
+    data = dict(KLINE, volume=12)
+    message = Message.create_market_data("BTCUSDT", "kline", data)
+
+    decoded = _roundtrip(message)
+
+    assert decoded.payload["data"] == data
+    assert type(decoded.payload["data"]["volume"]) is int
+
+
+def test_control_message_roundtrip_and_monotonic_ids():
+    """控制消息往返一致，消息ID为单调递增的整数"""
+    first = Message.create_control(MessageType.UPDATE_PARAMS, "worker-1", {"fast": 5, "name": "均线"})
+    second = Message.create_heartbeat("worker-1")
+
+    decoded = _roundtrip(first)
+
+    assert decoded.msg_type is MessageType.UPDATE_PARAMS
+    assert decoded.worker_id == "worker-1"
+    assert decoded.payload == {"fast": 5, "name": "均线"}
+    assert isinstance(first.msg_id, int) and second.msg_id > first.msg_id
+
+
+def test_json_frames_are_detected():
+    """默认 JSON 编码仍可解码，未知编码名称报错"""
+    message = Message.create_status_update("worker-1", "running")
+
+    assert serialize_message(message).startswith(b"{")
+    assert _roundtrip(message, "json").payload == message.payload
+    with pytest.raises(ValueError):
+        get_codec("xml")
+
+
+def test_comm_manager_negotiates_codec_per_worker():
+    """主进程按 Worker 发来消息的编码回复该 Worker"""
+    manager = CommManager(codec="binary")
+    json_frame = serialize_message(Message.create_heartbeat("worker-json"), "json")
+    binary_frame = serialize_message(Message.create_heartbeat("worker-bin"), "binary")
+
+    manager._decode_from_worker(json_frame)
+    manager._decode_from_worker(binary_frame)
+
+    assert manager.get_worker_codec("worker-json").name == "json"
+    assert manager.get_worker_codec("worker-bin").name == "binary"
+    assert manager.get_worker_codec("worker-new").name == "binary"
+
+
+def test_batch_frames_roundtrip():
+    """批量帧带头部，单条消息不加头部，头部计数不一致时报错"""
+    encoded = [serialize_message(Message.create_heartbeat(f"w{i}"), "binary") for i in range(3)]
+
+    frames = pack_batch(encoded)
+
+    assert len(frames) == 4
+    assert unpack_batch(frames) == encoded
+    assert pack_batch(encoded[:1]) == encoded[:1]
+    assert unpack_batch(encoded[:1]) == encoded[:1]
+    with pytest.raises(ValueError):
+        unpack_batch(frames[:-1])
@@ -12,6 +12,8 @@
 from typing import Literal, Optional, Union
 from datetime import datetime
 
+import numpy as np
+
 
 # 时间戳精度类型
 Precision = Literal['s', 'ms', 'us', 'ns', 'auto']
@@ -287,6 +289,32 @@ def batch_normalize_to_nanoseconds(timestamps: list,
     return [normalize_to_nanoseconds(ts, input_precision) for ts in timestamps]
 
 
+def array_to_nanoseconds(timestamps,
+                         input_precision: Precision = 'auto') -> np.ndarray:
+    """
+    向量化地将时间戳数组转换为纳秒级int64数组
+
+    精度自动检测规则与 detect_precision 一致，逐元素判断
+
+    Args:
+        timestamps: 时间戳数组（整数或浮点）
+        input_precision: 输入精度
+
+    Returns:
+        np.ndarray: 纳秒级int64时间戳数组
+    """
+    values = np.asarray(timestamps).astype(np.int64)
+    if input_precision == 'auto':
+        factor = np.select(
+            [values > 10**18, values > 10**15, values > 10**12],
+            [1, 1_000, 1_000_000],
+            default=1_000_000_000,
+        )
+    else:
+        factor = {'s': 1_000_000_000, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}[input_precision]
+    return values * factor
+
+
 # 验证函数
 def is_valid_nanoseconds(timestamp: Union[str, int]) -> bool:
     """
@@ -2,7 +2,17 @@
 Worker IPC模块 - ZeroMQ进程间通信
 """
 
-from .protocol import MessageType, Message, MessageTopic, serialize_message, deserialize_message
+from .protocol import (
+    MessageType,
+    Message,
+    MessageTopic,
+    MessageCodec,
+    JsonCodec,
+    BinaryCodec,
+    get_codec,
+    serialize_message,
+    deserialize_message,
+)
 from .comm_manager import CommManager
 from .worker_client import WorkerCommClient
 from .data_broker import DataBroker, DataSubscription
@@ -11,6 +21,10 @@ __all__ = [
     'MessageType',
     'Message',
     'MessageTopic',
+    'MessageCodec',
+    'JsonCodec',
+    'BinaryCodec',
+    'get_codec',
     'serialize_message',
     'deserialize_message',
     'CommManager',
@@ -7,14 +7,14 @@
 
 import zmq
 import zmq.asyncio
-from typing import Optional, Callable, Any, List
+from typing import Dict, Optional, Callable, Any, List, Union
 import asyncio
 from datetime import datetime
 from utils.logger import get_logger, LogType
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
-from .protocol import Message, MessageType, serialize_message, deserialize_message
+from .protocol import Message, MessageCodec, MessageType, detect_codec, get_codec, pack_batch
 
 # 超时配置常量
 ZMQ_BIND_TIMEOUT = 5.0  # ZeroMQ bind 操作超时时间（秒）
@@ -24,6 +24,11 @@ MAX_BIND_RETRIES = 3  # 最大 bind 重试次数
 PORT_RANGE_START = 5555  # 端口范围起始
 PORT_RANGE_END = 5600  # 端口范围结束
 
+# 批量发布配置常量
+DEFAULT_SEND_HWM = 100000  # 数据发布端每个订阅者的发送高水位（消息数）
+DEFAULT_BATCH_MAX_MESSAGES = 256  # 单个批量帧的最大消息数
+DEFAULT_MAX_PENDING = 50000  # 合并窗口内最多缓存的消息数，超出时丢弃最旧消息
+
 
 class CommManager:
     """
@@ -31,6 +36,13 @@ class CommManager:
 
     管理所有通信连接，提供数据发布、控制命令发送和状态接收功能
     底层使用 ZeroMQ 实现，但对外暴露通用接口
+
+    编码协商：数据发布使用本端编码；接收时按首字节识别对端编码，
+    之后发给该 Worker 的控制命令使用对端的编码
+
+    批量发布：batch_window_ms > 0 时 publish_data 只把消息放入按主题分组的缓存，
+    窗口到期或缓存达到 batch_max_messages 时，每个主题的消息合并为一个多帧消息发送，
+    整点收盘时的成批K线不再逐条 send_multipart
     """
 
     def __init__(
@@ -39,12 +51,47 @@ class CommManager:
         data_port: int = 5555,
         control_port: int = 5556,
         status_port: int = 5557,
+        codec: Union[str, MessageCodec] = "binary",
+        batch_window_ms: float = 0.0,
+        batch_max_messages: int = DEFAULT_BATCH_MAX_MESSAGES,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        send_hwm: int = DEFAULT_SEND_HWM,
     ):
+        """
+        Args:
+            host: 通信主机地址
+            data_port: 数据端口
+            control_port: 控制端口
+            status_port: 状态端口
+            codec: 消息编码
+            batch_window_ms: 数据合并窗口（毫秒），0 表示逐条发送
+            batch_max_messages: 单个批量帧的最大消息数，缓存达到该数量时立即发送
+            max_pending: 合并窗口内最多缓存的消息数
+            send_hwm: 数据发布端的发送高水位
+        """
         self.host = host
         self.data_port = data_port
         self.control_port = control_port
         self.status_port = status_port
 
+        # 消息编码及每个 Worker 协商后的编码
+        self.codec = get_codec(codec)
+        self._worker_codecs: Dict[str, MessageCodec] = {}
+
+        # 批量发布
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_messages = max(1, batch_max_messages)
+        self.max_pending = max_pending
+        self.send_hwm = send_hwm
+        self._pending: Dict[str, List[bytes]] = {}
+        self._pending_count = 0
+        self._flush_lock = asyncio.Lock()
+
+        # 发布统计
+        self._messages_published = 0
+        self._batches_published = 0
+        self._messages_dropped = 0
+
         # 通信上下文
         self._context: Optional[zmq.asyncio.Context] = None
 
@@ -83,6 +130,8 @@ class CommManager:
             # 启动后台任务
             self._tasks.append(asyncio.create_task(self._status_loop()))
             self._tasks.append(asyncio.create_task(self._control_loop()))
+            if self.batch_window > 0:
+                self._tasks.append(asyncio.create_task(self._batch_loop()))
 
             logger.info("通信管理器已启动")
             return True
@@ -104,6 +153,8 @@ class CommManager:
                 # 创建数据发布端点
                 self._data_publisher = self._context.socket(zmq.PUB)
                 self._data_publisher.setsockopt(zmq.LINGER, 0)  # 设置关闭时不阻塞
+                # PUB 端达到高水位时丢弃消息而不阻塞，高水位决定可容忍的突发量
+                self._data_publisher.setsockopt(zmq.SNDHWM, self.send_hwm)
                 
                 # 使用 asyncio.wait_for 添加超时
                 await asyncio.wait_for(
@@ -188,6 +239,9 @@ class CommManager:
         Returns:
             是否停止成功
         """
+        # 发送合并窗口内剩余的消息
+        if self._running and self._pending:
+            await self.flush()
         self._running = False
 
         # 取消后台任务，设置超时
@@ -222,22 +276,119 @@ class CommManager:
             message: 消息
 
         Returns:
-            是否发送成功
+            是否发送成功，开启合并窗口时表示是否已放入缓存
         """
+        if not (self._data_publisher and self._running):
+            return False
+        try:
+            data = self.codec.encode(message)
+        except Exception as e:
+            logger.error(f"编码数据失败: {e}")
+            self._messages_dropped += 1
+            return False
+
+        if self.batch_window > 0:
+            self._enqueue(topic, data)
+            if self._pending_count >= self.batch_max_messages:
+                await self.flush()
+            return True
+
+        return await self._send_frames(topic, [data])
+
+    async def publish_batch(self, topic: str, messages: List[Message]) -> int:
+        """
+        将同一主题的多条消息合并为一个多帧消息发送
+
+        Args:
+            topic: 主题
+            messages: 消息列表
+
+        Returns:
+            成功发送的消息数量
+        """
+        if not messages or not (self._data_publisher and self._running):
+            return 0
+        encoded = [self.codec.encode(message) for message in messages]
+        sent = 0
+        for start in range(0, len(encoded), self.batch_max_messages):
+            chunk = encoded[start:start + self.batch_max_messages]
+            if await self._send_frames(topic, chunk):
+                sent += len(chunk)
+        return sent
+
+    def _enqueue(self, topic: str, data: bytes) -> None:
+        """放入合并缓存，缓存已满时丢弃积压最多的主题中最旧的一条"""
+        if self._pending_count >= self.max_pending:
+            backlog = max(self._pending.values(), key=len)
+            backlog.pop(0)
+            self._pending_count -= 1
+            self._messages_dropped += 1
+        self._pending.setdefault(topic, []).append(data)
+        self._pending_count += 1
+
+    async def flush(self) -> int:
+        """
+        立即发送合并缓存中的全部消息
+
+        Returns:
+            成功发送的消息数量
+        """
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            sent = 0
+            for topic, encoded in pending.items():
+                for start in range(0, len(encoded), self.batch_max_messages):
+                    chunk = encoded[start:start + self.batch_max_messages]
+                    if await self._send_frames(topic, chunk):
+                        sent += len(chunk)
+            return sent
+
+    async def _send_frames(self, topic: str, encoded: List[bytes]) -> bool:
+        """发送一个主题的一条或多条已编码消息，失败时计入丢弃数"""
         try:
             if self._data_publisher and self._running:
-                data = serialize_message(message)
                 await asyncio.wait_for(
-                    self._data_publisher.send_multipart([topic.encode(), data]),
+                    self._data_publisher.send_multipart([topic.encode(), *pack_batch(encoded)]),
                     timeout=ZMQ_SEND_TIMEOUT
                 )
+                self._messages_published += len(encoded)
+                if len(encoded) > 1:
+                    self._batches_published += 1
                 return True
         except asyncio.TimeoutError:
             logger.warning(f"发布数据超时: {topic}")
         except Exception as e:
             logger.error(f"发布数据失败: {e}")
+        self._messages_dropped += len(encoded)
         return False
 
+    async def _batch_loop(self):
+        """合并窗口到期时发送缓存的消息"""
+        while self._running:
+            try:
+                await asyncio.sleep(self.batch_window)
+                if self._pending:
+                    await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"批量发布错误: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        获取发布统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "messages_published": self._messages_published,
+            "batches_published": self._batches_published,
+            "messages_dropped": self._messages_dropped,
+            "pending": self._pending_count,
+        }
+
     async def send_control(self, worker_id: str, message: Message) -> bool:
         """
         发送控制命令到指定 Worker
@@ -251,7 +402,7 @@ class CommManager:
         """
         try:
             if self._control_server and self._running:
-                data = serialize_message(message)
+                data = self.get_worker_codec(worker_id).encode(message)
                 await asyncio.wait_for(
                     self._control_server.send_multipart(
                         [worker_id.encode(), b"", data]
@@ -277,7 +428,7 @@ class CommManager:
         """
         try:
             if self._data_publisher and self._running:
-                data = serialize_message(message)
+                data = self.codec.encode(message)
                 await asyncio.wait_for(
                     self._data_publisher.send_multipart([b"control.all", data]),
                     timeout=ZMQ_SEND_TIMEOUT
@@ -289,6 +440,29 @@ class CommManager:
             logger.error(f"广播控制命令失败: {e}")
         return False
 
+    def get_worker_codec(self, worker_id: str) -> MessageCodec:
+        """
+        获取与 Worker 协商后的编码
+
+        Args:
+            worker_id: Worker ID
+
+        Returns:
+            Worker 发来消息所用的编码，尚未收到消息时为本端编码
+        """
+        return self._worker_codecs.get(worker_id, self.codec)
+
+    def _decode_from_worker(self, data: bytes, worker_id: Optional[str] = None) -> Message:
+        """解码 Worker 发来的消息并记录其编码"""
+        if not data:
+            raise ValueError("接收到的数据为空")
+        codec = detect_codec(data)
+        message = codec.decode(data)
+        worker_id = worker_id or message.worker_id
+        if worker_id:
+            self._worker_codecs[worker_id] = codec
+        return message
+
     def register_status_handler(self, handler: Callable[[Message], None]):
         """
         注册状态消息处理器
@@ -325,7 +499,7 @@ class CommManager:
                     # 使用超时接收，避免永久阻塞
                     if await self._status_collector.poll(timeout=int(ZMQ_RECV_TIMEOUT * 1000)):
                         data = await self._status_collector.recv()
-                        message = deserialize_message(data)
+                        message = self._decode_from_worker(data)
 
                         # 只记录非 LOG 类型的消息（减少日志量）
                         if message.msg_type != MessageType.LOG:
@@ -357,7 +531,7 @@ class CommManager:
                         if len(parts) >= 3:
                             worker_id = parts[0].decode()
                             data = parts[2]
-                            message = deserialize_message(data)
+                            message = self._decode_from_worker(data, worker_id)
 
                             # 调用所有控制处理器
                             for handler in self._control_handlers:
@@ -4,7 +4,7 @@
 管理数据订阅和分发，使用 ZeroMQ PUB/SUB 模式实现高效数据分发
 """
 
-from typing import Dict, List, Optional, Callable, Set
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Callable, Set
 from dataclasses import dataclass, field
 from utils.logger import get_logger, LogType
 
@@ -13,6 +13,18 @@ logger = get_logger(__name__, LogType.APPLICATION)
 from .protocol import Message, MessageTopic
 from .comm_manager import CommManager
 
+if TYPE_CHECKING:
+    from strategy.core.memory_pool import SharedMemoryMarketData
+
+# 写入共享内存环形缓冲区的字段，其余字段随通知消息发送
+KLINE_SHM_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+TICK_SHM_FIELDS = ("timestamp", "price", "volume")
+
+
+def shared_memory_key(symbol: str, data_type: str) -> str:
+    """共享内存中的缓冲区键，K线与Tick分别使用独立的环形缓冲区"""
+    return symbol if data_type == "kline" else f"{symbol}:{data_type}"
+
 
 @dataclass
 class DataSubscription:
@@ -56,21 +68,30 @@ class DataBroker:
     """
     数据代理
 
-    管理数据订阅和分发，使用 PUB/SUB 模式实现高效数据分发
+    管理数据订阅和分发，使用 PUB/SUB 模式实现高效数据分发。
+    配置共享内存市场数据后，K线和Tick写入按交易对的共享内存环形缓冲区，
+    PUB 通道只发送包含命名空间和记录序号的小通知，由 Worker 按交易对名读取
     """
 
-    def __init__(self, comm_manager: CommManager):
+    def __init__(
+        self,
+        comm_manager: CommManager,
+        shared_market_data: Optional["SharedMemoryMarketData"] = None,
+    ):
         """
         初始化数据代理
 
         Args:
             comm_manager: 通信管理器实例
+            shared_market_data: 共享内存市场数据（创建方），None 表示通过消息发送完整数据
         """
         self.comm_manager = comm_manager
+        self.shared_market_data = shared_market_data
         self._subscriptions: Dict[str, DataSubscription] = {}
         self._topic_routing: Dict[str, Set[str]] = {}
         self._messages_published = 0
         self._messages_dropped = 0
+        self._shm_writes = 0
         self._data_preprocessors: List[Callable[[Message], Optional[Message]]] = []
 
     def subscribe(
@@ -206,6 +227,8 @@ class DataBroker:
         """
         try:
             topic = MessageTopic.market_data(symbol, data_type)
+            if self.shared_market_data is not None:
+                data = self._write_shared_memory(symbol, data_type, data)
             message = Message.create_market_data(symbol, data_type, data, source)
 
             # 应用预处理器
@@ -226,25 +249,82 @@ class DataBroker:
             self._messages_dropped += 1
             return False
 
+    def _write_shared_memory(self, symbol: str, data_type: str, data: dict) -> dict:
+        """
+        将数据写入共享内存环形缓冲区
+
+        Args:
+            symbol: 交易对
+            data_type: 数据类型
+            data: 数据内容
+
+        Returns:
+            替代完整数据的通知：shm 为命名空间，shm_seq 为记录序号，
+            其余非数值字段原样保留；无法写入时返回原数据
+        """
+        if data_type == "kline":
+            fields = KLINE_SHM_FIELDS
+        elif data_type == "tick":
+            fields = TICK_SHM_FIELDS
+        else:
+            return data
+
+        try:
+            values = [data[field] for field in fields]
+        except (KeyError, TypeError):
+            return data
+        # 时间戳按 int64、价格按 float64 存放，其它类型走完整消息以保持原样
+        timestamp = values[0]
+        if isinstance(timestamp, bool) or not isinstance(timestamp, int):
+            return data
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values[1:]):
+            return data
+
+        key = shared_memory_key(symbol, data_type)
+        try:
+            if data_type == "kline":
+                seq = self.shared_market_data.write(key, *values)
+            else:
+                seq = self.shared_market_data.write_tick(key, values[1], values[2], timestamp)
+        except (RuntimeError, OverflowError) as e:
+            logger.warning(f"写入共享内存失败，改为发送完整数据: {symbol} {data_type}: {e}")
+            return data
+
+        self._shm_writes += 1
+        notification: Dict[str, Any] = {
+            key: value for key, value in data.items() if key not in fields
+        }
+        notification["shm"] = self.shared_market_data.namespace
+        notification["shm_seq"] = seq
+        return notification
+
     async def publish_batch(self, messages: List[Message]) -> int:
         """
         批量发布数据
 
+        同一主题的消息合并为一个多帧消息发送，Worker 端拆分后逐条处理
+
         Args:
             messages: 消息列表
 
         Returns:
             成功发布的消息数量
         """
-        count = 0
+        grouped: Dict[str, List[Message]] = {}
         for message in messages:
             if message.payload.get("symbol") and message.payload.get("data_type"):
                 topic = MessageTopic.market_data(
                     message.payload["symbol"],
                     message.payload["data_type"],
                 )
-                if await self.comm_manager.publish_data(topic, message):
-                    count += 1
+                grouped.setdefault(topic, []).append(message)
+
+        count = 0
+        for topic, group in grouped.items():
+            sent = await self.comm_manager.publish_batch(topic, group)
+            count += sent
+            self._messages_dropped += len(group) - sent
+        self._messages_published += count
         return count
 
     def get_subscribers(self, symbol: str, data_type: str) -> Set[str]:
@@ -294,6 +374,7 @@ class DataBroker:
             "topics_count": len(self._topic_routing),
             "messages_published": self._messages_published,
             "messages_dropped": self._messages_dropped,
+            "shm_writes": self._shm_writes,
             "topic_stats": self.get_topic_stats(),
         }
 
@@ -1,16 +1,30 @@
 """
 Worker IPC协议定义
 
-定义Worker进程间通信的消息协议，包括消息类型、消息格式和序列化/反序列化
+定义Worker进程间通信的消息协议，包括消息类型、消息格式和序列化/反序列化。
+
+支持两种编码：
+- json: 兼容原有格式的 JSON 文本
+- binary: 固定头部的二进制帧，K线/Tick 市场数据使用定长 struct 布局，
+  其它负载使用 msgpack（已安装时）或 JSON
+接收方根据首字节自动识别编码，发送方按连接选择编码。
 """
 
+import itertools
 import json
+import struct
 import time
-import uuid
 from enum import Enum
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
 from dataclasses import dataclass, field
 
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
 
 class MessageType(Enum):
     """消息类型枚举"""
@@ -49,6 +63,15 @@ class MessageType(Enum):
     CONTROL = "control"
 
 
+# 进程内单调递增的消息ID，替代逐条生成 uuid4
+_message_ids = itertools.count(1)
+
+
+def next_message_id() -> int:
+    """生成下一个消息ID"""
+    return next(_message_ids)
+
+
 @dataclass
 class Message:
     """
@@ -59,13 +82,13 @@ class Message:
         worker_id: Worker ID
         payload: 消息负载数据
         timestamp: 时间戳
-        msg_id: 消息唯一ID
+        msg_id: 消息ID（发送进程内单调递增）
     """
     msg_type: MessageType
     worker_id: Optional[str] = None
     payload: Dict[str, Any] = field(default_factory=dict)
     timestamp: float = field(default_factory=time.time)
-    msg_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    msg_id: int = field(default_factory=next_message_id)
 
     def to_json(self) -> str:
         """将消息序列化为JSON字符串"""
@@ -87,7 +110,7 @@ class Message:
             worker_id=data.get("worker_id"),
             payload=data.get("payload", {}),
             timestamp=data.get("timestamp", time.time()),
-            msg_id=data.get("msg_id", str(uuid.uuid4())),
+            msg_id=data.get("msg_id") or next_message_id(),
         )
 
     @classmethod
@@ -257,22 +280,289 @@ class MessageTopic:
         return "broadcast.all"
 
 
-def serialize_message(message: Message) -> bytes:
+class MessageCodec:
+    """
+    消息编解码器基类
+
+    Attributes:
+        name: 编码名称，用于配置和协商
+    """
+
+    name = ""
+
+    def encode(self, message: Message) -> bytes:
+        """将消息编码为字节"""
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Message:
+        """从字节解码消息"""
+        raise NotImplementedError
+
+
+class JsonCodec(MessageCodec):
+    """JSON 编解码器（原有格式）"""
+
+    name = "json"
+
+    def encode(self, message: Message) -> bytes:
+        return message.to_json().encode("utf-8")
+
+    def decode(self, data: bytes) -> Message:
+        json_str = data.decode("utf-8")
+        if not json_str or len(json_str.strip()) == 0:
+            raise ValueError("解码后的JSON字符串为空")
+        return Message.from_json(json_str)
+
+
+# 二进制帧头部：magic, 版本, 消息类型序号, 负载类型, 消息ID, 时间戳
+BINARY_MAGIC = 0xB1
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<BBBBQd")
+_STR_LEN = struct.Struct("<H")
+_NONE_STR = 0xFFFF
+
+# 负载类型
+PAYLOAD_JSON = 0
+PAYLOAD_MSGPACK = 1
+PAYLOAD_KLINE = 2
+PAYLOAD_TICK = 3
+
+# 市场数据定长布局：负载时间戳, 数据时间戳, 数值字段
+_KLINE_STRUCT = struct.Struct("<dq5d")
+_TICK_STRUCT = struct.Struct("<dq2d")
+_KLINE_FIELDS = ("open", "high", "low", "close", "volume")
+_TICK_FIELDS = ("price", "volume")
+_MARKET_DATA_KEYS = frozenset(("symbol", "data_type", "data", "source", "timestamp"))
+
+_MESSAGE_TYPES = list(MessageType)
+_MESSAGE_TYPE_INDEX = {msg_type: i for i, msg_type in enumerate(_MESSAGE_TYPES)}
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    if value is None:
+        return _STR_LEN.pack(_NONE_STR)
+    raw = value.encode("utf-8")
+    return _STR_LEN.pack(len(raw)) + raw
+
+
+def _unpack_str(data: bytes, offset: int):
+    (length,) = _STR_LEN.unpack_from(data, offset)
+    offset += _STR_LEN.size
+    if length == _NONE_STR:
+        return None, offset
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+class BinaryCodec(MessageCodec):
+    """
+    二进制编解码器
+
+    帧格式：定长头部 + worker_id + 负载。
+    data_type 为 kline/tick 且数值字段类型与定长布局一致的市场数据使用 struct 打包，
+    无法放入定长布局的附加字段以 JSON 附在末尾；其余负载使用 msgpack 或 JSON。
+    """
+
+    name = "binary"
+
+    def encode(self, message: Message) -> bytes:
+        payload = message.payload
+        body = None
+        kind = PAYLOAD_JSON
+        if message.msg_type is MessageType.MARKET_DATA:
+            kind, body = self._encode_market_data(payload)
+        if body is None:
+            if MSGPACK_AVAILABLE:
+                kind, body = PAYLOAD_MSGPACK, msgpack.packb(payload, use_bin_type=True)
+            else:
+                kind, body = PAYLOAD_JSON, json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+        # 旧格式的 uuid 字符串ID无法放入头部，记为 0
+        msg_id = message.msg_id if type(message.msg_id) is int else 0
+        header = _HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, _MESSAGE_TYPE_INDEX[message.msg_type], kind,
+            msg_id, message.timestamp,
+        )
+        return b"".join((header, _pack_str(message.worker_id), body))
+
+    @staticmethod
+    def _encode_market_data(payload: Dict[str, Any]):
+        """按定长布局编码K线/Tick，不满足条件时返回 (PAYLOAD_JSON, None)"""
+        if payload.keys() != _MARKET_DATA_KEYS:
+            return PAYLOAD_JSON, None
+        data_type = payload["data_type"]
+        if data_type == "kline":
+            kind, layout, fields = PAYLOAD_KLINE, _KLINE_STRUCT, _KLINE_FIELDS
+        elif data_type == "tick":
+            kind, layout, fields = PAYLOAD_TICK, _TICK_STRUCT, _TICK_FIELDS
+        else:
+            return PAYLOAD_JSON, None
+
+        data = payload["data"]
+        symbol = payload["symbol"]
+        source = payload["source"]
+        if not isinstance(data, dict) or type(symbol) is not str or type(payload["timestamp"]) is not float:
+            return PAYLOAD_JSON, None
+        if source is not None and type(source) is not str:
+            return PAYLOAD_JSON, None
+        try:
+            # 类型必须与布局严格一致，保证解码后与原数据相同
+            timestamp = data["timestamp"]
+            values = [data[f] for f in fields]
+        except KeyError:
+            return PAYLOAD_JSON, None
+        if type(timestamp) is not int or any(type(v) is not float for v in values):
+            return PAYLOAD_JSON, None
+
+        try:
+            packed = layout.pack(payload["timestamp"], timestamp, *values)
+        except struct.error:
+            return PAYLOAD_JSON, None
+
+        extra = b""
+        if len(data) > len(fields) + 1:
+            extra = json.dumps(
+                {k: v for k, v in data.items() if k != "timestamp" and k not in fields},
+                ensure_ascii=False,
+            ).encode("utf-8")
+        return kind, b"".join((_pack_str(symbol), _pack_str(source), packed, extra))
+
+    def decode(self, data: bytes) -> Message:
+        if len(data) < _HEADER.size or data[0] != BINARY_MAGIC:
+            raise ValueError("不是有效的二进制消息帧")
+        _, version, type_index, kind, msg_id, timestamp = _HEADER.unpack_from(data, 0)
+        if version != BINARY_VERSION:
+            raise ValueError(f"不支持的二进制消息版本: {version}")
+        worker_id, offset = _unpack_str(data, _HEADER.size)
+
+        if kind == PAYLOAD_KLINE or kind == PAYLOAD_TICK:
+            payload = self._decode_market_data(data, offset, kind)
+        elif kind == PAYLOAD_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("消息使用 msgpack 编码，但未安装 msgpack")
+            payload = msgpack.unpackb(data[offset:], raw=False, strict_map_key=False)
+        elif kind == PAYLOAD_JSON:
+            payload = json.loads(data[offset:].decode("utf-8"))
+        else:
+            raise ValueError(f"未知的负载类型: {kind}")
+
+        return Message(
+            msg_type=_MESSAGE_TYPES[type_index],
+            worker_id=worker_id,
+            payload=payload,
+            timestamp=timestamp,
+            msg_id=msg_id,
+        )
+
+    @staticmethod
+    def _decode_market_data(data: bytes, offset: int, kind: int) -> Dict[str, Any]:
+        symbol, offset = _unpack_str(data, offset)
+        source, offset = _unpack_str(data, offset)
+        if kind == PAYLOAD_KLINE:
+            layout, fields, data_type = _KLINE_STRUCT, _KLINE_FIELDS, "kline"
+        else:
+            layout, fields, data_type = _TICK_STRUCT, _TICK_FIELDS, "tick"
+
+        values = layout.unpack_from(data, offset)
+        offset += layout.size
+        market = {"timestamp": values[1]}
+        market.update(zip(fields, values[2:]))
+        if offset < len(data):
+            market.update(json.loads(data[offset:].decode("utf-8")))
+
+        return {
+            "symbol": symbol,
+            "data_type": data_type,
+            "data": market,
+            "source": source,
+            "timestamp": values[0],
+        }
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS: Dict[str, MessageCodec] = {codec.name: codec for codec in (JSON_CODEC, BINARY_CODEC)}
+
+
+def get_codec(codec: Union[str, MessageCodec, None]) -> MessageCodec:
+    """
+    获取编解码器
+
+    Args:
+        codec: 编码名称或编解码器实例，None 表示 JSON
+
+    Raises:
+        ValueError: 未知的编码名称
+    """
+    if codec is None:
+        return JSON_CODEC
+    if isinstance(codec, MessageCodec):
+        return codec
+    try:
+        return CODECS[codec]
+    except KeyError:
+        raise ValueError(f"未知的消息编码: {codec}，可选: {list(CODECS)}") from None
+
+
+def detect_codec(data: bytes) -> MessageCodec:
+    """根据首字节识别字节数据使用的编码"""
+    return BINARY_CODEC if data[0] == BINARY_MAGIC else JSON_CODEC
+
+
+# 批量帧：[主题, 批量头部, 消息1, 消息2, ...]，头部为 magic + 消息数
+BATCH_MAGIC = b"QBAT"
+_BATCH_HEADER = struct.Struct("<4sI")
+
+
+def pack_batch(encoded: List[bytes]) -> List[bytes]:
+    """
+    将已编码的消息打包为批量帧（不含主题）
+
+    Args:
+        encoded: 已编码的消息列表
+
+    Returns:
+        帧列表，单条消息时不加批量头部
+    """
+    if len(encoded) == 1:
+        return list(encoded)
+    return [_BATCH_HEADER.pack(BATCH_MAGIC, len(encoded)), *encoded]
+
+
+def unpack_batch(frames: List[bytes]) -> List[bytes]:
+    """
+    从主题之后的帧中取出各条已编码消息
+
+    Args:
+        frames: 主题之后的帧列表
+
+    Raises:
+        ValueError: 批量头部中的消息数与帧数不一致
+    """
+    if len(frames) > 1 and len(frames[0]) == _BATCH_HEADER.size and frames[0][:4] == BATCH_MAGIC:
+        _, count = _BATCH_HEADER.unpack(frames[0])
+        if count != len(frames) - 1:
+            raise ValueError(f"批量帧消息数不一致: 头部 {count}, 实际 {len(frames) - 1}")
+        return frames[1:]
+    return frames
+
+
+def serialize_message(message: Message, codec: Union[str, MessageCodec, None] = None) -> bytes:
     """
     序列化消息为字节
 
     Args:
         message: 消息对象
+        codec: 编码名称或编解码器，默认为 JSON
 
     Returns:
         字节数据
     """
-    return message.to_json().encode("utf-8")
+    return get_codec(codec).encode(message)
 
 
 def deserialize_message(data: bytes) -> Message:
     """
-    从字节反序列化消息
+    从字节反序列化消息，自动识别编码
 
     Args:
         data: 字节数据
@@ -286,8 +576,4 @@ def deserialize_message(data: bytes) -> Message:
     if not data or len(data) == 0:
         raise ValueError("接收到的数据为空")
 
-    json_str = data.decode("utf-8")
-    if not json_str or len(json_str.strip()) == 0:
-        raise ValueError("解码后的JSON字符串为空")
-
-    return Message.from_json(json_str)
+    return detect_codec(data).decode(data)
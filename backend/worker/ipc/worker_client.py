@@ -6,20 +6,25 @@ Worker进程使用的ZeroMQ客户端
 
 import zmq
 import zmq.asyncio
-from typing import Optional, Callable, List, Set
+from typing import Optional, Callable, List, Set, Union
 import asyncio
 from utils.logger import get_logger, LogType
 
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
-from .protocol import Message, serialize_message, deserialize_message
+from .protocol import Message, MessageCodec, deserialize_message, get_codec, unpack_batch
+
+# 数据订阅端的接收高水位（消息数），与主进程发送高水位配合吸收整点突发
+DEFAULT_RECV_HWM = 100000
 
 
 class WorkerCommClient:
     """
     Worker进程的通信客户端
 
-    连接到主进程的通信服务，接收数据和命令，发送状态
+    连接到主进程的通信服务，接收数据和命令，发送状态。
+    发送使用本端编码，接收时按首字节自动识别编码；
+    批量数据帧拆分为逐条消息后依次调用数据处理器
     """
 
     def __init__(
@@ -29,12 +34,16 @@ class WorkerCommClient:
         data_port: int = 5555,
         control_port: int = 5556,
         status_port: int = 5557,
+        codec: Union[str, MessageCodec] = "binary",
+        recv_hwm: int = DEFAULT_RECV_HWM,
     ):
         self.worker_id = worker_id
         self.host = host
         self.data_port = data_port
         self.control_port = control_port
         self.status_port = status_port
+        self.codec = get_codec(codec)
+        self.recv_hwm = recv_hwm
 
         # 通信上下文
         self._context: Optional[zmq.asyncio.Context] = None
@@ -64,6 +73,7 @@ class WorkerCommClient:
 
             # 创建数据订阅端点
             self._data_subscriber = self._context.socket(zmq.SUB)
+            self._data_subscriber.setsockopt(zmq.RCVHWM, self.recv_hwm)
             self._data_subscriber.connect(f"tcp://{self.host}:{self.data_port}")
             # 默认订阅控制广播
             self._data_subscriber.setsockopt(zmq.SUBSCRIBE, b"control.all")
@@ -198,7 +208,7 @@ class WorkerCommClient:
                 # 调试：记录发送前的 worker_id（仅debug级别）
                 logger.debug(f"[send_status] 发送前: message.worker_id={message.worker_id}, self.worker_id={self.worker_id}")
                 message.worker_id = self.worker_id
-                data = serialize_message(message)
+                data = self.codec.encode(message)
                 logger.debug(f"[send_status] 序列化后: data={data[:200]}...")
                 await self._status_sender.send(data)
                 logger.debug(f"[send_status] 消息已发送")
@@ -222,7 +232,7 @@ class WorkerCommClient:
         try:
             if self._control_client and self._connected:
                 message.worker_id = self.worker_id
-                data = serialize_message(message)
+                data = self.codec.encode(message)
                 await self._control_client.send(data)
                 return True
         except Exception as e:
@@ -262,21 +272,26 @@ class WorkerCommClient:
         while self._connected:
             try:
                 if self._data_subscriber:
-                    topic, data = await self._data_subscriber.recv_multipart()
-                    message = deserialize_message(data)
-
-                    # 调用所有数据处理器
-                    for handler in self._data_handlers:
-                        try:
-                            handler(topic.decode(), message)
-                        except Exception as e:
-                            logger.error(f"数据处理器错误: {e}")
+                    frames = await self._data_subscriber.recv_multipart()
+                    topic = frames[0].decode()
+                    for data in unpack_batch(frames[1:]):
+                        await self._dispatch_data(topic, deserialize_message(data))
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"接收数据错误: {e}")
                 await asyncio.sleep(0.1)
 
+    async def _dispatch_data(self, topic: str, message: Message):
+        """调用所有数据处理器，协程处理器等待其完成"""
+        for handler in self._data_handlers:
+            try:
+                result = handler(topic, message)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"数据处理器错误: {e}")
+
     async def _control_loop(self):
         """控制命令接收循环"""
         while self._connected:
@@ -34,6 +34,9 @@ class WorkerManager:
         data_port: int = 5555,
         control_port: int = 5556,
         status_port: int = 5557,
+        shared_market_data: Optional[Any] = None,
+        ipc_codec: str = "binary",
+        batch_window_ms: float = 0.0,
     ):
         """
         初始化 Worker 管理器
@@ -44,6 +47,10 @@ class WorkerManager:
             data_port: 数据端口
             control_port: 控制端口
             status_port: 状态端口
+            shared_market_data: 共享内存市场数据（SharedMemoryMarketData），
+                配置后行情写入共享内存，Worker 只接收通知
+            ipc_codec: 进程间消息编码（binary/json），Worker 未在配置中指定时沿用
+            batch_window_ms: 行情合并发布窗口（毫秒），0 表示逐条发送
         """
         self.max_workers = max_workers
         self.comm_host = comm_host
@@ -57,8 +64,10 @@ class WorkerManager:
             data_port=data_port,
             control_port=control_port,
             status_port=status_port,
+            codec=ipc_codec,
+            batch_window_ms=batch_window_ms,
         )
-        self.data_broker = DataBroker(self.comm_manager)
+        self.data_broker = DataBroker(self.comm_manager, shared_market_data)
 
         # Worker 管理
         self._workers: Dict[str, WorkerProcess] = {}
@@ -223,7 +232,8 @@ class WorkerManager:
                 logger.error(f"Worker ID 已存在: {worker_id}")
                 return None
 
-            # 创建 Worker 进程
+            # 创建 Worker 进程，未指定编码时沿用管理器的编码
+            config = {"ipc_codec": self.comm_manager.codec.name, **config}
             worker = WorkerProcess(
                 worker_id=worker_id,
                 strategy_path=strategy_path,
@@ -674,6 +684,7 @@ class WorkerManager:
             "running_workers": self.get_running_count(),
             "max_workers": self.max_workers,
             "data_broker_stats": self.data_broker.get_stats(),
+            "publish_stats": self.comm_manager.get_stats(),
         }
 
 
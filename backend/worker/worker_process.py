@@ -16,6 +16,7 @@ from utils.logger import get_logger, LogType
 # 获取模块日志器
 logger = get_logger(__name__, LogType.APPLICATION)
 from .ipc import WorkerCommClient, Message, MessageType
+from .ipc.data_broker import KLINE_SHM_FIELDS, TICK_SHM_FIELDS, shared_memory_key
 from .state import WorkerState, WorkerStatus
 
 
@@ -64,6 +65,9 @@ class WorkerProcess(multiprocessing.Process):
         self._messages_processed = 0
         self._orders_placed = 0
 
+        # 已附加的共享内存市场数据（命名空间 -> 只读实例）
+        self._shared_market_data: Dict[str, Any] = {}
+
     def run(self):
         """
         进程主入口
@@ -174,6 +178,7 @@ class WorkerProcess(multiprocessing.Process):
             data_port=self.data_port,
             control_port=self.control_port,
             status_port=self.status_port,
+            codec=self.config.get("ipc_codec", "binary"),
         )
 
         # 注册消息处理器
@@ -511,6 +516,12 @@ class WorkerProcess(multiprocessing.Process):
             if not symbol or not data:
                 return
 
+            # 通知消息：从共享内存环形缓冲区读取数据
+            if "shm" in data:
+                data = self._read_shared_memory(symbol, data_type, data)
+                if data is None:
+                    return
+
             # 调用策略回调
             if data_type == "kline" and hasattr(self.strategy, "on_bar"):
                 await self._call_strategy_method("on_bar", data)
@@ -521,6 +532,38 @@ class WorkerProcess(multiprocessing.Process):
             logger.error(f"Worker {self.worker_id} 处理数据错误: {e}")
             self.status.record_error(str(e))
 
+    def _read_shared_memory(self, symbol: str, data_type: str, notification: dict) -> Optional[dict]:
+        """
+        按通知消息从共享内存读取市场数据
+
+        Args:
+            symbol: 交易对
+            data_type: 数据类型
+            notification: DataBroker 发送的通知，包含 shm 命名空间和 shm_seq 记录序号
+
+        Returns:
+            还原后的数据字典，记录不存在或已被覆盖时返回 None
+        """
+        namespace = notification["shm"]
+        shared = self._shared_market_data.get(namespace)
+        if shared is None:
+            from strategy.core.memory_pool import SharedMemoryMarketData
+
+            shared = SharedMemoryMarketData.attach(namespace)
+            self._shared_market_data[namespace] = shared
+
+        seq = notification["shm_seq"]
+        record = shared.read_seq(shared_memory_key(symbol, data_type), seq)
+        if record is None:
+            logger.warning(f"Worker {self.worker_id} 共享内存记录不可用: {symbol} {data_type} seq={seq}")
+            return None
+
+        data = {key: value for key, value in notification.items() if key not in ("shm", "shm_seq")}
+        fields = KLINE_SHM_FIELDS if data_type == "kline" else TICK_SHM_FIELDS
+        for field in fields:
+            data[field] = record[field]
+        return data
+
     async def _handle_control(self, message: Message):
         """
         处理控制命令
@@ -687,6 +730,11 @@ class WorkerProcess(multiprocessing.Process):
             except Exception as e:
                 logger.error(f"Worker {self.worker_id} 断开通信连接错误: {e}")
 
+        # 关闭共享内存映射
+        for shared in self._shared_market_data.values():
+            shared.close()
+        self._shared_market_data.clear()
+
         # 更新状态
         self.status.update_state(WorkerState.STOPPED)
         logger.info(f"Worker {self.worker_id} 资源清理完成，进程即将退出")